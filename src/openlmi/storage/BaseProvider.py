@@ -19,8 +19,12 @@
 
 """ Module for BaseProvider class. """
 
+import pywbem
 from pywbem.cim_provider2 import CIMProvider2
+import threading
+import weakref
 import openlmi.common.cmpi_logging as cmpi_logging
+import openlmi.storage.util.classes as classes
 
 class BaseProvider(CIMProvider2):
     """
@@ -33,11 +37,13 @@ class BaseProvider(CIMProvider2):
     """
     @cmpi_logging.trace_method
     def __init__(self, storage, config, provider_manager, setting_manager,
-            job_manager, *args, **kwargs):
+            job_manager, snapshot=None, *args, **kwargs):
         """
             Initialize the provider.
             Store reference to blivet.Blivet.
             Store reference to StorageConfiguration.
+            Store reference to StorageSnapshot or SysfsInventory, which is
+            used until blivet.Blivet is populated.
             Register at given ProviderManager.
         """
         super(BaseProvider, self).__init__(*args, **kwargs)
@@ -46,6 +52,199 @@ class BaseProvider(CIMProvider2):
         self.provider_manager = provider_manager
         self.setting_manager = setting_manager
         self.job_manager = job_manager
+        self.snapshot = snapshot
+        # Hash DeviceTree -> list of CIMInstanceNames, see get_cached_names().
+        self._names = weakref.WeakKeyDictionary()
+        self._names_lock = threading.Lock()
+
+    # pylint: disable-msg=R0201
+    def enum_instance_names(self):
+        """
+            Return iterable with CIMInstanceNames of all instances of this
+            provider, which depend only on the device tree, or None, if
+            they must be enumerated by enum_instances().
+            Subclasses may override this method, the result is cached until
+            the device tree is reset.
+        """
+        return None
+
+    @cmpi_logging.trace_method
+    def get_cached_names(self):
+        """
+            Return list of CIMInstanceNames returned by
+            enum_instance_names() for current device tree or None, if the
+            provider does not support it.
+        """
+        devicetree = self.storage.devicetree
+        with self._names_lock:
+            names = self._names.get(devicetree)
+        if names is None:
+            names = self.enum_instance_names()
+            if names is None:
+                return None
+            names = list(names)
+            with self._names_lock:
+                self._names[devicetree] = names
+        return list(names)
+
+    @staticmethod
+    def is_requested(model, *properties):
+        """
+            Return True, if any of given properties should be set in given
+            model, i.e. there is no PropertyList in the request or the
+            property is in the PropertyList. Providers use this method to
+            skip computation of properties, which are not requested.
+        """
+        # list of lowercase property names or None
+        property_list = getattr(model, 'property_list', None)
+        if property_list is None:
+            return True
+        for prop in properties:
+            if prop.lower() in property_list:
+                return True
+        return False
+
+    @staticmethod
+    def _get_property_list(propertyList, instance_name=None):
+        """
+            Return lowercase PropertyList of a request, extended by key
+            names of given CIMInstanceName, as CIMProvider2 expects it.
+            Return None, if there is no PropertyList.
+        """
+        if propertyList is None:
+            return None
+        plist = [prop.lower() for prop in propertyList]
+        if instance_name is not None:
+            plist += [key.lower() for key in instance_name.keybindings.keys()]
+        return plist
+
+    def _filter_cached(self, instance, propertyList):
+        """
+            Return copy of instance from the snapshot with only properties
+            in given PropertyList. The snapshot itself is not modified.
+        """
+        instance = instance.copy()
+        self.filter_instance(instance,
+                self._get_property_list(propertyList, instance.path))
+        return instance
+
+    def _use_snapshot(self):
+        """
+            Return True, if blivet.Blivet is not populated yet and requests
+            should be answered from the snapshot.
+        """
+        return self.snapshot is not None and not self.snapshot.is_ready()
+
+    def _wait_for_storage(self):
+        """ Block until blivet.Blivet is populated."""
+        if self._use_snapshot():
+            self.snapshot.wait_for_ready()
+
+    @cmpi_logging.trace_method
+    def MI_enumInstanceNames(self, env, objPath):
+        """
+            Enumerate instance names, from the snapshot if blivet.Blivet is
+            not populated yet.
+        """
+        if self._use_snapshot():
+            instances = self.snapshot.get_instances(objPath.classname)
+            if instances is not None:
+                return [instance.path for instance in instances]
+            self.snapshot.wait_for_ready()
+        names = self.get_cached_names()
+        if names is not None:
+            return names
+        return super(BaseProvider, self).MI_enumInstanceNames(env, objPath)
+
+    @cmpi_logging.trace_method
+    def MI_enumInstances(self, env, objPath, propertyList):
+        """
+            Enumerate instances, from the snapshot if blivet.Blivet is not
+            populated yet. Complete enumerations of the populated
+            blivet.Blivet are stored in the snapshot.
+        """
+        if self._use_snapshot():
+            instances = self.snapshot.get_instances(objPath.classname)
+            if instances is not None:
+                for instance in instances:
+                    yield self._filter_cached(instance, propertyList)
+                return
+            self.snapshot.wait_for_ready()
+
+        # CIMProvider2.MI_enumInstances ignores the PropertyList, build
+        # the model with it, so is_requested() works also for enumerations.
+        model = pywbem.CIMInstance(classname=objPath.classname,
+                path=objPath,
+                property_list=self._get_property_list(propertyList))
+        store = self.snapshot is not None and propertyList is None
+        instances = []
+        devicetree = self.storage.devicetree
+        for instance in self.enum_instances(env=env, model=model,
+                keys_only=False) or []:
+            if store:
+                # providers yield the same model modified in place
+                instances.append(instance.copy())
+            yield instance
+        if store and self.storage.devicetree is devicetree:
+            # the device tree was not reset during the enumeration
+            self.snapshot.store_instances(
+                    self.storage, objPath.classname, instances)
+
+    @cmpi_logging.trace_method
+    def MI_getInstance(self, env, instanceName, propertyList):
+        """
+            Get instance, from the snapshot if blivet.Blivet is not
+            populated yet.
+        """
+        if self._use_snapshot():
+            instance = self.snapshot.get_instance(instanceName)
+            if instance is not None:
+                return self._filter_cached(instance, propertyList)
+            self.snapshot.wait_for_ready()
+        return super(BaseProvider, self).MI_getInstance(
+                env, instanceName, propertyList)
+
+    # Following operations need populated blivet.Blivet.
+
+    def MI_createInstance(self, env, *args):
+        """ Wait for blivet.Blivet and create instance."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_createInstance(env, *args)
+
+    def MI_modifyInstance(self, env, *args):
+        """ Wait for blivet.Blivet and modify instance."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_modifyInstance(env, *args)
+
+    def MI_deleteInstance(self, env, *args):
+        """ Wait for blivet.Blivet and delete instance."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_deleteInstance(env, *args)
+
+    def MI_associators(self, env, *args):
+        """ Wait for blivet.Blivet and return associators."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_associators(env, *args)
+
+    def MI_associatorNames(self, env, *args):
+        """ Wait for blivet.Blivet and return associator names."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_associatorNames(env, *args)
+
+    def MI_references(self, env, *args):
+        """ Wait for blivet.Blivet and return references."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_references(env, *args)
+
+    def MI_referenceNames(self, env, *args):
+        """ Wait for blivet.Blivet and return reference names."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_referenceNames(env, *args)
+
+    def MI_invokeMethod(self, env, *args):
+        """ Wait for blivet.Blivet and invoke the method."""
+        self._wait_for_storage()
+        return super(BaseProvider, self).MI_invokeMethod(env, *args)
 
     @cmpi_logging.trace_method
     # The method has too many arguments, but that's because of
@@ -115,11 +314,10 @@ class BaseProvider(CIMProvider2):
             CIM_ERR_FAILED (some other unspecified error occurred)
         """
 
-        cimom = env.get_cimom_handle()
-        if cimom.is_subclass(object_name.namespace,
+        if classes.is_subclass(env, object_name.namespace,
                   sub=object_name.classname,
                   super=first_class) or \
-                  cimom.is_subclass(object_name.namespace,
+                  classes.is_subclass(env, object_name.namespace,
                        sub=object_name.classname,
                        super=second_class):
             return self.simple_refs(env, object_name, model,
@@ -19,6 +19,7 @@
 """ Module for CapabilitiesProvider class. """
 
 from openlmi.storage.BaseProvider import BaseProvider
+from collections import OrderedDict
 import pywbem
 import openlmi.common.cmpi_logging as cmpi_logging
 
@@ -40,6 +41,54 @@ class CapabilitiesProvider(BaseProvider):
     def __init__(self, classname, *args, **kwargs):
         super(CapabilitiesProvider, self).__init__(*args, **kwargs)
         self.classname = classname
+        # List of capabilities dictionaries of subclasses, whose
+        # capabilities do not depend on storage devices, or None.
+        # Subclasses fill it in their __init__.
+        self.instances = None
+        # Hash InstanceID -> capabilities, frozen from self.instances on
+        # first use and dropped when configuration is reloaded.
+        self._frozen = None
+        self.config.add_listener(self._config_changed)
+
+    # pylint: disable-msg=W0613
+    def _config_changed(self, config):
+        """
+            Callback called when configuration is reloaded. Freeze the
+            capabilities again on next use.
+        """
+        self._frozen = None
+
+    @staticmethod
+    def _copy_capabilities(capabilities):
+        """
+            Return copy of given capabilities dictionary, which can be
+            modified without affecting the frozen one.
+        """
+        result = {}
+        for (key, value) in capabilities.iteritems():
+            if isinstance(value, list):
+                value = list(value)
+            elif isinstance(value, pywbem.CIMProperty):
+                value = value.copy()
+            result[key] = value
+        return result
+
+    @cmpi_logging.trace_method
+    def get_frozen_capabilities(self):
+        """
+            Return OrderedDict InstanceID -> capabilities with static
+            capabilities of this provider or None, if the capabilities
+            depend on storage devices. The dictionaries are shared and must
+            not be modified.
+        """
+        frozen = self._frozen
+        if frozen is None and self.instances is not None:
+            frozen = OrderedDict()
+            for capabilities in self.instances:
+                frozen[capabilities['InstanceID']] = \
+                        self._copy_capabilities(capabilities)
+            self._frozen = frozen
+        return frozen
 
     @cmpi_logging.trace_method
     def create_capabilities_id(self, myid):
@@ -76,6 +125,12 @@ class CapabilitiesProvider(BaseProvider):
             
             Subclasses can override this method.
         """
+        frozen = self.get_frozen_capabilities()
+        if frozen is not None:
+            capabilities = frozen.get(instance_id)
+            if capabilities is None:
+                return None
+            return self._copy_capabilities(capabilities)
         for capabilities in self.enumerate_capabilities():
             if capabilities['InstanceID'] == instance_id:
                 return capabilities
@@ -88,10 +143,16 @@ class CapabilitiesProvider(BaseProvider):
             dictionaries property_name -> value.
             If the capabilities are the default ones, it must have
             '_default' as a property name.
-            
-            Subclasses must override this method.
+
+            By default, copies of static capabilities in self.instances are
+            returned. Subclasses with dynamic capabilities must override
+            this method.
         """
-        return []
+        frozen = self.get_frozen_capabilities()
+        if frozen is None:
+            return []
+        return [self._copy_capabilities(capabilities)
+                for capabilities in frozen.itervalues()]
 
     # pylint: disable-msg=W0613
     @cmpi_logging.trace_method
@@ -211,20 +272,27 @@ class ElementCapabilitiesProvider(BaseProvider):
         self.capabilities_provider = capabilities_provider
         self.service_provider = service_provider
         super(ElementCapabilitiesProvider, self).__init__(*args, **kwargs)
+        # List of (managed_element_name, capabilities_name) of static
+        # capabilities, computed on first use and dropped when
+        # configuration is reloaded.
+        self._frozen = None
+        self.config.add_listener(self._config_changed)
+
+    # pylint: disable-msg=W0613
+    def _config_changed(self, config):
+        """
+            Callback called when configuration is reloaded. Forget the
+            instance names, the namespace or system name may have changed.
+        """
+        self._frozen = None
 
     @cmpi_logging.trace_method
-    def enumerate_capabilities(self):
+    def _get_names(self):
         """
-            Return iterable with (managed_element_name, capabilities_name),
-            where managed_element_name and capabilities_name
-            are CIMInstanceName.
-            
-            By default, all capabilities provided by capabilities_provider
-            are associated to service_provider.
-            
-            Subclasses can override this method if different behavior is
-            requested.
+            Return list of (managed_element_name, capabilities_name) of all
+            capabilities of capabilities_provider.
         """
+        names = []
         for capabilities in self.capabilities_provider.enumerate_capabilities():
             managed_element_name = pywbem.CIMInstanceName(
                     classname=self.service_provider.classname,
@@ -242,7 +310,31 @@ class ElementCapabilitiesProvider(BaseProvider):
                     classname=self.capabilities_provider.classname,
                     namespace=self.config.namespace,
                     keybindings={'InstanceID' : capabilities['InstanceID']})
-            yield (managed_element_name, capabilities_name)
+            names.append((managed_element_name, capabilities_name))
+        return names
+
+    @cmpi_logging.trace_method
+    def enumerate_capabilities(self):
+        """
+            Return iterable with (managed_element_name, capabilities_name),
+            where managed_element_name and capabilities_name
+            are CIMInstanceName.
+            
+            By default, all capabilities provided by capabilities_provider
+            are associated to service_provider.
+            
+            Subclasses can override this method if different behavior is
+            requested.
+        """
+        if self.capabilities_provider.get_frozen_capabilities() is None:
+            # the capabilities change with storage devices
+            return self._get_names()
+        names = self._frozen
+        if names is None:
+            names = self._get_names()
+            self._frozen = names
+        return [(element_name.copy(), capabilities_name.copy())
+                for (element_name, capabilities_name) in names]
 
     @cmpi_logging.trace_method
     def enum_instances(self, env, model, keys_only):
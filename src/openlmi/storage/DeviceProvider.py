@@ -336,6 +336,23 @@ class DeviceProvider(BaseProvider):
                     package_redundancy=package_redundancy,
                     stripe_length=stripe_length)
 
+        @cmpi_logging.trace_method
+        def get_redundancy_lv(self, stripes=1, mirrors=0):
+            """
+                Return the data redundancy characteristics of a logical
+                volume allocated from volume group with this redundancy.
+                The logical volume is striped across given nr. of physical
+                volumes and has given nr. of additional mirrors.
+            """
+            redundancy = self
+            if stripes > 1:
+                redundancy = self.get_common_redundancy_list(
+                        [redundancy] * stripes, self.RAID0)
+            if mirrors > 0:
+                redundancy = self.get_common_redundancy_list(
+                        [redundancy] * (mirrors + 1), self.RAID1)
+            return redundancy
+
         @staticmethod
         @cmpi_logging.trace_function
         def get_common_redundancy_list(redundancy_list,
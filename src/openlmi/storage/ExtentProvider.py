@@ -166,54 +166,69 @@ class ExtentProvider(DeviceProvider):
             raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
                     "Cannot find the extent.")
 
-        model['ElementName'] = self.get_element_name(device)
+        # Compute only properties which are requested, some of them are
+        # expensive.
+        if self.is_requested(model, 'ElementName'):
+            model['ElementName'] = self.get_element_name(device)
         model['NameNamespace'] = self.Values.NameNamespace.OS_Device_Namespace
         model['NameFormat'] = self.Values.NameFormat.OS_Device_Name
         model['Name'] = device.path
 
-        extent_status = self.get_extent_status(device)
-        model['ExtentStatus'] = pywbem.CIMProperty(
-                name='ExtentStatus',
-                value=extent_status,
-                type='uint16',
-                array_size=len(extent_status),
-                is_array=True)
-
-        operational_status = self.get_status(device)
-        model['OperationalStatus'] = pywbem.CIMProperty(
-                name='OperationalStatus',
-                value=operational_status,
-                type='uint16',
-                array_size=len(operational_status),
-                is_array=True)
-
-        (block_size, total_blocks, consumable_blocks) = self.get_size(device)
-        if block_size:
-            model['BlockSize'] = pywbem.Uint64(block_size)
-        if total_blocks:
-            model['NumberOfBlocks'] = pywbem.Uint64(total_blocks)
-        if consumable_blocks:
-            model['ConsumableBlocks'] = pywbem.Uint64(consumable_blocks)
-
-        redundancy = self.get_redundancy(device)
-        model['NoSinglePointOfFailure'] = redundancy.no_single_point_of_failure
-        model['DataRedundancy'] = pywbem.Uint16(redundancy.data_redundancy)
-        model['PackageRedundancy'] = pywbem.Uint16(
-                redundancy.package_redundancy)
-        model['ExtentStripeLength'] = pywbem.Uint64(redundancy.stripe_length)
+        if self.is_requested(model, 'ExtentStatus'):
+            extent_status = self.get_extent_status(device)
+            model['ExtentStatus'] = pywbem.CIMProperty(
+                    name='ExtentStatus',
+                    value=extent_status,
+                    type='uint16',
+                    array_size=len(extent_status),
+                    is_array=True)
+
+        if self.is_requested(model, 'OperationalStatus'):
+            operational_status = self.get_status(device)
+            model['OperationalStatus'] = pywbem.CIMProperty(
+                    name='OperationalStatus',
+                    value=operational_status,
+                    type='uint16',
+                    array_size=len(operational_status),
+                    is_array=True)
+
+        if self.is_requested(model, 'BlockSize', 'NumberOfBlocks',
+                'ConsumableBlocks'):
+            (block_size, total_blocks, consumable_blocks) = \
+                    self.get_size(device)
+            if block_size:
+                model['BlockSize'] = pywbem.Uint64(block_size)
+            if total_blocks:
+                model['NumberOfBlocks'] = pywbem.Uint64(total_blocks)
+            if consumable_blocks:
+                model['ConsumableBlocks'] = pywbem.Uint64(consumable_blocks)
+
+        if self.is_requested(model, 'NoSinglePointOfFailure',
+                'DataRedundancy', 'PackageRedundancy', 'ExtentStripeLength'):
+            redundancy = self.get_redundancy(device)
+            model['NoSinglePointOfFailure'] = \
+                    redundancy.no_single_point_of_failure
+            model['DataRedundancy'] = pywbem.Uint16(
+                    redundancy.data_redundancy)
+            model['PackageRedundancy'] = pywbem.Uint16(
+                    redundancy.package_redundancy)
+            model['ExtentStripeLength'] = pywbem.Uint64(
+                    redundancy.stripe_length)
         model['IsComposite'] = (len(device.parents) > 1)
 
         # TODO: add DeltaReservation (mandatory in SMI-S)
 
-        model['Primordial'] = self.get_primordial(device)
+        if self.is_requested(model, 'Primordial'):
+            model['Primordial'] = self.get_primordial(device)
 
-        discriminator = self.get_discriminator(device)
-        model['ExtentDiscriminator'] = pywbem.CIMProperty(
-                name='ExtentDiscriminator',
-                value=discriminator,
-                type='string',
-                array_size=len(discriminator),
-                is_array=True)
+        if self.is_requested(model, 'ExtentDiscriminator'):
+            discriminator = self.get_discriminator(device)
+            model['ExtentDiscriminator'] = pywbem.CIMProperty(
+                    name='ExtentDiscriminator',
+                    value=discriminator,
+                    type='string',
+                    array_size=len(discriminator),
+                    is_array=True)
 
         return model
 
@@ -225,6 +240,14 @@ class ExtentProvider(DeviceProvider):
         pass
 
 
+    @cmpi_logging.trace_method
+    def enum_instance_names(self):
+        """
+            Return CIMInstanceNames of all devices of this provider.
+        """
+        for device in self.enumerate_devices():
+            yield self.provider_manager.get_name_for_device(device)
+
     @cmpi_logging.trace_method
     def enum_instances(self, env, model, keys_only):
         """Enumerate instances.
@@ -262,6 +285,24 @@ class ExtentProvider(DeviceProvider):
             else:
                 yield self.get_instance(env, model, device)
 
+    @cmpi_logging.trace_method
+    def cim_method_getiohistory(self, env, object_name,
+                                param_resolution=None,
+                                param_since=None):
+        """
+            Implements GetIOHistory() method of StorageExtents.
+
+            Return recorded throughput, IOPS and latency of the extent.
+        """
+        device = self.get_device_for_name(object_name)
+        if not device:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                    "Cannot find the StorageExtent.")
+        stats_provider = self.provider_manager.get_instance_provider(
+                'LMI_BlockStorageStatisticalData')
+        return stats_provider.get_io_history([device], param_resolution,
+                param_since)
+
     class Values(DeviceProvider.Values):
         class NameNamespace(object):
             Unknown = pywbem.Uint16(0)
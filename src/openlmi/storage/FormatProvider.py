@@ -19,6 +19,7 @@
 """ Module for FormatProvider."""
 
 import pywbem
+import weakref
 from openlmi.storage.BaseProvider import BaseProvider
 import openlmi.common.cmpi_logging as cmpi_logging
 
@@ -33,6 +34,8 @@ class FormatProvider(BaseProvider):
     def __init__(self, classname, device_type, *args, **kwargs):
         self.classname = classname
         self.device_type = device_type
+        # Hash DeviceFormat -> (device path, format id, CIMInstanceName).
+        self._format_names = weakref.WeakKeyDictionary()
         super(FormatProvider, self).__init__(*args, **kwargs)
 
     @cmpi_logging.trace_method
@@ -107,16 +110,36 @@ class FormatProvider(BaseProvider):
 
     @cmpi_logging.trace_method
     def get_name_for_format(self, device, fmt):
-        """ Return CIMInstanceName for given DeviceFormat subclass."""
+        """
+            Return CIMInstanceName for given DeviceFormat subclass.
+            The name is cached until the device tree is reset, it must not
+            be modified.
+        """
+        format_id = self.get_format_id(device, fmt)
+        entry = self._format_names.get(fmt)
+        if entry is not None and entry[:2] == (device.path, format_id):
+            return entry[2]
+
         name = pywbem.CIMInstanceName(self.classname,
                 namespace=self.config.namespace,
                 keybindings={
                         "CSCreationClassName": self.config.system_class_name,
                         "CSName": self.config.system_name,
                         "CreationClassName": self.classname,
-                        "Name": self.get_format_id(device, fmt)})
+                        "Name": format_id})
+        self._format_names[fmt] = (device.path, format_id, name)
         return name
 
+    @cmpi_logging.trace_method
+    def enum_instance_names(self):
+        """
+            Return CIMInstanceNames of all formats of this provider.
+        """
+        for device in self.storage.devices:
+            fmt = device.format
+            if fmt and self.provides_format(device, fmt):
+                yield self.get_name_for_format(device, fmt)
+
     @cmpi_logging.trace_method
     def enum_instances(self, env, model, keys_only):
         """
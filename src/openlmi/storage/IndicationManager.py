@@ -35,7 +35,8 @@ class IndicationManager(object):
     
     Usage:
 
-    1. Subclass CIM_InstCreation and CIM_InstModification.
+    1. Subclass CIM_InstCreation, CIM_InstModification and
+    CIM_InstDeletion.
     
     2. In your initialization routine, create one ``IndicationManager``
     instance. E.g. one for whole ``LMI_Storage`` may be is enough.
@@ -272,6 +273,33 @@ class IndicationManager(object):
                 (filter_id, str(path)))
         self.send_indication(ind)
 
+    @cmpi_logging.trace_method
+    def send_instdeletion(self, instance, filter_id):
+        """
+        Send ``LMI_<nameprefix>InstDeletion`` indication with given instance.
+
+        :param instance: (``CIMInstance``) The deleted instance.
+        :param filter_id: (``string``) The ID of registered filter which
+            corresponds to this indication.
+        """
+        if not self.is_subscribed(filter_id):
+            return
+        path = pywbem.CIMInstanceName(
+                classname=self.instdeletion_classname,
+                namespace=self.namespace)
+        ind = pywbem.CIMInstance(
+                self.instdeletion_classname,
+                path=path)
+        ind['SourceInstance'] = instance
+        ind['SourceInstanceHost'] = socket.gethostname()
+        ind['SourceInstanceModelPath'] = str(instance.path)
+        ind['IndicationFilterName'] = "LMI:CIM_IndicationFilter:" + filter_id
+        ind['PerceivedSeverity'] = self.SEVERITY_INFO
+
+        cmpi_logging.logger.info("Sending indication %s for %s" %
+                (filter_id, str(path)))
+        self.send_indication(ind)
+
     @cmpi_logging.trace_method
     def is_subscribed(self, fltr_id):
         """
@@ -26,6 +26,15 @@
     .. autoclass:: Job
         :members:
 
+    .. autoclass:: FinishedJob
+        :members:
+
+    .. autoclass:: JobQueue
+        :members:
+
+    .. autoclass:: JobStatistics
+        :members:
+
     .. autoclass:: LMI_ConcreteJob
         :members:
 
@@ -40,29 +49,32 @@
 
     .. autoclass:: LMI_AssociatedJobMethodResult
         :members:
+
+    .. autoclass:: LMI_JobStatistics
+        :members:
 """
 
 from datetime import datetime, timedelta
+import bisect
+import copy
+import heapq
+import sys
 import threading
-from Queue import Queue
+import time
+from collections import OrderedDict, deque
 import pywbem
 import openlmi.common.cmpi_logging as cmpi_logging
+import openlmi.storage.util.classes as classes
 from pywbem.cim_provider2 import CIMProvider2
 import socket
 
-# Too many instance attributes
-# pylint: disable-msg=R0902
-class Job(object):
+class BaseJob(object):
     """
-        Generic abstract class representing one CIM_ConcreteJob.
-        It remembers input and output arguments, affected ManagedElements and
-        owning ManagedElement (to be able to create associations to them)
-        and all CIM_ConcreteJob properties.
-        
-        Due to multiple threads processing the job, each job has its own 
-        lock to guard its status changes. It is expected that number of jobs
-        is quite low. 
+        Common base of ``Job`` and ``FinishedJob``. It contains all methods
+        needed to present a job as CIM_ConcreteJob and its
+        CIM_InstMethodCall indications.
     """
+    __slots__ = ()
 
     DEFAULT_TIME_BEFORE_REMOVAL = 60  # in seconds
 
@@ -76,11 +88,237 @@ class Job(object):
     FINAL_STATES = [STATE_FINISHED_OK, STATE_FAILED, STATE_SUSPENDED,
             STATE_TERMINATED]
 
+    # Final states, from which the job cannot be started again.
+    COMPLETED_STATES = [STATE_FINISHED_OK, STATE_FAILED, STATE_TERMINATED]
+
     # There is no way how to suspend/terminate running job!
 
+    # Priority classes. Lower number means higher priority, as in
+    # CIM_Job.Priority.
+    PRIORITY_HIGH = 1
+    PRIORITY_NORMAL = 2
+    PRIORITY_LOW = 3
+
+    @cmpi_logging.trace_method
+    def _expire(self):
+        """
+        Callback when a Job completes and time_before_removal second passed.
+        The job gets removed from its JobManager.
+        """
+        cmpi_logging.logger.debug("Got timeout for job %s: '%s', removing"
+                " the job" % (self.the_id, self.job_name))
+        self.job_manager.remove_job(self)
+
+    @cmpi_logging.trace_method
+    def _restart_timer(self):
+        """
+        Re-schedule timer for TimeBeforeRemoval because some property has
+        changed.
+        The timer is not a thread on its own, the job is just (re-)scheduled
+        in ``JobManager``, which removes the job when the time comes.
+        """
+        if not self.job_state in self.FINAL_STATES:
+            # E.g. suspended job was started again, it must not expire.
+            self.job_manager.cancel_expiration(self)
+            return
+
+        if self.delete_on_completion:
+            now = datetime.utcnow()
+            passed = now - self.finish_time
+            timeout = self.time_before_removal - passed.total_seconds()
+            cmpi_logging.logger.debug("Starting timer for job %s: '%s' for %f"
+                    " seconds" % (self.the_id, self.job_name, timeout))
+            self.job_manager.schedule_expiration(self, timeout)
+        else:
+            # Stop the old timer.
+            self.job_manager.cancel_expiration(self)
+
+    @cmpi_logging.trace_method
+    def get_name(self):
+        """
+        Return CIMInstanceName of the job.
+        
+        :rtype: ``CIMInstanceName``
+        """
+        name = pywbem.CIMInstanceName(
+                classname=self.job_manager.job_classname,
+                namespace=self.job_manager.namespace,
+                keybindings={
+                        'InstanceID': self.get_instance_id()
+        })
+        return name
+
+    @cmpi_logging.trace_method
+    def get_instance_id(self, classname=None):
+        """
+        Return InstanceID.
+        
+        :param classname: (``string``) Optional classname to generate InstanceID
+            for different class, e.g. for LMI_<name>MethodResult.
+        :rtype: ``string``
+        """
+        if classname is None:
+            classname = self.job_manager.job_classname
+        return 'LMI:' + classname + ':' + str(self.the_id)
+
+    @staticmethod
+    def parse_instance_id(instance_id, job_manager, classname=None):
+        """
+        Return the last part of instance_id.
+        
+        :param instance_id: (``string``) InstanceID to parse.
+        :param job_manager: (``JobManager``) JobManager to query for Job's
+            classname.
+        :param classname: (``string``) Optional classname. If not given,
+            JobManager's job_classname will be used for parsing. Other
+            classnames may be used to parse e.g. LMI_<name>MethodResult
+            InstanceIDs.
+        
+        :rtype: ``string`` or None if the ``instance_id`` has wrong format.
+        """
+        if classname is None:
+            classname = job_manager.job_classname
+        parts = instance_id.split(":")
+        if len(parts) != 3:
+            return None
+        if parts[0] != 'LMI':
+            return None
+        if parts[1] != classname:
+            return None
+        if not parts[2].isdigit():
+            return None
+        return parts[2]
+
+    @cmpi_logging.trace_method
+    def get_pre_call(self):
+        """ 
+        Return indication that describes the pre-execution values of the
+        job's invocation.
+        
+        :rtype: ``CIMInstance of CIM_InstMethodCall``
+        """
+        path = pywbem.CIMInstanceName(
+                classname="CIM_InstMethodCall",
+                keybindings={},
+                host=socket.gethostname(),
+                namespace=self.job_manager.namespace)
+        inst = pywbem.CIMInstance(
+                classname="CIM_InstMethodCall",
+                path=path,
+                properties={
+                        'MethodName' : self.method_name,
+                        'MethodParameters' : pywbem.CIMProperty(
+                                name="MethodParameters",
+                                type='instance',
+                                value=self._get_method_params(False)),
+                        'PreCall' : True,
+                })
+        src_instance = self._get_cim_instance()
+        inst['SourceInstance'] = src_instance
+        inst['SourceInstanceModelPath'] = str(src_instance.path)
+        return inst
+
+    @cmpi_logging.trace_method
+    def get_post_call(self):
+        """ 
+        Return indication that describes the post-execution values of the
+        job's invocation.
+        
+        :rtype: ``CIMInstance of CIM_InstMethodCall``
+        """
+        path = pywbem.CIMInstanceName(
+                classname="CIM_InstMethodCall",
+                keybindings={},
+                host=socket.gethostname(),
+                namespace=self.job_manager.namespace)
+        inst = pywbem.CIMInstance(
+                classname="CIM_InstMethodCall",
+                path=path,
+                properties={
+                        'MethodName' : self.method_name,
+                        'MethodParameters' : self._get_method_params(True),
+                        'PreCall' : False
+        })
+        src_instance = self._get_cim_instance()
+        inst['SourceInstance'] = src_instance
+        inst['SourceInstanceModelPath'] = str(src_instance.path)
+
+        if self.return_value_type is not None:
+            inst['ReturnValueType'] = self.return_value_type
+        if self.return_value is not None:
+            inst['ReturnValue'] = self.return_value
+        if self.error is not None:
+            inst['Error'] = self.error
+        return inst
+
+    @cmpi_logging.trace_method
+    def _get_cim_instance(self):
+        """
+        Return CIMInstance of this job.
+        
+        :rtype: CIMInstance
+        """
+        return self.job_manager.get_job_instance(self)
+
+    @cmpi_logging.trace_method
+    def _get_method_params(self, output=True):
+        """
+        Assemble __MethodParameters for CIM_InstMethodCall indication.
+        
+        :rtype: CIMInstance of __MethodParameters.
+        """
+        path = pywbem.CIMInstanceName(
+                classname="__MethodParameters",
+                namespace=self.job_manager.namespace,
+                keybindings={})
+        inst = pywbem.CIMInstance(classname="__MethodParameters", path=path)
+        for (name, value) in self.input_arguments.iteritems():
+            inst[name] = value
+        if output and self.output_arguments:
+            # overwrite any input parameter
+            for (name, value) in self.output_arguments.iteritems():
+                inst[name] = value
+        return inst
+
+    # pylint: disable-msg=R0903
+    class ReturnValueType(object):
+        """ CIM_InstMethodCall.ReturnValueType values."""
+        Boolean = pywbem.Uint16(2)
+        String = pywbem.Uint16(3)
+        Char16 = pywbem.Uint16(4)
+        Uint8 = pywbem.Uint16(5)
+        Sint8 = pywbem.Uint16(6)
+        Uint16 = pywbem.Uint16(7)
+        Sint16 = pywbem.Uint16(8)
+        Uint32 = pywbem.Uint16(9)
+        Sint32 = pywbem.Uint16(10)
+        Uint64 = pywbem.Uint16(11)
+        Sint64 = pywbem.Uint16(12)
+        Datetime = pywbem.Uint16(13)
+        Real32 = pywbem.Uint16(14)
+        Real64 = pywbem.Uint16(15)
+        Reference = pywbem.Uint16(16)
+
+# Too many instance attributes
+# pylint: disable-msg=R0902
+class Job(BaseJob):
+    """
+        Generic abstract class representing one CIM_ConcreteJob.
+        It remembers input and output arguments, affected ManagedElements and
+        owning ManagedElement (to be able to create associations to them)
+        and all CIM_ConcreteJob properties.
+        
+        Due to multiple threads processing the job, each job has its own 
+        lock to guard its status changes. It is expected that number of jobs
+        is quite low. 
+
+        When the job completes, ``JobManager`` replaces it with
+        ``FinishedJob``, which does not hold any callbacks or locks.
+    """
+
     @cmpi_logging.trace_method
     def __init__(self, job_manager, job_name, input_arguments,
-            method_name, affected_elements, owning_element):
+            method_name, affected_elements, owning_element, priority=None):
         """
         Create new storage job.
         
@@ -97,6 +335,9 @@ class Job(object):
         :param owning_element: (``CIMInstanceName``) Reference to service, which
             spawned the job. ``LMI_OwningJobElement`` association will be
             created for it.
+        :param priority: (``int``) Priority of the job, lower number means
+            higher priority. If not set, default priority of ``method_name``
+            is used, see ``JobManager.set_method_priority()``.
         """
         self.job_manager = job_manager
 
@@ -125,6 +366,11 @@ class Job(object):
         # Name of the method
         self.method_name = method_name
 
+        # Priority of the job, lower number means higher priority
+        if priority is None:
+            priority = job_manager.get_method_priority(method_name)
+        self.priority = priority
+
         # Time when the job was created
         self.time_submitted = datetime.utcnow()
 
@@ -158,9 +404,6 @@ class Job(object):
         # instances.
         self.owning_element = owning_element
 
-        # Timer used to delete the job after time_before_removal seconds
-        self.timer = None
-
         # CIMError with result code
         self.error = None
 
@@ -310,40 +553,6 @@ class Job(object):
         self._restart_timer()
         self.unlock()
 
-    @cmpi_logging.trace_method
-    def _expire(self):
-        """
-        Callback when a Job completes and time_before_removal second passed.
-        The job gets removed from its JobManager.
-        """
-        cmpi_logging.logger.debug("Got timeout for job %s: '%s', removing"
-                " the job" % (self.the_id, self.job_name))
-        self.job_manager.remove_job(self)
-
-    @cmpi_logging.trace_method
-    def _restart_timer(self):
-        """
-        Re-schedule timer for TimeBeforeRemoval because some property has
-        changed.
-        """
-        if not self.job_state in self.FINAL_STATES:
-            return
-
-        # Stop the old timer.
-        if self.timer:
-            self.timer.cancel()
-            self.timer = None
-
-        # Start the new timer.
-        if self.delete_on_completion:
-            now = datetime.utcnow()
-            passed = now - self.finish_time
-            timeout = self.time_before_removal - passed.total_seconds()
-            cmpi_logging.logger.debug("Starting timer for job %s: '%s' for %f"
-                    " seconds" % (self.the_id, self.job_name, timeout))
-            self.timer = threading.Timer(timeout, self._expire)
-            self.timer.start()
-
     @cmpi_logging.trace_method
     def lock(self):
         """ 
@@ -384,171 +593,408 @@ class Job(object):
         if self._cancel:
             self._cancel(*(self._cancelargs), **(self._cancelkwargs))
 
+class FinishedJob(BaseJob):
+    """
+        Compact record of completed ``Job``. It keeps only the data needed to
+        show the job as CIM_ConcreteJob, LMI_<name>MethodResult and
+        the job associations. Execute and cancel callbacks, their arguments
+        and the per-job lock are dropped.
+
+        All ``FinishedJob`` instances of one ``JobManager`` share one lock.
+    """
+    __slots__ = ('job_manager', 'the_id', 'job_name', 'method_name',
+            'input_arguments', 'output_arguments', 'return_value',
+            'return_value_type', 'priority', 'time_submitted',
+            'time_before_removal',
+            'delete_on_completion', 'percent_complete', 'job_state',
+            'time_of_last_state_change', 'elapsed_time', 'start_time',
+            'finish_time', 'affected_elements', 'owning_element', 'error',
+            'size')
+
     @cmpi_logging.trace_method
-    def get_name(self):
+    def __init__(self, job):
         """
-        Return CIMInstanceName of the job.
-        
-        :rtype: ``CIMInstanceName``
+        Create compact record of given completed job.
+
+        :param job: (``Job``) The completed job.
         """
-        name = pywbem.CIMInstanceName(
-                classname=self.job_manager.job_classname,
-                namespace=self.job_manager.namespace,
-                keybindings={
-                        'InstanceID': self.get_instance_id()
-        })
-        return name
+        self.job_manager = job.job_manager
+        self.the_id = job.the_id
+        self.job_name = job.job_name
+        self.method_name = job.method_name
+        self.input_arguments = job.input_arguments
+        self.output_arguments = job.output_arguments
+        self.return_value = job.return_value
+        self.return_value_type = job.return_value_type
+        self.priority = job.priority
+        self.time_submitted = job.time_submitted
+        self.time_before_removal = job.time_before_removal
+        self.delete_on_completion = job.delete_on_completion
+        self.percent_complete = job.percent_complete
+        self.job_state = job.job_state
+        self.time_of_last_state_change = job.time_of_last_state_change
+        self.elapsed_time = job.elapsed_time
+        self.start_time = job.start_time
+        self.finish_time = job.finish_time
+        self.affected_elements = job.affected_elements
+        self.owning_element = job.owning_element
+        self.error = job.error
+        # Estimated memory consumption of the record, in bytes.
+        self.size = self._estimate_size()
+
+    def _estimate_size(self):
+        """
+        Return rough estimate of memory used by this record, in bytes.
+
+        :rtype: int
+        """
+        size = sys.getsizeof(self)
+        for attr in self.__slots__:
+            if attr in ('job_manager', 'size'):
+                continue
+            size += _estimate_size(getattr(self, attr))
+        return size
+
+    def lock(self):
+        """ Lock mutex shared by all finished jobs."""
+        self.job_manager.finished_job_lock.acquire()
+
+    def unlock(self):
+        """ Unlock mutex shared by all finished jobs."""
+        self.job_manager.finished_job_lock.release()
+
+def _estimate_size(value, depth=4):
+    """
+    Return rough estimate of memory used by given value, including the
+    objects it references, in bytes. Only ``depth`` levels of references
+    are followed.
+
+    :rtype: int
+    """
+    size = sys.getsizeof(value)
+    if depth <= 0 or isinstance(value, basestring):
+        return size
+    if isinstance(value, dict):
+        for (key, item) in value.iteritems():
+            size += _estimate_size(key, depth - 1)
+            size += _estimate_size(item, depth - 1)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            size += _estimate_size(item, depth - 1)
+    elif hasattr(value, '__dict__'):
+        size += _estimate_size(value.__dict__, depth - 1)
+    return size
+
+class JobStatistics(object):
+    """
+        Latency and throughput statistics of completed jobs of one method
+        or of all methods.
+
+        Time spent in the queue (from submission to start) and time spent
+        running are counted in histograms with fixed buckets, see
+        ``BUCKETS``. Run times of failed jobs have their own histogram.
+        Jobs terminated before they started are counted only as cancelled.
+    """
+
+    # Upper bounds of histogram buckets, in seconds. The last bucket of
+    # each histogram counts all longer times.
+    BUCKETS = (0.1, 1, 10, 60, 300, 900, 3600)
+
+    def __init__(self, method_name=None):
+        """
+        :param method_name: (``string``) Name of the CIM method, which
+            spawned the jobs. None for statistics of all jobs.
+        """
+        self.method_name = method_name
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.queue_wait_histogram = [0] * (len(self.BUCKETS) + 1)
+        self.run_time_histogram = [0] * (len(self.BUCKETS) + 1)
+        self.failed_run_time_histogram = [0] * (len(self.BUCKETS) + 1)
+        # Sums and maximums of the times, in seconds.
+        self.total_queue_wait = 0.0
+        self.total_run_time = 0.0
+        self.max_queue_wait = 0.0
+        self.max_run_time = 0.0
+
+    @classmethod
+    def get_bucket(cls, seconds):
+        """
+        Return index of histogram bucket for given time.
+
+        :param seconds: (``float``) The time.
+        :rtype: int
+        """
+        return bisect.bisect_left(cls.BUCKETS, seconds)
+
+    def add_job(self, job):
+        """
+        Count given completed job.
+
+        :param job: (``Job``) The completed job.
+        """
+        if job.start_time is None:
+            self.cancelled += 1
+            return
+
+        queue_wait = (job.start_time - job.time_submitted).total_seconds()
+        queue_wait = max(queue_wait, 0.0)
+        self.queue_wait_histogram[self.get_bucket(queue_wait)] += 1
+        self.total_queue_wait += queue_wait
+        self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+
+        run_time = 0.0
+        if job.elapsed_time:
+            run_time = job.elapsed_time.total_seconds()
+        bucket = self.get_bucket(run_time)
+        self.run_time_histogram[bucket] += 1
+        self.total_run_time += run_time
+        self.max_run_time = max(self.max_run_time, run_time)
+
+        self.completed += 1
+        if job.job_state == Job.STATE_FAILED:
+            self.failed += 1
+            self.failed_run_time_histogram[bucket] += 1
+
+    def get_summary(self):
+        """
+        Return one line summary of the statistics, suitable for logging.
+
+        :rtype: string
+        """
+        executed = self.completed or 1
+        return ("%s: %d completed, %d failed, %d cancelled, "
+                "queue wait avg %.1f s max %.1f s, "
+                "run time avg %.1f s max %.1f s" % (
+                    self.method_name or "all jobs",
+                    self.completed, self.failed, self.cancelled,
+                    self.total_queue_wait / executed, self.max_queue_wait,
+                    self.total_run_time / executed, self.max_run_time))
+
+class JobQueue(object):
+    """
+        Queue of jobs waiting for execution, ordered by their priority.
+        Jobs with the same priority are executed in the order they were
+        enqueued.
+
+        Low priority jobs are not starved by a stream of high priority ones,
+        each waiting job is aged: its effective priority is lowered by one
+        every ``aging_interval`` seconds it waits in the queue.
+
+        The queue can be used as ``Queue.Queue``, i.e. it has the same
+        ``put()``, ``get()``, ``task_done()`` and ``join()`` methods.
+    """
 
     @cmpi_logging.trace_method
-    def get_instance_id(self, classname=None):
+    def __init__(self, aging_interval=None):
         """
-        Return InstanceID.
-        
-        :param classname: (``string``) Optional classname to generate InstanceID
-            for different class, e.g. for LMI_<name>MethodResult.
-        :rtype: ``string``
+        Create new empty queue.
+
+        :param aging_interval: (``float``) Number of seconds after which
+            waiting job gets one step higher priority. None disables aging.
         """
-        if classname is None:
-            classname = self.job_manager.job_classname
-        return 'LMI:' + classname + ':' + str(self.the_id)
+        self.aging_interval = aging_interval
+        # Dictionary priority -> deque of (sequence, enqueue time, job),
+        # ordered by the sequence. There is no empty deque.
+        self._classes = {}
+        # Dictionary job_id -> number of its items in the queue.
+        self._queued = {}
+        # Sequence number of the last enqueued item.
+        self._sequence = 0
+        # Number of items which were not processed yet, see task_done().
+        self._unfinished_tasks = 0
+        # Guards all the attributes above.
+        lock = threading.Lock()
+        # Wakes up waiting get() when a job is enqueued.
+        self._cond = threading.Condition(lock)
+        # Wakes up join() when all items are processed.
+        self._all_done = threading.Condition(lock)
+
+    def _effective_priority(self, priority, enqueued, now):
+        """
+        Return priority of an item after aging.
 
-    @staticmethod
-    def parse_instance_id(instance_id, job_manager, classname=None):
+        :param priority: (``int``) Priority of the item.
+        :param enqueued: (``float``) Time when the item was enqueued.
+        :param now: (``float``) Current time.
+        :rtype: float
         """
-        Return the last part of instance_id.
-        
-        :param instance_id: (``string``) InstanceID to parse.
-        :param job_manager: (``JobManager``) JobManager to query for Job's
-            classname.
-        :param classname: (``string``) Optional classname. If not given,
-            JobManager's job_classname will be used for parsing. Other
-            classnames may be used to parse e.g. LMI_<name>MethodResult
-            InstanceIDs.
-        
-        :rtype: ``string`` or None if the ``instance_id`` has wrong format.
+        if not self.aging_interval:
+            return priority
+        return priority - (now - enqueued) / self.aging_interval
+
+    def _get_sorted_items(self, now):
         """
-        if classname is None:
-            classname = job_manager.job_classname
-        parts = instance_id.split(":")
-        if len(parts) != 3:
-            return None
-        if parts[0] != 'LMI':
-            return None
-        if parts[1] != classname:
-            return None
-        if not parts[2].isdigit():
-            return None
-        return parts[2]
+        Return all items in the order they would be returned by get() at
+        given time.
+        ``_cond`` must be already locked.
+
+        :param now: (``float``) Current time.
+        :rtype: list of (sequence, enqueue time, job)
+        """
+        keyed = []
+        for (priority, items) in self._classes.iteritems():
+            for item in items:
+                key = (self._effective_priority(priority, item[1], now),
+                        item[0])
+                keyed.append((key, item))
+        keyed.sort(key=lambda pair: pair[0])
+        return [item for (_key, item) in keyed]
 
     @cmpi_logging.trace_method
-    def get_pre_call(self):
-        """ 
-        Return indication that describes the pre-execution values of the
-        job's invocation.
-        
-        :rtype: ``CIMInstance of CIM_InstMethodCall``
+    def put(self, job):
         """
-        path = pywbem.CIMInstanceName(
-                classname="CIM_InstMethodCall",
-                keybindings={},
-                host=socket.gethostname(),
-                namespace=self.job_manager.namespace)
-        inst = pywbem.CIMInstance(
-                classname="CIM_InstMethodCall",
-                path=path,
-                properties={
-                        'MethodName' : self.method_name,
-                        'MethodParameters' : pywbem.CIMProperty(
-                                name="MethodParameters",
-                                type='instance',
-                                value=self._get_method_params(False)),
-                        'PreCall' : True,
-                })
-        src_instance = self._get_cim_instance()
-        inst['SourceInstance'] = src_instance
-        inst['SourceInstanceModelPath'] = str(src_instance.path)
-        return inst
+        Enqueue a job with its current priority.
+
+        :param job: (``Job``) Job to enqueue.
+        """
+        self._cond.acquire()
+        try:
+            self._sequence += 1
+            items = self._classes.setdefault(job.priority, deque())
+            items.append((self._sequence, time.time(), job))
+            self._queued[job.the_id] = self._queued.get(job.the_id, 0) + 1
+            self._unfinished_tasks += 1
+            self._cond.notify()
+        finally:
+            self._cond.release()
 
     @cmpi_logging.trace_method
-    def get_post_call(self):
-        """ 
-        Return indication that describes the post-execution values of the
-        job's invocation.
-        
-        :rtype: ``CIMInstance of CIM_InstMethodCall``
+    def get(self):
         """
-        path = pywbem.CIMInstanceName(
-                classname="CIM_InstMethodCall",
-                keybindings={},
-                host=socket.gethostname(),
-                namespace=self.job_manager.namespace)
-        inst = pywbem.CIMInstance(
-                classname="CIM_InstMethodCall",
-                path=path,
-                properties={
-                        'MethodName' : self.method_name,
-                        'MethodParameters' : self._get_method_params(True),
-                        'PreCall' : False
-        })
-        src_instance = self._get_cim_instance()
-        inst['SourceInstance'] = src_instance
-        inst['SourceInstanceModelPath'] = str(src_instance.path)
+        Remove and return the job with the highest effective priority. Wait
+        until there is a job in the queue.
 
-        if self.return_value_type is not None:
-            inst['ReturnValueType'] = self.return_value_type
-        if self.return_value is not None:
-            inst['ReturnValue'] = self.return_value
-        if self.error is not None:
-            inst['Error'] = self.error
-        return inst
+        :rtype: ``Job``
+        """
+        self._cond.acquire()
+        try:
+            while not self._classes:
+                self._cond.wait()
+            now = time.time()
+            best = None
+            best_key = None
+            # Only the first item of each priority class can be the best
+            # one, it waits longest in its class.
+            for (priority, items) in self._classes.iteritems():
+                (sequence, enqueued, _job) = items[0]
+                key = (self._effective_priority(priority, enqueued, now),
+                        sequence)
+                if best_key is None or key < best_key:
+                    best_key = key
+                    best = priority
+            items = self._classes[best]
+            (_sequence, _enqueued, job) = items.popleft()
+            if not items:
+                del self._classes[best]
+            count = self._queued[job.the_id] - 1
+            if count:
+                self._queued[job.the_id] = count
+            else:
+                del self._queued[job.the_id]
+            return job
+        finally:
+            self._cond.release()
+
+    @cmpi_logging.trace_method
+    def task_done(self):
+        """
+        Indicate that a job returned by get() has been processed.
+        """
+        self._cond.acquire()
+        try:
+            self._unfinished_tasks -= 1
+            if self._unfinished_tasks <= 0:
+                self._unfinished_tasks = 0
+                self._all_done.notify_all()
+        finally:
+            self._cond.release()
+
+    @cmpi_logging.trace_method
+    def join(self):
+        """
+        Wait until all enqueued jobs are processed.
+        """
+        self._cond.acquire()
+        try:
+            while self._unfinished_tasks:
+                self._all_done.wait()
+        finally:
+            self._cond.release()
+
+    def qsize(self):
+        """
+        Return number of items in the queue.
+
+        :rtype: int
+        """
+        self._cond.acquire()
+        try:
+            return sum(len(items) for items in self._classes.itervalues())
+        finally:
+            self._cond.release()
 
     @cmpi_logging.trace_method
-    def _get_cim_instance(self):
+    def contains(self, job):
         """
-        Return CIMInstance of this job.
-        
-        :rtype: CIMInstance
+        Return True, if the job waits in the queue.
+
+        :param job: (``Job``) Job to check.
+        :rtype: bool
         """
-        return self.job_manager.get_job_instance(self)
+        self._cond.acquire()
+        try:
+            return job.the_id in self._queued
+        finally:
+            self._cond.release()
 
     @cmpi_logging.trace_method
-    def _get_method_params(self, output=True):
+    def get_jobs(self):
         """
-        Assemble __MethodParameters for CIM_InstMethodCall indication.
-        
-        :rtype: CIMInstance of __MethodParameters.
+        Return all waiting jobs in the order in which they would be
+        executed if no other job was enqueued. A job may be listed more than
+        once, e.g. when it was suspended and started again.
+
+        :rtype: list of ``Job``
         """
-        path = pywbem.CIMInstanceName(
-                classname="__MethodParameters",
-                namespace=self.job_manager.namespace,
-                keybindings={})
-        inst = pywbem.CIMInstance(classname="__MethodParameters", path=path)
-        for (name, value) in self.input_arguments.iteritems():
-            inst[name] = value
-        if output:
-            # overwrite any input parameter
-            for (name, value) in self.output_arguments.iteritems():
-                inst[name] = value
-        return inst
+        self._cond.acquire()
+        try:
+            return [item[2] for item in self._get_sorted_items(time.time())]
+        finally:
+            self._cond.release()
 
-    # pylint: disable-msg=R0903
-    class ReturnValueType(object):
-        """ CIM_InstMethodCall.ReturnValueType values."""
-        Boolean = pywbem.Uint16(2)
-        String = pywbem.Uint16(3)
-        Char16 = pywbem.Uint16(4)
-        Uint8 = pywbem.Uint16(5)
-        Sint8 = pywbem.Uint16(6)
-        Uint16 = pywbem.Uint16(7)
-        Sint16 = pywbem.Uint16(8)
-        Uint32 = pywbem.Uint16(9)
-        Sint32 = pywbem.Uint16(10)
-        Uint64 = pywbem.Uint16(11)
-        Sint64 = pywbem.Uint16(12)
-        Datetime = pywbem.Uint16(13)
-        Real32 = pywbem.Uint16(14)
-        Real64 = pywbem.Uint16(15)
-        Reference = pywbem.Uint16(16)
+    @cmpi_logging.trace_method
+    def reprioritize(self, job):
+        """
+        Move the job to its current priority class, e.g. when its priority
+        was changed by an application. The job keeps its position among jobs
+        of the same priority and also the time it has waited so far.
+
+        :param job: (``Job``) Job with changed priority.
+        """
+        self._cond.acquire()
+        try:
+            moved = []
+            for priority in self._classes.keys():
+                if priority == job.priority:
+                    continue
+                items = self._classes[priority]
+                kept = deque(item for item in items if item[2] is not job)
+                if len(kept) == len(items):
+                    continue
+                moved.extend(item for item in items if item[2] is job)
+                if kept:
+                    self._classes[priority] = kept
+                else:
+                    del self._classes[priority]
+            if moved:
+                items = list(self._classes.get(job.priority, []))
+                items.extend(moved)
+                items.sort(key=lambda item: item[0])
+                self._classes[job.priority] = deque(items)
+        finally:
+            self._cond.release()
 
 class JobManager(object):
     """
@@ -597,6 +1043,16 @@ class JobManager(object):
       finishes. Application may set ``DeleteOnCompletion`` and
       ``TimeBeforeRemoval`` properties of ``LMI_<name>Job`` to override this
       timeout.
+    * All finished jobs share one expiration thread, which removes them when
+      their ``TimeBeforeRemoval`` elapses. There is no thread per job.
+    * Queued jobs are executed in order of their ``Priority``. Default
+      priority of jobs spawned by a method can be set by
+      ``set_method_priority()``. Long waiting jobs are aged, so low priority
+      jobs are executed eventually.
+    * Queue wait and run time of completed jobs are counted per method and
+      the queue depth is recorded, see ``get_statistics()`` and
+      ``LMI_<name>JobStatistics``. The statistics are also written to the
+      log periodically, see ``set_statistics_log_interval()``.
     """
 
     IND_JOB_PERCENT_UPDATED = "JobPercentUpdated"
@@ -605,8 +1061,17 @@ class JobManager(object):
     IND_JOB_CHANGED = "JobChanged"
     IND_JOB_CREATED = "JobCreated"
 
+    # Weight of the last job duration in estimated duration of a method.
+    DURATION_WEIGHT = 0.3
+    # Nr. of seconds, for which computed queue positions are reused.
+    QUEUE_POSITION_TIMEOUT = 1
+    # Nr. of recorded changes of queue depth.
+    QUEUE_DEPTH_HISTORY = 1000
+
     @cmpi_logging.trace_method
-    def __init__(self, name, namespace, indication_manager):
+    def __init__(self, name, namespace, indication_manager,
+            max_history=None, max_history_size=None, priority_aging=None,
+            statistics_log_interval=None):
         """ 
         Initialize new Manager. It automatically registers all job-related
         filters to indication_manager and starts a worker thread.
@@ -617,11 +1082,55 @@ class JobManager(object):
         :param namespace: (``string``) Namespace of all providers.    
         :param indication_manager: (``IndicationManager``): a manager where
             indications and filters should be added. 
+        :param max_history: (``int``) Maximum number of completed jobs to
+            keep. None means no limit.
+        :param max_history_size: (``int``) Maximum estimated memory size of
+            completed jobs to keep, in bytes. None means no limit.
+        :param priority_aging: (``float``) Number of seconds after which
+            a queued job gets one step higher priority. None disables aging.
+        :param statistics_log_interval: (``float``) Number of seconds
+            between writing job statistics to the log. None disables the
+            logging.
         """
-        # List of all jobs. Dictionary job_id -> Job.
+        # List of all jobs. Dictionary job_id -> Job or FinishedJob.
         self.jobs = {}
+        # Guards self.jobs and self.finished_jobs.
+        self.jobs_lock = threading.RLock()
+        # Completed jobs, oldest first. Dictionary job_id -> FinishedJob.
+        self.finished_jobs = OrderedDict()
+        # Sum of FinishedJob.size of all finished_jobs.
+        self.finished_jobs_size = 0
+        # Lock shared by all FinishedJobs.
+        self.finished_job_lock = threading.RLock()
+        self.max_history = max_history
+        self.max_history_size = max_history_size
         # Queue of jobs scheduled to execute.
-        self.queue = Queue()
+        self.queue = JobQueue(priority_aging)
+        # Default job priorities, dictionary method_name -> priority.
+        self.method_priorities = {}
+        # Estimated durations of jobs, dictionary method_name -> seconds.
+        self.method_durations = {}
+        # Currently executed job.
+        self.running_job = None
+        # Statistics of completed jobs, dictionary method_name ->
+        # JobStatistics, and statistics of all of them.
+        self.statistics = {}
+        self.total_statistics = JobStatistics()
+        # Recent changes of queue depth, (time, depth), oldest first.
+        self.queue_depths = deque(maxlen=self.QUEUE_DEPTH_HISTORY)
+        self.max_queue_depth = 0
+        # Time when the statistics started.
+        self.statistics_start = datetime.utcnow()
+        # Guards all statistics above.
+        self.statistics_lock = threading.Lock()
+        self.statistics_log_interval = statistics_log_interval
+        # Wakes up the statistics logging thread when the interval changes.
+        self._statistics_cond = threading.Condition()
+        # Cache of get_queue_positions() result and time when it was
+        # computed.
+        self._queue_positions = None
+        self._queue_positions_time = 0
+        self._queue_positions_lock = threading.Lock()
         # Last created job_id.
         self.last_instance_id = 0
         # Classname infix.
@@ -631,10 +1140,33 @@ class JobManager(object):
         self.namespace = namespace
         self.indication_manager = indication_manager
 
+        # Heap of (expiration time, job_id) of finished jobs, which should
+        # be removed. Rescheduled or cancelled jobs leave stale items in the
+        # heap, they are skipped when they get to the top.
+        self._expiration_heap = []
+        # Dictionary job_id -> valid expiration time of the job.
+        self._expiration_times = {}
+        # Guards both _expiration_heap and _expiration_times and wakes up
+        # the expiration thread when a new job is scheduled.
+        self._expiration_cond = threading.Condition()
+
         # Start the worker thread (don't forget to register it at CIMOM)
         self.worker = threading.Thread(target=self._worker_main)
+        self.worker.daemon = True
         self.worker.start()
 
+        # Start the thread, which removes expired jobs.
+        self.expiration_worker = threading.Thread(
+                target=self._expiration_main)
+        self.expiration_worker.daemon = True
+        self.expiration_worker.start()
+
+        # Start the thread, which writes statistics to the log.
+        self.statistics_worker = threading.Thread(
+                target=self._statistics_main)
+        self.statistics_worker.daemon = True
+        self.statistics_worker.start()
+
         # Various classnames for job-related classes, with correct infixes.
         self.job_classname = 'LMI_' + self.name + 'Job'
         self.method_result_classname = "LMI_" + self.name + "MethodResult"
@@ -644,6 +1176,7 @@ class JobManager(object):
                 + 'JobMethodResult')
         self.indication_filter_classname = ('LMI_' + self.name
                 + 'JobIndicationFilter')
+        self.statistics_classname = 'LMI_' + self.name + 'JobStatistics'
         self.job_provider = None
         self._add_indication_filters()
 
@@ -704,6 +1237,7 @@ class JobManager(object):
         * ``LMI_Affected<name>JobElement``
         * ``LMI_Owning<name>JobElement``
         * ``LMI_Associated<name>JobMethodResult``
+        * ``LMI_<name>JobStatistics``
             
         :rtype: dictionary class_name -> CIMProvider2
         """
@@ -729,6 +1263,10 @@ class JobManager(object):
                     self.owning_classname, job_manager=self)
             self.providers[self.associated_result_classname] = provider
 
+            provider = LMI_JobStatistics(
+                    self.statistics_classname, job_manager=self)
+            self.providers[self.statistics_classname] = provider
+
         return self.providers
 
     @cmpi_logging.trace_method
@@ -741,8 +1279,13 @@ class JobManager(object):
         cmpi_logging.logger.debug("Job %s: '%s' enqueued"
                 % (job.the_id, job.job_name))
 
-        self.jobs[job.the_id] = job
+        self.jobs_lock.acquire()
+        try:
+            self.jobs[job.the_id] = job
+        finally:
+            self.jobs_lock.release()
         self.queue.put(job)
+        self._record_queue_depth()
         # send indication
         if self.indication_manager.is_subscribed(self.IND_JOB_CREATED):
             job_instance = self.get_job_instance(job)
@@ -774,11 +1317,444 @@ class JobManager(object):
         """
         cmpi_logging.logger.debug("Removing job %s: '%s'"
                 % (job.the_id, job.job_name))
-        del self.jobs[job.the_id]
+        self.cancel_expiration(job)
+        self.jobs_lock.acquire()
+        try:
+            self.jobs.pop(job.the_id, None)
+            record = self.finished_jobs.pop(job.the_id, None)
+            if record:
+                self.finished_jobs_size -= record.size
+        finally:
+            self.jobs_lock.release()
         # The job may still be in the queue!
         # There is no way, how to remove it, it will be skipped by the
         # worker thread.
 
+    @cmpi_logging.trace_method
+    def archive_job(self, job):
+        """
+        Replace completed job with its compact ``FinishedJob`` record and
+        evict the oldest completed jobs if there are too many of them.
+        Jobs which are not completed are ignored.
+
+        :param job: (``Job``) The completed job.
+        """
+        if job.job_state not in Job.COMPLETED_STATES:
+            return
+        # The job counts in statistics even when it has been already removed.
+        self._record_statistics(job)
+        self.jobs_lock.acquire()
+        try:
+            if self.jobs.get(job.the_id, None) is not job:
+                # The job has been already removed.
+                return
+            # Copy the job under the lock, LMI_ConcreteJob.set_instance
+            # modifies it under the same lock.
+            record = FinishedJob(job)
+            self.jobs[job.the_id] = record
+            self.finished_jobs[job.the_id] = record
+            self.finished_jobs_size += record.size
+            self._evict_finished_jobs()
+        finally:
+            self.jobs_lock.release()
+
+    def _record_statistics(self, job):
+        """
+        Include just completed job into statistics of its method.
+
+        :param job: (``Job``) The completed job.
+        """
+        self.statistics_lock.acquire()
+        try:
+            stats = self.statistics.get(job.method_name, None)
+            if stats is None:
+                stats = JobStatistics(job.method_name)
+                self.statistics[job.method_name] = stats
+            stats.add_job(job)
+            self.total_statistics.add_job(job)
+        finally:
+            self.statistics_lock.release()
+
+    def _record_queue_depth(self):
+        """
+        Remember current depth of the queue, if it has changed.
+        """
+        depth = self.queue.qsize()
+        self.statistics_lock.acquire()
+        try:
+            if not self.queue_depths or self.queue_depths[-1][1] != depth:
+                self.queue_depths.append((datetime.utcnow(), depth))
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+        finally:
+            self.statistics_lock.release()
+
+    @cmpi_logging.trace_method
+    def get_statistics(self):
+        """
+        Return copy of statistics of all completed jobs and of jobs of each
+        method, sorted by method name.
+
+        :rtype: list of ``JobStatistics``, statistics of all jobs first.
+        """
+        self.statistics_lock.acquire()
+        try:
+            result = [copy.deepcopy(self.total_statistics)]
+            for method_name in sorted(self.statistics.keys()):
+                result.append(copy.deepcopy(self.statistics[method_name]))
+            return result
+        finally:
+            self.statistics_lock.release()
+
+    @cmpi_logging.trace_method
+    def get_queue_depths(self):
+        """
+        Return recent changes of depth of the queue and the maximum depth.
+
+        :rtype: tuple ``(list of (datetime, depth), maximum depth)``,
+            the oldest change first.
+        """
+        self.statistics_lock.acquire()
+        try:
+            return (list(self.queue_depths), self.max_queue_depth)
+        finally:
+            self.statistics_lock.release()
+
+    @cmpi_logging.trace_method
+    def log_statistics(self):
+        """
+        Write statistics of completed jobs and the queue to the log.
+        """
+        (_depths, max_depth) = self.get_queue_depths()
+        cmpi_logging.logger.info("Job queue depth: %d, maximum: %d"
+                % (self.queue.qsize(), max_depth))
+        for stats in self.get_statistics():
+            cmpi_logging.logger.info("Job statistics of "
+                    + stats.get_summary())
+
+    @cmpi_logging.trace_method
+    def set_statistics_log_interval(self, interval):
+        """
+        Set how often the job statistics are written to the log.
+
+        :param interval: (``float``) Number of seconds between writing the
+            statistics. None disables the logging.
+        """
+        self._statistics_cond.acquire()
+        try:
+            self.statistics_log_interval = interval
+            self._statistics_cond.notify()
+        finally:
+            self._statistics_cond.release()
+
+    def _statistics_main(self):
+        """
+        This is the main loop of the thread, which periodically writes job
+        statistics to the log. It never ends.
+        """
+        last_log = time.time()
+        while True:
+            self._statistics_cond.acquire()
+            try:
+                interval = self.statistics_log_interval
+                if interval:
+                    timeout = last_log + interval - time.time()
+                    if timeout > 0:
+                        self._statistics_cond.wait(timeout)
+                        # the interval may have changed
+                        continue
+                else:
+                    # wait() without timeout cannot be interrupted
+                    self._statistics_cond.wait(60)
+                    continue
+            finally:
+                self._statistics_cond.release()
+            last_log = time.time()
+            self.log_statistics()
+
+    @cmpi_logging.trace_method
+    def set_history_limits(self, max_history, max_history_size):
+        """
+        Set maximum number and maximum estimated size of completed jobs
+        to keep. Oldest completed jobs are removed immediately when over
+        the limits.
+
+        :param max_history: (``int``) Maximum number of completed jobs.
+            None means no limit.
+        :param max_history_size: (``int``) Maximum size of completed jobs,
+            in bytes. None means no limit.
+        """
+        self.jobs_lock.acquire()
+        try:
+            self.max_history = max_history
+            self.max_history_size = max_history_size
+            self._evict_finished_jobs()
+        finally:
+            self.jobs_lock.release()
+
+    def _evict_finished_jobs(self):
+        """
+        Remove the oldest completed jobs until the history fits its limits.
+        ``jobs_lock`` must be already locked.
+        """
+        while self.finished_jobs and self._history_exceeded():
+            record = self.finished_jobs.itervalues().next()
+            cmpi_logging.logger.debug("Evicting job %s: '%s'"
+                    % (record.the_id, record.job_name))
+            self.remove_job(record)
+
+    def _history_exceeded(self):
+        """
+        Return True, if there are too many completed jobs or they occupy
+        too much memory.
+        ``jobs_lock`` must be already locked.
+
+        :rtype: bool
+        """
+        if (self.max_history is not None
+                and len(self.finished_jobs) > self.max_history):
+            return True
+        if (self.max_history_size is not None
+                and self.finished_jobs_size > self.max_history_size):
+            return True
+        return False
+
+    @cmpi_logging.trace_method
+    def set_priority_aging(self, priority_aging):
+        """
+        Set aging of queued jobs.
+
+        :param priority_aging: (``float``) Number of seconds after which
+            a queued job gets one step higher priority. None disables aging.
+        """
+        self.queue.aging_interval = priority_aging
+
+    @cmpi_logging.trace_method
+    def set_method_priority(self, method_name, priority):
+        """
+        Set default priority of jobs spawned by given method.
+
+        :param method_name: (``string``) Name of the CIM method.
+        :param priority: (``int``) Priority of its jobs, e.g.
+            ``Job.PRIORITY_LOW``.
+        """
+        self.method_priorities[method_name] = priority
+
+    @cmpi_logging.trace_method
+    def get_method_priority(self, method_name):
+        """
+        Return default priority of jobs spawned by given method.
+
+        :param method_name: (``string``) Name of the CIM method.
+        :rtype: int
+        """
+        return self.method_priorities.get(method_name, Job.PRIORITY_NORMAL)
+
+    @cmpi_logging.trace_method
+    def set_job_priority(self, job, priority):
+        """
+        Change priority of a job. If the job is queued, it is moved in the
+        queue accordingly.
+        The job must be already locked.
+
+        :param job: (``Job``) Job to modify.
+        :param priority: (``int``) New priority of the job.
+        """
+        job.priority = priority
+        if job.job_state == Job.STATE_QUEUED:
+            self.queue.reprioritize(job)
+
+    @cmpi_logging.trace_method
+    def get_estimated_duration(self, method_name):
+        """
+        Return estimated duration of a job spawned by given method, based on
+        durations of previous jobs of the method.
+
+        :param method_name: (``string``) Name of the CIM method.
+        :rtype: float or None, if no such job has been executed yet.
+        """
+        return self.method_durations.get(method_name, None)
+
+    def _update_estimated_duration(self, job):
+        """
+        Include duration of just executed job into estimated duration of its
+        method.
+
+        :param job: (``Job``) The executed job.
+        """
+        if not job.elapsed_time:
+            return
+        duration = job.elapsed_time.total_seconds()
+        estimate = self.method_durations.get(job.method_name, None)
+        if estimate is None:
+            estimate = duration
+        else:
+            estimate += self.DURATION_WEIGHT * (duration - estimate)
+        self.method_durations[job.method_name] = estimate
+
+    @cmpi_logging.trace_method
+    def get_queue_positions(self):
+        """
+        Return expected order of queued jobs and estimated time before each
+        of them starts. The estimate is based on durations of previous jobs,
+        it is None if there is a job of unknown duration before the job.
+
+        :rtype: dictionary job_id -> (position, seconds), where position 1
+            is the next job to execute.
+        """
+        wait = 0.0
+        running = self.running_job
+        if running:
+            duration = self.get_estimated_duration(running.method_name)
+            start_time = running.start_time
+            if duration is None:
+                wait = None
+            elif start_time:
+                passed = datetime.utcnow() - start_time
+                wait = max(0.0, duration - passed.total_seconds())
+
+        positions = {}
+        for job in self.queue.get_jobs():
+            if job.job_state != Job.STATE_QUEUED or job.the_id in positions:
+                # Skip suspended jobs and jobs queued twice.
+                continue
+            positions[job.the_id] = (len(positions) + 1, wait)
+            duration = self.get_estimated_duration(job.method_name)
+            if wait is not None and duration is not None:
+                wait += duration
+            else:
+                wait = None
+        return positions
+
+    @cmpi_logging.trace_method
+    def get_queue_position(self, job):
+        """
+        Return position of a job in the queue and estimated time before it
+        starts, see ``get_queue_positions()``. The positions of all jobs are
+        computed at once and reused for ``QUEUE_POSITION_TIMEOUT`` seconds.
+
+        :param job: (``Job``) Job to check.
+        :rtype: tuple (position, seconds) or (None, None), if the job does not
+            wait in the queue.
+        """
+        if job.job_state != Job.STATE_QUEUED or not self.queue.contains(job):
+            return (None, None)
+        self._queue_positions_lock.acquire()
+        try:
+            now = time.time()
+            if (self._queue_positions is None
+                    or job.the_id not in self._queue_positions
+                    or now - self._queue_positions_time
+                            > self.QUEUE_POSITION_TIMEOUT):
+                self._queue_positions = self.get_queue_positions()
+                self._queue_positions_time = now
+            return self._queue_positions.get(job.the_id, (None, None))
+        finally:
+            self._queue_positions_lock.release()
+
+    @cmpi_logging.trace_method
+    def get_jobs(self):
+        """
+        Return snapshot of all jobs, i.e. a list, which is not modified when
+        jobs are added or removed by other threads.
+
+        :rtype: list of ``Job`` or ``FinishedJob``
+        """
+        self.jobs_lock.acquire()
+        try:
+            return self.jobs.values()
+        finally:
+            self.jobs_lock.release()
+
+    @cmpi_logging.trace_method
+    def schedule_expiration(self, job, timeout):
+        """
+        Schedule removal of a finished job after given timeout. Any previously
+        scheduled removal of the job is cancelled. This is helper method
+        called by ``Job`` when needed.
+        This method is thread-safe.
+
+        :param job: (``Job``) Job to remove.
+        :param timeout: (``float``) Number of seconds before the job is
+            removed.
+        """
+        expiration = time.time() + timeout
+        self._expiration_cond.acquire()
+        try:
+            self._expiration_times[job.the_id] = expiration
+            heapq.heappush(self._expiration_heap, (expiration, job.the_id))
+            self._compact_expirations()
+            self._expiration_cond.notify()
+        finally:
+            self._expiration_cond.release()
+
+    @cmpi_logging.trace_method
+    def cancel_expiration(self, job):
+        """
+        Cancel scheduled removal of a job, e.g. when its
+        ``DeleteOnCompletion`` property changes to False.
+        This method is thread-safe.
+
+        :param job: (``Job``) Job which should not be removed.
+        """
+        self._expiration_cond.acquire()
+        try:
+            # The heap item becomes stale and is skipped later.
+            self._expiration_times.pop(job.the_id, None)
+        finally:
+            self._expiration_cond.release()
+
+    def _compact_expirations(self):
+        """
+        Rebuild the expiration heap when it contains too many stale items.
+        ``_expiration_cond`` must be already locked.
+        """
+        if len(self._expiration_heap) > 2 * len(self._expiration_times) + 64:
+            self._expiration_heap = [(expiration, the_id)
+                    for (the_id, expiration)
+                    in self._expiration_times.iteritems()]
+            heapq.heapify(self._expiration_heap)
+
+    def _pop_expired(self):
+        """
+        Return list of job_ids, which expired. If there is none, wait until
+        the first job expires or a new job is scheduled.
+        ``_expiration_cond`` must be already locked.
+
+        :rtype: list of strings
+        """
+        expired = []
+        now = time.time()
+        while self._expiration_heap and self._expiration_heap[0][0] <= now:
+            (expiration, the_id) = heapq.heappop(self._expiration_heap)
+            if self._expiration_times.get(the_id) == expiration:
+                del self._expiration_times[the_id]
+                expired.append(the_id)
+
+        if not expired:
+            if self._expiration_heap:
+                self._expiration_cond.wait(self._expiration_heap[0][0] - now)
+            else:
+                self._expiration_cond.wait()
+        return expired
+
+    def _expiration_main(self):
+        """
+        This is the main loop of the expiration thread. It removes jobs
+        whose TimeBeforeRemoval elapsed and never ends.
+        """
+        while True:
+            self._expiration_cond.acquire()
+            try:
+                expired = self._pop_expired()
+            finally:
+                self._expiration_cond.release()
+
+            for the_id in expired:
+                job = self.jobs.get(the_id, None)
+                if job:
+                    # pylint: disable-msg=W0212
+                    job._expire()
+
     @cmpi_logging.trace_method
     def get_job_for_instance_id(self, instance_id, classname=None):
         """
@@ -806,11 +1782,13 @@ class JobManager(object):
         """
         while True:
             job = self.queue.get()
+            self._record_queue_depth()
             # we need to protect from changes between checking state and
             # setting new state
             job.lock()
             if job.job_state == Job.STATE_QUEUED:
                 # the job was not cancelled
+                self.running_job = job
                 job.change_state(Job.STATE_RUNNING)
                 job.unlock()
                 cmpi_logging.logger.info("Starting job %s: '%s'" %
@@ -823,6 +1801,9 @@ class JobManager(object):
                 else:
                     cmpi_logging.logger.info("Job %s: '%s' finished OK" %
                             (job.the_id, job.job_name))
+                self.running_job = None
+                self._update_estimated_duration(job)
+                self.archive_job(job)
             else:
                 # just skip suspended and terminated jobs
                 job.unlock()
@@ -871,12 +1852,16 @@ class LMI_ConcreteJob(CIMProvider2):
         Provider implementation of EnumerateInstances intrinsic method.
         """
         model.path.update({'InstanceID': None})
-        for job in self.job_manager.jobs.values():
+        positions = None
+        if not keys_only:
+            # Compute queue positions only once for all jobs.
+            positions = self.job_manager.get_queue_positions()
+        for job in self.job_manager.get_jobs():
             model['InstanceID'] = job.get_instance_id()
             if keys_only:
                 yield model
             else:
-                yield self.get_instance(env, model, job)
+                yield self.get_instance(env, model, job, positions)
 
     @cmpi_logging.trace_method
     def get_job_states(self, job):
@@ -910,9 +1895,13 @@ class LMI_ConcreteJob(CIMProvider2):
 
     @cmpi_logging.trace_method
     # pylint: disable-msg=W0221
-    def get_instance(self, env, model, job=None):
+    def get_instance(self, env, model, job=None, positions=None):
         """
         Provider implementation of GetInstance intrinsic method.
+
+        :param positions: (``dictionary``) Optional result of
+            ``JobManager.get_queue_positions()``, to be used instead of
+            computing the position of the job in the queue.
         """
         if not job:
             instance_id = model['InstanceID']
@@ -964,6 +1953,28 @@ class LMI_ConcreteJob(CIMProvider2):
                     type='datetime')
 
         model['TimeSubmitted'] = pywbem.CIMDateTime(job.time_submitted)
+        model['Priority'] = pywbem.Uint32(job.priority)
+
+        if positions is not None:
+            (position, wait) = positions.get(job.the_id, (None, None))
+        else:
+            (position, wait) = self.job_manager.get_queue_position(job)
+        if position is not None:
+            model['QueuePosition'] = pywbem.Uint32(position)
+        else:
+            model['QueuePosition'] = pywbem.CIMProperty(
+                    name='QueuePosition',
+                    value=None,
+                    type='uint32')
+        if wait is not None:
+            model['EstimatedWaitTime'] = pywbem.CIMDateTime(
+                    timedelta(seconds=wait))
+        else:
+            model['EstimatedWaitTime'] = pywbem.CIMProperty(
+                    name='EstimatedWaitTime',
+                    value=None,
+                    type='datetime')
+
         # set correct state
         jobstate, opstate = self.get_job_states(job)
         model['JobState'] = jobstate
@@ -986,13 +1997,22 @@ class LMI_ConcreteJob(CIMProvider2):
             raise pywbem.CIMError(pywbem.CIM_ERR_NOT_SUPPORTED,
                     "Creation of Job instances is not supported.")
 
-        job = self.job_manager.get_job_for_instance_id(instance['InstanceID'])
-        if not job:
-            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
-                    "Job not found.")
+        while True:
+            job = self.job_manager.get_job_for_instance_id(
+                    instance['InstanceID'])
+            if not job:
+                raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                        "Job not found.")
+            job.lock()
+            self.job_manager.jobs_lock.acquire()
+            if self.job_manager.jobs.get(job.the_id, None) is job:
+                break
+            # The job has been archived as FinishedJob or removed
+            # in the meantime, modify the current one.
+            self.job_manager.jobs_lock.release()
+            job.unlock()
 
         try:
-            job.lock()
             restart_timer = False
 
             for (key, value) in instance.iteritems():
@@ -1004,6 +2024,8 @@ class LMI_ConcreteJob(CIMProvider2):
                 elif key == 'TimeBeforeRemoval':
                     job.time_before_removal = value.total_seconds()
                     restart_timer = True
+                elif key == 'Priority':
+                    self.job_manager.set_job_priority(job, value)
                 elif key == 'JobRunTimes':
                     if value != 1:
                         raise pywbem.CIMError(pywbem.CIM_ERR_NOT_SUPPORTED,
@@ -1020,6 +2042,7 @@ class LMI_ConcreteJob(CIMProvider2):
             if restart_timer:
                 job._restart_timer()
         finally:
+            self.job_manager.jobs_lock.release()
             job.unlock()
         return instance
 
@@ -1036,7 +2059,7 @@ class LMI_ConcreteJob(CIMProvider2):
         if not job:
             raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
                     "Job not found.")
-        if not job.job_status in Job.FINAL_STATES:
+        if not job.job_state in Job.FINAL_STATES:
             raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
                     "Job has not finished.")
 
@@ -1158,6 +2181,7 @@ class LMI_ConcreteJob(CIMProvider2):
                     rval = retcodes.Invalid_State_Transition
                 else:
                     job.cancel()
+                    self.job_manager.archive_job(job)
                     rval = retcodes.Completed_with_No_Error
 
             elif param_requestedstate == states.Start:
@@ -1345,7 +2369,7 @@ class LMI_OwningJobElement(CIMProvider2):
     def enum_instances(self, env, model, keys_only):
         """Enumerate instances."""
         model.path.update({'OwnedElement': None, 'OwningElement': None})
-        for job in self.job_manager.jobs.values():
+        for job in self.job_manager.get_jobs():
             if job.owning_element:
                 model['OwnedElement'] = job.get_name()
                 model['OwningElement'] = job.owning_element
@@ -1355,11 +2379,10 @@ class LMI_OwningJobElement(CIMProvider2):
     def references(self, env, object_name, model, result_class_name, role,
                    result_role, keys_only):
         """Instrument Associations."""
-        ch = env.get_cimom_handle()
-        if ch.is_subclass(object_name.namespace,
+        if classes.is_subclass(env, object_name.namespace,
                   sub=object_name.classname,
                   super='CIM_ManagedElement') or \
-            ch.is_subclass(object_name.namespace,
+            classes.is_subclass(env, object_name.namespace,
                   sub=object_name.classname,
                   super=self.job_manager.job_classname):
             return self.simple_refs(env, object_name, model,
@@ -1392,7 +2415,7 @@ class LMI_AffectedJobElement(CIMProvider2):
     def enum_instances(self, env, model, keys_only):
         """Enumerate instances."""
         model.path.update({'AffectingElement': None, 'AffectedElement': None})
-        for job in self.job_manager.jobs.values():
+        for job in self.job_manager.get_jobs():
             for element in job.affected_elements:
                 model['AffectingElement'] = job.get_name()
                 model['AffectedElement'] = element
@@ -1405,11 +2428,10 @@ class LMI_AffectedJobElement(CIMProvider2):
     def references(self, env, object_name, model, result_class_name, role,
                    result_role, keys_only):
         """Instrument Associations."""
-        ch = env.get_cimom_handle()
-        if ch.is_subclass(object_name.namespace,
+        if classes.is_subclass(env, object_name.namespace,
                   sub=object_name.classname,
                   super='CIM_ManagedElement') or \
-            ch.is_subclass(object_name.namespace,
+            classes.is_subclass(env, object_name.namespace,
                   sub=object_name.classname,
                   super=self.job_manager.job_classname):
             return self.simple_refs(env, object_name, model,
@@ -1464,7 +2486,7 @@ class LMI_MethodResult(CIMProvider2):
     def enum_instances(self, env, model, keys_only):
         """Enumerate instances."""
         model.path.update({'InstanceID': None})
-        for job in self.job_manager.jobs.values():
+        for job in self.job_manager.get_jobs():
             model['InstanceID'] = job.get_instance_id(
                     classname=self.classname)
             if keys_only:
@@ -1503,7 +2525,7 @@ class LMI_AssociatedJobMethodResult(CIMProvider2):
     def enum_instances(self, env, model, keys_only):
         """Enumerate instances."""
         model.path.update({'JobParameters': None, 'Job': None})
-        for job in self.job_manager.jobs.values():
+        for job in self.job_manager.get_jobs():
             if job.owning_element:
                 model['Job'] = job.get_name()
                 model['JobParameters'] = pywbem.CIMInstanceName(
@@ -1519,13 +2541,108 @@ class LMI_AssociatedJobMethodResult(CIMProvider2):
     def references(self, env, object_name, model, result_class_name, role,
                    result_role, keys_only):
         """Instrument Associations."""
-        ch = env.get_cimom_handle()
-        if ch.is_subclass(object_name.namespace,
+        if classes.is_subclass(env, object_name.namespace,
                   sub=object_name.classname,
                   super=self.job_manager.method_result_classname) or \
-            ch.is_subclass(object_name.namespace,
+            classes.is_subclass(env, object_name.namespace,
                   sub=object_name.classname,
                   super=self.job_manager.job_classname):
             return self.simple_refs(env, object_name, model,
                           result_class_name, role, result_role, keys_only)
 
+
+class LMI_JobStatistics(CIMProvider2):
+    """
+        Instrumentation of LMI_JobStatistics class and its subclasses.
+
+        There is one instance with statistics of all completed jobs and one
+        instance for each method, which spawned a completed job.
+    """
+    # Suffix of InstanceID of statistics of all jobs.
+    ALL_JOBS_ID = '*'
+
+    @cmpi_logging.trace_method
+    def __init__(self, classname, job_manager):
+        self.classname = classname
+        self.job_manager = job_manager
+
+    def get_instance_id(self, stats):
+        """
+        Return InstanceID of given statistics.
+
+        :param stats: (``JobStatistics``) The statistics.
+        :rtype: string
+        """
+        return ('LMI:' + self.classname + ':'
+                + (stats.method_name or self.ALL_JOBS_ID))
+
+    @staticmethod
+    def _get_array(name, values, value_type):
+        """ Return CIMProperty with given array."""
+        return pywbem.CIMProperty(name=name, value=values, type=value_type,
+                is_array=True, array_size=len(values))
+
+    @cmpi_logging.trace_method
+    # pylint: disable-msg=W0221
+    def get_instance(self, env, model, stats=None):
+        """Return an instance."""
+        if not stats:
+            for item in self.job_manager.get_statistics():
+                if self.get_instance_id(item) == model['InstanceID']:
+                    stats = item
+                    break
+        if not stats:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                    "Job statistics not found.")
+
+        model['ElementName'] = stats.method_name or 'All jobs'
+        if stats.method_name:
+            model['MethodName'] = stats.method_name
+        model['StartStatisticTime'] = pywbem.CIMDateTime(
+                self.job_manager.statistics_start)
+        model['StatisticTime'] = pywbem.CIMDateTime(datetime.utcnow())
+        model['CompletedJobs'] = pywbem.Uint64(stats.completed)
+        model['FailedJobs'] = pywbem.Uint64(stats.failed)
+        model['CancelledJobs'] = pywbem.Uint64(stats.cancelled)
+        model['HistogramBuckets'] = self._get_array('HistogramBuckets',
+                [pywbem.Real64(bound) for bound in stats.BUCKETS], 'real64')
+        model['QueueWaitHistogram'] = self._get_array('QueueWaitHistogram',
+                [pywbem.Uint64(count)
+                    for count in stats.queue_wait_histogram], 'uint64')
+        model['RunTimeHistogram'] = self._get_array('RunTimeHistogram',
+                [pywbem.Uint64(count)
+                    for count in stats.run_time_histogram], 'uint64')
+        model['FailedRunTimeHistogram'] = self._get_array(
+                'FailedRunTimeHistogram',
+                [pywbem.Uint64(count)
+                    for count in stats.failed_run_time_histogram], 'uint64')
+        model['TotalQueueWait'] = pywbem.Real64(stats.total_queue_wait)
+        model['MaxQueueWait'] = pywbem.Real64(stats.max_queue_wait)
+        model['TotalRunTime'] = pywbem.Real64(stats.total_run_time)
+        model['MaxRunTime'] = pywbem.Real64(stats.max_run_time)
+
+        if not stats.method_name:
+            # the queue is shared by all methods
+            (depths, max_depth) = self.job_manager.get_queue_depths()
+            model['QueueDepth'] = pywbem.Uint32(
+                    self.job_manager.queue.qsize())
+            model['MaxQueueDepth'] = pywbem.Uint32(max_depth)
+            model['QueueDepthTimestamps'] = self._get_array(
+                    'QueueDepthTimestamps',
+                    [pywbem.CIMDateTime(stamp) for (stamp, _d) in depths],
+                    'datetime')
+            model['QueueDepths'] = self._get_array('QueueDepths',
+                    [pywbem.Uint32(depth) for (_s, depth) in depths],
+                    'uint32')
+        return model
+
+    @cmpi_logging.trace_method
+    def enum_instances(self, env, model, keys_only):
+        """Enumerate instances."""
+        model.path.update({'InstanceID': None})
+        for stats in self.job_manager.get_statistics():
+            model['InstanceID'] = self.get_instance_id(stats)
+            if keys_only:
+                yield model
+            else:
+                yield self.get_instance(env, model, stats)
@@ -0,0 +1,354 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# -*- coding: utf-8 -*-
+"""
+    Module for LMI_BlockStorageStatisticalData and
+    LMI_StorageElementStatisticalData classes.
+"""
+
+from datetime import datetime, timedelta
+import calendar
+import os
+import time
+import pywbem
+from pywbem.cim_provider2 import CIMProvider2
+from openlmi.storage.BaseProvider import BaseProvider
+from openlmi.storage.ExtentProvider import ExtentProvider
+from openlmi.storage.util import iohistory
+import openlmi.common.cmpi_logging as cmpi_logging
+
+class LMI_BlockStorageStatisticalData(BaseProvider):
+    """
+        Provider of LMI_BlockStorageStatisticalData, I/O statistics of
+        all LMI_StorageExtent instances.
+
+        The statistics are read from /proc/diskstats using shared
+        DiskStatsSampler, i.e. all instances enumerated within one sampling
+        interval come from the same read of the file.
+
+        It also provides history of I/O metrics of the devices to
+        GetIOHistory methods of StorageExtents and VGStoragePools.
+    """
+    INSTANCE_ID_PREFIX = "LMI:LMI_BlockStorageStatisticalData:"
+
+    # Names of GetIOHistory output parameters, in order of
+    # iohistory.METRICS.
+    HISTORY_PARAMS = ('readiops', 'writeiops', 'readkbps', 'writekbps',
+            'latency', 'utilization')
+
+    @cmpi_logging.trace_method
+    def __init__(self, sampler, history, *args, **kwargs):
+        super(LMI_BlockStorageStatisticalData, self).__init__(*args, **kwargs)
+        self.sampler = sampler
+        self.history = history
+
+    @staticmethod
+    def get_kernel_name(device):
+        """
+            Return kernel name of given StorageDevice, as used in
+            /proc/diskstats (e.g. 'sda1' or 'dm-0'), or None, if the device
+            does not exist in kernel.
+        """
+        sysfs_path = getattr(device, 'sysfsPath', None)
+        if not sysfs_path:
+            return None
+        return os.path.basename(sysfs_path)
+
+    @cmpi_logging.trace_method
+    def get_extent_provider(self, device):
+        """
+            Return ExtentProvider of given StorageDevice or None, if the
+            device is not represented by a StorageExtent.
+        """
+        provider = self.provider_manager.get_provider_for_device(device)
+        if isinstance(provider, ExtentProvider):
+            return provider
+        return None
+
+    @cmpi_logging.trace_method
+    def enumerate_devices(self):
+        """
+            Enumerate all StorageDevices with statistics, i.e. all
+            StorageExtents, which exist in kernel.
+        """
+        for device in self.storage.devices:
+            if not self.get_kernel_name(device):
+                continue
+            if self.get_extent_provider(device):
+                yield device
+
+    @cmpi_logging.trace_method
+    def get_name_for_device(self, device):
+        """
+            Return CIMInstanceName of statistics of given StorageDevice.
+            The device path is the same as DeviceID of its StorageExtent.
+        """
+        return pywbem.CIMInstanceName(
+                'LMI_BlockStorageStatisticalData',
+                namespace=self.config.namespace,
+                keybindings={'InstanceID': self.INSTANCE_ID_PREFIX
+                        + device.path})
+
+    @cmpi_logging.trace_method
+    def get_device_for_name(self, object_name):
+        """
+            Return StorageDevice for given CIMInstanceName of statistics or
+            None, if there is no such device.
+        """
+        instance_id = object_name['InstanceID']
+        if not instance_id or not instance_id.startswith(
+                self.INSTANCE_ID_PREFIX):
+            return None
+        path = instance_id[len(self.INSTANCE_ID_PREFIX):]
+        device = self.storage.devicetree.getDeviceByPath(path)
+        if not device or not self.get_kernel_name(device):
+            return None
+        if not self.get_extent_provider(device):
+            return None
+        return device
+
+    @cmpi_logging.trace_method
+    def enum_instance_names(self):
+        """
+            Return CIMInstanceNames of statistics of all devices.
+        """
+        for device in self.enumerate_devices():
+            yield self.get_name_for_device(device)
+
+    @cmpi_logging.trace_method
+    def MI_enumInstances(self, env, objPath, propertyList):
+        """
+            Enumerate instances. The statistics change all the time, they are
+            neither read from nor stored to the snapshot.
+        """
+        self._wait_for_storage()
+        return CIMProvider2.MI_enumInstances(self, env, objPath, propertyList)
+
+    @cmpi_logging.trace_method
+    def enum_instances(self, env, model, keys_only):
+        """
+            Provider implementation of EnumerateInstances intrinsic method.
+        """
+        model.path.update({'InstanceID': None})
+        sample = None
+        if not keys_only:
+            sample = self.sampler.get_sample()
+        for device in self.enumerate_devices():
+            name = self.get_name_for_device(device)
+            model['InstanceID'] = name['InstanceID']
+            if keys_only:
+                yield model
+            else:
+                yield self.get_instance(env, model, device, sample)
+
+    @cmpi_logging.trace_method
+    # pylint: disable-msg=W0221
+    def get_instance(self, env, model, device=None, sample=None):
+        """
+            Provider implementation of GetInstance intrinsic method.
+        """
+        if not device:
+            device = self.get_device_for_name(model)
+        if not device:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                    "Cannot find device for this statistics.")
+        if sample is None:
+            sample = self.sampler.get_sample()
+        (timestamp, all_stats) = sample
+
+        model['ElementName'] = device.name
+        model['ElementType'] = self.Values.ElementType.Extent
+        model['SampleInterval'] = pywbem.CIMDateTime(
+                timedelta(seconds=self.sampler.interval))
+        if self.sampler.boot_time is not None:
+            model['StartStatisticTime'] = pywbem.CIMDateTime(
+                    datetime.utcfromtimestamp(self.sampler.boot_time))
+
+        stats = all_stats.get(self.get_kernel_name(device))
+        if stats is None:
+            # The device has disappeared from kernel since last reset.
+            return model
+        model['StatisticTime'] = pywbem.CIMDateTime(
+                datetime.utcfromtimestamp(timestamp))
+        model['TotalIOs'] = pywbem.Uint64(stats.total_ios)
+        model['KBytesTransferred'] = pywbem.Uint64(
+                stats.kbytes_read + stats.kbytes_written)
+        model['ReadIOs'] = pywbem.Uint64(stats.read_ios)
+        model['KBytesRead'] = pywbem.Uint64(stats.kbytes_read)
+        model['ReadIOTimeCounter'] = pywbem.Uint64(stats.read_ticks)
+        model['WriteIOs'] = pywbem.Uint64(stats.write_ios)
+        model['KBytesWritten'] = pywbem.Uint64(stats.kbytes_written)
+        model['WriteIOTimeCounter'] = pywbem.Uint64(stats.write_ticks)
+        model['IOTimeCounter'] = pywbem.Uint64(stats.io_ticks)
+        model['SectorsRead'] = pywbem.Uint64(stats.read_sectors)
+        model['SectorsWritten'] = pywbem.Uint64(stats.write_sectors)
+        model['ReadsMerged'] = pywbem.Uint64(stats.read_merges)
+        model['WritesMerged'] = pywbem.Uint64(stats.write_merges)
+        model['IOsInProgress'] = pywbem.Uint64(stats.in_flight)
+        model['WeightedIOTimeCounter'] = pywbem.Uint64(stats.time_in_queue)
+        return model
+
+    @staticmethod
+    def _get_since_timestamp(since):
+        """
+            Convert Since parameter of GetIOHistory to timestamp. Interval
+            means the last part of the history of given length.
+        """
+        if since is None:
+            return None
+        if since.is_interval:
+            delta = since.timedelta
+            return time.time() - (delta.days * 86400 + delta.seconds)
+        return calendar.timegm(since.datetime.utctimetuple())
+
+    @cmpi_logging.trace_method
+    def get_io_history(self, devices, resolution=None, since=None):
+        """
+            Return return value and output parameters of GetIOHistory
+            method of given StorageDevices.
+
+            :param devices: (``list of StorageDevice``) Devices, whose
+                history should be returned.
+            :param resolution: (``int``) Step of the history in seconds,
+                one of iohistory.RESOLUTIONS. The finest one is the default.
+            :param since: (``CIMDateTime``) Return only samples newer than
+                this time or, if it is interval, return only the last part
+                of the history.
+        """
+        if not self.history.is_enabled():
+            return (self.Values.GetIOHistory.Not_Supported, [])
+        if resolution is None:
+            resolution = iohistory.RESOLUTIONS[0]
+        if resolution not in iohistory.RESOLUTIONS:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Unsupported Resolution: %d." % (resolution,))
+        since = self._get_since_timestamp(since)
+
+        elements = []
+        timestamps = []
+        # list of output arrays, in order of iohistory.METRICS
+        metrics = [[] for _metric in iohistory.METRICS]
+        for device in devices:
+            name = self.get_kernel_name(device)
+            if not name:
+                continue
+            element = self.provider_manager.get_name_for_device(device)
+            for (timestamp, values) in self.history.get_history(
+                    name, resolution, since):
+                if values[0] != values[0]:
+                    # NaN, the device did not exist or it was recreated
+                    continue
+                elements.append(element)
+                timestamps.append(pywbem.CIMDateTime(
+                        datetime.utcfromtimestamp(timestamp)))
+                for (output, value) in zip(metrics, values):
+                    output.append(pywbem.Real32(value))
+
+        out_params = [
+                pywbem.CIMParameter(
+                        name='elements',
+                        value=elements,
+                        type='reference',
+                        is_array=True,
+                        array_size=len(elements)),
+                pywbem.CIMParameter(
+                        name='timestamps',
+                        value=timestamps,
+                        type='datetime',
+                        is_array=True,
+                        array_size=len(timestamps)),
+        ]
+        for (param, output) in zip(self.HISTORY_PARAMS, metrics):
+            out_params.append(pywbem.CIMParameter(
+                    name=param,
+                    value=output,
+                    type='real32',
+                    is_array=True,
+                    array_size=len(output)))
+        return (self.Values.GetIOHistory.Success, out_params)
+
+    class Values(object):
+        class GetIOHistory(object):
+            Success = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Failed = pywbem.Uint32(4)
+
+        class ElementType(object):
+            Computer_System = pywbem.Uint16(2)
+            Front_end_Computer_System = pywbem.Uint16(3)
+            Peer_Computer_System = pywbem.Uint16(4)
+            Back_end_Computer_System = pywbem.Uint16(5)
+            Front_end_Port = pywbem.Uint16(6)
+            Back_end_Port = pywbem.Uint16(7)
+            Volume = pywbem.Uint16(8)
+            Extent = pywbem.Uint16(9)
+            Disk_Drive = pywbem.Uint16(10)
+            Arbitrary_LUs = pywbem.Uint16(11)
+            Remote_Replica_Group = pywbem.Uint16(12)
+
+
+class LMI_StorageElementStatisticalData(BaseProvider):
+    """
+        Implementation of LMI_StorageElementStatisticalData class, which
+        associates StorageExtents to their LMI_BlockStorageStatisticalData.
+    """
+    @cmpi_logging.trace_method
+    def __init__(self, stats_provider, *args, **kwargs):
+        super(LMI_StorageElementStatisticalData, self).__init__(
+                *args, **kwargs)
+        self.stats_provider = stats_provider
+
+    @cmpi_logging.trace_method
+    def enum_instances(self, env, model, keys_only):
+        """
+            Provider implementation of EnumerateInstances intrinsic method.
+        """
+        model.path.update({'ManagedElement': None, 'Stats': None})
+        for device in self.stats_provider.enumerate_devices():
+            provider = self.stats_provider.get_extent_provider(device)
+            model['ManagedElement'] = provider.get_name_for_device(device)
+            model['Stats'] = self.stats_provider.get_name_for_device(device)
+            yield model
+
+    @cmpi_logging.trace_method
+    def get_instance(self, env, model):
+        """
+            Provider implementation of GetInstance intrinsic method.
+            It just checks if ManagedElement and Stats are related.
+        """
+        device = self.provider_manager.get_device_for_name(
+                model['ManagedElement'])
+        if not device:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                    "Cannot find ManagedElement device.")
+        stats_device = self.stats_provider.get_device_for_name(model['Stats'])
+        if not stats_device:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                    "Cannot find Stats device.")
+        if device.path != stats_device.path:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                    "ManagedElement is not related to Stats.")
+        return model
+
+    @cmpi_logging.trace_method
+    def references(self, env, object_name, model, result_class_name, role,
+                   result_role, keys_only):
+        """Instrument Associations."""
+        return self.simple_references(env, object_name, model,
+                result_class_name, role, result_role, keys_only,
+                "CIM_StorageExtent",
+                "CIM_StatisticalData")
@@ -22,6 +22,7 @@ from openlmi.storage.ExtentProvider import ExtentProvider
 import blivet
 import pywbem
 import openlmi.storage.util.storage as storage
+import openlmi.storage.util.partitioning as partitioning
 import openlmi.common.cmpi_logging as cmpi_logging
 
 class LMI_DiskPartition(ExtentProvider):
@@ -53,12 +54,12 @@ class LMI_DiskPartition(ExtentProvider):
             return super(LMI_DiskPartition, self).get_base_devices(device)
 
         # logical partitions depend on the extended partition
-        parted_ext = device.disk.format.partedDisk.getExtendedPartition()
-        if not parted_ext:
+        extended = partitioning.get_disk_layout(device.disk).extended
+        if not extended:
             raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
                     'Cannot find extended partition for device: ' + device.path)
 
-        ext = self.storage.devicetree.getDeviceByPath(parted_ext.path)
+        ext = self.storage.devicetree.getDeviceByPath(extended.path)
         return [ext, ]
 
 
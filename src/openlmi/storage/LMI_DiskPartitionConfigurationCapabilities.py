@@ -27,6 +27,7 @@ import blivet.formats
 import parted
 import openlmi.common.cmpi_logging as cmpi_logging
 import openlmi.storage.util.units as units
+import openlmi.storage.util.partitioning as partitioning
 
 class LMI_DiskPartitionConfigurationCapabilities(CapabilitiesProvider):
     """
@@ -112,17 +113,6 @@ class LMI_DiskPartitionConfigurationCapabilities(CapabilitiesProvider):
     ]
 
 
-    @cmpi_logging.trace_method
-    def enumerate_capabilities(self):
-        """
-            Return an iterable with all capabilities instances, i.e.
-            dictionaries property_name -> value.
-            If the capabilities are the default ones, it must have
-            '_default' as a property name.
-        """
-
-        return self.instances
-
     @cmpi_logging.trace_method
     def create_setting_for_capabilities(self, capabilities):
         """
@@ -280,21 +270,24 @@ class LMI_DiskPartitionConfigurationCapabilities(CapabilitiesProvider):
         else:
             part_type = parted.PARTITION_NORMAL
 
-        if not param_size:
-            grow = True
-            size = 1.0
-        else:
-            grow = False
-            size = param_size / (units.MEGABYTE * 1.0)
-
-        # Find the best place
-        geometry = blivet.partitioning.getBestFreeSpaceRegion(
-                disk=device.format.partedDisk,
-                part_type=part_type,
-                req_size=size,
-                grow=grow)
-
-        if not geometry:
+        layout = partitioning.get_disk_layout(device)
+        sector_size = device.partedDevice.sectorSize
+        region = None
+        if (part_type == parted.PARTITION_LOGICAL
+                or layout.has_free_primary_slot()):
+            # Find the best place
+            free_space = layout.get_free_space(part_type)
+            if not param_size:
+                region = free_space.largest()
+            else:
+                # round up to whole sectors
+                length = (param_size + sector_size - 1) / sector_size
+                region = free_space.best_fit(length)
+                if region:
+                    # truncate the region to requested size
+                    region = (region[0], region[0] + length - 1)
+
+        if not region:
             # No place found
             retval = self.Values.FindPartitionLocation.Not_Enough_Free_Space
             out_params = [pywbem.CIMParameter('size', type='uint64',
@@ -302,25 +295,15 @@ class LMI_DiskPartitionConfigurationCapabilities(CapabilitiesProvider):
             return (retval, out_params)
 
         retval = self.Values.FindPartitionLocation.Success
-
-        sector_size = device.partedDevice.sectorSize
-        new_size = geometry.length * device.partedDevice.sectorSize
-
-        # anaconda returns the whole region size, we should make it smaller
-        # to adjust to requested size
-        if not grow and new_size > param_size:
-            # truncate the end to start + size
-            geometry.end = geometry.start + (param_size / sector_size)
-            if param_size % sector_size > 0:
-                geometry.end = geometry.end + 1
-        new_size = (geometry.end - geometry.start) * sector_size
+        (start, end) = region
+        new_size = (end - start + 1) * sector_size
 
         out_params = [pywbem.CIMParameter('size', type='uint64',
                 value=pywbem.Uint64(new_size))]
         out_params += [pywbem.CIMParameter('startingaddress', type='uint64',
-                value=pywbem.Uint64(geometry.start))]
+                value=pywbem.Uint64(start))]
         out_params += [pywbem.CIMParameter('endingaddress', type='uint64',
-                value=pywbem.Uint64(geometry.end))]
+                value=pywbem.Uint64(end))]
         return (retval, out_params)
 
 
@@ -24,6 +24,7 @@ from openlmi.storage.LMI_DiskPartitionConfigurationSetting \
 import pywbem
 import blivet.formats
 import openlmi.storage.util.storage as storage
+import openlmi.storage.util.partitioning as partitioning
 import openlmi.storage.util.units as units
 import parted
 import openlmi.common.cmpi_logging as cmpi_logging
@@ -273,14 +274,18 @@ class LMI_DiskPartitionConfigurationService(ServiceProvider):
         if logical:
             # Recalculate start/end addresses from 'relative to extended
             # partition start' to 'relative to disk start'
-            address_shift = partitioning.get_logical_partition_start(device)
+            extended = partitioning.get_disk_layout(device).extended
+            if not extended:
+                raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                        'Cannot find extended partition.')
+            address_shift = extended.start
             if param_startingaddress is not None:
                 param_startingaddress = param_startingaddress + address_shift
             if param_endingaddress is not None:
                 param_endingaddress = param_endingaddress + address_shift
 
         if device:
-            (minstart, maxend) = partitioning.get_available_sectors(device)
+            (minstart, maxend) = storage.get_available_sectors(device)
 
         # check partition
         partition = self._parse_partition(param_partition, device)
@@ -330,7 +335,7 @@ class LMI_DiskPartitionConfigurationService(ServiceProvider):
     @cmpi_logging.trace_method
     def _get_max_partition_size(self, device, partition_type):
         """
-            Return maximum partition size on given device, in bytes.
+            Return maximum partition size on given device, in sectors.
             Partition_type must be parted constant or None
         """
         if partition_type is None:
@@ -338,26 +343,24 @@ class LMI_DiskPartitionConfigurationService(ServiceProvider):
             max_primary = self._get_max_partition_size(
                 device, parted.PARTITION_NORMAL)
             max_logical = 0
-            if device.format.extendedPartition is not None:
+            layout = partitioning.get_disk_layout(device)
+            if layout.extended is not None:
                 max_logical = self._get_max_partition_size(
                     device, parted.PARTITION_LOGICAL)
             elif (device.format.labelType == 'msdos' and
-                    len(device.format.partitions) > 3):
+                    len(layout.partitions) > 3):
                 # There is no extended partition and the new one
                 # will be logical
                 # -> reserve 2 MB for extended partition metadata
-                max_primary = max_primary - 2 * units.MEGABYTE
+                max_primary = max_primary - (2 * units.MEGABYTE
+                        / device.partedDevice.sectorSize)
             return max(max_primary, max_logical)
         else:
-            parted_disk = device.format.partedDisk
-            geom = blivet.partitioning.getBestFreeSpaceRegion(
-                    parted_disk,
-                    partition_type,
-                    1,
-                    grow=True)
-            if geom is None:
+            layout = partitioning.get_disk_layout(device)
+            region = layout.get_free_space(partition_type).largest()
+            if region is None:
                 return 0
-            return geom.getLength()
+            return region[1] - region[0] + 1
 
 
 
@@ -425,10 +428,28 @@ class LMI_DiskPartitionConfigurationService(ServiceProvider):
                 else:
                     primary = True
 
+        if primary and not partitioning.get_disk_layout(
+                device).has_free_primary_slot():
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "Maximum number of primary partitions has been reached.")
+
+        # find exact place for the partition on the disk
+        length = None
+        if size is not None:
+            sector_size = device.partedDevice.sectorSize
+            length = (size + sector_size - 1) / sector_size
+        (alloc_type, region) = partitioning.find_partition_region(
+                device, part_type, length)
+
         # check size and grow it if necessary
         if size is None:
             grow = True
             size = 1
+        elif region:
+            # The partition will fit, no need to check maximum size.
+            grow = False
+            # blivet wants MiB, don't create smaller partition than requested
+            size = (size + units.MEGABYTE - 1) / units.MEGABYTE
         else:
             # check maximum size
             max_partition = self._get_max_partition_size(device, part_type)
@@ -438,7 +459,7 @@ class LMI_DiskPartitionConfigurationService(ServiceProvider):
                 return (ret, None, max_partition)
             # Ok, the partition will fit. Continue.
             grow = False
-            size = size / units.MEGABYTE
+            size = (size + units.MEGABYTE - 1) / units.MEGABYTE
 
         args = {
                 'parents': [device],
@@ -452,17 +473,28 @@ class LMI_DiskPartitionConfigurationService(ServiceProvider):
 
         partition = self.storage.newPartition(**args)
         partition.disk = device
-
-        if hidden is not None:
-            if partition.flagAvailable(parted.PARTITION_HIDDEN):
-                if hidden:
-                    partition.setFlag(parted.PARTITION_HIDDEN)
-            else:
-                raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
-                        "Goal.Hidden cannot be set for this Extent.")
+        if region:
+            # Place the partition directly, without global
+            # doPartitioning() of all disks.
+            partitioning.allocate_partition(partition, device, alloc_type,
+                    region[0], region[1])
+
+        try:
+            if hidden is not None:
+                if partition.flagAvailable(parted.PARTITION_HIDDEN):
+                    if hidden:
+                        partition.setFlag(parted.PARTITION_HIDDEN)
+                else:
+                    raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                            "Goal.Hidden cannot be set for this Extent.")
+            action = blivet.deviceaction.ActionCreateDevice(partition)
+        except Exception:
+            if region:
+                # don't leave the partition on the shared parted disk
+                partitioning.release_partition(partition, device)
+            raise
 
         # finally, do the dirty job
-        action = blivet.deviceaction.ActionCreateDevice(partition)
         storage.do_storage_action(self.storage, action)
         size = partition.size * units.MEGABYTE
 
@@ -57,17 +57,6 @@ class LMI_FileSystemConfigurationCapabilities(CapabilitiesProvider):
     ]
 
 
-    @cmpi_logging.trace_method
-    def enumerate_capabilities(self):
-        """
-            Return an iterable with all capabilities instances, i.e.
-            dictionaries property_name -> value.
-            If the capabilities are the default ones, it must have
-            '_default' as a property name.
-        """
-
-        return self.instances
-
     class Values(CapabilitiesProvider.Values):
         class SupportedActualFileSystemTypes(object):
             Unknown = pywbem.Uint16(0)
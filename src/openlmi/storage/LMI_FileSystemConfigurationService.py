@@ -34,6 +34,9 @@ class LMI_FileSystemConfigurationService(ServiceProvider):
         super(LMI_FileSystemConfigurationService, self).__init__(
                 "LMI_FileSystemConfigurationService", *args, **kwargs)
         self.broker = None
+        # mkfs of a large device can take long time, don't block other jobs
+        self.job_manager.set_method_priority('LMI_CreateFileSystem',
+                Job.PRIORITY_LOW)
 
     @cmpi_logging.trace_method
     def cim_method_lmi_createfilesystem(self, env, object_name,
@@ -24,6 +24,8 @@ from openlmi.storage.SettingManager import StorageSetting
 import pywbem
 import blivet.devices
 from openlmi.storage.BaseProvider import BaseProvider
+import openlmi.storage.util.lvm as lvm
+import openlmi.storage.util.units as units
 
 class LMI_LVStorageCapabilities(CapabilitiesProvider):
     """ Provider of LMI_LVStorageCapabilities class."""
@@ -65,12 +67,18 @@ class LMI_LVStorageCapabilities(CapabilitiesProvider):
                     device)
 
         redundancy = self.pool_provider.get_redundancy(device)
+        # each stripe and each mirror needs its own physical volume
+        max_stripes = max(len(device.pvs), 1)
+        max_mirrors = max(len(device.pvs) - 1, 0)
+        mirrored = redundancy.get_redundancy_lv(1, max_mirrors)
+        extent_size = int(device.peSize * units.MEGABYTE)
+
         caps = {}
         caps['InstanceID'] = self.create_capabilities_id(device.path)
         caps['ElementName'] = device.path
         caps['DataRedundancyDefault'] = \
                 pywbem.Uint16(redundancy.data_redundancy)
-        caps['DataRedundancyMax'] = pywbem.Uint16(redundancy.data_redundancy)
+        caps['DataRedundancyMax'] = pywbem.Uint16(mirrored.data_redundancy)
         caps['DataRedundancyMin'] = pywbem.Uint16(redundancy.data_redundancy)
         caps['NoSinglePointOfFailure'] = redundancy.no_single_point_of_failure
         caps['NoSinglePointOfFailureDefault'] = \
@@ -80,7 +88,7 @@ class LMI_LVStorageCapabilities(CapabilitiesProvider):
         caps['PackageRedundancyDefault'] = \
                 pywbem.Uint16(redundancy.package_redundancy)
         caps['PackageRedundancyMax'] = pywbem.Uint16(
-                redundancy.package_redundancy)
+                mirrored.package_redundancy)
         caps['PackageRedundancyMin'] = pywbem.Uint16(
                 redundancy.package_redundancy)
         if redundancy.parity_layout:
@@ -88,6 +96,18 @@ class LMI_LVStorageCapabilities(CapabilitiesProvider):
                     redundancy.parity_layout + 1)
         else:
             caps['ParityLayoutDefault'] = None
+        caps['StripeCountDefault'] = pywbem.Uint16(1)
+        caps['StripeCountMin'] = pywbem.Uint16(1)
+        caps['StripeCountMax'] = pywbem.Uint16(max_stripes)
+        caps['StripeSizeDefault'] = pywbem.Uint64(
+                min(lvm.STRIPE_SIZE_DEFAULT,
+                        lvm.get_max_stripe_size(extent_size)))
+        caps['StripeSizeMin'] = pywbem.Uint64(lvm.STRIPE_SIZE_MIN)
+        caps['StripeSizeMax'] = pywbem.Uint64(
+                lvm.get_max_stripe_size(extent_size))
+        caps['MirrorCountDefault'] = pywbem.Uint16(0)
+        caps['MirrorCountMin'] = pywbem.Uint16(0)
+        caps['MirrorCountMax'] = pywbem.Uint16(max_mirrors)
         return caps
 
 
@@ -139,6 +159,9 @@ class LMI_LVStorageCapabilities(CapabilitiesProvider):
             setting['ParityLayout'] = capabilities['ParityLayoutDefault'] - 1
         else:
             setting['ParityLayout'] = None
+        setting['StripeCount'] = capabilities['StripeCountDefault']
+        setting['StripeSize'] = capabilities['StripeSizeDefault']
+        setting['MirrorCount'] = capabilities['MirrorCountDefault']
 
         self.setting_manager.set_setting('LMI_LVStorageSetting', setting)
         return pywbem.CIMInstanceName(
@@ -206,10 +229,11 @@ class LMI_LVStorageCapabilities(CapabilitiesProvider):
 
             This method creates new instance of LMI_LVStorageSetting.
             Applications then do not need to calculate DataRedundancy,
-            PackageRedundancy and ExtentStripeLength. Because only basic
-            Logical Volumes without any additional stripping or mirroring are
-            supported, this method basically clones LMI_VGStorageSetting to
-            LMI_LVStorageSetting.
+            PackageRedundancy and ExtentStripeLength. The setting describes
+            linear Logical Volume, i.e. it basically clones
+            LMI_VGStorageSetting to LMI_LVStorageSetting. Applications can
+            then set StripeCount, StripeSize and MirrorCount together with
+            the redundancy of the striped or mirrored Logical Volume.
         """
         return super(LMI_LVStorageCapabilities, self).cim_method_createsetting(
                 env, object_name)
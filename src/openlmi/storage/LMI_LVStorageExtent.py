@@ -25,6 +25,8 @@ from openlmi.storage.SettingHelper import SettingHelper
 from openlmi.storage.SettingManager import StorageSetting
 import pywbem
 import openlmi.storage.util.storage as storage
+import openlmi.storage.util.lvm as lvm
+import openlmi.storage.util.units as units
 from openlmi.storage.SettingProvider import SettingProvider
 
 class LMI_LVStorageExtent(ExtentProvider, SettingHelper):
@@ -74,8 +76,91 @@ class LMI_LVStorageExtent(ExtentProvider, SettingHelper):
 
         model['UUID'] = device.uuid
 
+        # cache status needs dmsetup, read it only when requested
+        if self.is_requested(model, 'CacheMode', 'CacheBlockSize',
+                'CacheUsedBlocks', 'CacheTotalBlocks', 'CacheDirtyBlocks',
+                'CacheReadHits', 'CacheReadMisses', 'CacheWriteHits',
+                'CacheWriteMisses'):
+            status = lvm.get_cache_status(device.mapName)
+            model['CacheMode'] = self.get_cache_mode(status)
+            if status:
+                model['CacheBlockSize'] = pywbem.Uint64(status['block_size'])
+                model['CacheUsedBlocks'] = pywbem.Uint64(
+                        status['used_blocks'])
+                model['CacheTotalBlocks'] = pywbem.Uint64(
+                        status['total_blocks'])
+                model['CacheDirtyBlocks'] = pywbem.Uint64(
+                        status['dirty_blocks'])
+                model['CacheReadHits'] = pywbem.Uint64(status['read_hits'])
+                model['CacheReadMisses'] = pywbem.Uint64(
+                        status['read_misses'])
+                model['CacheWriteHits'] = pywbem.Uint64(
+                        status['write_hits'])
+                model['CacheWriteMisses'] = pywbem.Uint64(
+                        status['write_misses'])
+
+        if self.is_requested(model, 'ThinlyProvisioned'):
+            model['ThinlyProvisioned'] = bool(lvm.get_thin_lv_pool_map(
+                    getattr(device, 'sysfsPath', None)))
+        # thin pool status needs dmsetup, read it only when requested
+        if self.is_requested(model, 'ThinPoolDataSize', 'ThinPoolDataUsed',
+                'ThinPoolMetadataSize', 'ThinPoolMetadataUsed',
+                'ThinPoolVirtualSize'):
+            usage = lvm.get_thin_pool_status(device.mapName)
+            if usage:
+                model['ThinPoolDataSize'] = pywbem.Uint64(usage['data_size'])
+                model['ThinPoolDataUsed'] = pywbem.Uint64(usage['data_used'])
+                model['ThinPoolMetadataSize'] = pywbem.Uint64(
+                        usage['metadata_size'])
+                model['ThinPoolMetadataUsed'] = pywbem.Uint64(
+                        usage['metadata_used'])
+            # the virtual size scans the whole volume group
+            if usage and self.is_requested(model, 'ThinPoolVirtualSize'):
+                model['ThinPoolVirtualSize'] = pywbem.Uint64(
+                        self.get_thin_pool_virtual_size(device))
+
         return model
 
+    @cmpi_logging.trace_method
+    def get_thin_pool_virtual_size(self, device):
+        """
+            Return sum of virtual sizes of all thin logical volumes
+            provisioned from given thin pool, in bytes.
+        """
+        pool_map = lvm.get_thin_pool_map(device.mapName)
+        size = 0
+        for lv in device.vg.lvs:
+            if lvm.get_thin_lv_pool_map(
+                    getattr(lv, 'sysfsPath', None)) == pool_map:
+                size += lv.size * units.MEGABYTE
+        return long(size)
+
+    def get_cache_mode(self, status):
+        """
+            Return CacheMode value for given cache status, as returned by
+            lvm.get_cache_status().
+        """
+        if not status:
+            return self.Values.CacheMode.Not_Cached
+        modes = {
+                lvm.CACHE_MODE_WRITETHROUGH:
+                        self.Values.CacheMode.Writethrough,
+                lvm.CACHE_MODE_WRITEBACK: self.Values.CacheMode.Writeback,
+                lvm.CACHE_MODE_PASSTHROUGH: self.Values.CacheMode.Passthrough,
+        }
+        return modes[status['mode']]
+
+    @cmpi_logging.trace_method
+    def get_redundancy(self, device):
+        """
+            Returns redundancy characteristics for given Anaconda StorageDevice.
+            Striping and mirroring of the logical volume is added to
+            redundancy of its volume group.
+        """
+        redundancy = super(LMI_LVStorageExtent, self).get_redundancy(device)
+        (stripes, mirrors) = lvm.get_lv_layout(device)
+        return redundancy.get_redundancy_lv(stripes, mirrors)
+
     @cmpi_logging.trace_method
     def _get_setting_for_device(self, device, setting_provider):
         """ Return setting for given device """
@@ -83,6 +168,11 @@ class LMI_LVStorageExtent(ExtentProvider, SettingHelper):
                 StorageSetting.TYPE_CONFIGURATION,
                 setting_provider.create_setting_id(device.path))
         setting.set_setting(self.get_redundancy(device))
+        (stripes, mirrors) = lvm.get_lv_layout(device)
+        setting['StripeCount'] = stripes
+        setting['MirrorCount'] = mirrors
+        setting['CacheMode'] = self.get_cache_mode(
+                lvm.get_cache_status(device.mapName))
         setting['ElementName'] = device.path
         return setting
 
@@ -158,6 +248,10 @@ class LMI_LVStorageExtent(ExtentProvider, SettingHelper):
                 'PackageRedundancyMax' : pywbem.Uint16,
                 'PackageRedundancyMin' : pywbem.Uint16,
                 'ParityLayout' : pywbem.Uint16,
+                'StripeCount' : pywbem.Uint16,
+                'StripeSize' : pywbem.Uint64,
+                'MirrorCount' : pywbem.Uint16,
+                'CacheMode' : pywbem.Uint16,
         }
 
     @cmpi_logging.trace_method
@@ -181,3 +275,10 @@ class LMI_LVStorageExtent(ExtentProvider, SettingHelper):
         cmpi_logging.logger.info("DELETE LV: %s" % (device.path))
         action = blivet.deviceaction.ActionDestroyDevice(device)
         storage.do_storage_action(self.storage, action)
+
+    class Values(ExtentProvider.Values):
+        class CacheMode(object):
+            Not_Cached = pywbem.Uint16(0)
+            Writethrough = pywbem.Uint16(1)
+            Writeback = pywbem.Uint16(2)
+            Passthrough = pywbem.Uint16(3)
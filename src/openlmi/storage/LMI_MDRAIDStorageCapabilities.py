@@ -55,17 +55,6 @@ class LMI_MDRAIDStorageCapabilities(CapabilitiesProvider):
             },
     ]
 
-    @cmpi_logging.trace_method
-    def enumerate_capabilities(self):
-        """
-            Return an iterable with all capabilities instances, i.e.
-            dictionaries property_name -> value.
-            If the capabilities are the default ones, it must have
-            '_default' as a property name.
-        """
-
-        return self.instances
-
     @cmpi_logging.trace_method
     # pylint: disable-msg=W0221
     def create_setting_for_capabilities(self, capabilities, default=False):
@@ -20,7 +20,7 @@
 
 from openlmi.storage.BasedOnProvider import BasedOnProvider
 import pywbem
-import openlmi.storage.util.storage as storage
+import openlmi.storage.util.partitioning as partitioning
 import openlmi.common.cmpi_logging as cmpi_logging
 
 class LMI_PartitionBasedOn(BasedOnProvider):
@@ -47,7 +47,7 @@ class LMI_PartitionBasedOn(BasedOnProvider):
         """
             Return starting address of logical's partition metadata.
         """
-        return storage.get_logical_partition_start(device)
+        return partitioning.get_logical_partition_start(device)
 
     @cmpi_logging.trace_method
     def get_mbr_instance(self, model, device, base):
@@ -56,26 +56,27 @@ class LMI_PartitionBasedOn(BasedOnProvider):
         if device.isPrimary or device.isExtended:
             return self.get_gpt_instance(model, device, base)
 
+        layout = partitioning.get_disk_layout(device.disk)
+        info = layout.get_partition(device.path)
         # startaddress is relative to the beginning of the extended partition
-        base_start = base.partedPartition.geometry.start
+        base_start = layout.get_partition(base.path).start
         # find the metadata
         start = self.get_logical_partition_start(device)
-        end = device.partedPartition.geometry.end
 
-        model['OrderIndex'] = pywbem.Uint16(device.partedPartition.number)
+        model['OrderIndex'] = pywbem.Uint16(info.number)
         model['StartingAddress'] = pywbem.Uint64(start - base_start)
-        model['EndingAddress'] = pywbem.Uint64(end - base_start)
+        model['EndingAddress'] = pywbem.Uint64(info.end - base_start)
         return model
 
     @cmpi_logging.trace_method
     # pylint: disable-msg=W0613
     def get_gpt_instance(self, model, device, base):
         """ Fill instance of PartitionBasedOn class with GPT positions. """
-        model['OrderIndex'] = pywbem.Uint16(device.partedPartition.number)
-        model['StartingAddress'] = \
-            pywbem.Uint64(device.partedPartition.geometry.start)
-        model['EndingAddress'] = \
-            pywbem.Uint64(device.partedPartition.geometry.end)
+        info = partitioning.get_disk_layout(device.disk).get_partition(
+                device.path)
+        model['OrderIndex'] = pywbem.Uint16(info.number)
+        model['StartingAddress'] = pywbem.Uint64(info.start)
+        model['EndingAddress'] = pywbem.Uint64(info.end)
         return model
 
     @cmpi_logging.trace_method
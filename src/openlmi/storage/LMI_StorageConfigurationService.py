@@ -19,13 +19,18 @@
 """ Module for LMI_StorageConfigurationService class."""
 
 from openlmi.storage.ServiceProvider import ServiceProvider
+import json
+import math
 import pywbem
 import blivet.formats
 import openlmi.common.cmpi_logging as cmpi_logging
 import openlmi.storage.util.units as units
 import openlmi.storage.util.storage as storage
+import openlmi.storage.util.lvm as lvm
 from openlmi.storage.DeviceProvider import DeviceProvider
+from openlmi.storage.LMI_LVStorageExtent import LMI_LVStorageExtent
 from openlmi.storage.SettingProvider import SettingProvider
+from openlmi.storage.StorageTopology import StorageTopology
 
 class LMI_StorageConfigurationService(ServiceProvider):
     """ Provider of LMI_StorageConfigurationService. """
@@ -35,6 +40,8 @@ class LMI_StorageConfigurationService(ServiceProvider):
         super(LMI_StorageConfigurationService, self).__init__(
                 classname="LMI_StorageConfigurationService",
                 *args, **kwargs)
+        self.topology = StorageTopology(self.storage, self.provider_manager,
+                self.config.namespace)
 
     @cmpi_logging.trace_method
     def _check_redundancy_setting(self, redundancy, setting):
@@ -151,7 +158,9 @@ class LMI_StorageConfigurationService(ServiceProvider):
             # check PE size
             newsize = device.vg.align(float(size) / units.MEGABYTE, True)
             oldsize = device.vg.align(device.size, False)
-            if newsize != oldsize:
+            if newsize != oldsize and lvm.has_thin_pool(device.vg):
+                device = self._extend_lv(device, newsize)
+            elif newsize != oldsize:
                 action = blivet.deviceaction.ActionResizeDevice(
                         device, newsize)
                 storage.do_storage_action(self.storage, action)
@@ -174,7 +183,37 @@ class LMI_StorageConfigurationService(ServiceProvider):
 
 
     @cmpi_logging.trace_method
-    def _create_lv(self, pool, name, size):
+    def _extend_lv(self, device, newsize):
+        """
+            Extend logical volume in volume group with thin pool, where
+            blivet computes wrong free space, using lvm directly.
+            Return the resized LVMLogicalVolumeDevice.
+        """
+        vg = device.vg
+        growth = newsize - vg.align(device.size, False)
+        thin = lvm.get_thin_lv_pool_map(getattr(device, 'sysfsPath', None))
+        # virtual size of thin logical volumes does not need free space
+        if not thin and growth > self._get_free_space(vg):
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "Not enough free space in the volume group.")
+        storage.log_storage_call("RESIZE LV", {
+                'device': device, 'size': newsize})
+        lvm_args = lvm.get_lvextend_args(vg.name, device.lvname,
+                int(newsize * units.MEGABYTE))
+        return self._run_lvcreate(vg, device.lvname, lvm_args,
+                [device.path])
+
+    @cmpi_logging.trace_method
+    def _get_free_space(self, vg):
+        """
+            Return free space of given LVMVolumeGroupDevice in MiB, see
+            lvm.get_free_extents().
+        """
+        return lvm.get_free_extents(vg) * vg.peSize
+
+    @cmpi_logging.trace_method
+    def _create_lv(self, pool, name, size, stripes=1, stripe_size=None,
+            mirrors=0):
         """
             Really create the logical volume, all parameters were checked.
         """
@@ -184,11 +223,14 @@ class LMI_StorageConfigurationService(ServiceProvider):
         if name:
             args['name'] = name
 
-        storage.log_storage_call("CREATE LV", args)
-
-        lv = self.storage.newLV(**args)
-        action = blivet.deviceaction.ActionCreateDevice(lv)
-        storage.do_storage_action(self.storage, action)
+        if stripes == 1 and mirrors == 0 and not lvm.has_thin_pool(pool):
+            storage.log_storage_call("CREATE LV", args)
+            lv = self.storage.newLV(**args)
+            action = blivet.deviceaction.ActionCreateDevice(lv)
+            storage.do_storage_action(self.storage, action)
+        else:
+            lv = self._create_lv_layout(pool, args, stripes, stripe_size,
+                    mirrors)
 
         newsize = lv.size * units.MEGABYTE
         outparams = [
@@ -205,6 +247,98 @@ class LMI_StorageConfigurationService(ServiceProvider):
                 .Job_Completed_with_No_Error
         return (ret, outparams)
 
+    @cmpi_logging.trace_method
+    def _create_lv_layout(self, pool, args, stripes, stripe_size, mirrors):
+        """
+            Create striped or mirrored logical volume, which blivet does not
+            support, or any logical volume in volume group with thin pool,
+            where blivet computes wrong free space, using lvm directly.
+            Return the created LVMLogicalVolumeDevice.
+        """
+        # each stripe must have the same nr. of extents
+        chunk = pool.peSize * stripes
+        args['size'] = math.ceil(args['size'] / chunk) * chunk
+        if args['size'] * (mirrors + 1) > self._get_free_space(pool):
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "Not enough free space in InPool for all stripes and "
+                    "mirrors.")
+
+        args['stripes'] = stripes
+        args['stripe_size'] = stripe_size
+        args['mirrors'] = mirrors
+        storage.log_storage_call("CREATE LV", args)
+
+        name = args.get('name', None)
+        lvm_args = lvm.get_lvcreate_args(pool.name, name,
+                int(args['size'] * units.MEGABYTE), stripes, stripe_size,
+                mirrors)
+        return self._run_lvcreate(pool, name, lvm_args,
+                [device.path for device in pool.pvs])
+
+    @cmpi_logging.trace_method
+    def _run_lvcreate(self, vg, name, lvm_args, paths):
+        """
+            Run lvm command, which creates or modifies logical volume in
+            given LVMVolumeGroupDevice. lvm chooses the name of a new
+            logical volume, if no name is given.
+            Return the created or modified LVMLogicalVolumeDevice.
+        """
+        vg_name = vg.name
+        old_names = set(lv.lvname for lv in vg.lvs)
+        if name and name not in old_names:
+            # wait also for the new logical volume to appear
+            paths = list(paths) + [
+                    '/dev/mapper/' + lvm.get_map_name(vg_name, name)]
+        storage.do_lvm_command(self.storage, lvm_args, paths)
+
+        vg = self.storage.devicetree.getDeviceByName(vg_name)
+        if vg:
+            for lv in vg.lvs:
+                if name and lv.lvname == name:
+                    return lv
+                if not name and lv.lvname not in old_names:
+                    return lv
+        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                "Cannot find created logical volume in " + vg_name)
+
+    @cmpi_logging.trace_method
+    def _parse_lv_layout(self, goal, pool):
+        """
+            Return (stripes, stripe_size, mirrors) requested by given
+            LMI_LVStorageSetting Goal. Linear layout is returned if no Goal
+            was given.
+            Raise CIMError, if the layout cannot be allocated from given
+            LVMVolumeGroupDevice.
+        """
+        if not goal:
+            return (1, None, 0)
+        stripes = int(goal.get('StripeCount', None) or 1)
+        mirrors = int(goal.get('MirrorCount', None) or 0)
+        stripe_size = goal.get('StripeSize', None)
+        if stripes == 1 or not stripe_size:
+            # lvm uses default stripe size
+            stripe_size = None
+        else:
+            stripe_size = int(stripe_size)
+        if not pool:
+            return (stripes, stripe_size, mirrors)
+
+        if stripes * (mirrors + 1) > len(pool.pvs):
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "InPool does not have enough physical volumes for "
+                    "StripeCount and MirrorCount of the Goal.")
+        if stripes > 1 and mirrors > 1:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_SUPPORTED,
+                    "Striped logical volume can have only one mirror.")
+        extent_size = int(pool.peSize * units.MEGABYTE)
+        if stripe_size and not lvm.is_valid_stripe_size(
+                stripe_size, extent_size):
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "StripeSize of the Goal must be power of two between "
+                    "%d and %d bytes." % (lvm.STRIPE_SIZE_MIN,
+                            lvm.get_max_stripe_size(extent_size)))
+        return (stripes, stripe_size, mirrors)
+
     @cmpi_logging.trace_method
     def _parse_goal(self, param_goal, classname):
         """
@@ -305,10 +439,22 @@ class LMI_StorageConfigurationService(ServiceProvider):
             # don't need to change the name
             param_elementname = None
 
+        (stripes, stripe_size, mirrors) = self._parse_lv_layout(goal, pool)
+
+        # goal vs theelement
+        if (goal and device
+                and (goal.get('StripeCount', None) is not None
+                    or goal.get('MirrorCount', None) is not None)
+                and (stripes, mirrors) != lvm.get_lv_layout(device)):
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_SUPPORTED,
+                    "Changing StripeCount or MirrorCount of a logical volume"
+                    " is not supported.")
+
         # pool vs goal
         if goal and pool:
             pool_provider = self.provider_manager.get_provider_for_device(pool)
-            redundancy = pool_provider.get_redundancy(pool)
+            redundancy = pool_provider.get_redundancy(pool).get_redundancy_lv(
+                    stripes, mirrors)
             error = self._check_redundancy_setting(redundancy, goal)
             if error:
                 raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
@@ -333,8 +479,295 @@ class LMI_StorageConfigurationService(ServiceProvider):
         if device:
             return self._modify_lv(device, param_elementname, param_size)
         else:
-            return self._create_lv(pool, param_elementname, param_size)
+            return self._create_lv(pool, param_elementname, param_size,
+                    stripes, stripe_size, mirrors)
+
+
+    @cmpi_logging.trace_method
+    def cim_method_createlvcachepool(self, env, object_name,
+                                     param_elementname=None,
+                                     param_inpool=None,
+                                     param_inextents=None,
+                                     param_size=None):
+        """
+            Implements LMI_StorageConfigurationService.CreateLVCachePool()
+
+            Create cache pool in a Volume Group, optionally only on given
+            Physical Volumes of the group, e.g. on SSDs. The cache pool
+            can be then attached to a Logical Volume by AttachLVCache().
+        """
+        self.check_instance(object_name)
+        pool = self._parse_pool(param_inpool)
+        if not pool:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter InPool must be specified.")
+        if not param_size:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter Size must be set when creating a cache pool.")
+        (devices, _redundancies) = self._parse_inextents(param_inextents)
+        devices = devices or []
+        for device in devices:
+            if device not in pool.pvs:
+                raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                        "InExtent %s is not a physical volume of InPool."
+                        % device.path)
+
+        args = {}
+        args['parents'] = [pool]
+        args['size'] = pool.align(float(param_size) / units.MEGABYTE, True)
+        if param_elementname:
+            args['name'] = param_elementname
+        if args['size'] > self._get_free_space(pool):
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "Not enough free space in InPool.")
+
+        args['pvs'] = devices
+        storage.log_storage_call("CREATE LV CACHE POOL", args)
+
+        pv_paths = [device.path for device in devices]
+        lvm_args = lvm.get_cache_pool_args(pool.name, param_elementname,
+                int(args['size'] * units.MEGABYTE), pv_paths)
+        lv = self._run_lvcreate(pool, param_elementname, lvm_args,
+                pv_paths or [device.path for device in pool.pvs])
+
+        outparams = [
+                pywbem.CIMParameter(
+                        name='theelement',
+                        type='reference',
+                        value=self.provider_manager.get_name_for_device(lv)),
+                pywbem.CIMParameter(
+                    name="Size",
+                    type="uint64",
+                    value=pywbem.Uint64(lv.size * units.MEGABYTE))
+        ]
+        return (self.Values.CreateLVCachePool.Job_Completed_with_No_Error,
+                outparams)
+
+    @cmpi_logging.trace_method
+    def cim_method_attachlvcache(self, env, object_name,
+                                 param_theelement=None,
+                                 param_cachepool=None,
+                                 param_goal=None):
+        """
+            Implements LMI_StorageConfigurationService.AttachLVCache()
+
+            Attach cache pool to a Logical Volume. Cache mode is taken from
+            the Goal, writethrough is used when it is not set.
+        """
+        self.check_instance(object_name)
+        device = self._parse_element(param_theelement, "LMI_LVStorageExtent")
+        cache_pool = self._parse_element(param_cachepool,
+                "LMI_LVStorageExtent")
+        if not device or not cache_pool:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameters TheElement and CachePool must be specified.")
+        if cache_pool.vg != device.vg:
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "CachePool must be in the same volume group as "
+                    "TheElement.")
+        if lvm.is_cached(device.mapName):
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "TheElement has a cache attached already.")
+
+        modes = {
+                LMI_LVStorageExtent.Values.CacheMode.Writethrough:
+                        lvm.CACHE_MODE_WRITETHROUGH,
+                LMI_LVStorageExtent.Values.CacheMode.Writeback:
+                        lvm.CACHE_MODE_WRITEBACK,
+        }
+        mode = lvm.CACHE_MODE_WRITETHROUGH
+        goal = self._parse_goal(param_goal, "LMI_LVStorageSetting")
+        if goal and goal.get('CacheMode', None) is not None:
+            mode = modes.get(int(goal['CacheMode']))
+            if not mode:
+                raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                        "CacheMode of the Goal must be Writethrough (1) or "
+                        "Writeback (2).")
+
+        storage.log_storage_call("ATTACH LV CACHE", {
+                'device': device, 'cache_pool': cache_pool, 'mode': mode})
+        lvm_args = lvm.get_attach_cache_args(device.vg.name, device.lvname,
+                cache_pool.lvname, mode)
+        path = device.path
+        storage.do_lvm_command(self.storage, lvm_args,
+                [path, cache_pool.path])
+
+        device = self.storage.devicetree.getDeviceByPath(path)
+        if not device:
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "Cannot find the cached logical volume " + path)
+        outparams = [
+                pywbem.CIMParameter(
+                        name='theelement',
+                        type='reference',
+                        value=self.provider_manager.get_name_for_device(
+                                device))
+        ]
+        return (self.Values.AttachLVCache.Job_Completed_with_No_Error,
+                outparams)
+
+    @cmpi_logging.trace_method
+    def cim_method_detachlvcache(self, env, object_name,
+                                 param_theelement=None,
+                                 param_deletecachepool=None):
+        """
+            Implements LMI_StorageConfigurationService.DetachLVCache()
+
+            Detach cache pool from a Logical Volume. Dirty blocks are
+            written to the Logical Volume first. The cache pool is either
+            kept for later use or deleted.
+        """
+        self.check_instance(object_name)
+        device = self._parse_element(param_theelement, "LMI_LVStorageExtent")
+        if not device:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter TheElement must be specified.")
+        if not lvm.is_cached(device.mapName):
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "TheElement has no cache attached.")
+
+        storage.log_storage_call("DETACH LV CACHE", {
+                'device': device, 'delete_pool': bool(param_deletecachepool)})
+        lvm_args = lvm.get_detach_cache_args(device.vg.name, device.lvname,
+                bool(param_deletecachepool))
+        storage.do_lvm_command(self.storage, lvm_args, [device.path])
+        return (self.Values.DetachLVCache.Job_Completed_with_No_Error, [])
+
+    @cmpi_logging.trace_method
+    def cim_method_createlvthinpool(self, env, object_name,
+                                    param_elementname=None,
+                                    param_inpool=None,
+                                    param_size=None):
+        """
+            Implements LMI_StorageConfigurationService.CreateLVThinPool()
+
+            Create thin pool in a Volume Group. Thin Logical Volumes can be
+            then allocated from the pool by CreateThinLV().
+        """
+        self.check_instance(object_name)
+        pool = self._parse_pool(param_inpool)
+        if not pool:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter InPool must be specified.")
+        if not param_size:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter Size must be set when creating a thin pool.")
+
+        size = pool.align(float(param_size) / units.MEGABYTE, True)
+        if size > self._get_free_space(pool):
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    "Not enough free space in InPool.")
+
+        storage.log_storage_call("CREATE LV THIN POOL", {
+                'parents': [pool], 'name': param_elementname, 'size': size})
+        lvm_args = lvm.get_thin_pool_args(pool.name, param_elementname,
+                int(size * units.MEGABYTE))
+        lv = self._run_lvcreate(pool, param_elementname, lvm_args,
+                [device.path for device in pool.pvs])
+
+        outparams = [
+                pywbem.CIMParameter(
+                        name='theelement',
+                        type='reference',
+                        value=self.provider_manager.get_name_for_device(lv)),
+                pywbem.CIMParameter(
+                    name="Size",
+                    type="uint64",
+                    value=pywbem.Uint64(lv.size * units.MEGABYTE))
+        ]
+        return (self.Values.CreateLVThinPool.Job_Completed_with_No_Error,
+                outparams)
+
+    @cmpi_logging.trace_method
+    def cim_method_createthinlv(self, env, object_name,
+                                param_elementname=None,
+                                param_thinpool=None,
+                                param_size=None):
+        """
+            Implements LMI_StorageConfigurationService.CreateThinLV()
 
+            Create thin Logical Volume in a thin pool. Its virtual size can
+            be larger than the thin pool, the space is allocated from the
+            pool only when the data is written.
+        """
+        self.check_instance(object_name)
+        thin_pool = self._parse_element(param_thinpool, "LMI_LVStorageExtent")
+        if not thin_pool:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter ThinPool must be specified.")
+        if not lvm.get_thin_pool_map(thin_pool.mapName):
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "ThinPool is not an active thin pool.")
+        if not param_size:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter Size must be set when creating a thin logical"
+                    " volume.")
+
+        vg = thin_pool.vg
+        size = vg.align(float(param_size) / units.MEGABYTE, True)
+        if size * units.MEGABYTE > lvm.THIN_SIZE_MAX:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Size is larger than the maximum virtual size %d."
+                    % lvm.THIN_SIZE_MAX)
+
+        storage.log_storage_call("CREATE THIN LV", {
+                'thin_pool': thin_pool, 'name': param_elementname,
+                'size': size})
+        lvm_args = lvm.get_thin_lv_args(vg.name, param_elementname,
+                thin_pool.lvname, int(size * units.MEGABYTE))
+        lv = self._run_lvcreate(vg, param_elementname, lvm_args,
+                [thin_pool.path])
+
+        outparams = [
+                pywbem.CIMParameter(
+                        name='theelement',
+                        type='reference',
+                        value=self.provider_manager.get_name_for_device(lv)),
+                pywbem.CIMParameter(
+                    name="Size",
+                    type="uint64",
+                    value=pywbem.Uint64(lv.size * units.MEGABYTE))
+        ]
+        return (self.Values.CreateThinLV.Job_Completed_with_No_Error,
+                outparams)
+
+    @cmpi_logging.trace_method
+    def cim_method_createthinsnapshot(self, env, object_name,
+                                      param_elementname=None,
+                                      param_sourceelement=None):
+        """
+            Implements LMI_StorageConfigurationService.CreateThinSnapshot()
+
+            Create snapshot of thin Logical Volume. The snapshot shares
+            all data blocks with its origin in the same thin pool, only
+            blocks modified later are allocated.
+        """
+        self.check_instance(object_name)
+        origin = self._parse_element(param_sourceelement,
+                "LMI_LVStorageExtent")
+        if not origin:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter SourceElement must be specified.")
+        if not lvm.get_thin_lv_pool_map(getattr(origin, 'sysfsPath', None)):
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "SourceElement is not a thin logical volume.")
+
+        storage.log_storage_call("CREATE THIN SNAPSHOT", {
+                'origin': origin, 'name': param_elementname})
+        vg = origin.vg
+        lvm_args = lvm.get_thin_snapshot_args(vg.name, param_elementname,
+                origin.lvname)
+        lv = self._run_lvcreate(vg, param_elementname, lvm_args,
+                [origin.path])
+
+        outparams = [
+                pywbem.CIMParameter(
+                        name='theelement',
+                        type='reference',
+                        value=self.provider_manager.get_name_for_device(lv))
+        ]
+        return (self.Values.CreateThinSnapshot.Job_Completed_with_No_Error,
+                outparams)
 
     @cmpi_logging.trace_method
     # Too many aruments of generated method: pylint: disable-msg=R0913
@@ -818,6 +1251,117 @@ class LMI_StorageConfigurationService(ServiceProvider):
         else:
             return self._create_mdraid(param_level, goal, devices, name)
 
+    @cmpi_logging.trace_method
+    def _get_instance_for_name(self, env, instance_name):
+        """
+            Return instance with given CIMInstanceName or None, if it does
+            not exist.
+        """
+        provider = self.provider_manager.get_instance_provider(
+                instance_name.classname)
+        if provider is None:
+            return None
+        instance_name = instance_name.copy()
+        if not instance_name.namespace:
+            instance_name.namespace = self.config.namespace
+        model = pywbem.CIMInstance(classname=instance_name.classname,
+                properties=instance_name.keybindings, path=instance_name)
+        try:
+            return provider.get_instance(env, model)
+        except pywbem.CIMError, err:
+            if err.args[0] == pywbem.CIM_ERR_NOT_FOUND:
+                return None
+            raise
+
+    @cmpi_logging.trace_method
+    def cim_method_getinstances(self, env, object_name,
+                                param_instancenames=None):
+        """
+            Implements LMI_StorageConfigurationService.GetInstances()
+
+            Return instances with given object paths in one call. All the
+            instances are read from the same device tree.
+        """
+        self.check_instance(object_name)
+        if param_instancenames is None:
+            raise pywbem.CIMError(pywbem.CIM_ERR_INVALID_PARAMETER,
+                    "Parameter InstanceNames must be provided.")
+
+        instances = []
+        not_found = []
+        with storage.lock_storage():
+            for instance_name in param_instancenames:
+                instance = self._get_instance_for_name(env, instance_name)
+                if instance is None:
+                    not_found.append(instance_name)
+                else:
+                    instances.append(instance)
+
+        out_params = [
+                pywbem.CIMParameter(
+                        name='instances',
+                        value=instances,
+                        type='instance',
+                        is_array=True,
+                        array_size=len(instances)),
+                pywbem.CIMParameter(
+                        name='notfound',
+                        value=not_found,
+                        type='reference',
+                        is_array=True,
+                        array_size=len(not_found)),
+        ]
+        return (self.Values.GetInstances.Success, out_params)
+
+    @cmpi_logging.trace_method
+    def cim_method_gettopology(self, env, object_name,
+                               param_sincegeneration=None,
+                               param_epoch=None):
+        """
+            Implements LMI_StorageConfigurationService.GetTopology()
+
+            Return whole storage topology or its changes since given
+            generation as one JSON document.
+        """
+        self.check_instance(object_name)
+        with storage.lock_storage():
+            (generation, document) = self.topology.get_document(
+                    param_sincegeneration, param_epoch)
+
+        out_params = [
+                pywbem.CIMParameter('epoch', type='string',
+                        value=self.topology.epoch),
+                pywbem.CIMParameter('generation', type='uint64',
+                        value=pywbem.Uint64(generation)),
+                pywbem.CIMParameter('topology', type='string',
+                        value=document),
+        ]
+        return (self.Values.GetTopology.Success, out_params)
+
+    @cmpi_logging.trace_method
+    def cim_method_getactiontimeline(self, env, object_name,
+                                     param_sincesequence=None):
+        """
+            Implements LMI_StorageConfigurationService.GetActionTimeline()
+
+            Return phase timings of recent storage actions, each action as
+            one JSON object.
+        """
+        self.check_instance(object_name)
+        (sequence, records) = storage.get_timeline().get_records(
+                param_sincesequence)
+        actions = [json.dumps(record) for record in records]
+
+        out_params = [
+                pywbem.CIMParameter('sequence', type='uint64',
+                        value=pywbem.Uint64(sequence)),
+                pywbem.CIMParameter('actions', type='string',
+                        value=actions,
+                        is_array=True,
+                        array_size=len(actions)),
+        ]
+        return (self.Values.GetActionTimeline.Success, out_params)
+
 
     class Values(ServiceProvider.Values):
         class CreateOrModifyElementFromStoragePool(object):
@@ -858,6 +1402,60 @@ class LMI_StorageConfigurationService(ServiceProvider):
             # Method_Reserved = 4098..32767
             # Vendor_Specific = 32768..65535
 
+        class CreateLVCachePool(object):
+            Job_Completed_with_No_Error = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Timeout = pywbem.Uint32(3)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+            In_Use = pywbem.Uint32(6)
+
+        class AttachLVCache(object):
+            Job_Completed_with_No_Error = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Timeout = pywbem.Uint32(3)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+            In_Use = pywbem.Uint32(6)
+
+        class DetachLVCache(object):
+            Job_Completed_with_No_Error = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Timeout = pywbem.Uint32(3)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+            In_Use = pywbem.Uint32(6)
+
+        class CreateLVThinPool(object):
+            Job_Completed_with_No_Error = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Timeout = pywbem.Uint32(3)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+            In_Use = pywbem.Uint32(6)
+
+        class CreateThinLV(object):
+            Job_Completed_with_No_Error = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Timeout = pywbem.Uint32(3)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+            In_Use = pywbem.Uint32(6)
+
+        class CreateThinSnapshot(object):
+            Job_Completed_with_No_Error = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Timeout = pywbem.Uint32(3)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+            In_Use = pywbem.Uint32(6)
+
         class CreateOrModifyVG(object):
             Job_Completed_with_No_Error = pywbem.Uint32(0)
             Not_Supported = pywbem.Uint32(1)
@@ -908,6 +1506,27 @@ class LMI_StorageConfigurationService(ServiceProvider):
                 # DMTF_Reserved = ..
                 # Vendor_Specific = 32768..65535
 
+        class GetInstances(object):
+            Success = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+
+        class GetTopology(object):
+            Success = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+
+        class GetActionTimeline(object):
+            Success = pywbem.Uint32(0)
+            Not_Supported = pywbem.Uint32(1)
+            Unknown = pywbem.Uint32(2)
+            Failed = pywbem.Uint32(4)
+            Invalid_Parameter = pywbem.Uint32(5)
+
         class CreateOrModifyMDRAID(object):
             Completed_with_No_Error = pywbem.Uint32(0)
             Not_Supported = pywbem.Uint32(1)
@@ -26,6 +26,7 @@ from openlmi.storage.SettingHelper import SettingHelper
 from openlmi.storage.SettingManager import StorageSetting
 import openlmi.storage.util.units as units
 import openlmi.storage.util.storage as storage
+import openlmi.storage.util.lvm as lvm
 import math
 from openlmi.storage.SettingProvider import SettingProvider
 
@@ -115,18 +116,32 @@ class LMI_VGStoragePool(DeviceProvider, SettingHelper):
         model['ElementName'] = device.name
         model['PoolID'] = device.name
 
-        model['TotalManagedSpace'] = pywbem.Uint64(
-                device.extents * device.peSize * units.MEGABYTE)
-        model['RemainingManagedSpace'] = pywbem.Uint64(
-                device.freeExtents * device.peSize * units.MEGABYTE)
+        # free extents are computed from all logical volumes, compute them
+        # only when requested
+        if self.is_requested(model, 'TotalManagedSpace', 'TotalExtents'):
+            model['TotalManagedSpace'] = pywbem.Uint64(
+                    device.extents * device.peSize * units.MEGABYTE)
+            model['TotalExtents'] = pywbem.Uint64(device.extents)
+        if self.is_requested(model, 'RemainingManagedSpace',
+                'RemainingExtents'):
+            free_extents = lvm.get_free_extents(device)
+            model['RemainingManagedSpace'] = pywbem.Uint64(
+                    free_extents * device.peSize * units.MEGABYTE)
+            model['RemainingExtents'] = pywbem.Uint64(free_extents)
 
         model['ExtentSize'] = pywbem.Uint64(device.peSize * units.MEGABYTE)
-        model['TotalExtents'] = pywbem.Uint64(device.extents)
-        model['RemainingExtents'] = pywbem.Uint64(device.freeExtents)
         model['UUID'] = device.uuid
 
         return model
 
+    @cmpi_logging.trace_method
+    def enum_instance_names(self):
+        """
+            Return CIMInstanceNames of all VGs.
+        """
+        for device in self.storage.vgs:
+            yield self.provider_manager.get_name_for_device(device)
+
     @cmpi_logging.trace_method
     def enum_instances(self, env, model, keys_only):
         """Enumerate instances.
@@ -232,16 +247,27 @@ class LMI_VGStoragePool(DeviceProvider, SettingHelper):
 
         # we support only logical disks for now (should be StorageExtent)
         etypes = self.Values.GetSupportedSizeRange.ElementType
+        thin_types = (etypes.Thin_Provisioned_Volume,
+                etypes.Thin_Provisioned_Logical_Disk)
         if (param_elementtype
-                and param_elementtype != etypes.Logical_Disk):
+                and param_elementtype != etypes.Logical_Disk
+                and param_elementtype not in thin_types):
             ret = self.Values.GetSupportedSizeRange.Invalid_Element_Type
             return (ret, [])
 
         # TODO: check Goal setting!
 
         extent_size = long(device.peSize * units.MEGABYTE)
-        available_size = long(
-                device.peSize * device.freeExtents * units.MEGABYTE)
+        if param_elementtype in thin_types:
+            # thin logical volumes need a thin pool, their virtual size
+            # is not limited by free space
+            if not lvm.has_thin_pool(device):
+                ret = self.Values.GetSupportedSizeRange.Invalid_Element_Type
+                return (ret, [])
+            available_size = lvm.THIN_SIZE_MAX / extent_size * extent_size
+        else:
+            available_size = long(device.peSize
+                    * lvm.get_free_extents(device) * units.MEGABYTE)
 
         out_params = []
         out_params += [pywbem.CIMParameter('minimumvolumesize', type='uint64',
@@ -382,6 +408,27 @@ class LMI_VGStoragePool(DeviceProvider, SettingHelper):
         action = blivet.deviceaction.ActionDestroyDevice(device)
         storage.do_storage_action(self.storage, action)
 
+    @cmpi_logging.trace_method
+    def cim_method_getiohistory(self, env, object_name,
+                                param_resolution=None,
+                                param_since=None):
+        """
+            Implements LMI_VGStoragePool.GetIOHistory()
+
+            Return recorded throughput, IOPS and latency of all Logical
+            Volumes allocated from the pool.
+        """
+        if not self.provides_name(object_name):
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND, "Wrong keys.")
+        device = self.get_device_for_name(object_name)
+        if not device:
+            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                    "Cannot find the VG.")
+        stats_provider = self.provider_manager.get_instance_provider(
+                'LMI_BlockStorageStatisticalData')
+        return stats_provider.get_io_history(device.lvs, param_resolution,
+                param_since)
+
 
     class Values(DeviceProvider.Values):
         class GetSupportedSizeRange(object):
@@ -316,12 +316,13 @@ class LocalFileSystemProvider(FormatProvider, SettingHelper):
         model['CaseSensitive'] = True
         model['CasePreserved'] = True
         model['PersistenceType'] = self.Values.PersistenceType.Persistent
-        if fmt.label:
-            model['ElementName'] = fmt.label
-        if fmt.uuid:
-            model['ElementName'] = fmt.uuid
-        else:
-            model['ElementName'] = fmt.device
+        if self.is_requested(model, 'ElementName'):
+            if fmt.label:
+                model['ElementName'] = fmt.label
+            if fmt.uuid:
+                model['ElementName'] = fmt.uuid
+            else:
+                model['ElementName'] = fmt.device
 
         return model
 
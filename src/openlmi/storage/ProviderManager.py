@@ -18,6 +18,8 @@
 # -*- coding: utf-8 -*-
 """ Module for ProviderManager class."""
 
+import threading
+import weakref
 import openlmi.common.cmpi_logging as cmpi_logging
 
 class ProviderManager(object):
@@ -47,6 +49,15 @@ class ProviderManager(object):
         the LMI_HostedService can easily enumerate all services.
         The service providers must be registered by add_service_provider().
         The service providers must be subclasses of ServiceProvider class.
+
+        The manager holds references to all instance providers by their
+        class names, so extrinsic methods can read instances of any class.
+        The providers must be registered by add_instance_provider().
+
+        Providers and CIM InstanceNames of StorageDevices are cached, so
+        all associations return the same CIMInstanceName objects. The
+        cache is dropped together with the StorageDevices on each reset
+        of the device tree.
     """
 
     @cmpi_logging.trace_method
@@ -56,6 +67,11 @@ class ProviderManager(object):
         self.service_providers = []
         self.capabilities_providers = []
         self.format_providers = []
+        # Hash lowercase classname -> provider.
+        self.instance_providers = {}
+        # Hash StorageDevice -> (device path, provider, CIMInstanceName).
+        self._device_cache = weakref.WeakKeyDictionary()
+        self._device_cache_lock = threading.Lock()
 
     @cmpi_logging.trace_method
     def add_device_provider(self, provider):
@@ -92,6 +108,21 @@ class ProviderManager(object):
         """
         self.format_providers.append(provider)
 
+    @cmpi_logging.trace_method
+    def add_instance_provider(self, classname, provider):
+        """
+            Add new provider of instances of given class to the manager.
+        """
+        self.instance_providers[classname.lower()] = provider
+
+    @cmpi_logging.trace_method
+    def get_instance_provider(self, classname):
+        """
+            Return provider of instances of given class.
+            Return None if no such provider is registered.
+        """
+        return self.instance_providers.get(classname.lower())
+
     @cmpi_logging.trace_method
     def get_device_provider_for_name(self, object_name):
         """
@@ -114,27 +145,45 @@ class ProviderManager(object):
             return provider.get_device_for_name(object_name)
         return None
 
+    def _get_device_entry(self, device):
+        """
+            Return cached (device path, provider, CIMInstanceName) of given
+            Anaconda StorageDevice. The entry is recomputed if the device
+            has been renamed since it was cached.
+        """
+        with self._device_cache_lock:
+            entry = self._device_cache.get(device)
+        if entry is not None and entry[0] == device.path:
+            return entry
+
+        name = None
+        for provider in self.device_providers:
+            if provider.provides_device(device):
+                name = provider.get_name_for_device(device)
+                break
+        else:
+            provider = None
+        entry = (device.path, provider, name)
+        with self._device_cache_lock:
+            self._device_cache[device] = entry
+        return entry
+
     @cmpi_logging.trace_method
     def get_provider_for_device(self, device):
         """
             Return provider for given Anaconda StorageDevice.
             Return None if no such provider is registered.
         """
-        for provider in self.device_providers:
-            if provider.provides_device(device):
-                return provider
-        return None
+        return self._get_device_entry(device)[1]
 
     @cmpi_logging.trace_method
     def get_name_for_device(self, device):
         """
             Return CIM InstanceName for given Anaconda StorageDevice.
             Return None if no device exist.
+            The returned CIMInstanceName must not be modified.
         """
-        provider = self.get_provider_for_device(device)
-        if provider:
-            return provider.get_name_for_device(device)
-        return None
+        return self._get_device_entry(device)[2]
 
     @cmpi_logging.trace_method
     def get_provider_for_format(self, device, fmt):
@@ -32,7 +32,18 @@ class ServiceProvider(BaseProvider):
     def __init__(self, classname, *args, **kwargs):
         super(ServiceProvider, self).__init__(*args, **kwargs)
         self.classname = classname
+        # CIMInstanceName of the service singleton. It's computed once and
+        # dropped when configuration is reloaded, see _get_frozen_name().
+        self._instance_name = None
+        self.config.add_listener(self._config_changed)
 
+    # pylint: disable-msg=W0613
+    def _config_changed(self, config):
+        """
+            Callback called when configuration is reloaded. Forget the
+            instance name, the namespace or system name may have changed.
+        """
+        self._instance_name = None
 
     @cmpi_logging.trace_method
     def check_instance(self, model):
@@ -40,11 +51,12 @@ class ServiceProvider(BaseProvider):
             Check if the model represents real instance of this class.
             Throw an error if not.
         """
-        if (model['SystemCreationClassName'] != self.config.system_class_name
-                or model['SystemName'] != self.config.system_name
-                or model['CreationClassName'] != self.classname
-                or model['Name'] != self.classname):
-            raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND, "Wrong keys.")
+        keys = self._get_frozen_name()
+        for key in ('SystemCreationClassName', 'SystemName',
+                'CreationClassName', 'Name'):
+            if model[key] != keys[key]:
+                raise pywbem.CIMError(pywbem.CIM_ERR_NOT_FOUND,
+                        "Wrong keys.")
 
     @cmpi_logging.trace_method
     def get_instance(self, env, model):
@@ -69,27 +81,36 @@ class ServiceProvider(BaseProvider):
         """
         model.path.update({'CreationClassName': None, 'SystemName': None,
             'Name': None, 'SystemCreationClassName': None})
-        model['SystemName'] = self.config.system_name
-        model['SystemCreationClassName'] = self.config.system_class_name
-        model['CreationClassName'] = self.classname
-        model['Name'] = self.classname
+        model.update(self._get_frozen_name().keybindings)
         if keys_only:
             yield model
         else:
             yield self.get_instance(env, model)
 
+    @cmpi_logging.trace_method
+    def _get_frozen_name(self):
+        """
+            Return CIMInstanceName of the service singleton, which is shared
+            by all callers and must not be modified.
+        """
+        name = self._instance_name
+        if name is None:
+            name = pywbem.CIMInstanceName(
+                    classname=self.classname,
+                    namespace=self.config.namespace,
+                    keybindings={
+                        'SystemName': self.config.system_name,
+                        'SystemCreationClassName':
+                                self.config.system_class_name,
+                        'CreationClassName': self.classname,
+                        'Name': self.classname})
+            self._instance_name = name
+        return name
+
     @cmpi_logging.trace_method
     def _get_instance_name(self):
         """ Return CIMInstanceName of the service singleton."""
-        name = pywbem.CIMInstanceName(
-                classname=self.classname,
-                namespace=self.config.namespace,
-                keybindings={
-                    'SystemName': self.config.system_name,
-                    'SystemCreationClassName': self.config.system_class_name,
-                    'CreationClassName': self.classname,
-                    'Name': self.classname})
-        return name
+        return self._get_frozen_name().copy()
 
     class Values(object):
         class EnabledDefault(object):
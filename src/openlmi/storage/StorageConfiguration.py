@@ -35,13 +35,27 @@ class StorageConfiguration(object):
 
     PERSISTENT_PATH = '/var/lib/openlmi-storage/'
     SETTINGS_DIR = 'settings/'
+    SNAPSHOT_FILE = 'snapshot'
+
+    BACKEND_BLIVET = 'blivet'
+    BACKEND_SYSFS = 'sysfs'
 
     defaults = {
         'namespace' : 'root/cimv2',
         'systemclassname' : 'Linux_ComputerSystem',
+        'backend': BACKEND_BLIVET,
+        'state_socket': '',
         'tracing': 'false',
         'blivet_tracing': 'false',
         'stderr': 'false',
+        'max_job_history': '1000',
+        'max_job_history_size': str(16 * 1024 * 1024),
+        'job_priority_aging': '300',
+        'statistics_log_interval': '3600',
+        'sampling_interval': '10',
+        'history_size': '360',
+        'action_timeline_size': '100',
+        'action_timeline_log': '',
     }
 
     @cmpi_logging.trace_method
@@ -87,6 +101,10 @@ class StorageConfiguration(object):
             self.config.add_section('common')
         if not self.config.has_section('debug'):
             self.config.add_section('debug')
+        if not self.config.has_section('jobs'):
+            self.config.add_section('jobs')
+        if not self.config.has_section('statistics'):
+            self.config.add_section('statistics')
         self._call_listeners()
 
     @property
@@ -99,6 +117,31 @@ class StorageConfiguration(object):
         """ Return SystemClassName of OpenLMI storage provider."""
         return self.config.get('common', 'systemclassname')
 
+    @property
+    def backend(self):
+        """
+            Return backend, which provides the storage devices: 'blivet'
+            (the default) or 'sysfs' for read-only inventory, which uses
+            blivet only when a device is to be modified.
+        """
+        value = self.config.get('common', 'backend').lower()
+        if value not in (self.BACKEND_BLIVET, self.BACKEND_SYSFS):
+            cmpi_logging.logger.error("Unknown backend '%s', using '%s'."
+                    % (value, self.BACKEND_BLIVET))
+            return self.BACKEND_BLIVET
+        return value
+
+    @property
+    def state_socket(self):
+        """
+            Return path to Unix socket of storage state daemon or None, if
+            the daemon should not be used.
+        """
+        value = self.config.get('common', 'state_socket')
+        if not value:
+            return None
+        return value
+
     @property
     def system_name(self):
         """ Return SystemName of OpenLMI storage provider."""
@@ -119,3 +162,90 @@ class StorageConfiguration(object):
         """ Return True if logging to stderr is enabled."""
         return self.config.getboolean('debug', 'stderr')
 
+    @property
+    def max_job_history(self):
+        """
+            Return maximum number of completed jobs to keep or None, if
+            there is no limit.
+        """
+        value = self.config.getint('jobs', 'max_job_history')
+        if value <= 0:
+            return None
+        return value
+
+    @property
+    def max_job_history_size(self):
+        """
+            Return maximum estimated memory size of completed jobs to keep,
+            in bytes, or None, if there is no limit.
+        """
+        value = self.config.getint('jobs', 'max_job_history_size')
+        if value <= 0:
+            return None
+        return value
+
+    @property
+    def job_priority_aging(self):
+        """
+            Return number of seconds after which a queued job gets one
+            step higher priority or None, if the aging is disabled.
+        """
+        value = self.config.getint('jobs', 'job_priority_aging')
+        if value <= 0:
+            return None
+        return value
+
+    @property
+    def statistics_log_interval(self):
+        """
+            Return number of seconds between writing job statistics to the
+            log or None, if the statistics are not logged.
+        """
+        value = self.config.getint('jobs', 'statistics_log_interval')
+        if value <= 0:
+            return None
+        return value
+
+    @property
+    def sampling_interval(self):
+        """
+            Return number of seconds, for which one sample of I/O statistics
+            is reused. Zero means the statistics are read on each request.
+        """
+        value = self.config.getint('statistics', 'sampling_interval')
+        if value < 0:
+            return 0
+        return value
+
+    @property
+    def history_size(self):
+        """
+            Return number of samples of I/O metrics kept in each resolution
+            of the history. Zero means the history is not recorded.
+        """
+        value = self.config.getint('statistics', 'history_size')
+        if value < 0:
+            return 0
+        return value
+
+    @property
+    def action_timeline_size(self):
+        """
+            Return number of recent storage actions, whose phase timings
+            are kept in memory.
+        """
+        value = self.config.getint('statistics', 'action_timeline_size')
+        if value < 0:
+            return 0
+        return value
+
+    @property
+    def action_timeline_log(self):
+        """
+            Return path to file, where phase timings of storage actions are
+            appended as JSON lines, or None, if they are not written.
+        """
+        value = self.config.get('statistics', 'action_timeline_log')
+        if not value:
+            return None
+        return value
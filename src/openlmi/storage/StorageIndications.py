@@ -0,0 +1,173 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# -*- coding: utf-8 -*-
+""" Module for StorageIndications class."""
+
+import pywbem
+import openlmi.common.cmpi_logging as cmpi_logging
+
+class StorageIndications(object):
+    """
+        Sends CIM_InstCreation, CIM_InstDeletion and CIM_InstModification
+        indications of storage extents, storage pools and filesystems.
+
+        The indications are found by comparing instances enumerated just
+        before the storage is modified or reset and right after the reset,
+        i.e. two consecutive generations of the device tree. Nothing is
+        enumerated if nobody is subscribed.
+    """
+    IND_EXTENT_CREATED = "StorageExtentCreated"
+    IND_EXTENT_DELETED = "StorageExtentDeleted"
+    IND_EXTENT_CHANGED = "StorageExtentChanged"
+    IND_POOL_CREATED = "StoragePoolCreated"
+    IND_POOL_DELETED = "StoragePoolDeleted"
+    IND_POOL_CHANGED = "StoragePoolChanged"
+    IND_FS_CREATED = "FileSystemCreated"
+    IND_FS_DELETED = "FileSystemDeleted"
+    IND_FS_CHANGED = "FileSystemChanged"
+
+    # Hash kind -> (class in queries, creation, deletion, modification
+    # filter IDs)
+    KINDS = {
+        'extent': ('CIM_StorageExtent', IND_EXTENT_CREATED,
+                IND_EXTENT_DELETED, IND_EXTENT_CHANGED),
+        'pool': ('LMI_VGStoragePool', IND_POOL_CREATED,
+                IND_POOL_DELETED, IND_POOL_CHANGED),
+        'fs': ('LMI_LocalFileSystem', IND_FS_CREATED,
+                IND_FS_DELETED, IND_FS_CHANGED),
+    }
+
+    @cmpi_logging.trace_method
+    def __init__(self, indication_manager, namespace):
+        self.indication_manager = indication_manager
+        self.namespace = namespace
+        # List of (kind, classname, provider) of all watched providers.
+        self.providers = []
+        # Hash instance key -> (kind, CIMInstance) of the previous
+        # generation or None, if it was not enumerated.
+        self._previous = None
+        self._add_indication_filters()
+
+    @cmpi_logging.trace_method
+    def _add_indication_filters(self):
+        """
+            Add all IndicationFilters to indication manager.
+        """
+        filters = {}
+        for (classname, created, deleted, changed) in self.KINDS.itervalues():
+            filters[created] = {
+                "Query" : "SELECT * FROM CIM_InstCreation WHERE "
+                    "SourceInstance ISA " + classname,
+                "Description" : "Creation of a " + classname + ".",
+            }
+            filters[deleted] = {
+                "Query" : "SELECT * FROM CIM_InstDeletion WHERE "
+                    "SourceInstance ISA " + classname,
+                "Description" : "Deletion of a " + classname + ".",
+            }
+            filters[changed] = {
+                "Query" : "SELECT * FROM CIM_InstModification WHERE "
+                    "SourceInstance ISA " + classname,
+                "Description" : "Modification of a " + classname + ".",
+            }
+        self.indication_manager.add_filters(filters)
+
+    @cmpi_logging.trace_method
+    def add_provider(self, kind, classname, provider):
+        """
+            Watch instances of given provider.
+
+            :param kind: (``string``) One of KINDS keys, it selects the
+                indication filters.
+            :param classname: (``string``) Name of the class, which is
+                enumerated.
+            :param provider: (``BaseProvider``) The provider.
+        """
+        self.providers.append((kind, classname, provider))
+
+    def _is_subscribed(self):
+        """ Return True, if any of our filters is subscribed."""
+        for (_classname, created, deleted, changed) in self.KINDS.itervalues():
+            for filter_id in (created, deleted, changed):
+                if self.indication_manager.is_subscribed(filter_id):
+                    return True
+        return False
+
+    @staticmethod
+    def _get_key(instance):
+        """ Return hashable key of given CIMInstance."""
+        keys = [(key.lower(), value)
+                for (key, value) in instance.path.keybindings.items()]
+        keys.sort()
+        return (instance.classname.lower(), tuple(keys))
+
+    @cmpi_logging.trace_method
+    def _enumerate(self):
+        """
+            Return hash instance key -> (kind, CIMInstance) of all instances
+            of watched providers in current device tree.
+        """
+        instances = {}
+        for (kind, classname, provider) in self.providers:
+            name = pywbem.CIMInstanceName(classname=classname,
+                    namespace=self.namespace)
+            model = pywbem.CIMInstance(classname=classname, path=name)
+            # the providers yield the same model, modified
+            for instance in provider.enum_instances(None, model, False):
+                instance = instance.copy()
+                instances[self._get_key(instance)] = (kind, instance)
+        return instances
+
+    @cmpi_logging.trace_method
+    # pylint: disable-msg=W0613
+    def storage_changing(self, storage):
+        """
+            Callback called before the storage is modified or reset.
+            Remember current instances, if someone is subscribed.
+        """
+        if not self._is_subscribed():
+            self._previous = None
+            return
+        self._previous = self._enumerate()
+
+    @cmpi_logging.trace_method
+    # pylint: disable-msg=W0613
+    def storage_changed(self, storage):
+        """
+            Callback called after the storage was reset. Send indications
+            for all instances, which differ from the remembered ones.
+        """
+        previous = self._previous
+        self._previous = None
+        if previous is None or not self._is_subscribed():
+            return
+        current = self._enumerate()
+        manager = self.indication_manager
+
+        for (key, (kind, instance)) in current.iteritems():
+            (_classname, created, _deleted, changed) = self.KINDS[kind]
+            if key not in previous:
+                manager.send_instcreation(instance, created)
+                continue
+            old_instance = previous[key][1]
+            if dict(old_instance.items()) != dict(instance.items()):
+                manager.send_instmodification(old_instance, instance,
+                        changed)
+
+        for (key, (kind, instance)) in previous.iteritems():
+            if key not in current:
+                manager.send_instdeletion(instance, self.KINDS[kind][2])
@@ -0,0 +1,295 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# -*- coding: utf-8 -*-
+""" Module for StorageSnapshot class."""
+
+import os
+import threading
+import time
+import weakref
+import cPickle
+import openlmi.common.cmpi_logging as cmpi_logging
+
+@cmpi_logging.trace_function
+def get_block_devices():
+    """
+        Return sorted list of (major, minor, size in KiB, name) of all block
+        devices known to the kernel, as reported in /proc/partitions.
+    """
+    devices = []
+    with open('/proc/partitions') as partitions:
+        for line in partitions:
+            fields = line.split()
+            if len(fields) != 4 or not fields[0].isdigit():
+                continue
+            devices.append((int(fields[0]), int(fields[1]), int(fields[2]),
+                    fields[3]))
+    devices.sort()
+    return devices
+
+class StorageSnapshot(object):
+    """
+        Persistent snapshot of the last known storage topology.
+
+        Scanning of all devices by blivet.Blivet.reset() takes long time.
+        To answer read-only requests right after start, the snapshot with
+        device records and CIM instances, which were returned by
+        the providers before, is stored in
+        /var/lib/openlmi-storage/snapshot. The snapshot is used only while
+        the real device tree is being populated, i.e. until set_ready() is
+        called, and only if the set of block devices in kernel has not
+        changed since the snapshot was saved.
+
+        Each reset of the device tree starts new generation of the
+        snapshot. Cached CIM instances from older generations are dropped.
+        The snapshot is saved once per generation, SAVE_DELAY seconds after
+        the first instances of the generation were stored.
+    """
+    VERSION = 1
+
+    # Nr. of seconds to collect instances of new generation before the
+    # snapshot is saved.
+    SAVE_DELAY = 10
+
+    @cmpi_logging.trace_method
+    def __init__(self, config):
+        self.config = config
+        self.path = config.PERSISTENT_PATH + config.SNAPSHOT_FILE
+        # Generation stamp, incremented on each device tree reset.
+        self.generation = 0
+        # Time of the last change of the generation.
+        self.timestamp = None
+        # List of block devices in kernel, see get_block_devices().
+        self.block_devices = []
+        # Hash device path -> device record (dictionary).
+        self.devices = {}
+        # Hash classname -> list of CIM instances.
+        self.instances = {}
+
+        # Set when blivet.Blivet instance is fully populated.
+        self._ready = threading.Event()
+        self._lock = threading.RLock()
+        # Weak reference to device tree of current generation.
+        self._devicetree = None
+        # threading.Timer, which will save current generation.
+        self._save_timer = None
+        # Last generation, which was saved or scheduled to be saved.
+        self._saved_generation = None
+
+    @cmpi_logging.trace_method
+    def load(self):
+        """
+            Load the snapshot from the persistent file.
+            Return True, if the snapshot is valid, i.e. it exists and the set
+            of block devices in kernel is the same as when the snapshot was
+            saved.
+        """
+        try:
+            with open(self.path, 'rb') as snapshot_file:
+                data = cPickle.load(snapshot_file)
+        except (EnvironmentError, EOFError, cPickle.UnpicklingError,
+                AttributeError, ImportError, ValueError), err:
+            cmpi_logging.logger.trace_info(
+                    "Cannot load storage snapshot: " + str(err))
+            return False
+        if data.get('version') != self.VERSION:
+            cmpi_logging.logger.trace_info(
+                    "Ignoring storage snapshot of unknown version.")
+            return False
+        if data['block_devices'] != get_block_devices():
+            cmpi_logging.logger.info(
+                    "Block devices have changed, ignoring storage snapshot.")
+            return False
+
+        with self._lock:
+            self.generation = data['generation']
+            self.timestamp = data['timestamp']
+            self.block_devices = data['block_devices']
+            self.devices = data['devices']
+            self.instances = data['instances']
+        cmpi_logging.logger.info("Loaded storage snapshot of generation %d"
+                % self.generation)
+        return True
+
+    @cmpi_logging.trace_method
+    def save(self):
+        """
+            Save the snapshot to the persistent file.
+            Create the persistent directory if it does not exist.
+        """
+        with self._lock:
+            data = {
+                    'version': self.VERSION,
+                    'generation': self.generation,
+                    'timestamp': self.timestamp,
+                    'block_devices': self.block_devices,
+                    'devices': self.devices,
+                    'instances': self.instances,
+            }
+            directory = os.path.dirname(self.path)
+            try:
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+                # Write to temporary file first, so the snapshot is never
+                # left half-written.
+                tmppath = self.path + '.tmp'
+                with open(tmppath, 'wb') as snapshot_file:
+                    cPickle.dump(data, snapshot_file, cPickle.HIGHEST_PROTOCOL)
+                os.rename(tmppath, self.path)
+            except EnvironmentError, err:
+                cmpi_logging.logger.error(
+                        "Cannot save storage snapshot: " + str(err))
+
+    def _remove(self):
+        """ Remove the persistent file, it describes an old generation."""
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _schedule_save(self):
+        """
+            Save the snapshot after SAVE_DELAY, unless current generation
+            has been saved already. The caller must hold _lock.
+        """
+        if self._saved_generation == self.generation:
+            return
+        self._saved_generation = self.generation
+        if self._save_timer is not None:
+            # pending save of previous generation saves current one
+            return
+        self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    @cmpi_logging.trace_method
+    def flush(self):
+        """
+            Save the snapshot now, if its saving has been scheduled.
+        """
+        with self._lock:
+            timer = self._save_timer
+            if timer is None:
+                return
+            timer.cancel()
+            self._save_timer = None
+            self.save()
+        if timer is not threading.current_thread():
+            timer.join()
+
+    @staticmethod
+    def _get_device_record(device):
+        """
+            Return dictionary with basic information about given
+            StorageDevice.
+        """
+        fmt = None
+        if device.format and device.format.type:
+            fmt = device.format.type
+        return {
+                'name': device.name,
+                'path': device.path,
+                'type': device.type,
+                'parents': [parent.path for parent in device.parents],
+                'format': fmt,
+                'size': device.size,
+        }
+
+    @cmpi_logging.trace_method
+    def update(self, storage):
+        """
+            Check, if the device tree of given blivet.Blivet instance has been
+            reset since last call. If so, start new generation, record the
+            devices and drop all cached instances.
+        """
+        with self._lock:
+            if self._devicetree is not None \
+                    and self._devicetree() is storage.devicetree:
+                return
+            self._devicetree = weakref.ref(storage.devicetree)
+
+            self.devices = {}
+            for device in storage.devices:
+                self.devices[device.path] = self._get_device_record(device)
+            self.generation += 1
+            self.timestamp = time.time()
+            self.block_devices = get_block_devices()
+            # Any instance may have changed, the providers will store
+            # new ones.
+            self.instances = {}
+            # Don't load the old generation after restart, the new one is
+            # saved when the providers store its instances.
+            self._remove()
+
+    @cmpi_logging.trace_method
+    def set_ready(self, storage):
+        """
+            Mark the blivet.Blivet instance as fully populated. From now on,
+            only the real device tree should be used.
+        """
+        self.update(storage)
+        self._ready.set()
+
+    def is_ready(self):
+        """ Return True, if the device tree has been populated."""
+        return self._ready.is_set()
+
+    @cmpi_logging.trace_method
+    def wait_for_ready(self):
+        """ Block until the device tree has been populated."""
+        while not self._ready.is_set():
+            # wait() without timeout cannot be interrupted
+            self._ready.wait(1)
+
+    @cmpi_logging.trace_method
+    def get_instances(self, classname):
+        """
+            Return list of cached instances of given class or None, if the
+            class has not been cached.
+        """
+        with self._lock:
+            return self.instances.get(classname.lower())
+
+    @cmpi_logging.trace_method
+    def get_instance(self, instance_name):
+        """
+            Return cached instance with given CIMInstanceName or None, if it is
+            not cached.
+        """
+        instances = self.get_instances(instance_name.classname)
+        if not instances:
+            return None
+        for instance in instances:
+            if instance.path is not None \
+                    and instance.path.keybindings == instance_name.keybindings:
+                return instance
+        return None
+
+    @cmpi_logging.trace_method
+    def store_instances(self, storage, classname, instances):
+        """
+            Remember all instances of given class, enumerated from current
+            device tree. The snapshot is saved once per generation, see
+            _schedule_save().
+        """
+        with self._lock:
+            self.update(storage)
+            classname = classname.lower()
+            if self.instances.get(classname) == instances:
+                return
+            self.instances[classname] = instances
+            self._schedule_save()
@@ -0,0 +1,380 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# -*- coding: utf-8 -*-
+"""
+    Module for StorageState, StorageStateServer and StorageStateClient
+    classes.
+
+    CIMOM can load the providers into several processes. StorageState
+    daemon keeps storage state shared by all these processes: generation
+    of the storage, which is incremented whenever any process modifies a
+    device, and CIM instances enumerated in current generation. The
+    processes populate their blivet.Blivet only when they cannot answer a
+    request from the shared state.
+
+    Run the daemon as:
+        python -m openlmi.storage.StorageState [socket path]
+"""
+
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import cPickle
+import SocketServer
+import openlmi.common.cmpi_logging as cmpi_logging
+
+DEFAULT_SOCKET = '/var/run/openlmi-storage.socket'
+
+# Length prefix of each message.
+_HEADER = struct.Struct('!I')
+
+def _send(sock, obj):
+    """ Send pickled object to given socket."""
+    data = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _recv_exactly(sock, length):
+    """ Receive exactly length bytes or None on end of stream."""
+    chunks = []
+    while length > 0:
+        chunk = sock.recv(length)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        length -= len(chunk)
+    return "".join(chunks)
+
+def _recv(sock):
+    """ Receive one pickled object or raise EOFError on end of stream."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        raise EOFError("Connection closed.")
+    (length,) = _HEADER.unpack(header)
+    data = _recv_exactly(sock, length)
+    if data is None:
+        raise EOFError("Connection closed.")
+    return cPickle.loads(data)
+
+class StorageState(object):
+    """
+        Storage state shared by provider processes.
+
+        This class is used by the daemon. It can also be passed directly
+        to StorageStateClient instead of StorageStateConnection, e.g.
+        in tests.
+    """
+    def __init__(self):
+        self.generation = 1
+        # Hash classname -> list of CIM instances of current generation.
+        self.instances = {}
+        self._lock = threading.Lock()
+
+    def call(self, request, *args):
+        """
+            Process one request and return its result.
+            Following requests are supported:
+              get_generation() -> generation
+              get_instances(classname) -> list of instances or None
+              store_instances(generation, classname, instances) -> True, if
+                the instances were stored
+              invalidate() -> new generation
+        """
+        with self._lock:
+            if request == 'get_generation':
+                return self.generation
+            if request == 'get_instances':
+                (classname,) = args
+                return self.instances.get(classname.lower())
+            if request == 'store_instances':
+                (generation, classname, instances) = args
+                if generation != self.generation:
+                    # the instances are from outdated device tree
+                    return False
+                self.instances[classname.lower()] = instances
+                return True
+            if request == 'invalidate':
+                self.generation += 1
+                self.instances = {}
+                return self.generation
+        raise ValueError("Unknown request: " + str(request))
+
+class _RequestHandler(SocketServer.BaseRequestHandler):
+    """ Process requests of one client connection."""
+    def handle(self):
+        while True:
+            try:
+                (request, args) = _recv(self.request)
+            except EOFError:
+                return
+            try:
+                reply = ('ok', self.server.state.call(request, *args))
+            except (ValueError, TypeError), err:
+                reply = ('error', str(err))
+            _send(self.request, reply)
+
+class StorageStateServer(SocketServer.ThreadingMixIn,
+        SocketServer.UnixStreamServer):
+    """
+        Daemon, which serves StorageState on a Unix socket.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, state=None):
+        if os.path.exists(path):
+            os.unlink(path)
+        # only root can connect
+        old_umask = os.umask(0077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, path,
+                    _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        if state is None:
+            state = StorageState()
+        self.state = state
+
+class StorageStateConnection(object):
+    """
+        Connection to StorageStateServer. It is reconnected automatically
+        when the daemon restarts.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """ Connect to the daemon."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except socket.error:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def _close(self):
+        """ Close the connection."""
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def call(self, request, *args):
+        """
+            Send request to the daemon and return its result.
+            Raise EnvironmentError, if the daemon is not available.
+        """
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    _send(self._sock, (request, args))
+                    (status, result) = _recv(self._sock)
+                    break
+                except (EnvironmentError, EOFError), err:
+                    self._close()
+                    if attempt == 2:
+                        raise EnvironmentError(
+                                "Storage state daemon is not available: "
+                                + str(err))
+        if status != 'ok':
+            raise ValueError(result)
+        return result
+
+class StorageStateClient(object):
+    """
+        Client of the storage state daemon.
+
+        It has the same interface as StorageSnapshot and it is used
+        instead of it, when 'state_socket' is configured. Read-only
+        requests are answered from the instances shared by all processes.
+        blivet.Blivet of this process is populated only when the shared
+        state does not have requested instances or when the storage was
+        modified by another process.
+
+        If the daemon is not available, blivet.Blivet is used for all
+        requests.
+    """
+    # Nr. of seconds, for which populated blivet.Blivet is considered
+    # up to date without asking the daemon.
+    READY_CHECK_INTERVAL = 1.0
+
+    @cmpi_logging.trace_method
+    def __init__(self, storage, connection, storage_util=None):
+        """
+        :param storage: (``blivet.Blivet``) Storage of this process.
+        :param connection: (``StorageStateConnection``) Connection to the
+            daemon.
+        :param storage_util: (``module``) openlmi.storage.util.storage,
+            which resets the storage the same way as storage modifications
+            do and watches external changes of the storage. If it is not
+            provided, storage.reset() is called directly.
+        """
+        self.storage = storage
+        self.connection = connection
+        self.storage_util = storage_util
+        # Generation of the storage, when blivet.Blivet was populated or
+        # None, if it is not populated yet.
+        self._generation = None
+        # Time of the last check of the generation with the daemon.
+        self._checked = 0
+        # True, if external changes of the storage are watched.
+        self._watching = False
+        # True, while blivet.Blivet is reset because of a modification by
+        # another process.
+        self._syncing = False
+        self._lock = threading.RLock()
+
+    def _call(self, request, *args):
+        """ Send request to the daemon, return None on error."""
+        try:
+            return self.connection.call(request, *args)
+        except EnvironmentError, err:
+            cmpi_logging.logger.error(str(err))
+            return None
+
+    def is_ready(self):
+        """
+            Return True, if blivet.Blivet is populated and the storage has
+            not been modified by another process since then.
+
+            The daemon is asked at most once per READY_CHECK_INTERVAL,
+            external modifications are watched by udev in the meantime.
+        """
+        if self._generation is None:
+            return False
+        now = time.time()
+        if now - self._checked < self.READY_CHECK_INTERVAL:
+            return True
+        generation = self._call('get_generation')
+        if generation is None:
+            # no daemon, use blivet
+            return True
+        if generation != self._generation:
+            return False
+        self._checked = now
+        return True
+
+    def _lock_storage(self):
+        """ Return lock, which serializes all resets of the storage."""
+        if self.storage_util:
+            return self.storage_util.lock_storage()
+        return self._lock
+
+    @cmpi_logging.trace_method
+    def wait_for_ready(self):
+        """
+            Populate blivet.Blivet, if it is not populated or if it is
+            outdated.
+        """
+        # The storage lock must be taken first, storage modifications
+        # call storage_changed() with it held.
+        with self._lock_storage():
+            with self._lock:
+                if self.is_ready():
+                    return
+                generation = self._call('get_generation')
+                self._syncing = True
+                try:
+                    if self.storage_util:
+                        self.storage_util.reset_storage(self.storage,
+                                "Storage modified by another process")
+                    else:
+                        self.storage.reset()
+                finally:
+                    self._syncing = False
+                if generation is None:
+                    generation = 0
+                self._generation = generation
+                self._checked = time.time()
+                if self.storage_util and not self._watching:
+                    self._watching = self.storage_util \
+                            .watch_external_changes(self.storage)
+
+    @cmpi_logging.trace_method
+    def get_instances(self, classname):
+        """
+            Return list of shared instances of given class or None, if they
+            are not available.
+        """
+        return self._call('get_instances', classname)
+
+    @cmpi_logging.trace_method
+    def get_instance(self, instance_name):
+        """
+            Return shared instance with given CIMInstanceName or None, if it
+            is not available.
+        """
+        instances = self.get_instances(instance_name.classname)
+        if not instances:
+            return None
+        for instance in instances:
+            if instance.path is not None \
+                    and instance.path.keybindings == instance_name.keybindings:
+                return instance
+        return None
+
+    @cmpi_logging.trace_method
+    # pylint: disable-msg=W0613
+    def store_instances(self, storage, classname, instances):
+        """
+            Share instances enumerated from blivet.Blivet of this process.
+            They are dropped by the daemon, if the storage was modified in
+            the meantime.
+        """
+        if self._generation:
+            self._call('store_instances', self._generation, classname,
+                    instances)
+
+    @cmpi_logging.trace_method
+    # pylint: disable-msg=W0613
+    def storage_changed(self, storage):
+        """
+            Callback called when this process modified the storage and reset
+            its blivet.Blivet. Other processes will reset their
+            blivet.Blivet when they need it.
+        """
+        with self._lock:
+            if self._syncing:
+                # this process only caught up with the others
+                return
+            generation = self._call('invalidate')
+            if generation is None:
+                generation = 0
+            self._generation = generation
+            self._checked = time.time()
+
+def main():
+    """ Run the daemon."""
+    logging.basicConfig(level=logging.INFO)
+    path = DEFAULT_SOCKET
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    server = StorageStateServer(path)
+    logging.info("Serving storage state on %s", path)
+    try:
+        server.serve_forever()
+    finally:
+        os.unlink(path)
+
+if __name__ == '__main__':
+    main()
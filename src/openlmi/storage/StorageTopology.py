@@ -0,0 +1,239 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# -*- coding: utf-8 -*-
+""" Module for StorageTopology class."""
+
+import json
+import threading
+import uuid
+import weakref
+import pywbem
+import openlmi.common.cmpi_logging as cmpi_logging
+
+class StorageTopology(object):
+    """
+        Versioned export of storage topology, i.e. all devices, their
+        formats and settings with their parents, as one JSON document.
+
+        The properties of the objects are the same as the providers return
+        in GetInstance. Each change of the topology starts new generation.
+        Caller can ask for a delta since a previous generation, i.e. only
+        objects created or modified since then and keys of removed objects.
+
+        Generations are valid only within one provider process. The
+        process is identified by random epoch, a full document is
+        returned whenever the epoch does not match.
+
+        The document looks like:
+          {
+            "version": 1,
+            "epoch": "<epoch>",
+            "generation": <current generation>,
+            "since": <generation of the delta or null>,
+            "objects": {
+              "<key>": {
+                "class": "<CIM class name>",
+                "parents": ["<key of parent>", ...],
+                "properties": {"<name>": <value>, ...}
+              }, ...
+            },
+            "removed": ["<key>", ...]
+          }
+        where key of an object is derived from its CIMInstanceName.
+    """
+    VERSION = 1
+
+    # Nr. of removed objects to remember for deltas.
+    MAX_REMOVED = 1000
+
+    @cmpi_logging.trace_method
+    def __init__(self, storage, provider_manager, namespace):
+        self.storage = storage
+        self.provider_manager = provider_manager
+        self.namespace = namespace
+        self.epoch = uuid.uuid4().hex
+        self.generation = 0
+        # Hash key -> (generation of last change, object record).
+        self._objects = {}
+        # Hash key -> generation, in which the object was removed.
+        self._removed = {}
+        # Deltas since older generations are not available, because some
+        # removed objects were forgotten.
+        self._oldest_delta = 0
+        # Weak reference to device tree, from which the objects were read.
+        self._devicetree = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(name):
+        """
+            Return key of object with given CIMInstanceName. Unlike
+            str(name), it does not depend on order of keybindings.
+        """
+        keys = ['%s="%s"' % (key, value) for (key, value)
+                in sorted(name.keybindings.items())]
+        return name.classname + "." + ",".join(keys)
+
+    @classmethod
+    def _to_json(cls, value):
+        """ Convert property value to JSON-compatible value."""
+        if isinstance(value, list):
+            return [cls._to_json(item) for item in value]
+        if isinstance(value, pywbem.CIMInstanceName):
+            return cls.get_key(value)
+        if value is None or isinstance(value, (bool, int, long, float,
+                basestring)):
+            return value
+        return str(value)
+
+    def _get_model(self, name):
+        """ Return empty CIMInstance for given CIMInstanceName."""
+        path = name.copy()
+        if not path.namespace:
+            path.namespace = self.namespace
+        return pywbem.CIMInstance(classname=name.classname,
+                properties=name.keybindings, path=path)
+
+    def _add_record(self, records, name, instance, parents):
+        """ Add object record of given instance to records."""
+        properties = {}
+        for (prop, value) in instance.items():
+            properties[prop] = self._to_json(value)
+        records[self.get_key(name)] = {
+                'class': name.classname,
+                'parents': [self.get_key(parent) for parent in parents
+                        if parent is not None],
+                'properties': properties,
+        }
+
+    @cmpi_logging.trace_method
+    def _collect(self):
+        """
+            Return hash key -> object record of all objects in current
+            device tree.
+        """
+        manager = self.provider_manager
+        records = {}
+        for device in self.storage.devices:
+            provider = manager.get_provider_for_device(device)
+            if provider is None:
+                continue
+            name = manager.get_name_for_device(device)
+            try:
+                instance = provider.get_instance(None, self._get_model(name),
+                        device)
+                parents = [manager.get_name_for_device(parent)
+                        for parent in device.parents
+                        if manager.get_provider_for_device(parent)]
+                self._add_record(records, name, instance, parents)
+
+                fmt = device.format
+                if not fmt or not fmt.type:
+                    continue
+                fmt_provider = manager.get_provider_for_format(device, fmt)
+                if fmt_provider is None:
+                    continue
+                fmt_name = fmt_provider.get_name_for_format(device, fmt)
+                instance = fmt_provider.get_instance(None,
+                        self._get_model(fmt_name), fmt)
+                self._add_record(records, fmt_name, instance, [name])
+            except pywbem.CIMError, err:
+                cmpi_logging.logger.trace_warn(
+                        "Skipping %s in topology: %s" % (device.path, err))
+
+        for provider in manager.setting_providers:
+            for setting in provider.enumerate_configurations():
+                name = pywbem.CIMInstanceName(
+                        classname=provider.setting_classname,
+                        namespace=self.namespace,
+                        keybindings={'InstanceID': setting.the_id})
+                instance = provider.get_instance(None, self._get_model(name),
+                        setting)
+                element = provider.get_associated_element_name(setting.the_id)
+                self._add_record(records, name, instance, [element])
+        return records
+
+    @cmpi_logging.trace_method
+    def update(self):
+        """
+            Read the objects again, if the device tree has been reset since
+            last update. Start new generation, if any object has changed.
+        """
+        with self._lock:
+            devicetree = self.storage.devicetree
+            if self._devicetree is not None \
+                    and self._devicetree() is devicetree:
+                return
+            records = self._collect()
+            self._devicetree = weakref.ref(devicetree)
+
+            generation = self.generation + 1
+            changed = False
+            for (key, record) in records.iteritems():
+                old = self._objects.get(key)
+                if old is None or old[1] != record:
+                    self._objects[key] = (generation, record)
+                    self._removed.pop(key, None)
+                    changed = True
+            for key in self._objects.keys():
+                if key not in records:
+                    del self._objects[key]
+                    self._removed[key] = generation
+                    changed = True
+            if changed:
+                self.generation = generation
+            self._forget_removed()
+
+    def _forget_removed(self):
+        """ Keep at most MAX_REMOVED removed objects."""
+        if len(self._removed) <= self.MAX_REMOVED:
+            return
+        removed = sorted(self._removed.iteritems(), key=lambda item: item[1])
+        for (key, generation) in removed[:-self.MAX_REMOVED]:
+            del self._removed[key]
+            self._oldest_delta = max(self._oldest_delta, generation)
+
+    @cmpi_logging.trace_method
+    def get_document(self, since=None, epoch=None):
+        """
+            Return (generation, JSON document) with the topology. If since
+            and epoch are given and the delta is available, only objects
+            changed after generation 'since' are in the document.
+        """
+        self.update()
+        with self._lock:
+            if (since is None or epoch != self.epoch
+                    or since < self._oldest_delta or since > self.generation):
+                since = None
+            objects = {}
+            for (key, (generation, record)) in self._objects.iteritems():
+                if since is None or generation > since:
+                    objects[key] = record
+            removed = []
+            if since is not None:
+                removed = sorted(key for (key, generation)
+                        in self._removed.iteritems() if generation > since)
+            document = {
+                    'version': self.VERSION,
+                    'epoch': self.epoch,
+                    'generation': self.generation,
+                    'since': since,
+                    'objects': objects,
+                    'removed': removed,
+            }
+            return (self.generation, json.dumps(document, sort_keys=True,
+                    separators=(',', ':')))
@@ -0,0 +1,296 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# -*- coding: utf-8 -*-
+""" Module for SysfsInventory class."""
+
+import threading
+import pywbem
+from openlmi.storage.ExtentProvider import ExtentProvider
+from openlmi.storage.LMI_DiskPartition import LMI_DiskPartition
+from openlmi.storage.LocalFileSystemProvider import LocalFileSystemProvider
+import openlmi.storage.util.storage as storage_util
+import openlmi.storage.util.sysfs as sysfs
+import openlmi.common.cmpi_logging as cmpi_logging
+
+# ID_PART_ENTRY_TYPE of extended msdos partitions
+EXTENDED_PARTITION_TYPES = ('0x5', '0xf', '0x85')
+
+class SysfsInventory(object):
+    """
+        Read-only storage inventory, which is read directly from sysfs
+        and udev database.
+
+        It has the same interface as StorageSnapshot and it is used
+        instead of it, when 'sysfs' backend is configured. Instances of
+        LMI_StorageExtent, LMI_DiskPartition, LMI_VGStoragePool and
+        LMI_LocalFileSystem are built from sysfs. blivet.Blivet is
+        populated only when any other operation is requested, e.g. a
+        method is invoked.
+
+        Some properties, which can be read only by probing the devices,
+        are not set, e.g. free space of volume groups. Classes, whose
+        properties cannot be read exactly from sysfs, e.g. redundancy of
+        devices stacked on RAIDs, are enumerated by blivet.
+    """
+
+    @cmpi_logging.trace_method
+    def __init__(self, config, storage):
+        self.config = config
+        self.storage = storage
+        # Set when blivet.Blivet instance is populated.
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._builders = {
+                'lmi_storageextent': self._get_extents,
+                'lmi_diskpartition': self._get_partitions,
+                'lmi_vgstoragepool': self._get_pools,
+                'lmi_localfilesystem': self._get_filesystems,
+        }
+
+    def is_ready(self):
+        """ Return True, if blivet.Blivet has been populated."""
+        return self._ready.is_set()
+
+    @cmpi_logging.trace_method
+    def wait_for_ready(self):
+        """
+            Populate blivet.Blivet, if it was not populated yet.
+        """
+        with self._lock:
+            if self._ready.is_set():
+                return
+            cmpi_logging.logger.info(
+                    "Switching from sysfs inventory to blivet.")
+            try:
+                self.storage.reset()
+            finally:
+                self._ready.set()
+
+    @cmpi_logging.trace_method
+    def get_instances(self, classname):
+        """
+            Return list of instances of given class, built from sysfs or
+            None, if the class cannot be built from sysfs.
+        """
+        builder = self._builders.get(classname.lower())
+        if builder is None:
+            return None
+        return builder(sysfs.get_devices())
+
+    @cmpi_logging.trace_method
+    def get_instance(self, instance_name):
+        """
+            Return instance with given CIMInstanceName or None, if it cannot
+            be built from sysfs.
+        """
+        instances = self.get_instances(instance_name.classname)
+        if not instances:
+            return None
+        for instance in instances:
+            if instance.path.keybindings == instance_name.keybindings:
+                return instance
+        return None
+
+    # pylint: disable-msg=W0613
+    def store_instances(self, storage, classname, instances):
+        """ Instances enumerated by blivet are not stored anywhere."""
+        pass
+
+    def _get_extent_name(self, classname, device):
+        """ Return CIMInstanceName of StorageExtent of given BlockDevice."""
+        return pywbem.CIMInstanceName(classname,
+                namespace=self.config.namespace,
+                keybindings={
+                    'SystemName' : self.config.system_name,
+                    'SystemCreationClassName' : self.config.system_class_name,
+                    'CreationClassName' : classname,
+                    'DeviceID': device.path
+                })
+
+    def _get_extent(self, classname, device):
+        """
+            Return StorageExtent instance of given BlockDevice. The
+            properties are the same as ExtentProvider sets.
+        """
+        name = self._get_extent_name(classname, device)
+        model = pywbem.CIMInstance(classname, path=name)
+        model.update(name.keybindings)
+        values = ExtentProvider.Values
+
+        model['ElementName'] = device.display_name
+        model['NameNamespace'] = values.NameNamespace.OS_Device_Namespace
+        model['NameFormat'] = values.NameFormat.OS_Device_Name
+        model['Name'] = device.path
+        model['ExtentStatus'] = pywbem.CIMProperty(
+                name='ExtentStatus', value=[], type='uint16',
+                array_size=0, is_array=True)
+        model['OperationalStatus'] = pywbem.CIMProperty(
+                name='OperationalStatus',
+                value=[values.OperationalStatus.OK],
+                type='uint16', array_size=1, is_array=True)
+
+        blocks = device.size / device.sector_size
+        consumable_blocks = blocks
+        if device.partition_table == 'gpt':
+            consumable_blocks -= storage_util.GPT_TABLE_SIZE * 2
+        elif device.partition_table == 'dos':
+            consumable_blocks -= storage_util.MBR_TABLE_SIZE
+        model['BlockSize'] = pywbem.Uint64(device.sector_size)
+        if blocks:
+            model['NumberOfBlocks'] = pywbem.Uint64(blocks)
+        if consumable_blocks > 0:
+            model['ConsumableBlocks'] = pywbem.Uint64(consumable_blocks)
+
+        # The same redundancy as DeviceProvider.get_redundancy() reports
+        # for devices without parents, devices stacked on a single disk
+        # inherit it (see _has_exact_redundancy).
+        redundancy = ExtentProvider.Redundancy()
+        model['NoSinglePointOfFailure'] = \
+                redundancy.no_single_point_of_failure
+        model['DataRedundancy'] = pywbem.Uint16(redundancy.data_redundancy)
+        model['PackageRedundancy'] = pywbem.Uint16(
+                redundancy.package_redundancy)
+        model['ExtentStripeLength'] = pywbem.Uint64(redundancy.stripe_length)
+        model['IsComposite'] = (len(device.parents) > 1)
+        model['Primordial'] = False
+
+        discriminator = []
+        if device.fs_type == 'LVM2_member':
+            discriminator.append(values.Discriminator.Pool_Component)
+        model['ExtentDiscriminator'] = pywbem.CIMProperty(
+                name='ExtentDiscriminator', value=discriminator,
+                type='string', array_size=len(discriminator), is_array=True)
+        return model
+
+    @classmethod
+    def _has_exact_redundancy(cls, device, devices):
+        """
+            Return True, if redundancy of given BlockDevice can be computed
+            without blivet, i.e. it is a disk or it is stacked on a single
+            disk. Redundancy of the others depends on RAID levels and LV
+            segments, which are not in sysfs.
+        """
+        if device.type in (sysfs.BlockDevice.TYPE_DISK,
+                sysfs.BlockDevice.TYPE_LOOP):
+            return not device.parents
+        if device.type == sysfs.BlockDevice.TYPE_PARTITION:
+            disk = devices.get(device.disk)
+            return disk is not None and cls._has_exact_redundancy(
+                    disk, devices)
+        if device.type == sysfs.BlockDevice.TYPE_DM:
+            if len(device.parents) != 1:
+                return False
+            parent = devices.get(device.parents[0])
+            return parent is not None and cls._has_exact_redundancy(
+                    parent, devices)
+        return False
+
+    def _get_extents(self, devices):
+        """
+            Build LMI_StorageExtent instances or return None, if any of them
+            needs blivet.
+        """
+        extents = []
+        for device in devices.itervalues():
+            if device.type not in (sysfs.BlockDevice.TYPE_DISK,
+                    sysfs.BlockDevice.TYPE_DM, sysfs.BlockDevice.TYPE_LOOP):
+                continue
+            if not self._has_exact_redundancy(device, devices):
+                return None
+            extents.append(self._get_extent('LMI_StorageExtent', device))
+        return extents
+
+    def _get_partitions(self, devices):
+        """
+            Build LMI_DiskPartition instances of msdos partitions or return
+            None, if any of them needs blivet.
+        """
+        values = LMI_DiskPartition.Values
+        partitions = []
+        for device in devices.itervalues():
+            if device.type != sysfs.BlockDevice.TYPE_PARTITION:
+                continue
+            disk = devices.get(device.disk)
+            if disk is None or disk.partition_table != 'dos':
+                continue
+            if not self._has_exact_redundancy(device, devices):
+                return None
+            model = self._get_extent('LMI_DiskPartition', device)
+            part_type = device.properties.get('ID_PART_ENTRY_TYPE')
+            if device.partition_number > 4:
+                model['PrimaryPartition'] = False
+                model['PartitionType'] = values.PartitionType.Logical
+            elif part_type in EXTENDED_PARTITION_TYPES:
+                model['PrimaryPartition'] = False
+                model['PartitionType'] = values.PartitionType.Extended
+            else:
+                model['PrimaryPartition'] = True
+                model['PartitionType'] = values.PartitionType.Primary
+            partitions.append(model)
+        return partitions
+
+    def _get_pools(self, devices):
+        """
+            Build LMI_VGStoragePool instances of all volume groups found
+            in metadata of physical volumes, including inactive ones.
+        """
+        pools = []
+        for vgname in sorted(sysfs.get_volume_groups(devices)):
+            name = pywbem.CIMInstanceName('LMI_VGStoragePool',
+                    namespace=self.config.namespace,
+                    keybindings={'InstanceID' : "LMI:VG:" + vgname})
+            model = pywbem.CIMInstance('LMI_VGStoragePool', path=name)
+            model.update(name.keybindings)
+            model['Primordial'] = False
+            model['ElementName'] = vgname
+            model['PoolID'] = vgname
+            pools.append(model)
+        return pools
+
+    def _get_filesystems(self, devices):
+        """ Build LMI_LocalFileSystem instances."""
+        values = LocalFileSystemProvider.Values
+        filesystems = []
+        for device in devices.itervalues():
+            if device.fs_usage != 'filesystem' or not device.fs_type:
+                continue
+            if device.fs_type == 'btrfs':
+                # not supported by LMI_LocalFileSystem
+                continue
+            if device.fs_uuid:
+                fs_id = "UUID=" + device.fs_uuid
+            else:
+                fs_id = "DEVICE=" + device.path
+            name = pywbem.CIMInstanceName('LMI_LocalFileSystem',
+                    namespace=self.config.namespace,
+                    keybindings={
+                        "CSCreationClassName": self.config.system_class_name,
+                        "CSName": self.config.system_name,
+                        "CreationClassName": 'LMI_LocalFileSystem',
+                        "Name": fs_id})
+            model = pywbem.CIMInstance('LMI_LocalFileSystem', path=name)
+            model.update(name.keybindings)
+            model['FileSystemType'] = device.fs_type
+            model['CaseSensitive'] = True
+            model['CasePreserved'] = True
+            model['PersistenceType'] = values.PersistenceType.Persistent
+            if device.fs_uuid:
+                model['ElementName'] = device.fs_uuid
+            else:
+                model['ElementName'] = device.path
+            filesystems.append(model)
+        return filesystems
@@ -27,6 +27,10 @@
 from openlmi.storage.StorageConfiguration import StorageConfiguration
 from openlmi.storage.ProviderManager import ProviderManager
 from openlmi.storage.SettingManager import SettingManager
+from openlmi.storage.StorageSnapshot import StorageSnapshot
+from openlmi.storage.SysfsInventory import SysfsInventory
+from openlmi.storage.StorageState import StorageStateClient, \
+        StorageStateConnection
 
 from openlmi.storage.LMI_StorageExtent import LMI_StorageExtent
 from openlmi.storage.LMI_MDRAIDStorageExtent import LMI_MDRAIDStorageExtent
@@ -71,17 +75,37 @@ from openlmi.storage.LMI_FileSystemConfigurationService \
         import LMI_FileSystemConfigurationService
 from openlmi.storage.LMI_FileSystemConfigurationCapabilities \
         import LMI_FileSystemConfigurationCapabilities
+from openlmi.storage.LMI_BlockStorageStatisticalData \
+        import LMI_BlockStorageStatisticalData, \
+        LMI_StorageElementStatisticalData
 from openlmi.storage.JobManager import JobManager
 from openlmi.storage.IndicationManager import IndicationManager
+from openlmi.storage.StorageIndications import StorageIndications
 
 import openlmi.common.cmpi_logging as cmpi_logging
+import openlmi.storage.util.storage as storage_util
+import openlmi.storage.util.classes as classes_util
+from openlmi.storage.util.diskstats import DiskStatsSampler
+from openlmi.storage.util.iohistory import IOHistory
 import blivet
 import logging
+import threading
 
 indication_manager = None
+job_manager = None
+diskstats_sampler = None
+io_history = None
 
 def init_anaconda(log_manager, config):
-    """ Initialize Anaconda storage module."""
+    """
+        Initialize Anaconda storage module.
+        Return tuple (blivet.Blivet, StorageSnapshot, SysfsInventory or
+        StorageStateClient).
+
+        With 'sysfs' backend or with storage state daemon, the devices are
+        scanned only when needed. Otherwise the devices are scanned by
+        start_anaconda(), when all providers are registered.
+    """
     cmpi_logging.logger.info("Initializing Anaconda")
 
     # set up logging
@@ -95,9 +119,46 @@ def init_anaconda(log_manager, config):
 
     # set up storage class instance
     storage = blivet.Blivet()
-    # identify the system's storage devices
-    storage.reset()
-    return storage
+    if config.backend == config.BACKEND_SYSFS:
+        return (storage, SysfsInventory(config, storage))
+    if config.state_socket:
+        client = StorageStateClient(storage,
+                StorageStateConnection(config.state_socket), storage_util)
+        storage_util.add_reset_listener(client.storage_changed)
+        return (storage, client)
+
+    return (storage, StorageSnapshot(config))
+
+def start_anaconda(storage, snapshot):
+    """
+        Scan the storage devices. It must be called after all providers and
+        their listeners are registered.
+
+        If there is valid snapshot of the storage, the devices are scanned
+        in background and the snapshot is used in the meantime.
+    """
+    if not isinstance(snapshot, StorageSnapshot):
+        # SysfsInventory and StorageStateClient scan the devices when needed
+        return
+    if snapshot.load():
+        thread = threading.Thread(target=reset_storage,
+                args=(storage, snapshot))
+        thread.daemon = True
+        thread.start()
+    else:
+        reset_storage(storage, snapshot)
+
+def reset_storage(storage, snapshot):
+    """
+        Identify the system's storage devices and stop using the snapshot.
+    """
+    try:
+        storage.reset()
+    finally:
+        # do not block the providers forever
+        snapshot.set_ready(storage)
+    cmpi_logging.logger.info("Storage devices identified")
+    storage_util.watch_external_changes(storage)
 
 def change_anaconda_loglevel(config):
     """
@@ -134,6 +195,28 @@ def change_anaconda_loglevel(config):
         change_anaconda_loglevel.stderr_handler = None
 change_anaconda_loglevel.stderr_handler = None
 
+def change_job_config(config):
+    """
+    Callback called when configuration changes.
+    Apply any new limits of completed job history, job priority aging and
+    interval of job statistics logging.
+    """
+    job_manager.set_history_limits(config.max_job_history,
+            config.max_job_history_size)
+    job_manager.set_priority_aging(config.job_priority_aging)
+    job_manager.set_statistics_log_interval(config.statistics_log_interval)
+
+def change_statistics_config(config):
+    """
+    Callback called when configuration changes.
+    Apply any new sampling interval and history size of I/O statistics
+    and new size and log file of the timeline of storage actions.
+    """
+    diskstats_sampler.set_interval(config.sampling_interval)
+    io_history.set_size(config.history_size)
+    storage_util.get_timeline().configure(config.action_timeline_size,
+            config.action_timeline_log)
+
 def get_providers(env):
     """
         CIMOM callback. Initialize OpenLMI and return dictionary of all
@@ -147,24 +230,35 @@ def get_providers(env):
     config.load()
     log_manager.set_config(config)
 
+    # The providers are being (re)loaded, the class hierarchy may have
+    # changed since last load.
+    classes_util.clear_cache()
+
     global indication_manager
     indication_manager = IndicationManager(env, "Storage", config.namespace)
 
     manager = ProviderManager()
     setting_manager = SettingManager(config)
     setting_manager.load()
-    storage = init_anaconda(log_manager, config)
+    (storage, snapshot) = init_anaconda(log_manager, config)
 
     providers = {}
 
-    job_manager = JobManager('Storage', config.namespace, indication_manager)
+    global job_manager
+    job_manager = JobManager('Storage', config.namespace, indication_manager,
+            max_history=config.max_job_history,
+            max_history_size=config.max_job_history_size,
+            priority_aging=config.job_priority_aging,
+            statistics_log_interval=config.statistics_log_interval)
+    config.add_listener(change_job_config)
 
     # common construction options
     opts = {'storage': storage,
             'config': config,
             'provider_manager': manager,
             'setting_manager': setting_manager,
-            'job_manager' : job_manager}
+            'job_manager' : job_manager,
+            'snapshot': snapshot}
 
     # StorageDevice providers
     provider = LMI_StorageExtent(**opts)
@@ -352,9 +446,44 @@ def get_providers(env):
     provider = LMI_ResidesOnExtent(**opts)
     providers['LMI_ResidesOnExtent'] = provider
 
+    # I/O statistics
+    global diskstats_sampler, io_history
+    diskstats_sampler = DiskStatsSampler(config.sampling_interval)
+    io_history = IOHistory(config.history_size)
+    io_history.start()
+    storage_util.get_timeline().configure(config.action_timeline_size,
+            config.action_timeline_log)
+    config.add_listener(change_statistics_config)
+    stats_provider = LMI_BlockStorageStatisticalData(
+            sampler=diskstats_sampler, history=io_history, **opts)
+    providers['LMI_BlockStorageStatisticalData'] = stats_provider
+    assoc_provider = LMI_StorageElementStatisticalData(
+            stats_provider=stats_provider, **opts)
+    providers['LMI_StorageElementStatisticalData'] = assoc_provider
+
     job_providers = job_manager.get_providers()
     providers.update(job_providers)
 
+    for (classname, provider) in providers.iteritems():
+        manager.add_instance_provider(classname, provider)
+
+    # storage change indications
+    storage_indications = StorageIndications(indication_manager,
+            config.namespace)
+    for classname in ('LMI_StorageExtent', 'LMI_MDRAIDStorageExtent',
+            'LMI_DiskPartition', 'LMI_GenericDiskPartition',
+            'LMI_LVStorageExtent'):
+        storage_indications.add_provider('extent', classname,
+                providers[classname])
+    storage_indications.add_provider('pool', 'LMI_VGStoragePool',
+            providers['LMI_VGStoragePool'])
+    storage_indications.add_provider('fs', 'LMI_LocalFileSystem',
+            providers['LMI_LocalFileSystem'])
+    storage_util.add_pre_reset_listener(storage_indications.storage_changing)
+    storage_util.add_reset_listener(storage_indications.storage_changed)
+
+    start_anaconda(storage, snapshot)
+
     print "providers:", providers
     return providers
 
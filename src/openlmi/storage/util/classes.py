@@ -0,0 +1,62 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Cache of CIM class hierarchy.
+
+    Each is_subclass() call of CIMOM handle is a round trip to the CIMOM
+    class repository. The class hierarchy does not change while the
+    providers are loaded, so the answers are cached.
+"""
+
+import threading
+import openlmi.common.cmpi_logging as cmpi_logging
+
+# Hash (namespace, subclass, superclass) -> bool, all names in lowercase.
+_subclass_cache = {}
+_lock = threading.Lock()
+
+def is_subclass(env, namespace, sub, super):
+    """
+        Return True, if class 'sub' is the same as or subclass of class
+        'super' in given namespace. CIMOM is asked only when the answer is
+        not cached.
+
+        :param env: Provider Environment (pycimmb.ProviderEnvironment).
+        :param namespace: (``string``) CIM namespace.
+        :param sub: (``string``) Name of the class to check.
+        :param super: (``string``) Name of the superclass.
+    """
+    # 'super' is the name used by CIMOM handle, pylint: disable-msg=W0622
+    key = (namespace.lower(), sub.lower(), super.lower())
+    if key[1] == key[2]:
+        return True
+    with _lock:
+        result = _subclass_cache.get(key)
+    if result is None:
+        cimom = env.get_cimom_handle()
+        result = bool(cimom.is_subclass(namespace, sub=sub, super=super))
+        with _lock:
+            _subclass_cache[key] = result
+    return result
+
+@cmpi_logging.trace_function
+def clear_cache():
+    """
+        Forget all cached answers, e.g. when the providers are reloaded.
+    """
+    with _lock:
+        _subclass_cache.clear()
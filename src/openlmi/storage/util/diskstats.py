@@ -0,0 +1,156 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    I/O statistics of block devices, read from /proc/diskstats.
+
+    All devices are read at once and the sample is shared by all requests
+    within one sampling interval, so enumeration of statistics of all
+    extents costs only one read of /proc/diskstats.
+"""
+
+import threading
+import time
+import openlmi.common.cmpi_logging as cmpi_logging
+
+DISKSTATS = '/proc/diskstats'
+PROC_STAT = '/proc/stat'
+
+# Size of sectors in /proc/diskstats, regardless of real sector size.
+DISKSTATS_SECTOR_SIZE = 512
+
+class DiskStats(object):
+    """
+        I/O counters of one block device, i.e. one line of /proc/diskstats.
+        The counters are cumulative since boot, times are in milliseconds.
+    """
+    __slots__ = ('name', 'read_ios', 'read_merges', 'read_sectors',
+            'read_ticks', 'write_ios', 'write_merges', 'write_sectors',
+            'write_ticks', 'in_flight', 'io_ticks', 'time_in_queue')
+
+    def __init__(self, name, counters):
+        self.name = name
+        (self.read_ios, self.read_merges, self.read_sectors,
+                self.read_ticks, self.write_ios, self.write_merges,
+                self.write_sectors, self.write_ticks, self.in_flight,
+                self.io_ticks, self.time_in_queue) = counters
+
+    @property
+    def total_ios(self):
+        """ Nr. of completed reads and writes."""
+        return self.read_ios + self.write_ios
+
+    @property
+    def kbytes_read(self):
+        """ Nr. of KiB read."""
+        return self.read_sectors * DISKSTATS_SECTOR_SIZE / 1024
+
+    @property
+    def kbytes_written(self):
+        """ Nr. of KiB written."""
+        return self.write_sectors * DISKSTATS_SECTOR_SIZE / 1024
+
+def parse_diskstats(lines):
+    """
+        Return dictionary kernel name -> DiskStats of all devices in given
+        lines of /proc/diskstats. Lines of old kernels, which report only
+        four counters for partitions, are skipped.
+    """
+    stats = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 14:
+            continue
+        try:
+            counters = [int(field) for field in fields[3:14]]
+        except ValueError:
+            continue
+        stats[fields[2]] = DiskStats(fields[2], counters)
+    return stats
+
+@cmpi_logging.trace_function
+def read_diskstats(path=DISKSTATS):
+    """
+        Return dictionary kernel name -> DiskStats of all block devices.
+        Return empty dictionary, if the statistics cannot be read.
+    """
+    try:
+        with open(path) as statfile:
+            return parse_diskstats(statfile.readlines())
+    except EnvironmentError, err:
+        cmpi_logging.logger.error("Cannot read %s: %s" % (path, err))
+        return {}
+
+@cmpi_logging.trace_function
+def get_boot_time(path=PROC_STAT):
+    """
+        Return time of system boot in seconds since the epoch, i.e. time
+        when the counters in /proc/diskstats started, or None, if it cannot
+        be read.
+    """
+    try:
+        with open(path) as statfile:
+            for line in statfile:
+                if line.startswith('btime '):
+                    return int(line.split()[1])
+    except (EnvironmentError, ValueError, IndexError), err:
+        cmpi_logging.logger.error("Cannot read boot time from %s: %s"
+                % (path, err))
+    return None
+
+class DiskStatsSampler(object):
+    """
+        Sample /proc/diskstats at most once per sampling interval.
+        All callers within one interval get the same sample.
+    """
+    @cmpi_logging.trace_method
+    def __init__(self, interval, path=DISKSTATS):
+        """
+            :param interval: (``int``) Sampling interval in seconds.
+            :param path: (``string``) Path to diskstats file.
+        """
+        self.interval = interval
+        self.path = path
+        # Time when the counters started, see get_boot_time().
+        self.boot_time = get_boot_time()
+        # Time of the last sample or None.
+        self.timestamp = None
+        # Dictionary kernel name -> DiskStats of the last sample.
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    @cmpi_logging.trace_method
+    def set_interval(self, interval):
+        """ Change the sampling interval."""
+        with self._lock:
+            self.interval = interval
+
+    @cmpi_logging.trace_method
+    def get_sample(self):
+        """
+            Return tuple (timestamp, dictionary kernel name -> DiskStats).
+            /proc/diskstats is read again only if the last sample is older
+            than the sampling interval. The returned dictionary must not be
+            modified.
+        """
+        with self._lock:
+            now = time.time()
+            if (self.timestamp is None
+                    or now - self.timestamp >= self.interval
+                    or now < self.timestamp):
+                self.stats = read_diskstats(self.path)
+                self.timestamp = now
+            return (self.timestamp, self.stats)
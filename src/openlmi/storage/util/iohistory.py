@@ -0,0 +1,252 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    In-memory history of I/O metrics of block devices.
+
+    /proc/diskstats is sampled periodically and throughput, IOPS and
+    latency of each device are stored in ring buffers of several
+    resolutions. Each coarser resolution is computed from counter
+    differences over its own step, i.e. it is an exact average of the
+    finer samples, not a sample of them.
+
+    The values are stored in typed arrays (module array), one float per
+    metric and sample, so the memory consumption is
+    4 * len(METRICS) * size bytes per device and resolution.
+"""
+
+import array
+import threading
+import time
+import openlmi.common.cmpi_logging as cmpi_logging
+from openlmi.storage.util import diskstats
+
+# Steps of supported resolutions, in seconds. The first one is also the
+# sampling period.
+RESOLUTIONS = (10, 60, 900)
+
+# Default number of samples kept in each resolution.
+DEFAULT_SIZE = 360
+
+# Names of stored metrics, in order of values in the ring buffers.
+METRICS = ('read_iops', 'write_iops', 'read_kbps', 'write_kbps',
+        'latency', 'utilization')
+
+# Value of unknown metric, e.g. before the device appeared.
+UNKNOWN = float('nan')
+
+def compute_metrics(old, new, elapsed):
+    """
+        Return list of METRICS of one device, computed from two DiskStats
+        taken given nr. of seconds apart. Return None, if the counters
+        went backwards, e.g. the device was recreated with the same name.
+
+        Latency is average time of completed requests in milliseconds,
+        utilization is percentage of time the device was busy.
+    """
+    read_ios = new.read_ios - old.read_ios
+    write_ios = new.write_ios - old.write_ios
+    read_sectors = new.read_sectors - old.read_sectors
+    write_sectors = new.write_sectors - old.write_sectors
+    ticks = (new.read_ticks - old.read_ticks) \
+            + (new.write_ticks - old.write_ticks)
+    io_ticks = new.io_ticks - old.io_ticks
+    if min(read_ios, write_ios, read_sectors, write_sectors, ticks,
+            io_ticks) < 0:
+        return None
+
+    kbytes = diskstats.DISKSTATS_SECTOR_SIZE / 1024.0
+    if read_ios + write_ios:
+        latency = float(ticks) / (read_ios + write_ios)
+    else:
+        latency = 0.0
+    return [read_ios / elapsed,
+            write_ios / elapsed,
+            read_sectors * kbytes / elapsed,
+            write_sectors * kbytes / elapsed,
+            latency,
+            min(100.0, io_ticks / (elapsed * 10.0))]
+
+class HistoryRing(object):
+    """
+        Ring buffers of all devices in one resolution. Timestamps are
+        shared by all devices.
+    """
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        # Timestamps of the samples, end of each step.
+        self.timestamps = array.array('d', [0.0] * size)
+        # Hash kernel name -> array of len(METRICS) * size values.
+        self.values = {}
+        # Index of the next sample to write.
+        self.position = 0
+        # Nr. of valid samples.
+        self.count = 0
+        # Time and DiskStats of the beginning of current step.
+        self.last_time = None
+        self.last_stats = None
+
+    def update(self, timestamp, stats):
+        """
+            Add new sample of all devices, if the step has elapsed since
+            the last one.
+        """
+        if self.last_time is not None:
+            elapsed = timestamp - self.last_time
+            if 0 <= elapsed < self.step:
+                return
+            if elapsed > 0:
+                self._append(timestamp, elapsed, stats)
+        self.last_time = timestamp
+        self.last_stats = stats
+
+    def _append(self, timestamp, elapsed, stats):
+        """ Store metrics of all devices computed since last_time."""
+        nmetrics = len(METRICS)
+        offset = self.position * nmetrics
+        for name in self.values.keys():
+            if name not in stats:
+                # the device has disappeared
+                del self.values[name]
+
+        for (name, new) in stats.iteritems():
+            old = self.last_stats.get(name)
+            metrics = None
+            if old is not None:
+                metrics = compute_metrics(old, new, elapsed)
+            if metrics is None:
+                metrics = [UNKNOWN] * nmetrics
+            values = self.values.get(name)
+            if values is None:
+                values = array.array('f', [UNKNOWN]) * (nmetrics * self.size)
+                self.values[name] = values
+            values[offset:offset + nmetrics] = array.array('f', metrics)
+
+        self.timestamps[self.position] = timestamp
+        self.position = (self.position + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def get(self, name, since=None):
+        """
+            Return list of (timestamp, list of METRICS) of given device,
+            from the oldest to the newest. Only samples newer than given
+            'since' timestamp are returned.
+        """
+        values = self.values.get(name)
+        if values is None:
+            return []
+        nmetrics = len(METRICS)
+        samples = []
+        start = (self.position - self.count) % self.size
+        for i in xrange(self.count):
+            index = (start + i) % self.size
+            timestamp = self.timestamps[index]
+            if since is not None and timestamp <= since:
+                continue
+            offset = index * nmetrics
+            samples.append((timestamp, values[offset:offset + nmetrics]
+                    .tolist()))
+        return samples
+
+class IOHistory(object):
+    """
+        History of I/O metrics of all block devices in all RESOLUTIONS.
+        The samples are taken by a background thread, see start().
+    """
+    @cmpi_logging.trace_method
+    def __init__(self, size=DEFAULT_SIZE, path=diskstats.DISKSTATS):
+        """
+            :param size: (``int``) Nr. of samples kept in each resolution.
+                Zero disables the history.
+            :param path: (``string``) Path to diskstats file.
+        """
+        self.path = path
+        self.rings = {}
+        self.size = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self.set_size(size)
+
+    @cmpi_logging.trace_method
+    def set_size(self, size):
+        """
+            Change nr. of samples kept in each resolution. All recorded
+            samples are dropped, if the size changes.
+        """
+        with self._lock:
+            if size == self.size:
+                return
+            self.size = size
+            self.rings = {}
+            if size > 0:
+                for step in RESOLUTIONS:
+                    self.rings[step] = HistoryRing(step, size)
+
+    def is_enabled(self):
+        """ Return True, if the history is recorded."""
+        return self.size > 0
+
+    @cmpi_logging.trace_method
+    def start(self):
+        """ Start sampling in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        """ Main loop of the sampling thread."""
+        while True:
+            if self.is_enabled():
+                try:
+                    self.sample()
+                except Exception, err:
+                    # keep sampling, the next read may succeed
+                    cmpi_logging.logger.error(
+                            "Cannot sample I/O statistics: " + str(err))
+            time.sleep(RESOLUTIONS[0])
+
+    def sample(self, timestamp=None, stats=None):
+        """
+            Read /proc/diskstats and add the sample to all resolutions.
+            The timestamp and DiskStats can be provided by caller.
+        """
+        if stats is None:
+            stats = diskstats.read_diskstats(self.path)
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            for ring in self.rings.itervalues():
+                ring.update(timestamp, stats)
+
+    @cmpi_logging.trace_method
+    def get_history(self, name, resolution, since=None):
+        """
+            Return list of (timestamp, list of METRICS) of given device in
+            given resolution, from the oldest to the newest.
+
+            :param name: (``string``) Kernel name of the device.
+            :param resolution: (``int``) One of RESOLUTIONS.
+            :param since: (``float``) Return only samples newer than this
+                timestamp.
+        """
+        with self._lock:
+            ring = self.rings.get(resolution)
+            if ring is None:
+                return []
+            return ring.get(name, since)
@@ -0,0 +1,451 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Logical volume layouts, which blivet cannot create, e.g. striped and
+    mirrored logical volumes, cached logical volumes or thin logical
+    volumes. They are created by lvm command directly.
+"""
+
+import os
+import subprocess
+import pywbem
+import openlmi.common.cmpi_logging as cmpi_logging
+
+KILOBYTE = 1024
+
+# Range of stripe sizes accepted by lvcreate, in bytes. Stripe size must
+# be also power of two and it must not be larger than extent size.
+STRIPE_SIZE_MIN = 4 * KILOBYTE
+STRIPE_SIZE_MAX = 512 * KILOBYTE
+STRIPE_SIZE_DEFAULT = 64 * KILOBYTE
+
+# Size of sectors in device-mapper status.
+DM_SECTOR_SIZE = 512
+
+# Cache modes of cached logical volumes.
+CACHE_MODE_WRITETHROUGH = 'writethrough'
+CACHE_MODE_WRITEBACK = 'writeback'
+CACHE_MODE_PASSTHROUGH = 'passthrough'
+CACHE_MODES = (CACHE_MODE_WRITETHROUGH, CACHE_MODE_WRITEBACK,
+        CACHE_MODE_PASSTHROUGH)
+
+# Size of thin pool metadata blocks, in bytes.
+THIN_METADATA_BLOCK_SIZE = 4 * KILOBYTE
+
+# Maximum virtual size of thin logical volume, in bytes. Virtual size is not
+# limited by free space in the volume group, only by the kernel.
+THIN_SIZE_MAX = 2 ** 63 - 1
+
+def get_max_stripe_size(extent_size):
+    """
+        Return the largest stripe size usable in volume group with given
+        extent size, both in bytes.
+    """
+    return min(STRIPE_SIZE_MAX, extent_size)
+
+def is_valid_stripe_size(stripe_size, extent_size):
+    """
+        Return True, if given stripe size can be used in volume group with
+        given extent size, both in bytes.
+    """
+    if stripe_size < STRIPE_SIZE_MIN:
+        return False
+    if stripe_size > get_max_stripe_size(extent_size):
+        return False
+    # power of two
+    return stripe_size & (stripe_size - 1) == 0
+
+def get_lv_layout(device):
+    """
+        Return (stripes, mirrors) of given LVMLogicalVolumeDevice, i.e. nr.
+        of physical volumes the data is striped across and nr. of additional
+        copies of the data. Linear layout is assumed if blivet does not
+        know the layout.
+    """
+    stripes = getattr(device, 'stripes', 1) or 1
+    copies = getattr(device, 'copies', 1) or 1
+    return (stripes, copies - 1)
+
+def get_lvcreate_args(vg_name, lv_name, size, stripes=1, stripe_size=None,
+        mirrors=0):
+    """
+        Return arguments of lvm command, which creates logical volume.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the new logical volume or None
+            to let lvm choose the name.
+        :param size: (``int``) Size of the logical volume in bytes.
+        :param stripes: (``int``) Nr. of physical volumes to stripe the data
+            across.
+        :param stripe_size: (``int``) Size of one stripe in bytes or None
+            for lvm default.
+        :param mirrors: (``int``) Nr. of additional copies of the data.
+    """
+    args = ['lvcreate']
+    if lv_name:
+        args += ['--name', lv_name]
+    args += ['--size', '%dk' % (size / KILOBYTE)]
+    if mirrors:
+        if stripes > 1:
+            args += ['--type', 'raid10']
+        else:
+            args += ['--type', 'raid1']
+        args += ['--mirrors', str(mirrors)]
+    if stripes > 1:
+        args += ['--stripes', str(stripes)]
+        if stripe_size:
+            args += ['--stripesize', '%dk' % (stripe_size / KILOBYTE)]
+    args.append(vg_name)
+    return args
+
+def get_lvextend_args(vg_name, lv_name, size):
+    """
+        Return arguments of lvm command, which extends logical volume.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the logical volume.
+        :param size: (``int``) New size of the logical volume in bytes.
+    """
+    return ['lvextend', '--size', '%dk' % (size / KILOBYTE),
+            '%s/%s' % (vg_name, lv_name)]
+
+def get_cache_pool_args(vg_name, lv_name, size, pv_paths=None):
+    """
+        Return arguments of lvm command, which creates cache pool.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the new cache pool or None to
+            let lvm choose the name.
+        :param size: (``int``) Size of the cache pool in bytes.
+        :param pv_paths: (``list of strings``) Paths to physical volumes,
+            where the cache pool is allocated. Any physical volume of the
+            volume group is used, if it is not provided.
+    """
+    args = ['lvcreate', '--type', 'cache-pool']
+    if lv_name:
+        args += ['--name', lv_name]
+    args += ['--size', '%dk' % (size / KILOBYTE), vg_name]
+    if pv_paths:
+        args += pv_paths
+    return args
+
+def get_attach_cache_args(vg_name, lv_name, pool_name, mode):
+    """
+        Return arguments of lvm command, which attaches cache pool to
+        logical volume.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the logical volume to cache.
+        :param pool_name: (``string``) Name of the cache pool.
+        :param mode: (``string``) Cache mode, one of CACHE_MODES.
+    """
+    return ['lvconvert', '--yes', '--type', 'cache',
+            '--cachepool', '%s/%s' % (vg_name, pool_name),
+            '--cachemode', mode,
+            '%s/%s' % (vg_name, lv_name)]
+
+def get_detach_cache_args(vg_name, lv_name, delete_pool=False):
+    """
+        Return arguments of lvm command, which detaches cache pool from
+        logical volume. Dirty blocks are written to the logical volume
+        first.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the cached logical volume.
+        :param delete_pool: (``bool``) Whether the cache pool should be
+            removed or kept for later use.
+    """
+    if delete_pool:
+        operation = '--uncache'
+    else:
+        operation = '--splitcache'
+    return ['lvconvert', '--yes', operation, '%s/%s' % (vg_name, lv_name)]
+
+def parse_cache_status(line):
+    """
+        Parse output of 'dmsetup status' of dm-cache device. Return
+        dictionary with cache statistics or None, if the line is not valid
+        status of dm-cache device. Sizes are in bytes.
+    """
+    # <start> <length> cache <metadata block size>
+    # <used metadata blocks>/<total metadata blocks> <cache block size>
+    # <used cache blocks>/<total cache blocks> <read hits> <read misses>
+    # <write hits> <write misses> <demotions> <promotions> <dirty>
+    # <nr. of features> <features>* ...
+    fields = line.split()
+    if len(fields) < 15 or fields[2] != 'cache':
+        return None
+    try:
+        (used_metadata, total_metadata) = fields[4].split('/')
+        (used, total) = fields[6].split('/')
+        features = fields[15:15 + int(fields[14])]
+        # dm-cache default is writeback
+        mode = CACHE_MODE_WRITEBACK
+        for cache_mode in CACHE_MODES:
+            if cache_mode in features:
+                mode = cache_mode
+        return {
+                'mode': mode,
+                'metadata_block_size': int(fields[3]) * DM_SECTOR_SIZE,
+                'metadata_used_blocks': int(used_metadata),
+                'metadata_total_blocks': int(total_metadata),
+                'block_size': int(fields[5]) * DM_SECTOR_SIZE,
+                'used_blocks': int(used),
+                'total_blocks': int(total),
+                'read_hits': int(fields[7]),
+                'read_misses': int(fields[8]),
+                'write_hits': int(fields[9]),
+                'write_misses': int(fields[10]),
+                'demotions': int(fields[11]),
+                'promotions': int(fields[12]),
+                'dirty_blocks': int(fields[13]),
+        }
+    except ValueError:
+        return None
+
+def get_map_name(vg_name, lv_name):
+    """
+        Return device-mapper name of logical volume with given name in
+        volume group with given name. '-' in the names is escaped as '--',
+        the same way as blivet builds LVMLogicalVolumeDevice.mapName.
+    """
+    return "%s-%s" % (vg_name.replace("-", "--"), lv_name.replace("-", "--"))
+
+def is_cached(map_name):
+    """
+        Return True, if device-mapper device with given name is cached
+        logical volume, i.e. its hidden origin exists.
+    """
+    return os.path.exists('/dev/mapper/' + map_name + '_corig')
+
+@cmpi_logging.trace_function
+def get_cache_status(map_name):
+    """
+        Return cache statistics of logical volume with given device-mapper
+        name, see parse_cache_status(). Return None, if the logical volume
+        is not cached.
+    """
+    if not is_cached(map_name):
+        return None
+    try:
+        process = subprocess.Popen(['dmsetup', 'status', map_name],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (out, _err) = process.communicate()
+    except EnvironmentError, err:
+        cmpi_logging.logger.error("Cannot run dmsetup: " + str(err))
+        return None
+    if process.returncode != 0:
+        return None
+    return parse_cache_status(out)
+
+def get_thin_pool_args(vg_name, lv_name, size):
+    """
+        Return arguments of lvm command, which creates thin pool.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the new thin pool or None to
+            let lvm choose the name.
+        :param size: (``int``) Size of data of the thin pool in bytes.
+    """
+    args = ['lvcreate', '--type', 'thin-pool']
+    if lv_name:
+        args += ['--name', lv_name]
+    args += ['--size', '%dk' % (size / KILOBYTE), vg_name]
+    return args
+
+def get_thin_lv_args(vg_name, lv_name, pool_name, virtual_size):
+    """
+        Return arguments of lvm command, which creates thin logical volume.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the new logical volume or None
+            to let lvm choose the name.
+        :param pool_name: (``string``) Name of the thin pool.
+        :param virtual_size: (``int``) Virtual size of the logical volume in
+            bytes. It may be larger than the thin pool.
+    """
+    args = ['lvcreate', '--type', 'thin']
+    if lv_name:
+        args += ['--name', lv_name]
+    args += ['--virtualsize', '%dk' % (virtual_size / KILOBYTE),
+            '--thinpool', '%s/%s' % (vg_name, pool_name)]
+    return args
+
+def get_thin_snapshot_args(vg_name, lv_name, origin_name):
+    """
+        Return arguments of lvm command, which creates snapshot of thin
+        logical volume. The snapshot is allocated in the same thin pool as
+        its origin and it is activated immediately.
+
+        :param vg_name: (``string``) Name of the volume group.
+        :param lv_name: (``string``) Name of the new snapshot or None to let
+            lvm choose the name.
+        :param origin_name: (``string``) Name of the thin logical volume to
+            snapshot.
+    """
+    args = ['lvcreate', '--snapshot', '--setactivationskip', 'n']
+    if lv_name:
+        args += ['--name', lv_name]
+    args.append('%s/%s' % (vg_name, origin_name))
+    return args
+
+def parse_thin_pool_status(line):
+    """
+        Parse output of 'dmsetup status' of dm-thin-pool device. Return
+        dictionary with thin pool usage or None, if the line is not valid
+        status of dm-thin-pool device. Sizes are in bytes.
+    """
+    # <start> <length> thin-pool <transaction id>
+    # <used metadata blocks>/<total metadata blocks>
+    # <used data blocks>/<total data blocks> <held metadata root> ...
+    fields = line.split()
+    if len(fields) < 6 or fields[2] != 'thin-pool':
+        return None
+    try:
+        (used_metadata, total_metadata) = fields[4].split('/')
+        (used, total) = fields[5].split('/')
+        data_size = int(fields[1]) * DM_SECTOR_SIZE
+        used = int(used)
+        total = int(total)
+        if total:
+            # the pool device spans all data blocks
+            block_size = data_size / total
+        else:
+            block_size = 0
+        return {
+                'data_size': data_size,
+                'data_used': used * block_size,
+                'metadata_size':
+                    int(total_metadata) * THIN_METADATA_BLOCK_SIZE,
+                'metadata_used':
+                    int(used_metadata) * THIN_METADATA_BLOCK_SIZE,
+        }
+    except ValueError:
+        return None
+
+def get_thin_pool_map(map_name):
+    """
+        Return device-mapper name of dm-thin-pool device of thin pool with
+        given device-mapper name. Return None, if the logical volume is not
+        active thin pool.
+    """
+    pool_map = map_name + '-tpool'
+    if os.path.exists('/dev/mapper/' + pool_map):
+        return pool_map
+    return None
+
+def get_thin_lv_pool_map(sys_path):
+    """
+        Return device-mapper name of dm-thin-pool device, which provisions
+        thin logical volume with given sysfs path. Return None, if the
+        logical volume is not thin.
+    """
+    if not sys_path:
+        return None
+    try:
+        slaves = os.listdir(os.path.join(sys_path, 'slaves'))
+    except OSError:
+        return None
+    for slave in slaves:
+        try:
+            with open(os.path.join('/sys/block', slave, 'dm', 'name')) \
+                    as namefile:
+                name = namefile.read().strip()
+        except EnvironmentError:
+            continue
+        if name.endswith('-tpool'):
+            return name
+    return None
+
+@cmpi_logging.trace_function
+def get_thin_pool_status(map_name):
+    """
+        Return usage of thin pool with given device-mapper name, see
+        parse_thin_pool_status(). Return None, if the logical volume is not
+        thin pool.
+    """
+    pool_map = get_thin_pool_map(map_name)
+    if pool_map is None:
+        return None
+    try:
+        process = subprocess.Popen(['dmsetup', 'status', pool_map],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (out, _err) = process.communicate()
+    except EnvironmentError, err:
+        cmpi_logging.logger.error("Cannot run dmsetup: " + str(err))
+        return None
+    if process.returncode != 0:
+        return None
+    return parse_thin_pool_status(out)
+
+@cmpi_logging.trace_function
+def get_vg_free_extents(vg_name):
+    """
+        Return nr. of free extents in volume group with given name, as
+        reported by lvm, or None, if lvm fails.
+    """
+    try:
+        out = run_lvm(['vgs', '--noheadings', '--options', 'vg_free_count',
+                vg_name])
+        return int(out.strip())
+    except (pywbem.CIMError, ValueError), err:
+        cmpi_logging.logger.error("Cannot read free extents of %s: %s"
+                % (vg_name, err))
+        return None
+
+def has_thin_pool(vg):
+    """
+        Return True, if given LVMVolumeGroupDevice contains active thin
+        pool.
+    """
+    return any(get_thin_pool_map(lv.mapName) for lv in vg.lvs)
+
+@cmpi_logging.trace_function
+def get_free_extents(vg):
+    """
+        Return nr. of free extents in given LVMVolumeGroupDevice.
+
+        blivet counts virtual size of thin logical volumes as used space,
+        its free space is wrong or even negative when the thin pools are
+        overcommitted. lvm is asked instead, if the volume group has a thin
+        pool. Use this function instead of freeSpace or freeExtents of
+        the volume group.
+    """
+    if has_thin_pool(vg):
+        free_extents = get_vg_free_extents(vg.name)
+        if free_extents is not None:
+            return free_extents
+    return max(vg.freeExtents, 0)
+
+@cmpi_logging.trace_function
+def run_lvm(args):
+    """
+        Run lvm command with given arguments and return its standard output.
+        Raise CIMError with lvm error output, if the command fails.
+    """
+    cmpi_logging.logger.info("Running lvm " + " ".join(args))
+    try:
+        process = subprocess.Popen(['lvm'] + args,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (out, err) = process.communicate()
+    except EnvironmentError, err:
+        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                "Cannot run lvm: " + str(err))
+    if process.returncode != 0:
+        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                "lvm %s failed: %s" % (args[0], err.strip()))
+    return out
@@ -0,0 +1,485 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Partition layout of disks.
+
+    Walking the partition list of a disk in pyparted is expensive, every
+    step creates new wrappers of libparted structures. Therefore the list
+    is walked only once per disk and the result is remembered as
+    ``DiskLayout``. The layout is bound to ``partedDisk`` of the disk,
+    which is replaced when the device tree is reset, so the layout is built
+    again for each new device tree. Layouts of disks modified by blivet
+    actions are dropped explicitly, see ``invalidate_disk_layouts()``.
+
+    The layout contains also index of free space on the disk, see
+    ``FreeSpaceIndex``.
+"""
+
+import bisect
+import weakref
+from collections import OrderedDict
+import parted
+import pywbem
+import openlmi.common.cmpi_logging as cmpi_logging
+
+def _align_up(sector, alignment):
+    """ Return the first sector >= sector, which is aligned."""
+    return (sector + alignment - 1) / alignment * alignment
+
+def _align_end(sector, alignment):
+    """ Return the last sector <= sector, which ends an aligned block."""
+    return (sector + 1) / alignment * alignment - 1
+
+class PartitionInfo(object):
+    """
+        Position, type and flags of one partition on a disk.
+    """
+    def __init__(self, path, number, part_type, start, end,
+            metadata_start=None, flags=None):
+        """
+        :param path: (``string``) Device path of the partition.
+        :param number: (``int``) Number of the partition.
+        :param part_type: (``int``) parted.PARTITION_* type of the partition.
+        :param start: (``int``) First sector of the partition.
+        :param end: (``int``) Last sector of the partition.
+        :param metadata_start: (``int``) Start of the metadata of a logical
+            partition.
+        :param flags: (``list of int``) parted.PARTITION_* flags, which are
+            set.
+        """
+        self.path = path
+        self.number = number
+        self.type = part_type
+        self.start = start
+        self.end = end
+        self.length = end - start + 1
+        # Starting sector of logical partition metadata, None for primary
+        # and extended partitions.
+        self.metadata_start = metadata_start
+        # List of parted.PARTITION_* flags, which are set.
+        if flags is None:
+            flags = []
+        self.flags = flags
+
+    @property
+    def is_logical(self):
+        """ True, if the partition is logical one."""
+        return bool(self.type & parted.PARTITION_LOGICAL)
+
+    @property
+    def is_extended(self):
+        """ True, if the partition is extended one."""
+        return bool(self.type & parted.PARTITION_EXTENDED)
+
+def _get_partition_info(part, metadata_start=None):
+    """
+    Return PartitionInfo of given parted partition.
+
+    :param part: (``parted.Partition``) The partition.
+    :param metadata_start: (``int``) Start of the metadata of a logical
+        partition.
+    :rtype: ``PartitionInfo``
+    """
+    flags = [flag for flag in parted.partitionFlag.iterkeys()
+            if part.isFlagAvailable(flag) and part.getFlag(flag)]
+    return PartitionInfo(part.path, part.number, part.type,
+            part.geometry.start, part.geometry.end, metadata_start, flags)
+
+class FreeSpaceIndex(object):
+    """
+        Index of free regions of one kind (primary or logical) on a disk.
+        The regions are kept sorted and merged, so they can be updated
+        incrementally when a partition is created or deleted.
+
+        Aligned parts of the regions are kept also sorted by their length,
+        so queries for a region of given size are answered by bisection.
+
+        Queries return aligned regions as tuple (start, end) of sectors,
+        both inclusive. Regions, which are too small to hold an aligned
+        partition, are not returned.
+    """
+    def __init__(self, alignment, reserved=0):
+        """
+        :param alignment: (``int``) Alignment of partitions, in sectors.
+        :param reserved: (``int``) Nr. of sectors needed before each
+            partition, e.g. for metadata of logical partitions.
+        """
+        self.alignment = max(1, alignment)
+        self.reserved = reserved
+        # Sorted list of non-overlapping, non-adjacent (start, end) tuples.
+        self.regions = []
+        # Sorted list of (length, start, end) of aligned parts of regions.
+        self.lengths = []
+
+    def _aligned(self, region):
+        """
+        Return aligned part of given region or None, if there is none.
+        """
+        start = _align_up(region[0] + self.reserved, self.alignment)
+        end = _align_end(region[1], self.alignment)
+        if end < start:
+            return None
+        return (start, end)
+
+    def _insert(self, index, region):
+        """ Insert region at given index of self.regions."""
+        self.regions.insert(index, region)
+        aligned = self._aligned(region)
+        if aligned:
+            bisect.insort(self.lengths,
+                    (aligned[1] - aligned[0] + 1,) + aligned)
+
+    def _pop(self, index):
+        """ Remove region at given index of self.regions and return it."""
+        region = self.regions.pop(index)
+        aligned = self._aligned(region)
+        if aligned:
+            key = (aligned[1] - aligned[0] + 1,) + aligned
+            del self.lengths[bisect.bisect_left(self.lengths, key)]
+        return region
+
+    def clear(self):
+        """ Mark all sectors as used."""
+        self.regions = []
+        self.lengths = []
+
+    def add(self, start, end):
+        """
+        Mark sectors from start to end (inclusive) as free.
+        """
+        index = bisect.bisect_left(self.regions, (start, end))
+        # merge with the previous region
+        if index > 0 and self.regions[index - 1][1] >= start - 1:
+            index -= 1
+            (start, prev_end) = self._pop(index)
+            end = max(end, prev_end)
+        # merge with following regions
+        while (index < len(self.regions)
+                and self.regions[index][0] <= end + 1):
+            end = max(end, self._pop(index)[1])
+        self._insert(index, (start, end))
+
+    def remove(self, start, end):
+        """
+        Mark sectors from start to end (inclusive) as used.
+        """
+        index = bisect.bisect_left(self.regions, (start, start))
+        if index > 0 and self.regions[index - 1][1] >= start:
+            index -= 1
+        while index < len(self.regions) and self.regions[index][0] <= end:
+            (region_start, region_end) = self._pop(index)
+            if region_start < start:
+                self._insert(index, (region_start, start - 1))
+                index += 1
+            if region_end > end:
+                self._insert(index, (end + 1, region_end))
+                index += 1
+
+    def largest(self):
+        """
+        Return the largest aligned free region or None, if there is none.
+        The first one on the disk is returned, if there are more of them.
+        """
+        if not self.lengths:
+            return None
+        index = bisect.bisect_left(self.lengths, (self.lengths[-1][0],))
+        return self.lengths[index][1:]
+
+    def first_fit(self, length):
+        """
+        Return the first aligned free region with at least ``length``
+        sectors or None, if there is none.
+        """
+        index = bisect.bisect_left(self.lengths, (length,))
+        if index == len(self.lengths):
+            return None
+        return min(item[1:] for item in self.lengths[index:])
+
+    def best_fit(self, length):
+        """
+        Return the smallest aligned free region with at least ``length``
+        sectors or None, if there is none. The first one on the disk is
+        returned, if there are more of them.
+        """
+        index = bisect.bisect_left(self.lengths, (length,))
+        if index == len(self.lengths):
+            return None
+        return self.lengths[index][1:]
+
+class DiskLayout(object):
+    """
+        Map of all partitions on one disk.
+    """
+    def __init__(self, parted_disk):
+        """
+        Walk all partitions of given disk.
+
+        :param parted_disk: (``parted.Disk``) The disk to walk.
+        """
+        # Dictionary path -> PartitionInfo, ordered as on the disk.
+        self.partitions = OrderedDict()
+        # PartitionInfo of extended partition or None.
+        self.extended = None
+        # Number of primary and extended partitions.
+        self.primary_count = 0
+        self.max_primary_count = parted_disk.maxPrimaryPartitionCount
+
+        alignment = parted_disk.device.optimumAlignment.grainSize
+        # Free space for primary partitions.
+        self.free_primary = FreeSpaceIndex(alignment)
+        # Free space for logical partitions, each needs one sector for
+        # its metadata.
+        self.free_logical = FreeSpaceIndex(alignment, reserved=1)
+
+        metadata_start = None
+        part = parted_disk.getFirstPartition()
+        while part is not None:
+            ptype = part.type
+            if ptype & parted.PARTITION_METADATA:
+                if ptype & parted.PARTITION_LOGICAL:
+                    metadata_start = part.geometry.start
+            elif ptype & parted.PARTITION_FREESPACE:
+                self.get_free_space(ptype).add(
+                        part.geometry.start, part.geometry.end)
+            elif not ptype & parted.PARTITION_PROTECTED:
+                if ptype & parted.PARTITION_LOGICAL:
+                    info = _get_partition_info(part, metadata_start)
+                else:
+                    info = _get_partition_info(part)
+                self._add_info(info)
+            part = part.nextPartition()
+
+    def _add_info(self, info):
+        """ Add PartitionInfo to the list of partitions."""
+        if not info.is_logical:
+            self.primary_count += 1
+        if info.is_extended:
+            self.extended = info
+        self.partitions[info.path] = info
+
+    def get_free_space(self, part_type):
+        """
+        Return index of free space for partitions of given type.
+
+        :param part_type: (``int``) parted.PARTITION_* type of the partition.
+        :rtype: ``FreeSpaceIndex``
+        """
+        if part_type & parted.PARTITION_LOGICAL:
+            return self.free_logical
+        return self.free_primary
+
+    def add_partition(self, info):
+        """
+        Update the layout after a partition was created.
+
+        :param info: (``PartitionInfo``) The new partition.
+        """
+        start = info.start
+        if info.metadata_start is not None:
+            start = info.metadata_start
+        self.get_free_space(info.type).remove(start, info.end)
+        if info.is_extended:
+            self.free_logical.add(info.start, info.end)
+        self._add_info(info)
+
+    def remove_partition(self, path):
+        """
+        Update the layout after a partition was deleted.
+
+        :param path: (``string``) Device path of the deleted partition.
+        """
+        info = self.get_partition(path)
+        del self.partitions[path]
+        if not info.is_logical:
+            self.primary_count -= 1
+        if info.is_extended:
+            self.extended = None
+            self.free_logical.clear()
+        start = info.start
+        if info.metadata_start is not None:
+            start = info.metadata_start
+        self.get_free_space(info.type).add(start, info.end)
+
+    def get_partition(self, path):
+        """
+        Return PartitionInfo of partition with given path.
+
+        :param path: (``string``) Device path of the partition.
+        :rtype: ``PartitionInfo``
+        """
+        info = self.partitions.get(path, None)
+        if not info:
+            raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                    'Cannot find the partition on the disk.')
+        return info
+
+    def has_free_primary_slot(self):
+        """
+        Return True, if another primary partition can be created.
+
+        :rtype: bool
+        """
+        return self.primary_count < self.max_primary_count
+
+# Dictionary parted.Disk -> DiskLayout. It does not keep old parted.Disks
+# alive when the device tree is reset.
+_layouts = weakref.WeakKeyDictionary()
+
+@cmpi_logging.trace_function
+def get_disk_layout(disk):
+    """
+        Return DiskLayout of given disk. The layout is computed only once
+        for each device tree.
+
+        :param disk: (``StorageDevice``) Disk with a partition table.
+        :rtype: ``DiskLayout``
+    """
+    parted_disk = disk.format.partedDisk
+    layout = _layouts.get(parted_disk, None)
+    if layout is None:
+        layout = DiskLayout(parted_disk)
+        _layouts[parted_disk] = layout
+    return layout
+
+@cmpi_logging.trace_function
+def invalidate_disk_layouts(disks=None):
+    """
+        Forget cached DiskLayout of given disks, e.g. when blivet modified
+        their partition tables. The layouts are built again when needed.
+
+        :param disks: (list of ``StorageDevice``) Disks with modified
+            partition table. All layouts are forgotten, if it is None.
+    """
+    if disks is None:
+        _layouts.clear()
+        return
+    paths = set(disk.path for disk in disks)
+    for parted_disk in _layouts.keys():
+        if parted_disk.device.path in paths:
+            _layouts.pop(parted_disk, None)
+
+@cmpi_logging.trace_function
+def get_logical_partition_start(partition):
+    """
+        Return starting sector of logical partition metadata, relative to
+        disk start.
+    """
+    layout = get_disk_layout(partition.disk)
+    if not layout.extended:
+        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                'Cannot find extended partition.')
+
+    info = layout.get_partition(partition.path)
+    if info.metadata_start is None:
+        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
+                'Cannot find metadata for the partition.')
+    return info.metadata_start
+
+@cmpi_logging.trace_function
+def find_partition_region(disk, part_type, length=None):
+    """
+        Find place for a new partition on given disk, which can be allocated
+        by ``allocate_partition()``.
+
+        :param disk: (``StorageDevice``) Disk with a partition table.
+        :param part_type: (``int``) parted.PARTITION_* type of the new
+            partition or None, if primary or logical partition should be
+            chosen automatically.
+        :param length: (``int``) Requested size of the partition in sectors.
+            None means the largest possible partition.
+        :rtype: tuple (part_type, (start, end)) or (None, None), if the
+            partition cannot be placed directly, e.g. when new extended
+            partition must be created for it or there is not enough space.
+    """
+    layout = get_disk_layout(disk)
+    if part_type is None:
+        primary_left = layout.max_primary_count - layout.primary_count
+        if layout.extended is not None:
+            part_type = parted.PARTITION_LOGICAL
+        elif ((disk.format.labelType != 'msdos' and primary_left > 0)
+                or primary_left > 1):
+            # keep the last MBR slot for extended partition
+            part_type = parted.PARTITION_NORMAL
+        else:
+            return (None, None)
+
+    if part_type & parted.PARTITION_LOGICAL:
+        if layout.extended is None:
+            return (None, None)
+    elif not layout.has_free_primary_slot():
+        return (None, None)
+
+    free_space = layout.get_free_space(part_type)
+    if length is None:
+        region = free_space.largest()
+    else:
+        region = free_space.best_fit(length)
+        if region:
+            region = (region[0], region[0] + length - 1)
+    if region is None:
+        return (None, None)
+    return (part_type, region)
+
+@cmpi_logging.trace_function
+def allocate_partition(partition, disk, part_type, start, end):
+    """
+        Place new PartitionDevice at exact position on given disk, so
+        ``blivet.partitioning.doPartitioning()`` does not need to be called
+        to find a place for it. The disk layout is updated.
+
+        :param partition: (``PartitionDevice``) The new partition.
+        :param disk: (``StorageDevice``) Disk with a partition table.
+        :param part_type: (``int``) parted.PARTITION_* type of the partition.
+        :param start: (``int``) First sector of the partition.
+        :param end: (``int``) Last sector of the partition.
+    """
+    disklabel = disk.format
+    geometry = parted.Geometry(device=disklabel.partedDevice,
+            start=start, end=end)
+    new_partition = parted.Partition(disk=disklabel.partedDisk,
+            type=part_type, geometry=geometry)
+    constraint = parted.Constraint(exactGeom=geometry)
+    disklabel.partedDisk.addPartition(partition=new_partition,
+            constraint=constraint)
+    # libparted may modify the partition when adding it to the disk,
+    # use the current one.
+    partition.partedPartition = disklabel.partedDisk.getPartitionByPath(
+            new_partition.path)
+    partition.disk = disk
+
+    metadata_start = None
+    if part_type & parted.PARTITION_LOGICAL:
+        metadata_start = start - 1
+    get_disk_layout(disk).add_partition(PartitionInfo(
+            partition.partedPartition.path,
+            partition.partedPartition.number, part_type, start, end,
+            metadata_start))
+
+@cmpi_logging.trace_function
+def release_partition(partition, disk):
+    """
+        Remove PartitionDevice placed by ``allocate_partition()`` from given
+        disk, when it is not going to be created after all. The disk layout
+        is updated.
+
+        :param partition: (``PartitionDevice``) The new partition.
+        :param disk: (``StorageDevice``) Disk with a partition table.
+    """
+    path = partition.partedPartition.path
+    disk.format.partedDisk.removePartition(partition.partedPartition)
+    partition.partedPartition = None
+    get_disk_layout(disk).remove_partition(path)
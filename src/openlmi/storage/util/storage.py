@@ -18,16 +18,148 @@
     Support functions for Blivet.
 """
 
-import subprocess
-import os
-import parted
-import pywbem
+import threading
 import blivet
 import openlmi.common.cmpi_logging as cmpi_logging
+import openlmi.storage.util.lvm as lvm
+import openlmi.storage.util.partitioning as partitioning
+import openlmi.storage.util.sysfs as sysfs
+import openlmi.storage.util.timeline as timeline
+import openlmi.storage.util.udev as udev
+import openlmi.storage.util.wipe as wipe
 
 GPT_TABLE_SIZE = 34 * 2  # there are two copies
 MBR_TABLE_SIZE = 1
 
+# Functions called with blivet.Blivet instance after it was reset because
+# of a storage modification.
+_reset_listeners = []
+# Functions called with blivet.Blivet instance before the storage is
+# modified or reset because of an external modification.
+_pre_reset_listeners = []
+
+# Serializes modifications of the storage and resets caused by external
+# modifications.
+_storage_lock = threading.RLock()
+# Fingerprint of block devices at the time of last reset, see
+# sysfs.get_fingerprint(). None, if external changes are not watched.
+_fingerprint = None
+# BlockDeviceMonitor, which watches external changes.
+_monitor = None
+# Timings of recent storage actions.
+_timeline = timeline.ActionTimeline()
+
+def add_reset_listener(callback):
+    """
+        Add a callback, which will be called when the storage is modified.
+        The callback will be called with blivet.Blivet as parameter:
+          callback(storage)
+    """
+    _reset_listeners.append(callback)
+
+def add_pre_reset_listener(callback):
+    """
+        Add a callback, which will be called before the storage is modified
+        or reset, i.e. while blivet.Blivet still has the old device tree.
+        The callback will be called with blivet.Blivet as parameter:
+          callback(storage)
+    """
+    _pre_reset_listeners.append(callback)
+
+def lock_storage():
+    """
+        Return lock, which prevents any modification or reset of the
+        storage while it is held. Use it to read several instances from
+        the same device tree:
+          with lock_storage():
+              ...
+    """
+    return _storage_lock
+
+def get_timeline():
+    """
+        Return ActionTimeline with timings of recent storage actions.
+    """
+    return _timeline
+
+def _call_listeners(listeners, storage):
+    """
+        Call all given listeners with the storage as parameter. A failing
+        listener is logged and the remaining ones are called anyway.
+    """
+    for callback in listeners:
+        try:
+            callback(storage)
+        except Exception, err:
+            cmpi_logging.logger.error(
+                    "Storage listener %r failed: %s" % (callback, str(err)))
+
+def _reset(storage, timer):
+    """
+        Reset the storage and call all reset listeners. Measure both with
+        given ActionTimer.
+    """
+    global _fingerprint
+    with timer.phase('reset'):
+        storage.reset()
+        if _fingerprint is not None:
+            _fingerprint = sysfs.get_fingerprint()
+    with timer.phase('reset_listeners'):
+        _call_listeners(_reset_listeners, storage)
+
+@cmpi_logging.trace_function
+def watch_external_changes(storage):
+    """
+        Start watching udev events and reset the storage, when block devices
+        are modified outside of do_storage_action(), e.g. by command line
+        tools or by hotplug. Return False, if the changes cannot be watched.
+    """
+    global _fingerprint, _monitor
+    if _monitor is not None:
+        return True
+    with _storage_lock:
+        _fingerprint = sysfs.get_fingerprint()
+    monitor = udev.BlockDeviceMonitor(
+            lambda: check_external_changes(storage))
+    if not monitor.start():
+        _fingerprint = None
+        return False
+    _monitor = monitor
+    return True
+
+@cmpi_logging.trace_function
+def reset_storage(storage, reason):
+    """
+        Reset the storage outside of do_storage_action(), e.g. when it was
+        modified externally. All pre-reset and reset listeners are called
+        and the reset is recorded in the timeline as action with given
+        description.
+    """
+    timer = timeline.ActionTimer(reason, None)
+    with _storage_lock:
+        with timer.phase('pre_reset_listeners'):
+            _call_listeners(_pre_reset_listeners, storage)
+        _reset(storage, timer)
+        timer.finish()
+    _timeline.add(timer)
+
+@cmpi_logging.trace_function
+def check_external_changes(storage):
+    """
+        Reset the storage, if block devices have changed since last reset.
+        udev events caused by do_storage_action() or by probing of the
+        devices do not change the fingerprint of the devices and are
+        ignored.
+        Return True, if the storage was reset.
+    """
+    with _storage_lock:
+        if sysfs.get_fingerprint() == _fingerprint:
+            return False
+        cmpi_logging.logger.info(
+                "Block devices were modified externally, resetting storage.")
+        reset_storage(storage, 'External modification')
+    return True
+
 def _align_up(address, alignment):
     """ Align address to nearest higher address divisible by alignment."""
     return (address / alignment + 1) * alignment
@@ -36,38 +168,6 @@ def _align_down(address, alignment):
     """ Align address to nearest lower address divisible by alignment."""
     return (address / alignment) * alignment
 
-@cmpi_logging.trace_function
-def get_logical_partition_start(partition):
-    """
-        Return starting sector of logical partition metadata, relative to
-        extended partition start.
-    """
-    disk = partition.disk
-    ext = disk.format.partedDisk.getExtendedPartition()
-    if not ext:
-        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
-                'Cannot find extended partition.')
-
-    metadata = None
-    part = ext.nextPartition()
-    while part is not None:
-        if (part.type & parted.PARTITION_LOGICAL
-                and part.type & parted.PARTITION_METADATA):
-            metadata = part
-        if part.path == partition.path:
-            break
-        part = part.nextPartition()
-
-    print 'partition', part, 'metadata', metadata
-    if not part:
-        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
-                'Cannot find the partition on the disk.')
-    if not metadata:
-        raise pywbem.CIMError(pywbem.CIM_ERR_FAILED,
-                'Cannot find metadata for the partition.')
-
-    return metadata.geometry.start
-
 @cmpi_logging.trace_function
 def get_partition_table_size(device):
     """
@@ -127,23 +227,73 @@ def do_storage_action(storage, action):
     cmpi_logging.logger.trace_info("Running action " + str(action))
     cmpi_logging.logger.trace_info("    on device " + repr(action.device))
 
+    timer = timeline.ActionTimer(str(action), action.device.path)
+    _run_timed(timer, _do_storage_action, storage, action)
+
+def _run_timed(timer, function, *args):
+    """
+        Call function(*args, timer) with _storage_lock held and add the
+        finished ActionTimer to the timeline.
+    """
+    try:
+        with timer.phase('lock_wait'):
+            _storage_lock.acquire()
+        try:
+            function(*(args + (timer,)))
+        finally:
+            _storage_lock.release()
+    except Exception, err:
+        timer.finish(str(err))
+        raise
+    else:
+        timer.finish()
+    finally:
+        _timeline.add(timer)
+
+def _get_node_paths(devices):
+    """
+        Return paths of given StorageDevices, which are block devices.
+        Volume groups have no device node, their path /dev/<vg> is only
+        a directory with links to logical volumes.
+    """
+    return [device.path for device in devices
+            if not isinstance(device, blivet.devices.LVMVolumeGroupDevice)]
+
+def _do_storage_action(storage, action, timer):
+    """
+        Perform Anaconda DeviceAction on given Storage instance and measure
+        its phases with given ActionTimer. The caller must hold
+        _storage_lock.
+    """
+    with timer.phase('pre_reset_listeners'):
+        _call_listeners(_pre_reset_listeners, storage)
+
     do_partitioning = False
     if (isinstance(action.device, blivet.devices.PartitionDevice)
             and isinstance(action,
-                    blivet.deviceaction.ActionCreateDevice)):
+                    blivet.deviceaction.ActionCreateDevice)
+            and action.device.partedPartition is None):
+        # The partition has not been placed on the disk yet, see
+        # openlmi.storage.util.partitioning.allocate_partition().
         do_partitioning = True
-    storage.devicetree.registerAction(action)
+    with timer.phase('register_action'):
+        storage.devicetree.registerAction(action)
 
     do_raid = False
     if isinstance(action.device, blivet.devices.MDRaidArrayDevice):
         do_raid = True
+    # wait for udev to process only the modified devices
+    settler = udev.DeviceSettler(
+            _get_node_paths([action.device] + list(action.device.parents)))
     try:
         if do_partitioning:
             # this must be called when creating a partition
             cmpi_logging.logger.trace_verbose("Running doPartitioning()")
-            blivet.partitioning.doPartitioning(storage=storage)
+            with timer.phase('do_partitioning'):
+                blivet.partitioning.doPartitioning(storage=storage)
 
-        storage.devicetree.processActions(dryRun=False)
+        with timer.phase('process_actions'):
+            storage.devicetree.processActions(dryRun=False)
         if not isinstance(action,
                 blivet.deviceaction.ActionDestroyDevice):
             cmpi_logging.logger.trace_verbose("Result: " + repr(action.device))
@@ -153,20 +303,51 @@ def do_storage_action(storage, action):
                     blivet.deviceaction.ActionDestroyDevice):
                 # remove the metadata, otherwise reset() still recognizes
                 # the array
-                for device in action.device.parents:
-                    subprocess.call([
-                            'dd',
-                            'if=/dev/zero',
-                            'of=' + device.path,
-                            'bs=1024',
-                            'count=1024'])
+                with timer.phase('wipe_metadata'):
+                    wipe.wipe_devices([device.path
+                            for device in action.device.parents])
     finally:
-        # workaround for bug #891971
-        open("/dev/.in_sysinit", "w")
-        os.system('udevadm control --env=ANACONDA=1')
-        os.system('udevadm trigger --subsystem-match block')
-        os.system('udevadm settle')
-        storage.reset()
+        # blivet modified partedDisk of the disks, cached layouts are stale
+        if do_partitioning:
+            # doPartitioning() may move new partitions on any disk
+            partitioning.invalidate_disk_layouts()
+        else:
+            partitioning.invalidate_disk_layouts(
+                    [action.device] + list(action.device.parents))
+        with timer.phase('udev_settle'):
+            settler.settle()
+        _reset(storage, timer)
+
+@cmpi_logging.trace_function
+def do_lvm_command(storage, args, paths):
+    """
+        Run lvm command, which modifies the storage in a way blivet does not
+        support, e.g. creates striped logical volume. The storage is reset
+        afterwards, the same way as do_storage_action() does.
+
+        :param args: (``list of strings``) Arguments of the lvm command.
+        :param paths: (``list of strings``) Paths to devices modified by
+            the command, only udev events of these devices are waited for.
+    """
+    timer = timeline.ActionTimer("lvm " + " ".join(args),
+            paths[0] if paths else None)
+    _run_timed(timer, _do_lvm_command, storage, args, paths)
+
+def _do_lvm_command(storage, args, paths, timer):
+    """
+        Run lvm command on given Storage instance and measure its phases
+        with given ActionTimer. The caller must hold _storage_lock.
+    """
+    with timer.phase('pre_reset_listeners'):
+        _call_listeners(_pre_reset_listeners, storage)
+    settler = udev.DeviceSettler(paths)
+    try:
+        with timer.phase('lvm_command'):
+            lvm.run_lvm(args)
+    finally:
+        with timer.phase('udev_settle'):
+            settler.settle()
+        _reset(storage, timer)
 
 def log_storage_call(msg, args):
     """
@@ -0,0 +1,362 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Read-only inventory of block devices, read directly from sysfs, udev
+    database and /proc/self/mountinfo, without any probing of the devices.
+    Only LVM metadata of physical volumes is read to find volume groups.
+"""
+
+import os
+import struct
+from collections import OrderedDict
+import openlmi.common.cmpi_logging as cmpi_logging
+
+SYS_BLOCK = '/sys/block'
+UDEV_DATA = '/run/udev/data'
+MOUNTINFO = '/proc/self/mountinfo'
+DEV_DIR = '/dev'
+
+# Size of sectors in /sys/block/*/size, regardless of real sector size.
+SYSFS_SECTOR_SIZE = 512
+
+# LVM2 on-disk format, see lib/format_text/layout.h in lvm2 sources.
+LVM_LABEL_ID = 'LABELONE'
+LVM_LABEL_TYPE = 'LVM2 001'
+LVM_LABEL_SCAN_SECTORS = 4
+LVM_MDA_MAGIC = ' LVM2 x[5A%r0N*>'
+# label_header: id, sector_xl, crc_xl, offset_xl, type
+LVM_LABEL_HEADER = struct.Struct('<8sQII8s')
+# pv_header: pv_uuid, device_size_xl
+LVM_PV_HEADER = struct.Struct('<32sQ')
+# disk_locn: offset, size
+LVM_DISK_LOCN = struct.Struct('<QQ')
+# mda_header: checksum_xl, magic, version, start, size
+LVM_MDA_HEADER = struct.Struct('<I16sIQQ')
+# raw_locn: offset, size, checksum, flags
+LVM_RAW_LOCN = struct.Struct('<QQII')
+
+def _read(path, default=None):
+    """ Return stripped content of given file or default, if it's missing."""
+    try:
+        with open(path) as sysfile:
+            return sysfile.read().strip()
+    except EnvironmentError:
+        return default
+
+def _read_udev_data(major, minor):
+    """
+        Return dictionary with udev properties of given block device.
+    """
+    properties = {}
+    path = os.path.join(UDEV_DATA, "b%d:%d" % (major, minor))
+    try:
+        with open(path) as datafile:
+            for line in datafile:
+                if not line.startswith('E:'):
+                    continue
+                (key, _sep, value) = line[2:].rstrip('\n').partition('=')
+                properties[key] = value
+    except EnvironmentError:
+        pass
+    return properties
+
+def _read_mountinfo():
+    """
+        Return dictionary (major, minor) -> list of (mountpoint, fstype).
+    """
+    mounts = {}
+    try:
+        with open(MOUNTINFO) as mountinfo:
+            for line in mountinfo:
+                # 36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root
+                (mount, _sep, fsinfo) = line.partition(' - ')
+                fields = mount.split()
+                if len(fields) < 5 or not fsinfo:
+                    continue
+                (major, minor) = fields[2].split(':')
+                fstype = fsinfo.split()[0]
+                mountpoint = fields[4].decode('string_escape')
+                mounts.setdefault((int(major), int(minor)), []).append(
+                        (mountpoint, fstype))
+    except EnvironmentError:
+        pass
+    return mounts
+
+def _read_lvm_metadata(devfile):
+    """
+        Return text of the first metadata area of LVM physical volume on
+        given open device or None, if the device has no metadata.
+    """
+    data = devfile.read(LVM_LABEL_SCAN_SECTORS * SYSFS_SECTOR_SIZE)
+    for sector in xrange(LVM_LABEL_SCAN_SECTORS):
+        label = data[sector * SYSFS_SECTOR_SIZE:]
+        if len(label) < LVM_LABEL_HEADER.size:
+            return None
+        (label_id, _sector, _crc, offset, label_type) = \
+                LVM_LABEL_HEADER.unpack_from(label)
+        if label_id == LVM_LABEL_ID and label_type == LVM_LABEL_TYPE:
+            break
+    else:
+        return None
+
+    # pv_header is followed by two zero-terminated lists of disk_locn,
+    # data areas and metadata areas.
+    position = offset + LVM_PV_HEADER.size
+    areas = [[], []]
+    for area_list in areas:
+        while True:
+            if position + LVM_DISK_LOCN.size > len(label):
+                return None
+            (area_offset, area_size) = LVM_DISK_LOCN.unpack_from(
+                    label, position)
+            position += LVM_DISK_LOCN.size
+            if area_offset == 0:
+                break
+            area_list.append((area_offset, area_size))
+    if not areas[1]:
+        return None
+
+    mda_offset = areas[1][0][0]
+    devfile.seek(mda_offset)
+    header = devfile.read(SYSFS_SECTOR_SIZE)
+    if len(header) < LVM_MDA_HEADER.size + LVM_RAW_LOCN.size:
+        return None
+    (_checksum, magic, _version, _start, mda_size) = \
+            LVM_MDA_HEADER.unpack_from(header)
+    if magic != LVM_MDA_MAGIC:
+        return None
+    (text_offset, text_size, _checksum, _flags) = LVM_RAW_LOCN.unpack_from(
+            header, LVM_MDA_HEADER.size)
+    if text_offset == 0 or text_size == 0:
+        return None
+
+    # The metadata area is circular buffer, the text can wrap around
+    # to the first sector after mda_header.
+    first_size = min(text_size, mda_size - text_offset)
+    devfile.seek(mda_offset + text_offset)
+    text = devfile.read(first_size)
+    if first_size < text_size:
+        devfile.seek(mda_offset + SYSFS_SECTOR_SIZE)
+        text += devfile.read(text_size - first_size)
+    return text
+
+def read_pv_vg_name(path):
+    """
+        Return name of volume group, which the LVM physical volume on given
+        device belongs to. Only the LVM label and metadata area are read.
+        Return None, if the device is not physical volume or it's not in any
+        volume group.
+    """
+    try:
+        with open(path, 'rb') as devfile:
+            text = _read_lvm_metadata(devfile)
+    except EnvironmentError, err:
+        cmpi_logging.logger.warn("Cannot read LVM metadata from %s: %s"
+                % (path, err))
+        return None
+    if not text:
+        return None
+    # The text starts with "<vgname> {"
+    (vgname, sep, _rest) = text.partition('{')
+    vgname = vgname.strip()
+    if not sep or not vgname:
+        return None
+    return vgname
+
+class BlockDevice(object):
+    """
+        Record of one block device, as found in sysfs and udev database.
+    """
+    TYPE_DISK = 'disk'
+    TYPE_PARTITION = 'partition'
+    TYPE_LV = 'lvmlv'
+    TYPE_MDRAID = 'mdarray'
+    TYPE_DM = 'dm'
+    TYPE_LOOP = 'loop'
+
+    def __init__(self, name, sys_path, disk=None):
+        self.name = name
+        self.sys_path = sys_path
+        # Name of the disk, if this device is a partition.
+        self.disk = disk
+        (major, minor) = _read(os.path.join(sys_path, 'dev'), '0:0').split(':')
+        self.major = int(major)
+        self.minor = int(minor)
+
+        # Names of parent devices.
+        if disk:
+            self.parents = [disk]
+        else:
+            try:
+                self.parents = sorted(
+                        os.listdir(os.path.join(sys_path, 'slaves')))
+            except OSError:
+                self.parents = []
+
+        queue_path = os.path.join(sys_path, 'queue')
+        if disk:
+            queue_path = os.path.join(os.path.dirname(sys_path), 'queue')
+        self.sector_size = int(_read(
+                os.path.join(queue_path, 'logical_block_size'),
+                SYSFS_SECTOR_SIZE))
+        self.size = int(_read(os.path.join(sys_path, 'size'), 0)) \
+                * SYSFS_SECTOR_SIZE
+
+        self.partition_number = None
+        if disk:
+            self.partition_number = int(
+                    _read(os.path.join(sys_path, 'partition'), 0))
+
+        self.dm_name = _read(os.path.join(sys_path, 'dm', 'name'))
+        self.dm_uuid = _read(os.path.join(sys_path, 'dm', 'uuid'), '')
+
+        # udev properties, E: lines in udev database
+        self.properties = _read_udev_data(self.major, self.minor)
+        # list of (mountpoint, fstype)
+        self.mounts = []
+
+    @property
+    def type(self):
+        """ Type of the device, one of TYPE_* constants."""
+        if self.disk:
+            return self.TYPE_PARTITION
+        if self.dm_name is not None:
+            if self.dm_uuid.startswith('LVM-'):
+                return self.TYPE_LV
+            return self.TYPE_DM
+        if self.name.startswith('md'):
+            return self.TYPE_MDRAID
+        if self.name.startswith('loop'):
+            return self.TYPE_LOOP
+        return self.TYPE_DISK
+
+    @property
+    def path(self):
+        """ Path to the device, the same as blivet uses."""
+        if self.dm_name is not None:
+            return '/dev/mapper/' + self.dm_name
+        return '/dev/' + self.name
+
+    @property
+    def display_name(self):
+        """ Name of the device, the same as blivet uses."""
+        if self.dm_name is not None:
+            return self.dm_name
+        return self.name
+
+    @property
+    def fs_type(self):
+        """ Type of the format on the device or None, if it's unknown."""
+        fs_type = self.properties.get('ID_FS_TYPE')
+        if not fs_type and self.mounts:
+            # udev did not probe the device, use mounted filesystem
+            fs_type = self.mounts[0][1]
+        return fs_type or None
+
+    @property
+    def fs_usage(self):
+        """ ID_FS_USAGE of the device, e.g. 'filesystem' or 'raid'."""
+        usage = self.properties.get('ID_FS_USAGE')
+        if not usage and self.mounts:
+            usage = 'filesystem'
+        return usage
+
+    @property
+    def fs_uuid(self):
+        """ UUID of the format on the device or None."""
+        return self.properties.get('ID_FS_UUID') or None
+
+    @property
+    def fs_label(self):
+        """ Label of the format on the device or None."""
+        return self.properties.get('ID_FS_LABEL') or None
+
+    @property
+    def partition_table(self):
+        """ Type of partition table on the device, 'dos', 'gpt' or None."""
+        return self.properties.get('ID_PART_TABLE_TYPE') or None
+
+    @property
+    def vg_name(self):
+        """ Name of volume group, if the device is logical volume."""
+        return self.properties.get('DM_VG_NAME') or None
+
+@cmpi_logging.trace_function
+def get_devices():
+    """
+        Return OrderedDict name -> BlockDevice of all block devices in the
+        system. Partitions follow their disks.
+    """
+    devices = OrderedDict()
+    try:
+        names = sorted(os.listdir(SYS_BLOCK))
+    except OSError, err:
+        cmpi_logging.logger.error("Cannot read %s: %s" % (SYS_BLOCK, err))
+        return devices
+
+    for name in names:
+        sys_path = os.path.join(SYS_BLOCK, name)
+        devices[name] = BlockDevice(name, sys_path)
+        partitions = []
+        for entry in os.listdir(sys_path):
+            part_path = os.path.join(sys_path, entry)
+            if os.path.exists(os.path.join(part_path, 'partition')):
+                partitions.append(BlockDevice(entry, part_path, name))
+        partitions.sort(key=lambda part: part.partition_number)
+        for part in partitions:
+            devices[part.name] = part
+
+    mounts = _read_mountinfo()
+    for device in devices.itervalues():
+        device.mounts = mounts.get((device.major, device.minor), [])
+    return devices
+
+@cmpi_logging.trace_function
+def get_volume_groups(devices):
+    """
+        Return dictionary VG name -> list of names of its physical volumes.
+        Volume groups are found in metadata of the physical volumes, i.e.
+        also inactive volume groups and groups without any logical volume
+        are returned.
+
+        :param devices: (``OrderedDict``) Devices returned by get_devices().
+    """
+    vgs = {}
+    for device in devices.itervalues():
+        if device.fs_type != 'LVM2_member':
+            continue
+        vgname = read_pv_vg_name(os.path.join(DEV_DIR, device.name))
+        if vgname:
+            vgs.setdefault(vgname, []).append(device.name)
+    return vgs
+
+@cmpi_logging.trace_function
+def get_fingerprint(devices=None):
+    """
+        Return hashable summary of block devices, which changes when any
+        device is created, removed, resized or formatted. Unlike udev events,
+        it does not change when the devices are only probed or re-triggered.
+
+        :param devices: (``OrderedDict``) Devices returned by get_devices().
+            They are read from sysfs if not provided.
+    """
+    if devices is None:
+        devices = get_devices()
+    return tuple((device.name, device.size, tuple(device.parents),
+            device.dm_name, device.partition_table, device.fs_type,
+            device.fs_uuid, device.fs_label)
+            for device in devices.itervalues())
@@ -0,0 +1,153 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Timing of phases of storage actions.
+
+    Each action run by do_storage_action() is measured by ActionTimer and
+    its record is kept in bounded ActionTimeline. The records can be also
+    appended to a file as JSON lines, one line per action.
+"""
+
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+import json
+import threading
+import time
+import openlmi.common.cmpi_logging as cmpi_logging
+
+# Default nr. of actions kept in the timeline.
+DEFAULT_SIZE = 100
+
+class ActionTimer(object):
+    """
+        Measures duration of phases of one storage action.
+        Usage:
+          timer = ActionTimer("Create partition", "/dev/sda1")
+          with timer.phase('process_actions'):
+              ...
+          timer.finish()
+    """
+    def __init__(self, action, device):
+        """
+            :param action: (``string``) Description of the action.
+            :param device: (``string``) Path to the modified device.
+        """
+        self.action = action
+        self.device = device
+        self.start = time.time()
+        # Durations of the phases in seconds, in order of execution.
+        self.phases = OrderedDict()
+        self.duration = None
+        self.error = None
+
+    @contextmanager
+    def phase(self, name):
+        """
+            Context manager, which measures one phase. Repeated phases are
+            summed.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) \
+                    + (time.time() - start)
+
+    def finish(self, error=None):
+        """
+            Stop measuring the action.
+
+            :param error: (``string``) Error, which stopped the action, or
+                None, if it succeeded.
+        """
+        self.duration = time.time() - self.start
+        self.error = error
+
+    def get_record(self):
+        """ Return the timing as dictionary, which can be stored as JSON."""
+        return OrderedDict([
+                ('action', self.action),
+                ('device', self.device),
+                ('start', self.start),
+                ('duration', self.duration),
+                ('phases', self.phases),
+                ('error', self.error),
+        ])
+
+class ActionTimeline(object):
+    """
+        Bounded in-memory list of timings of recent storage actions.
+        Each record gets a sequence number, so clients can ask only for
+        records added since their last request.
+    """
+    @cmpi_logging.trace_method
+    def __init__(self, size=DEFAULT_SIZE, log_path=None):
+        """
+            :param size: (``int``) Nr. of actions to keep.
+            :param log_path: (``string``) Path to file, where each record is
+                appended as one JSON line. None disables the file.
+        """
+        self.log_path = log_path
+        self.records = deque(maxlen=size)
+        self.sequence = 0
+        self._lock = threading.Lock()
+
+    @cmpi_logging.trace_method
+    def configure(self, size, log_path):
+        """
+            Change nr. of kept actions and path to JSON lines file.
+            The oldest records are dropped, if the size shrinks.
+        """
+        with self._lock:
+            if size != self.records.maxlen:
+                self.records = deque(self.records, maxlen=size)
+            self.log_path = log_path
+
+    @cmpi_logging.trace_method
+    def add(self, timer):
+        """
+            Add timing of finished action.
+
+            :param timer: (``ActionTimer``) The finished action.
+        """
+        record = timer.get_record()
+        with self._lock:
+            self.sequence += 1
+            record['sequence'] = self.sequence
+            self.records.append(record)
+            log_path = self.log_path
+        cmpi_logging.logger.trace_info("Storage action timing: "
+                + json.dumps(record))
+        if log_path:
+            try:
+                with open(log_path, 'a') as log_file:
+                    log_file.write(json.dumps(record) + '\n')
+            except EnvironmentError, err:
+                cmpi_logging.logger.error(
+                        "Cannot write action timing to %s: %s"
+                        % (log_path, err))
+
+    @cmpi_logging.trace_method
+    def get_records(self, since=None):
+        """
+            Return tuple (last sequence number, list of records). Only
+            records with sequence number greater than 'since' are returned.
+        """
+        with self._lock:
+            records = [record for record in self.records
+                    if since is None or record['sequence'] > since]
+            return (self.sequence, records)
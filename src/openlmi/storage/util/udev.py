@@ -0,0 +1,292 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Synchronization with udev after block devices were modified.
+
+    Instead of re-triggering all block devices and waiting for the whole
+    udev queue, only the modified devices are triggered and only their
+    events are waited for.
+"""
+
+import os
+import subprocess
+import threading
+import time
+import openlmi.common.cmpi_logging as cmpi_logging
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+# Maximum nr. of seconds to wait for udev events.
+SETTLE_TIMEOUT = 10
+
+# Nr. of seconds without any udev event, after which a burst of events is
+# considered finished by BlockDeviceMonitor.
+QUIET_TIME = 2
+
+# True, if ANACONDA=1 has been set in udev environment.
+_anaconda_env = False
+
+def _set_anaconda_env():
+    """
+        Tell udev rules that the devices are managed by Anaconda (blivet).
+        The setting is global, it is sufficient to set it only once.
+    """
+    global _anaconda_env
+    if not _anaconda_env:
+        subprocess.call(['udevadm', 'control', '--env=ANACONDA=1'])
+        _anaconda_env = True
+
+def _settle_all():
+    """
+        Trigger all block devices and wait until udev processes them.
+    """
+    subprocess.call(['udevadm', 'trigger', '--subsystem-match', 'block'])
+    subprocess.call(['udevadm', 'settle'])
+
+# Kernel counter of emitted uevents.
+UEVENT_SEQNUM = '/sys/kernel/uevent_seqnum'
+
+def _read_seqnum():
+    """ Return sequence number of the last uevent emitted by kernel."""
+    try:
+        with open(UEVENT_SEQNUM) as seqfile:
+            return int(seqfile.read())
+    except (EnvironmentError, ValueError):
+        return 0
+
+class DeviceSettler(object):
+    """
+        Wait until udev processes events of modified block devices.
+
+        'add' and 'remove' events of created and destroyed devices are
+        emitted while the devices are modified, therefore the settler must
+        be created before the modification starts and settle() must be
+        called when it is finished:
+
+            settler = DeviceSettler(paths)
+            ... modify the devices ...
+            settler.settle()
+
+        Devices, which exist after the modification, are triggered with
+        'change' event and the event is waited for. For devices, which do
+        not exist, 'add' or 'remove' event is waited for. Created partitions
+        are recognized by sys_path derived from sys_path of their disk,
+        which must be in the given paths. Created device-mapper devices are
+        usable only after their table is loaded, therefore 'change' event
+        with DM_NAME is waited for instead of their 'add' event.
+
+        If pyudev is not available, all block devices are triggered and
+        whole udev queue is waited for.
+    """
+    @cmpi_logging.trace_method
+    def __init__(self, paths):
+        """
+        :param paths: (``list of strings``) Paths to the block devices,
+            which are going to be modified, created or destroyed, and to
+            their parents. Only paths of device nodes are allowed, e.g.
+            /dev/<vg> of a volume group is not.
+        """
+        # workaround for bug #891971
+        open("/dev/.in_sysinit", "w")
+        _set_anaconda_env()
+
+        self.paths = set(paths)
+        self._monitor = None
+        if pyudev is None:
+            return
+
+        self._context = pyudev.Context()
+        # The monitor must listen before the devices are modified.
+        self._monitor = pyudev.Monitor.from_netlink(self._context)
+        self._monitor.filter_by('block')
+        self._monitor.start()
+
+        # Paths, which existed before the modification.
+        self._existing = set()
+        # sys_paths of existing devices, created partitions are their
+        # children.
+        self._parent_sys_paths = []
+        for path in self.paths:
+            device = self._get_device(path)
+            if device is not None:
+                self._existing.add(path)
+                self._parent_sys_paths.append(device.sys_path)
+
+    def _get_device(self, path):
+        """ Return pyudev.Device with given path or None, if it's missing."""
+        try:
+            return pyudev.Device.from_device_file(self._context, path)
+        except (LookupError, EnvironmentError, ValueError):
+            return None
+
+    def _is_device(self, device, path):
+        """ Return True, if pyudev.Device is device with given path."""
+        if device.device_node == path or path in list(device.device_links):
+            return True
+        dm_name = device.get('DM_NAME')
+        if dm_name and path == '/dev/mapper/' + dm_name:
+            return True
+        name = os.path.basename(path)
+        for parent in self._parent_sys_paths:
+            if device.sys_path == os.path.join(parent, name):
+                return True
+        return False
+
+    @staticmethod
+    def _is_created(device):
+        """
+            Return True, if pyudev.Device announces a usable created device.
+            Device-mapper devices emit 'add' event before their table is
+            loaded, they are usable after 'change' event with DM_NAME.
+        """
+        if device.sys_name.startswith('dm-'):
+            return device.action == 'change' and bool(device.get('DM_NAME'))
+        return device.action == 'add'
+
+    @cmpi_logging.trace_method
+    def settle(self, timeout=SETTLE_TIMEOUT):
+        """
+            Wait for udev events of the devices and close the monitor.
+
+            :param timeout: (``float``) Maximum nr. of seconds to wait.
+        """
+        if self._monitor is None:
+            _settle_all()
+            return
+        try:
+            self._wait(timeout)
+        finally:
+            self.close()
+
+    def _wait(self, timeout):
+        """ Trigger the devices and wait for their events."""
+        # sys_path -> seqnum, after which the 'change' event was triggered
+        pending_changes = {}
+        # paths of destroyed devices, waiting for 'remove' event
+        pending_removes = set()
+        # paths of created devices, waiting for 'add' event or for 'change'
+        # event of device-mapper device
+        pending_adds = set()
+        for path in self.paths:
+            device = self._get_device(path)
+            if device is None:
+                if path in self._existing:
+                    pending_removes.add(path)
+                else:
+                    pending_adds.add(path)
+                continue
+            seqnum = _read_seqnum()
+            try:
+                uevent = open(os.path.join(device.sys_path, 'uevent'), 'w')
+                try:
+                    uevent.write('change')
+                finally:
+                    uevent.close()
+            except EnvironmentError:
+                # The device has disappeared in the meantime.
+                pending_removes.add(path)
+                continue
+            pending_changes[device.sys_path] = seqnum
+
+        deadline = time.time() + timeout
+        while pending_changes or pending_removes or pending_adds:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                cmpi_logging.logger.warn("Timeout waiting for udev events on: "
+                        + ", ".join(list(pending_changes)
+                                + list(pending_removes)
+                                + list(pending_adds)))
+                break
+            if not pending_changes and not pending_removes:
+                # A device, which failed to be created, emits no event.
+                # Its 'add' event is not waited for after a quiet period.
+                remaining = min(remaining, QUIET_TIME)
+            device = self._monitor.poll(timeout=remaining)
+            if device is None:
+                if not pending_changes and not pending_removes:
+                    cmpi_logging.logger.trace_verbose(
+                            "No 'add' event of " + ", ".join(pending_adds))
+                    break
+                continue
+
+            if device.action == 'change':
+                seqnum = pending_changes.get(device.sys_path)
+                if (seqnum is not None
+                        and int(device.get('SEQNUM', 0)) > seqnum):
+                    del pending_changes[device.sys_path]
+            elif device.action == 'remove':
+                pending_removes = set(path for path in pending_removes
+                        if not self._is_device(device, path))
+            if self._is_created(device):
+                pending_adds = set(path for path in pending_adds
+                        if not self._is_device(device, path))
+
+    @cmpi_logging.trace_method
+    def close(self):
+        """ Stop listening to udev events."""
+        # pyudev closes the netlink socket when the monitor is freed.
+        self._monitor = None
+
+class BlockDeviceMonitor(object):
+    """
+        Watch udev events of block devices in a background thread.
+
+        Events come in bursts, e.g. when a disk with several partitions is
+        attached. The callback is called without arguments once per burst,
+        after there was no event for given quiet time.
+    """
+    @cmpi_logging.trace_method
+    def __init__(self, callback, quiet_time=QUIET_TIME):
+        self.callback = callback
+        self.quiet_time = quiet_time
+        self._thread = None
+
+    @cmpi_logging.trace_method
+    def start(self):
+        """
+            Start watching. Return False, if pyudev is not available.
+        """
+        if pyudev is None:
+            cmpi_logging.logger.info(
+                    "pyudev is not available, external changes of block "
+                    "devices are not watched.")
+            return False
+        context = pyudev.Context()
+        monitor = pyudev.Monitor.from_netlink(context)
+        monitor.filter_by('block')
+        monitor.start()
+        self._thread = threading.Thread(target=self._run, args=(monitor,))
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def _run(self, monitor):
+        """ Main loop of the monitoring thread."""
+        while True:
+            # wait for the first event of a burst
+            monitor.poll()
+            # wait for the end of the burst
+            while monitor.poll(timeout=self.quiet_time) is not None:
+                pass
+            try:
+                self.callback()
+            except Exception, err:
+                # keep watching, the next burst may succeed
+                cmpi_logging.logger.error(
+                        "Cannot process udev events: " + str(err))
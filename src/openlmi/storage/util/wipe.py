@@ -0,0 +1,184 @@
+# OpenLMI Storage Provider
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Removal of metadata signatures from block devices.
+
+    Only the areas where known signatures reside are overwritten with
+    zeros, the rest of the device is left untouched. Devices are wiped
+    in parallel by a small pool of threads.
+"""
+
+import errno
+import mmap
+import os
+import Queue
+import sys
+import threading
+import openlmi.common.cmpi_logging as cmpi_logging
+
+KILOBYTE = 1024
+MEGABYTE = 1024 * KILOBYTE
+GIGABYTE = 1024 * MEGABYTE
+
+# All writes are aligned to this size, which is enough for O_DIRECT on
+# devices with 4096 bytes sectors.
+BLOCK_SIZE = 4096
+
+# Maximum number of devices wiped in parallel.
+MAX_THREADS = 4
+
+def _md090_offset(size):
+    """ Offset of MD 0.90 superblock, 64 KiB block before the last one."""
+    return (size & ~(64 * KILOBYTE - 1)) - 64 * KILOBYTE
+
+def _md10_offset(size):
+    """ Offset of MD 1.0 superblock, 8 KiB before the end, 4 KiB aligned."""
+    return (size - 8 * KILOBYTE) & ~(4 * KILOBYTE - 1)
+
+# List of (name, function returning offset of the signature, size of the
+# signature) for a device of given size, in bytes.
+SIGNATURES = [
+    # MBR, LVM2 label and metadata area, MD 1.1 and 1.2 superblocks,
+    # GPT primary header and table, superblocks of ext*, xfs, btrfs and
+    # swap.
+    ('start', lambda size: 0, MEGABYTE),
+    ('md 0.90', _md090_offset, 64 * KILOBYTE),
+    ('md 1.0', _md10_offset, 4 * KILOBYTE),
+    # GPT backup header and table (33 sectors of 4096 bytes at most).
+    ('gpt backup', lambda size: size - 33 * 4 * KILOBYTE, 33 * 4 * KILOBYTE),
+    # Mirrors of btrfs superblock.
+    ('btrfs mirror 1', lambda size: 64 * MEGABYTE, 4 * KILOBYTE),
+    ('btrfs mirror 2', lambda size: 256 * GIGABYTE, 4 * KILOBYTE),
+]
+
+def get_wipe_ranges(size):
+    """
+        Return list of (offset, length) ranges of a device with given size,
+        where metadata signatures may reside. The ranges are aligned to
+        BLOCK_SIZE, sorted and merged. Only the last range may end
+        unaligned, at the end of the device.
+
+        :param size: (``int``) Size of the device, in bytes.
+        :rtype: list of (``int``, ``int``)
+    """
+    ranges = []
+    for (_name, get_offset, length) in SIGNATURES:
+        start = max(0, get_offset(size))
+        end = min(size, start + length)
+        start = start & ~(BLOCK_SIZE - 1)
+        end = min(size, (end + BLOCK_SIZE - 1) & ~(BLOCK_SIZE - 1))
+        if end > start:
+            ranges.append((start, end))
+    ranges.sort()
+
+    merged = []
+    for (start, end) in ranges:
+        if merged and merged[-1][1] >= start:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return [(start, end - start) for (start, end) in merged]
+
+def _open(path):
+    """
+        Open the device for writing, with O_DIRECT if possible.
+    """
+    flags = os.O_WRONLY
+    try:
+        return os.open(path, flags | os.O_DIRECT)
+    except OSError, err:
+        if err.errno != errno.EINVAL:
+            raise
+    # the filesystem does not support O_DIRECT
+    return os.open(path, flags)
+
+def _write_zeros(fd, offset, length, zeros):
+    """
+        Write length zero bytes at given offset.
+    """
+    os.lseek(fd, offset, os.SEEK_SET)
+    while length > 0:
+        chunk = min(length, len(zeros))
+        length -= os.write(fd, buffer(zeros, 0, chunk))
+
+@cmpi_logging.trace_function
+def wipe_device(path):
+    """
+        Overwrite all known metadata signatures on given device with zeros.
+
+        :param path: (``string``) Path to the device.
+    """
+    # mmap-ed buffer is page aligned, as O_DIRECT requires.
+    zeros = mmap.mmap(-1, MEGABYTE)
+    fd = _open(path)
+    try:
+        size = os.lseek(fd, 0, os.SEEK_END)
+        for (offset, length) in get_wipe_ranges(size):
+            tail = length % BLOCK_SIZE
+            _write_zeros(fd, offset, length - tail, zeros)
+            if tail:
+                # unaligned end of the device, O_DIRECT cannot be used
+                tail_fd = os.open(path, os.O_WRONLY)
+                try:
+                    _write_zeros(tail_fd, offset + length - tail, tail, zeros)
+                    os.fsync(tail_fd)
+                finally:
+                    os.close(tail_fd)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+        zeros.close()
+
+@cmpi_logging.trace_function
+def wipe_devices(paths):
+    """
+        Overwrite all known metadata signatures on given devices with zeros.
+        At most MAX_THREADS devices are wiped in parallel. All errors are
+        logged and the first one is raised when all devices are processed.
+
+        :param paths: (``list of strings``) Paths to the devices.
+    """
+    queue = Queue.Queue()
+    for path in paths:
+        queue.put(path)
+    # list of sys.exc_info() of failed wipes
+    errors = []
+
+    def _worker():
+        """ Wipe devices from the queue until it is empty."""
+        while True:
+            try:
+                path = queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                wipe_device(path)
+            except Exception, err:
+                cmpi_logging.logger.error(
+                        "Cannot wipe %s: %s" % (path, str(err)))
+                errors.append(sys.exc_info())
+
+    threads = []
+    for _i in xrange(min(MAX_THREADS, len(paths))):
+        thread = threading.Thread(target=_worker)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    if errors:
+        (exc_type, exc_value, exc_traceback) = errors[0]
+        raise exc_type, exc_value, exc_traceback
@@ -305,5 +305,114 @@ class TestCreateLV(StorageTestBase):
         for lv in lvs:
             self.wbemconnection.DeleteInstance(lv.path)
 
+class TestCreateStripedLV(StorageTestBase):
+    """
+        Test CreateOrModifyLV method with striped and mirrored Goals.
+    """
+
+    def setUp(self):
+        """ Find storage service and create VG on two partitions. """
+        super(TestCreateStripedLV, self).setUp()
+        self.service = self.wbemconnection.EnumerateInstanceNames(
+                "LMI_StorageConfigurationService")[0]
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateOrModifyVG",
+                self.service,
+                InExtents=self.partition_names[:2],
+                ElementName='tstName')
+        self.assertEqual(ret, 0)
+        self.vg = self.wbemconnection.GetInstance(outparams['pool'])
+        self.lvcaps_name = self.wbemconnection.AssociatorNames(self.vg.path,
+                AssocClass="LMI_LVElementCapabilities")[0]
+
+    def tearDown(self):
+        self.wbemconnection.DeleteInstance(self.vg.path)
+        super(TestCreateStripedLV, self).tearDown()
+
+    def _create_setting(self, stripes, mirrors):
+        """
+            Create new LMI_LVStorageSetting for given nr. of stripes and
+            mirrors and return its CIMInstance.
+        """
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateLVStorageSetting",
+                self.lvcaps_name)
+        self.assertEqual(ret, 0)
+        setting = self.wbemconnection.GetInstance(outparams['setting'])
+        setting['StripeCount'] = pywbem.Uint16(stripes)
+        setting['MirrorCount'] = pywbem.Uint16(mirrors)
+        setting['ExtentStripeLength'] = pywbem.Uint16(stripes)
+        setting['ExtentStripeLengthMin'] = pywbem.Uint16(stripes)
+        setting['ExtentStripeLengthMax'] = pywbem.Uint16(stripes)
+        setting['DataRedundancyGoal'] = pywbem.Uint16(mirrors + 1)
+        setting['DataRedundancyMin'] = pywbem.Uint16(mirrors + 1)
+        setting['DataRedundancyMax'] = pywbem.Uint16(mirrors + 1)
+        setting['PackageRedundancyGoal'] = pywbem.Uint16(mirrors)
+        setting['PackageRedundancyMin'] = pywbem.Uint16(mirrors)
+        setting['PackageRedundancyMax'] = pywbem.Uint16(mirrors)
+        setting['NoSinglePointOfFailure'] = (mirrors > 0)
+        self.wbemconnection.ModifyInstance(setting)
+        return setting
+
+    def test_capabilities(self):
+        """ Test LMI_LVStorageCapabilities advertise stripes and mirrors."""
+        caps = self.wbemconnection.GetInstance(self.lvcaps_name)
+        self.assertEqual(caps['StripeCountMin'], 1)
+        self.assertEqual(caps['StripeCountMax'], 2)
+        self.assertEqual(caps['MirrorCountMin'], 0)
+        self.assertEqual(caps['MirrorCountMax'], 1)
+        self.assertTrue(caps['StripeSizeMin'] <= caps['StripeSizeDefault'])
+        self.assertTrue(caps['StripeSizeDefault'] <= caps['StripeSizeMax'])
+        self.assertTrue(caps['StripeSizeMax'] <= self.vg['ExtentSize'])
+
+    def test_create_striped(self):
+        """ Test CreateOrModifyLV with striped Goal."""
+        goal = self._create_setting(2, 0)
+        (retval, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateOrModifyLV",
+                self.service,
+                InPool=self.vg.path,
+                Size=pywbem.Uint64(10 * self.vg['ExtentSize']),
+                Goal=goal.path)
+        self.assertEqual(retval, 0)
+        self.assertEqual(outparams['Size'], 10 * self.vg['ExtentSize'])
+
+        lv_name = outparams['theelement']
+        lv = self.wbemconnection.GetInstance(lv_name)
+        lv_setting = self.wbemconnection.Associators(lv_name,
+                AssocClass="LMI_LVElementSettingData")[0]
+        self.assertEqual(lv['ExtentStripeLength'], 2)
+        self.assertEqual(lv_setting['StripeCount'], 2)
+        self.assertEqual(lv_setting['MirrorCount'], 0)
+
+        self.wbemconnection.DeleteInstance(goal.path)
+        self.wbemconnection.DeleteInstance(lv_name)
+
+    def test_create_too_many_stripes(self):
+        """ Test CreateOrModifyLV with more stripes than PVs."""
+        goal = self._create_setting(3, 0)
+        self.assertRaises(pywbem.CIMError, self.wbemconnection.InvokeMethod,
+                "CreateOrModifyLV",
+                self.service,
+                InPool=self.vg.path,
+                Size=pywbem.Uint64(10 * self.vg['ExtentSize']),
+                Goal=goal.path)
+        self.wbemconnection.DeleteInstance(goal.path)
+
+    def test_create_wrong_redundancy(self):
+        """ Test CreateOrModifyLV with mirrored Goal without redundancy."""
+        goal = self._create_setting(1, 1)
+        goal['DataRedundancyGoal'] = pywbem.Uint16(1)
+        goal['DataRedundancyMin'] = pywbem.Uint16(1)
+        goal['DataRedundancyMax'] = pywbem.Uint16(1)
+        self.wbemconnection.ModifyInstance(goal)
+        self.assertRaises(pywbem.CIMError, self.wbemconnection.InvokeMethod,
+                "CreateOrModifyLV",
+                self.service,
+                InPool=self.vg.path,
+                Size=pywbem.Uint64(10 * self.vg['ExtentSize']),
+                Goal=goal.path)
+        self.wbemconnection.DeleteInstance(goal.path)
+
 if __name__ == '__main__':
     unittest.main()
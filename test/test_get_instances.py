@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- Coding:utf-8 -*-
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+
+from test_base import StorageTestBase
+import unittest
+import time
+
+class TestGetInstances(StorageTestBase):
+    """
+        Test LMI_StorageConfigurationService.GetInstances.
+    """
+
+    def setUp(self):
+        """ Find storage service. """
+        super(TestGetInstances, self).setUp()
+        self.service = self.wbemconnection.EnumerateInstanceNames(
+                "LMI_StorageConfigurationService")[0]
+
+    def test_get_instances(self):
+        """ Test GetInstances returns the same as GetInstance."""
+        names = self.wbemconnection.EnumerateInstanceNames(
+                "CIM_StorageExtent")
+
+        start = time.time()
+        expected = [self.wbemconnection.GetInstance(name) for name in names]
+        single_time = time.time() - start
+
+        start = time.time()
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "GetInstances",
+                self.service,
+                InstanceNames=names)
+        bulk_time = time.time() - start
+        print "%d extents: GetInstance %.4f s, GetInstances %.4f s" % (
+                len(names), single_time, bulk_time)
+
+        self.assertEqual(ret, 0)
+        self.assertEqual(outparams['notfound'], [])
+        instances = outparams['instances']
+        self.assertEqual(len(instances), len(expected))
+        for (instance, expected_instance) in zip(instances, expected):
+            self.assertEqual(instance.classname, expected_instance.classname)
+            for prop in expected_instance.properties.keys():
+                self.assertEqual(instance[prop], expected_instance[prop])
+
+    def test_not_found(self):
+        """ Test GetInstances with missing instance."""
+        missing = self.disk_name.copy()
+        missing['DeviceID'] = '/dev/does_not_exist'
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "GetInstances",
+                self.service,
+                InstanceNames=[self.disk_name, missing])
+        self.assertEqual(ret, 0)
+        self.assertEqual(len(outparams['instances']), 1)
+        self.assertEqual(outparams['instances'][0]['DeviceID'], self.disk)
+        self.assertEqual(len(outparams['notfound']), 1)
+        self.assertEqual(outparams['notfound'][0]['DeviceID'],
+                '/dev/does_not_exist')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- Coding:utf-8 -*-
+#
+# Copyright (C) 2012 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+
+from test_base import StorageTestBase
+import unittest
+import pywbem
+
+class TestLVCache(StorageTestBase):
+    """
+        Test CreateLVCachePool, AttachLVCache and DetachLVCache methods.
+    """
+
+    CACHE_MODE_NOT_CACHED = 0
+    CACHE_MODE_WRITEBACK = 2
+
+    def setUp(self):
+        """ Create VG on two partitions and LV on the first one. """
+        super(TestLVCache, self).setUp()
+        self.service = self.wbemconnection.EnumerateInstanceNames(
+                "LMI_StorageConfigurationService")[0]
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateOrModifyVG",
+                self.service,
+                InExtents=self.partition_names[:2],
+                ElementName='tstName')
+        self.assertEqual(ret, 0)
+        self.vg = self.wbemconnection.GetInstance(outparams['pool'])
+
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateOrModifyLV",
+                self.service,
+                InPool=self.vg.path,
+                Size=pywbem.Uint64(10 * self.vg['ExtentSize']))
+        self.assertEqual(ret, 0)
+        self.lv_name = outparams['theelement']
+
+    def tearDown(self):
+        self.wbemconnection.DeleteInstance(self.lv_name)
+        self.wbemconnection.DeleteInstance(self.vg.path)
+        super(TestLVCache, self).tearDown()
+
+    def _create_cache_pool(self):
+        """ Create cache pool on the second partition and return its name."""
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateLVCachePool",
+                self.service,
+                InPool=self.vg.path,
+                InExtents=self.partition_names[1:2],
+                Size=pywbem.Uint64(4 * self.vg['ExtentSize']))
+        self.assertEqual(ret, 0)
+        self.assertEqual(outparams['Size'], 4 * self.vg['ExtentSize'])
+        return outparams['theelement']
+
+    def test_create_pool_wrong_extent(self):
+        """ Test CreateLVCachePool with extent, which is not in the VG."""
+        self.assertRaises(pywbem.CIMError, self.wbemconnection.InvokeMethod,
+                "CreateLVCachePool",
+                self.service,
+                InPool=self.vg.path,
+                InExtents=self.partition_names[2:3],
+                Size=pywbem.Uint64(4 * self.vg['ExtentSize']))
+
+    def test_attach_detach(self):
+        """ Test attaching and detaching of cache pool in writeback mode."""
+        cache_name = self._create_cache_pool()
+
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateLVStorageSetting",
+                self.wbemconnection.AssociatorNames(self.vg.path,
+                        AssocClass="LMI_LVElementCapabilities")[0])
+        self.assertEqual(ret, 0)
+        goal = self.wbemconnection.GetInstance(outparams['setting'])
+        goal['CacheMode'] = pywbem.Uint16(self.CACHE_MODE_WRITEBACK)
+        self.wbemconnection.ModifyInstance(goal)
+
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "AttachLVCache",
+                self.service,
+                TheElement=self.lv_name,
+                CachePool=cache_name,
+                Goal=goal.path)
+        self.assertEqual(ret, 0)
+        self.wbemconnection.DeleteInstance(goal.path)
+
+        lv = self.wbemconnection.GetInstance(self.lv_name)
+        self.assertEqual(lv['CacheMode'], self.CACHE_MODE_WRITEBACK)
+        self.assertTrue(lv['CacheTotalBlocks'] > 0)
+        self.assertTrue(lv['CacheReadHits'] is not None)
+
+        # already cached
+        self.assertRaises(pywbem.CIMError, self.wbemconnection.InvokeMethod,
+                "AttachLVCache",
+                self.service,
+                TheElement=self.lv_name,
+                CachePool=cache_name)
+
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "DetachLVCache",
+                self.service,
+                TheElement=self.lv_name,
+                DeleteCachePool=True)
+        self.assertEqual(ret, 0)
+        lv = self.wbemconnection.GetInstance(self.lv_name)
+        self.assertEqual(lv['CacheMode'], self.CACHE_MODE_NOT_CACHED)
+
+    def test_detach_not_cached(self):
+        """ Test DetachLVCache on LV without cache."""
+        self.assertRaises(pywbem.CIMError, self.wbemconnection.InvokeMethod,
+                "DetachLVCache",
+                self.service,
+                TheElement=self.lv_name)
+
+if __name__ == '__main__':
+    unittest.main()
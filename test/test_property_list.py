@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- Coding:utf-8 -*-
+#
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+
+from test_base import StorageTestBase
+import unittest
+import time
+
+class TestPropertyList(StorageTestBase):
+    """
+        Test and benchmark of enumeration with PropertyList. Only the
+        requested properties should be computed and returned.
+    """
+
+    DISK_CLASS = "LMI_StorageExtent"
+    PROPERTIES = ['Name', 'OperationalStatus', 'ConsumableBlocks']
+    ROUNDS = 20
+
+    def _enumerate(self, classname, property_list):
+        """
+            Enumerate instances ROUNDS times, return the last result and
+            average time of one enumeration.
+        """
+        start = time.time()
+        for _i in xrange(self.ROUNDS):
+            if property_list is None:
+                instances = self.wbemconnection.EnumerateInstances(classname)
+            else:
+                instances = self.wbemconnection.EnumerateInstances(classname,
+                        PropertyList=property_list)
+        return (instances, (time.time() - start) / self.ROUNDS)
+
+    def _compare(self, classname):
+        """
+            Check that narrow enumeration returns the same values as full one
+            and print the durations of both.
+        """
+        (full, full_time) = self._enumerate(classname, None)
+        (narrow, narrow_time) = self._enumerate(classname, self.PROPERTIES)
+        print "%s: full %.4f s, narrow %.4f s (%d instances)" % (
+                classname, full_time, narrow_time, len(full))
+
+        full = dict([(i.path, i) for i in full])
+        self.assertEqual(len(full), len(narrow))
+        for instance in narrow:
+            # key properties may be returned too
+            allowed = self.PROPERTIES + instance.path.keybindings.keys()
+            self.assertLessEqual(
+                    set([p.lower() for p in instance.properties.keys()]),
+                    set([p.lower() for p in allowed]))
+            for prop in instance.properties.keys():
+                self.assertEqual(instance[prop], full[instance.path][prop])
+
+    def test_extents(self):
+        """ Benchmark enumeration of LMI_StorageExtent."""
+        self._compare(self.DISK_CLASS)
+
+    def test_all_extents(self):
+        """ Benchmark enumeration of all CIM_StorageExtent subclasses."""
+        self._compare("CIM_StorageExtent")
+
+if __name__ == '__main__':
+    unittest.main()
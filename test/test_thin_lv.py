@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- Coding:utf-8 -*-
+#
+# Copyright (C) 2012 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+
+from test_base import StorageTestBase
+import unittest
+import pywbem
+
+class TestThinLV(StorageTestBase):
+    """
+        Test CreateLVThinPool, CreateThinLV and CreateThinSnapshot methods.
+    """
+
+    # GetSupportedSizeRange element types
+    LOGICAL_DISK = 4
+    THIN_PROVISIONED_LOGICAL_DISK = 6
+
+    def setUp(self):
+        """ Create VG on two partitions. """
+        super(TestThinLV, self).setUp()
+        self.service = self.wbemconnection.EnumerateInstanceNames(
+                "LMI_StorageConfigurationService")[0]
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateOrModifyVG",
+                self.service,
+                InExtents=self.partition_names[:2],
+                ElementName='tstName')
+        self.assertEqual(ret, 0)
+        self.vg = self.wbemconnection.GetInstance(outparams['pool'])
+        # LVs to delete, in order
+        self.lv_names = []
+
+    def tearDown(self):
+        for lv_name in reversed(self.lv_names):
+            self.wbemconnection.DeleteInstance(lv_name)
+        self.wbemconnection.DeleteInstance(self.vg.path)
+        super(TestThinLV, self).tearDown()
+
+    def _create_thin_pool(self):
+        """ Create thin pool with 10 extents and return its name."""
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateLVThinPool",
+                self.service,
+                InPool=self.vg.path,
+                ElementName='tstPool',
+                Size=pywbem.Uint64(10 * self.vg['ExtentSize']))
+        self.assertEqual(ret, 0)
+        self.assertEqual(outparams['Size'], 10 * self.vg['ExtentSize'])
+        self.lv_names.append(outparams['theelement'])
+        return outparams['theelement']
+
+    def _create_thin_lv(self, pool_name, size):
+        """ Create thin LV with given virtual size and return its name."""
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateThinLV",
+                self.service,
+                ThinPool=pool_name,
+                Size=pywbem.Uint64(size))
+        self.assertEqual(ret, 0)
+        self.assertEqual(outparams['Size'], size)
+        self.lv_names.append(outparams['theelement'])
+        return outparams['theelement']
+
+    def test_overcommit(self):
+        """ Test thin LV larger than its thin pool and the VG."""
+        pool_name = self._create_thin_pool()
+        size = self.vg['TotalManagedSpace'] * 2
+        size -= size % self.vg['ExtentSize']
+        lv_name = self._create_thin_lv(pool_name, size)
+
+        lv = self.wbemconnection.GetInstance(lv_name)
+        self.assertTrue(lv['ThinlyProvisioned'])
+        self.assertEqual(lv['BlockSize'] * lv['NumberOfBlocks'], size)
+
+        pool = self.wbemconnection.GetInstance(pool_name)
+        self.assertFalse(pool['ThinlyProvisioned'])
+        self.assertEqual(pool['ThinPoolDataSize'],
+                10 * self.vg['ExtentSize'])
+        self.assertTrue(pool['ThinPoolDataUsed'] <= pool['ThinPoolDataSize'])
+        self.assertTrue(pool['ThinPoolMetadataSize'] > 0)
+        self.assertEqual(pool['ThinPoolVirtualSize'], size)
+
+        # virtual size does not consume space of the VG
+        vg = self.wbemconnection.GetInstance(self.vg.path)
+        self.assertTrue(vg['RemainingManagedSpace']
+                < self.vg['RemainingManagedSpace'])
+        self.assertTrue(vg['RemainingManagedSpace'] > 0)
+
+    def test_snapshot(self):
+        """ Test CreateThinSnapshot."""
+        pool_name = self._create_thin_pool()
+        lv_name = self._create_thin_lv(pool_name,
+                20 * self.vg['ExtentSize'])
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateThinSnapshot",
+                self.service,
+                SourceElement=lv_name,
+                ElementName='tstSnap')
+        self.assertEqual(ret, 0)
+        self.lv_names.append(outparams['theelement'])
+
+        snapshot = self.wbemconnection.GetInstance(outparams['theelement'])
+        self.assertEqual(snapshot['ElementName'], 'tstSnap')
+        self.assertTrue(snapshot['ThinlyProvisioned'])
+        pool = self.wbemconnection.GetInstance(pool_name)
+        self.assertEqual(pool['ThinPoolVirtualSize'],
+                40 * self.vg['ExtentSize'])
+
+        # snapshot of thin pool is not supported
+        self.assertRaises(pywbem.CIMError, self.wbemconnection.InvokeMethod,
+                "CreateThinSnapshot",
+                self.service,
+                SourceElement=pool_name)
+
+    def test_thin_lv_wrong_pool(self):
+        """ Test CreateThinLV with LV, which is not thin pool."""
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "CreateOrModifyLV",
+                self.service,
+                InPool=self.vg.path,
+                Size=pywbem.Uint64(10 * self.vg['ExtentSize']))
+        self.assertEqual(ret, 0)
+        self.lv_names.append(outparams['theelement'])
+        self.assertRaises(pywbem.CIMError, self.wbemconnection.InvokeMethod,
+                "CreateThinLV",
+                self.service,
+                ThinPool=outparams['theelement'],
+                Size=pywbem.Uint64(10 * self.vg['ExtentSize']))
+
+    def test_size_range(self):
+        """ Test GetSupportedSizeRange with thin element types."""
+        # no thin pool in the VG
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "GetSupportedSizeRange",
+                self.vg.path,
+                ElementType=pywbem.Uint16(
+                        self.THIN_PROVISIONED_LOGICAL_DISK))
+        self.assertEqual(ret, 3)
+
+        self._create_thin_pool()
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "GetSupportedSizeRange",
+                self.vg.path,
+                ElementType=pywbem.Uint16(
+                        self.THIN_PROVISIONED_LOGICAL_DISK))
+        self.assertEqual(ret, 0)
+        self.assertEqual(outparams['VolumeSizeDivisor'],
+                self.vg['ExtentSize'])
+        self.assertTrue(outparams['MaximumVolumeSize']
+                > self.vg['TotalManagedSpace'])
+
+        (ret, outparams) = self.wbemconnection.InvokeMethod(
+                "GetSupportedSizeRange",
+                self.vg.path,
+                ElementType=pywbem.Uint16(self.LOGICAL_DISK))
+        self.assertEqual(ret, 0)
+        self.assertTrue(outparams['MaximumVolumeSize']
+                < self.vg['TotalManagedSpace'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -43,6 +43,16 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(cfg.namespace, "root/cimv2")
         self.assertEqual(cfg.system_class_name, "Linux_ComputerSystem")
         self.assertEqual(cfg.system_name, socket.getfqdn())
+        self.assertEqual(cfg.max_job_history, 1000)
+        self.assertEqual(cfg.max_job_history_size, 16 * 1024 * 1024)
+        self.assertEqual(cfg.job_priority_aging, 300)
+        self.assertEqual(cfg.statistics_log_interval, 3600)
+        self.assertEqual(cfg.sampling_interval, 10)
+        self.assertEqual(cfg.history_size, 360)
+        self.assertEqual(cfg.action_timeline_size, 100)
+        self.assertEqual(cfg.action_timeline_log, None)
+        self.assertEqual(cfg.backend, "blivet")
+        self.assertEqual(cfg.state_socket, None)
 
     def test_empty(self):
         """ Test configuration when CONFIG_FILE is empty."""
@@ -71,6 +81,16 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(cfg.namespace, "root/my/namespace")
         self.assertEqual(cfg.system_class_name, "My_ComputerSystem")
         self.assertEqual(cfg.system_name, socket.getfqdn())
+        self.assertEqual(cfg.max_job_history, 50)
+        self.assertEqual(cfg.max_job_history_size, None)
+        self.assertEqual(cfg.job_priority_aging, 60)
+        self.assertEqual(cfg.statistics_log_interval, None)
+        self.assertEqual(cfg.sampling_interval, 5)
+        self.assertEqual(cfg.history_size, 0)
+        self.assertEqual(cfg.action_timeline_size, 20)
+        self.assertEqual(cfg.action_timeline_log, "/tmp/timeline.log")
+        self.assertEqual(cfg.backend, "sysfs")
+        self.assertEqual(cfg.state_socket, "/tmp/state.socket")
 
     def tearDown(self):
         pass
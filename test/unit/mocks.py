@@ -0,0 +1,75 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+"""
+    Mockups shared by the unit tests.
+"""
+
+from openlmi.storage.BaseProvider import BaseProvider
+import pywbem
+
+class CMPILoggerMock(object):
+    """ Mockup of cmpi_bindings_pywbem Logger and env, which drops
+    everything."""
+    def get_logger(self):
+        return self
+
+    def log_error(self, msg):
+        pass
+
+    def log_warn(self, msg):
+        pass
+
+    def log_info(self, msg):
+        pass
+
+    def log_debug(self, msg):
+        pass
+
+    def trace_warn(self, component, msg):
+        pass
+
+    def trace_info(self, component, msg):
+        pass
+
+    def trace_verbose(self, component, msg):
+        pass
+
+class ExtentProviderMock(BaseProvider):
+    """
+        Provider of StorageExtents of all devices, which yields the same
+        model modified in place, as ExtentProvider does.
+    """
+    def __init__(self, storage, snapshot):
+        super(ExtentProviderMock, self).__init__(
+                storage, None, None, None, None, snapshot)
+        # DeviceIDs of devices, whose NumberOfBlocks was computed.
+        self.computed = []
+
+    def enum_instances(self, env, model, keys_only):
+        model.path.update({'DeviceID': None})
+        for device in self.storage.devices:
+            model['DeviceID'] = device.path
+            yield self.get_instance(env, model)
+
+    def get_instance(self, env, model):
+        model['Name'] = model['DeviceID']
+        if self.is_requested(model, 'NumberOfBlocks'):
+            self.computed.append(model['DeviceID'])
+            model['NumberOfBlocks'] = pywbem.Uint64(100)
+        return model
@@ -0,0 +1,138 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.CapabilitiesProvider import CapabilitiesProvider, \
+        ElementCapabilitiesProvider
+from openlmi.storage.ServiceProvider import ServiceProvider
+import openlmi.common.cmpi_logging as cmpi_logging
+import unittest
+from mocks import CMPILoggerMock
+
+class ConfigMock(object):
+    """ Mockup of StorageConfiguration, which counts system_name calls."""
+    def __init__(self):
+        self.namespace = 'root/cimv2'
+        self.system_class_name = 'Linux_ComputerSystem'
+        self.hostname = 'host1'
+        self.calls = 0
+        self.listeners = set()
+
+    @property
+    def system_name(self):
+        self.calls += 1
+        return self.hostname
+
+    def add_listener(self, callback):
+        self.listeners.add(callback)
+
+    def load(self):
+        for callback in self.listeners:
+            callback(self)
+
+class StaticCapabilities(CapabilitiesProvider):
+    """ Capabilities provider with static capabilities."""
+    def __init__(self, *args, **kwargs):
+        super(StaticCapabilities, self).__init__(
+                'LMI_TestCapabilities', *args, **kwargs)
+        self.instances = [
+            {
+                    'InstanceID': 'LMI:LMI_TestCapabilities:1',
+                    'SupportedSettings': [1, 2],
+            },
+            {
+                    'InstanceID': 'LMI:LMI_TestCapabilities:2',
+                    'SupportedSettings': [3],
+                    CapabilitiesProvider.DEFAULT_CAPABILITY: True,
+            },
+    ]
+
+class TestCapabilities(unittest.TestCase):
+    """
+        Test frozen capabilities and service instance names.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.config = ConfigMock()
+        opts = {
+                'storage': None,
+                'config': self.config,
+                'provider_manager': None,
+                'setting_manager': None,
+                'job_manager': None,
+        }
+        self.capabilities = StaticCapabilities(**opts)
+        self.service = ServiceProvider('LMI_TestService', **opts)
+        self.assoc = ElementCapabilitiesProvider('LMI_TestElementCapabilities',
+                self.capabilities, self.service, **opts)
+
+    def test_copy_on_read(self):
+        """ Test that returned capabilities can be modified."""
+        caps = self.capabilities.get_capabilities_for_id(
+                'LMI:LMI_TestCapabilities:1')
+        caps['SupportedSettings'].append(5)
+        caps['ElementName'] = 'modified'
+        caps = self.capabilities.get_capabilities_for_id(
+                'LMI:LMI_TestCapabilities:1')
+        self.assertEqual(caps['SupportedSettings'], [1, 2])
+        self.assertNotIn('ElementName', caps)
+
+        all_caps = self.capabilities.enumerate_capabilities()
+        self.assertEqual([c['InstanceID'] for c in all_caps],
+                ['LMI:LMI_TestCapabilities:1', 'LMI:LMI_TestCapabilities:2'])
+        all_caps[0]['SupportedSettings'].pop()
+        self.assertEqual(self.capabilities.enumerate_capabilities(),
+                self.capabilities.instances)
+
+        self.assertIsNone(self.capabilities.get_capabilities_for_id('foo'))
+        self.assertEqual(
+                self.capabilities.get_default_capabilities()['InstanceID'],
+                'LMI:LMI_TestCapabilities:2')
+
+    def test_names(self):
+        """ Test that system name is read only once per configuration."""
+        names = self.assoc.enumerate_capabilities()
+        self.assertEqual(len(names), 2)
+        self.assertEqual(names[0][0]['SystemName'], 'host1')
+        self.assertEqual(names[1][1]['InstanceID'],
+                'LMI:LMI_TestCapabilities:2')
+        names[0][0]['SystemName'] = 'modified'
+        names = self.assoc.enumerate_capabilities()
+        self.assertEqual(names[0][0]['SystemName'], 'host1')
+
+        service_name = self.service._get_instance_name()
+        self.service.check_instance(service_name)
+        service_name['Name'] = 'modified'
+        self.service.check_instance(self.service._get_instance_name())
+
+        # once per capabilities in the association, once in the service
+        self.assertEqual(self.config.calls, 3)
+
+        # reload refreezes the names
+        self.config.hostname = 'host2'
+        self.config.load()
+        names = self.assoc.enumerate_capabilities()
+        self.assertEqual(names[0][0]['SystemName'], 'host2')
+        self.assertEqual(self.service._get_instance_name()['SystemName'],
+                'host2')
+
+    def tearDown(self):
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
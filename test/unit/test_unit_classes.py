@@ -0,0 +1,86 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+import openlmi.storage.util.classes as classes
+import openlmi.common.cmpi_logging as cmpi_logging
+import unittest
+from mocks import CMPILoggerMock
+
+class CIMOMHandleMock(object):
+    """ Mockup of CIMOM handle, which counts is_subclass calls."""
+    def __init__(self):
+        self.calls = 0
+        self.hierarchy = {
+                'lmi_storageextent': 'cim_storageextent',
+                'cim_storageextent': 'cim_managedelement',
+        }
+
+    def is_subclass(self, namespace, sub, super):
+        self.calls += 1
+        sub = sub.lower()
+        while sub:
+            if sub == super.lower():
+                return True
+            sub = self.hierarchy.get(sub)
+        return False
+
+class EnvMock(object):
+    """ Mockup of ProviderEnvironment."""
+    def __init__(self):
+        self.cimom = CIMOMHandleMock()
+
+    def get_cimom_handle(self):
+        return self.cimom
+
+class TestClasses(unittest.TestCase):
+    """
+        Test cache of CIM class hierarchy.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.env = EnvMock()
+        classes.clear_cache()
+
+    def test_cache(self):
+        """ Test that CIMOM is asked only once for each pair of classes."""
+        self.assertTrue(classes.is_subclass(self.env, 'root/cimv2',
+                sub='LMI_StorageExtent', super='CIM_ManagedElement'))
+        self.assertTrue(classes.is_subclass(self.env, 'root/cimv2',
+                sub='lmi_storageextent', super='cim_managedelement'))
+        self.assertFalse(classes.is_subclass(self.env, 'root/cimv2',
+                sub='CIM_ManagedElement', super='LMI_StorageExtent'))
+        self.assertFalse(classes.is_subclass(self.env, 'root/cimv2',
+                sub='CIM_ManagedElement', super='LMI_StorageExtent'))
+        self.assertEqual(self.env.cimom.calls, 2)
+
+        # the same class does not need CIMOM at all
+        self.assertTrue(classes.is_subclass(self.env, 'root/cimv2',
+                sub='LMI_StorageExtent', super='LMI_StorageExtent'))
+        self.assertEqual(self.env.cimom.calls, 2)
+
+        classes.clear_cache()
+        classes.is_subclass(self.env, 'root/cimv2',
+                sub='LMI_StorageExtent', super='CIM_ManagedElement')
+        self.assertEqual(self.env.cimom.calls, 3)
+
+    def tearDown(self):
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util import diskstats
+import openlmi.common.cmpi_logging as cmpi_logging
+import os
+import shutil
+import tempfile
+import unittest
+from mocks import CMPILoggerMock
+
+DISKSTATS = """\
+   8       0 sda 1000 20 80000 500 2000 40 160000 1500 1 1800 2000
+   8       1 sda1 10 0 80 5 20 0 160 15 0 18 20
+   8       2 sda2 1 2 3 4
+ 253       0 dm-0 300 0 2400 100 400 0 3200 200 2 250 300 0 0 0 0
+"""
+
+class TestDiskStats(unittest.TestCase):
+    """
+        Test sampling of /proc/diskstats.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "diskstats")
+        self._write(DISKSTATS)
+
+    def _write(self, content):
+        """ Write the fake diskstats file."""
+        with open(self.path, "w") as f:
+            f.write(content)
+
+    def test_parse(self):
+        """ Test parsing of all devices in one read."""
+        stats = diskstats.read_diskstats(self.path)
+        # sda2 has only old-style counters
+        self.assertEqual(sorted(stats.keys()), ["dm-0", "sda", "sda1"])
+
+        sda = stats["sda"]
+        self.assertEqual(sda.read_ios, 1000)
+        self.assertEqual(sda.read_merges, 20)
+        self.assertEqual(sda.read_sectors, 80000)
+        self.assertEqual(sda.read_ticks, 500)
+        self.assertEqual(sda.write_ios, 2000)
+        self.assertEqual(sda.write_merges, 40)
+        self.assertEqual(sda.write_sectors, 160000)
+        self.assertEqual(sda.write_ticks, 1500)
+        self.assertEqual(sda.in_flight, 1)
+        self.assertEqual(sda.io_ticks, 1800)
+        self.assertEqual(sda.time_in_queue, 2000)
+        self.assertEqual(sda.total_ios, 3000)
+        self.assertEqual(sda.kbytes_read, 40000)
+        self.assertEqual(sda.kbytes_written, 80000)
+
+        # discard counters of new kernels are ignored
+        self.assertEqual(stats["dm-0"].time_in_queue, 300)
+
+    def test_missing(self):
+        """ Test reading of missing diskstats file."""
+        stats = diskstats.read_diskstats(self.path + ".missing")
+        self.assertEqual(stats, {})
+
+    def test_sampler(self):
+        """ Test the file is read only once per sampling interval."""
+        sampler = diskstats.DiskStatsSampler(3600, self.path)
+        (timestamp, stats) = sampler.get_sample()
+        self.assertEqual(stats["sda"].read_ios, 1000)
+
+        self._write(DISKSTATS.replace(" 1000 ", " 1001 "))
+        (timestamp2, stats2) = sampler.get_sample()
+        self.assertEqual(timestamp2, timestamp)
+        self.assertIs(stats2, stats)
+
+        sampler.set_interval(0)
+        (timestamp3, stats3) = sampler.get_sample()
+        self.assertEqual(stats3["sda"].read_ios, 1001)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util import iohistory
+from openlmi.storage.util.diskstats import DiskStats
+import openlmi.common.cmpi_logging as cmpi_logging
+import unittest
+from mocks import CMPILoggerMock
+
+def make_stats(ios, sectors=0, ticks=0, io_ticks=0):
+    """
+        Return diskstats of one device 'sda' with given nr. of reads and
+        writes, sectors read and written and time spent by them.
+    """
+    return {'sda': DiskStats('sda', [ios, 0, sectors, ticks, ios, 0,
+            sectors, ticks, 0, io_ticks, 2 * ticks])}
+
+class TestIOHistory(unittest.TestCase):
+    """
+        Test recording of I/O history in several resolutions.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+
+    def test_metrics(self):
+        """ Test computation of metrics from two samples."""
+        old = make_stats(100, 1000, 50, 1000)['sda']
+        new = make_stats(200, 3000, 150, 6000)['sda']
+        metrics = iohistory.compute_metrics(old, new, 10.0)
+        (read_iops, write_iops, read_kbps, write_kbps, latency,
+                utilization) = metrics
+        self.assertEqual(read_iops, 10.0)
+        self.assertEqual(write_iops, 10.0)
+        self.assertEqual(read_kbps, 100.0)
+        self.assertEqual(write_kbps, 100.0)
+        # 200 ms for 200 requests
+        self.assertEqual(latency, 1.0)
+        self.assertEqual(utilization, 50.0)
+
+        # counters went backwards
+        self.assertEqual(iohistory.compute_metrics(new, old, 10.0), None)
+
+    def test_resolutions(self):
+        """ Test downsampling to coarser resolutions."""
+        history = iohistory.IOHistory(size=5)
+        for i in xrange(0, 13):
+            # 10 requests per second
+            history.sample(1000.0 + i * 10, make_stats(i * 100))
+
+        fine = history.get_history('sda', 10)
+        # only the last 5 samples are kept
+        self.assertEqual([timestamp for (timestamp, _v) in fine],
+                [1080.0, 1090.0, 1100.0, 1110.0, 1120.0])
+        for (_timestamp, values) in fine:
+            self.assertAlmostEqual(values[0], 10.0)
+
+        coarse = history.get_history('sda', 60)
+        self.assertEqual([timestamp for (timestamp, _v) in coarse],
+                [1060.0, 1120.0])
+        for (_timestamp, values) in coarse:
+            self.assertAlmostEqual(values[0], 10.0)
+
+        self.assertEqual(history.get_history('sda', 900), [])
+        self.assertEqual(history.get_history('sdb', 10), [])
+
+        since = history.get_history('sda', 10, since=1100.0)
+        self.assertEqual([timestamp for (timestamp, _v) in since],
+                [1110.0, 1120.0])
+
+    def test_new_device(self):
+        """ Test device, which appears and disappears."""
+        history = iohistory.IOHistory(size=5)
+        history.sample(1000.0, {})
+        history.sample(1010.0, make_stats(100))
+        history.sample(1020.0, make_stats(200))
+        fine = history.get_history('sda', 10)
+        self.assertEqual(len(fine), 2)
+        # the first sample of the device is unknown
+        self.assertNotEqual(fine[0][1][0], fine[0][1][0])
+        self.assertAlmostEqual(fine[1][1][0], 10.0)
+
+        history.sample(1030.0, {})
+        self.assertEqual(history.get_history('sda', 10), [])
+
+    def test_disabled(self):
+        """ Test history with zero size."""
+        history = iohistory.IOHistory(size=0)
+        self.assertFalse(history.is_enabled())
+        history.sample(1000.0, make_stats(100))
+        history.sample(1010.0, make_stats(200))
+        self.assertEqual(history.get_history('sda', 10), [])
+
+        history.set_size(3)
+        self.assertTrue(history.is_enabled())
+        history.sample(1020.0, make_stats(300))
+        history.sample(1030.0, make_stats(400))
+        self.assertEqual(len(history.get_history('sda', 10)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
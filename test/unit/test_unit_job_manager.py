@@ -0,0 +1,328 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.JobManager import JobManager, Job, FinishedJob, \
+        JobStatistics
+import openlmi.common.cmpi_logging as cmpi_logging
+import pywbem
+import unittest
+import threading
+import time
+from mocks import CMPILoggerMock
+
+class IndicationManagerMock(object):
+    """ Mockup of IndicationManager without any subscribed filter."""
+    def add_filters(self, filters):
+        pass
+
+    def is_subscribed(self, filter_id):
+        return False
+
+    def send_instcreation(self, instance, filter_id):
+        pass
+
+    def send_instmodification(self, old_instance, new_instance, filter_id):
+        pass
+
+class TestJobManager(unittest.TestCase):
+    """
+        Test JobManager job queue and removal of finished jobs.
+    """
+    JOB_COUNT = 50000
+
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.manager = JobManager('Storage', 'root/cimv2',
+                IndicationManagerMock())
+        self.manager.get_providers()
+        # List of executed jobs, in order of execution.
+        self.executed = []
+
+    def _finish(self, job):
+        """ Execute callback of test jobs."""
+        self.executed.append(job)
+        job.finish_method(Job.STATE_FINISHED_OK)
+
+    def _block(self, job, event):
+        """ Execute callback, which blocks the worker until event is set."""
+        event.wait()
+        job.finish_method(Job.STATE_FINISHED_OK)
+
+    def _create_job(self, time_before_removal=Job.DEFAULT_TIME_BEFORE_REMOVAL,
+            priority=None):
+        """ Create and enqueue new test job."""
+        job = Job(self.manager, "TEST", {}, "Test", [], None, priority)
+        job.time_before_removal = time_before_removal
+        job.set_execute_action(self._finish, job)
+        self.manager.add_job(job)
+        return job
+
+    def _block_worker(self):
+        """
+        Enqueue a job, which blocks the worker thread until returned event
+        is set.
+        """
+        event = threading.Event()
+        job = Job(self.manager, "BLOCK", {}, "Block", [], None,
+                Job.PRIORITY_HIGH)
+        job.set_execute_action(self._block, job, event)
+        self.manager.add_job(job)
+        while job.job_state == Job.STATE_QUEUED:
+            time.sleep(0.01)
+        return event
+
+    def _wait_for_jobs(self, count, timeout=10):
+        """ Wait until number of jobs in JobManager drops to count."""
+        start = time.time()
+        while len(self.manager.jobs) > count:
+            if time.time() - start > timeout:
+                break
+            time.sleep(0.1)
+        self.assertEqual(len(self.manager.jobs), count)
+
+    def test_thread_count(self):
+        """
+            Test that finished jobs do not spawn any threads.
+        """
+        threads = threading.active_count()
+        for _i in xrange(self.JOB_COUNT):
+            self._create_job()
+        self.manager.queue.join()
+
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(len(self.manager.jobs), self.JOB_COUNT)
+        self.assertEqual(len(self.manager._expiration_times), self.JOB_COUNT)
+
+    def test_expiration(self):
+        """
+            Test that finished jobs are removed after TimeBeforeRemoval.
+        """
+        threads = threading.active_count()
+        for _i in xrange(self.JOB_COUNT):
+            self._create_job(time_before_removal=1)
+        self.manager.queue.join()
+
+        self._wait_for_jobs(0)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(len(self.manager._expiration_times), 0)
+
+    def test_delete_on_completion(self):
+        """
+            Test that DeleteOnCompletion=False and rescheduling cancel
+            scheduled removal.
+        """
+        kept = self._create_job(time_before_removal=1)
+        rescheduled = self._create_job(time_before_removal=1)
+        removed = self._create_job(time_before_removal=1)
+        self.manager.queue.join()
+
+        kept.lock()
+        kept.delete_on_completion = False
+        kept._restart_timer()
+        kept.unlock()
+
+        rescheduled.lock()
+        rescheduled.time_before_removal = 3600
+        rescheduled._restart_timer()
+        rescheduled.unlock()
+
+        self._wait_for_jobs(2)
+        self.assertIn(kept.the_id, self.manager.jobs)
+        self.assertIn(rescheduled.the_id, self.manager.jobs)
+        self.assertNotIn(removed.the_id, self.manager.jobs)
+
+    def test_history_count(self):
+        """
+            Test that only max_history completed jobs are kept, the oldest
+            are removed first and completed jobs are compacted.
+        """
+        self.manager.set_history_limits(10, None)
+        jobs = [self._create_job() for _i in xrange(20)]
+        self.manager.queue.join()
+
+        self.assertEqual(len(self.manager.jobs), 10)
+        for job in jobs[:10]:
+            self.assertNotIn(job.the_id, self.manager.jobs)
+        for job in jobs[10:]:
+            record = self.manager.jobs[job.the_id]
+            self.assertIsInstance(record, FinishedJob)
+            self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(len(self.manager._expiration_times), 10)
+
+    def test_history_size(self):
+        """
+            Test that completed jobs are removed when they occupy too much
+            memory.
+        """
+        job = self._create_job()
+        self.manager.queue.join()
+        size = self.manager.jobs[job.the_id].size
+
+        self.manager.set_history_limits(None, size * 5)
+        for _i in xrange(20):
+            self._create_job()
+        self.manager.queue.join()
+
+        self.assertLessEqual(self.manager.finished_jobs_size, size * 5)
+        self.assertEqual(self.manager.finished_jobs_size,
+                sum([j.size for j in self.manager.finished_jobs.values()]))
+        self.assertNotIn(job.the_id, self.manager.jobs)
+
+    def test_priority(self):
+        """
+            Test that jobs are executed in order of their priority and
+            jobs with the same priority in FIFO order.
+        """
+        self.manager.set_method_priority("Test", Job.PRIORITY_LOW)
+        event = self._block_worker()
+        low1 = self._create_job()
+        normal = self._create_job(priority=Job.PRIORITY_NORMAL)
+        low2 = self._create_job()
+        high = self._create_job(priority=Job.PRIORITY_HIGH)
+        self.assertEqual(low1.priority, Job.PRIORITY_LOW)
+        event.set()
+        self.manager.queue.join()
+
+        self.assertEqual(self.executed, [high, normal, low1, low2])
+
+    def test_aging(self):
+        """
+            Test that long waiting job gets higher priority.
+        """
+        self.manager.set_priority_aging(0.05)
+        event = self._block_worker()
+        low = self._create_job(priority=Job.PRIORITY_LOW)
+        time.sleep(0.5)
+        high = self._create_job(priority=Job.PRIORITY_HIGH)
+        event.set()
+        self.manager.queue.join()
+
+        self.assertEqual(self.executed, [low, high])
+
+    def test_queue_position(self):
+        """
+            Test queue positions, estimated waiting time, change of priority
+            and skipping of suspended jobs.
+        """
+        # Learn duration of "Test" jobs.
+        self._create_job()
+        self.manager.queue.join()
+        self.assertIsNotNone(self.manager.get_estimated_duration("Test"))
+
+        event = self._block_worker()
+        first = self._create_job()
+        suspended = self._create_job()
+        last = self._create_job(priority=Job.PRIORITY_LOW)
+        suspended.change_state(Job.STATE_SUSPENDED)
+
+        positions = self.manager.get_queue_positions()
+        self.assertEqual(positions[first.the_id][0], 1)
+        self.assertEqual(positions[last.the_id][0], 2)
+        self.assertNotIn(suspended.the_id, positions)
+        # Duration of the blocking job is not known.
+        self.assertIsNone(positions[first.the_id][1])
+
+        last.lock()
+        self.manager.set_job_priority(last, Job.PRIORITY_HIGH)
+        last.unlock()
+        positions = self.manager.get_queue_positions()
+        self.assertEqual(positions[last.the_id][0], 1)
+        self.assertEqual(positions[first.the_id][0], 2)
+
+        event.set()
+        self.manager.queue.join()
+        self.assertEqual(self.executed[1:], [last, first])
+        self.assertEqual(suspended.job_state, Job.STATE_SUSPENDED)
+        self.assertEqual(self.manager.get_queue_position(first), (None, None))
+
+    def _fail(self, job):
+        """ Execute callback of failing test jobs."""
+        raise Exception("Test failure")
+
+    def test_statistics(self):
+        """
+            Test statistics of completed, failed and cancelled jobs and of
+            the queue depth.
+        """
+        event = self._block_worker()
+        for _i in xrange(3):
+            self._create_job()
+        failed = Job(self.manager, "FAIL", {}, "Fail", [], None)
+        failed.set_execute_action(self._fail, failed)
+        self.manager.add_job(failed)
+        cancelled = self._create_job()
+        cancelled.lock()
+        cancelled.cancel()
+        self.manager.archive_job(cancelled)
+        cancelled.unlock()
+        # removed before it was archived
+        removed = self._create_job()
+        removed.lock()
+        removed.cancel()
+        self.manager.remove_job(removed)
+        self.manager.archive_job(removed)
+        removed.unlock()
+        self.assertEqual(self.manager.queue.qsize(), 6)
+
+        event.set()
+        self.manager.queue.join()
+        self.assertEqual(self.manager.queue.qsize(), 0)
+
+        stats = self.manager.get_statistics()
+        self.assertEqual([item.method_name for item in stats],
+                [None, "Block", "Fail", "Test"])
+        (total, block, fail, test) = stats
+        self.assertEqual(total.completed, 5)
+        self.assertEqual(total.failed, 1)
+        self.assertEqual(total.cancelled, 2)
+        self.assertEqual(sum(total.queue_wait_histogram), 5)
+        self.assertEqual(sum(total.run_time_histogram), 5)
+        self.assertEqual(sum(total.failed_run_time_histogram), 1)
+        self.assertEqual(block.completed, 1)
+        self.assertEqual(fail.failed, 1)
+        self.assertEqual(sum(fail.failed_run_time_histogram), 1)
+        self.assertEqual(test.completed, 3)
+        self.assertEqual(test.failed, 0)
+        self.assertEqual(test.cancelled, 2)
+
+        (depths, max_depth) = self.manager.get_queue_depths()
+        self.assertEqual(max_depth, 6)
+        self.assertEqual(depths[-1][1], 0)
+
+        instances = list(self.manager.providers[
+                'LMI_StorageJobStatistics'].enum_instances(None,
+                        pywbem.CIMInstance('LMI_StorageJobStatistics',
+                                path=pywbem.CIMInstanceName(
+                                        'LMI_StorageJobStatistics')),
+                        True))
+        self.assertEqual(len(instances), 4)
+
+    def test_statistics_buckets(self):
+        """ Test histogram bucket of a time."""
+        self.assertEqual(JobStatistics.get_bucket(0.05), 0)
+        self.assertEqual(JobStatistics.get_bucket(1), 1)
+        self.assertEqual(JobStatistics.get_bucket(1.5), 2)
+        self.assertEqual(JobStatistics.get_bucket(10000),
+                len(JobStatistics.BUCKETS))
+
+    def tearDown(self):
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util import lvm
+import unittest
+
+KILOBYTE = 1024
+MEGABYTE = 1024 * 1024
+
+class FakeLV(object):
+    """ LVMLogicalVolumeDevice with given attributes."""
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class TestLVM(unittest.TestCase):
+    def test_linear_args(self):
+        """ Test lvcreate arguments of linear logical volume."""
+        self.assertEqual(
+                lvm.get_lvcreate_args('vg', 'lv', 40 * MEGABYTE),
+                ['lvcreate', '--name', 'lv', '--size', '40960k', 'vg'])
+
+    def test_striped_args(self):
+        """ Test lvcreate arguments of striped logical volume."""
+        self.assertEqual(
+                lvm.get_lvcreate_args('vg', 'lv', 40 * MEGABYTE, stripes=2,
+                        stripe_size=128 * KILOBYTE),
+                ['lvcreate', '--name', 'lv', '--size', '40960k',
+                        '--stripes', '2', '--stripesize', '128k', 'vg'])
+        self.assertEqual(
+                lvm.get_lvcreate_args('vg', 'lv', 40 * MEGABYTE, stripes=3),
+                ['lvcreate', '--name', 'lv', '--size', '40960k',
+                        '--stripes', '3', 'vg'])
+
+    def test_mirrored_args(self):
+        """ Test lvcreate arguments of mirrored logical volumes."""
+        self.assertEqual(
+                lvm.get_lvcreate_args('vg', 'lv', 40 * MEGABYTE, mirrors=2),
+                ['lvcreate', '--name', 'lv', '--size', '40960k',
+                        '--type', 'raid1', '--mirrors', '2', 'vg'])
+        self.assertEqual(
+                lvm.get_lvcreate_args('vg', 'lv', 40 * MEGABYTE, stripes=2,
+                        stripe_size=64 * KILOBYTE, mirrors=1),
+                ['lvcreate', '--name', 'lv', '--size', '40960k',
+                        '--type', 'raid10', '--mirrors', '1',
+                        '--stripes', '2', '--stripesize', '64k', 'vg'])
+
+    def test_stripe_size(self):
+        """ Test validation of stripe size."""
+        extent_size = 4 * MEGABYTE
+        self.assertTrue(lvm.is_valid_stripe_size(4 * KILOBYTE, extent_size))
+        self.assertTrue(lvm.is_valid_stripe_size(512 * KILOBYTE, extent_size))
+        self.assertFalse(lvm.is_valid_stripe_size(2 * KILOBYTE, extent_size))
+        self.assertFalse(lvm.is_valid_stripe_size(1 * MEGABYTE, extent_size))
+        self.assertFalse(lvm.is_valid_stripe_size(96 * KILOBYTE, extent_size))
+        # stripe must not be larger than an extent
+        self.assertEqual(lvm.get_max_stripe_size(64 * KILOBYTE),
+                64 * KILOBYTE)
+        self.assertFalse(lvm.is_valid_stripe_size(128 * KILOBYTE,
+                64 * KILOBYTE))
+
+    def test_layout(self):
+        """ Test layout of logical volumes."""
+        self.assertEqual(lvm.get_lv_layout(FakeLV()), (1, 0))
+        self.assertEqual(lvm.get_lv_layout(FakeLV(stripes=3, copies=2)),
+                (3, 1))
+
+    def test_cache_args(self):
+        """ Test lvm arguments of cache operations."""
+        self.assertEqual(
+                lvm.get_cache_pool_args('vg', 'cache', 40 * MEGABYTE,
+                        ['/dev/sdb1']),
+                ['lvcreate', '--type', 'cache-pool', '--name', 'cache',
+                        '--size', '40960k', 'vg', '/dev/sdb1'])
+        self.assertEqual(
+                lvm.get_attach_cache_args('vg', 'lv', 'cache',
+                        lvm.CACHE_MODE_WRITEBACK),
+                ['lvconvert', '--yes', '--type', 'cache',
+                        '--cachepool', 'vg/cache', '--cachemode', 'writeback',
+                        'vg/lv'])
+        self.assertEqual(lvm.get_detach_cache_args('vg', 'lv'),
+                ['lvconvert', '--yes', '--splitcache', 'vg/lv'])
+        self.assertEqual(lvm.get_detach_cache_args('vg', 'lv', True),
+                ['lvconvert', '--yes', '--uncache', 'vg/lv'])
+
+    def test_cache_status(self):
+        """ Test parsing of dm-cache status."""
+        status = lvm.parse_cache_status("0 2097152 cache 8 174/8192 128 "
+                "3/16384 10 20 30 40 0 3 1 1 writethrough 2 "
+                "migration_threshold 2048 smq 0 rw -\n")
+        self.assertEqual(status['mode'], lvm.CACHE_MODE_WRITETHROUGH)
+        self.assertEqual(status['metadata_block_size'], 4 * KILOBYTE)
+        self.assertEqual(status['metadata_used_blocks'], 174)
+        self.assertEqual(status['metadata_total_blocks'], 8192)
+        self.assertEqual(status['block_size'], 64 * KILOBYTE)
+        self.assertEqual(status['used_blocks'], 3)
+        self.assertEqual(status['total_blocks'], 16384)
+        self.assertEqual(status['read_hits'], 10)
+        self.assertEqual(status['read_misses'], 20)
+        self.assertEqual(status['write_hits'], 30)
+        self.assertEqual(status['write_misses'], 40)
+        self.assertEqual(status['demotions'], 0)
+        self.assertEqual(status['promotions'], 3)
+        self.assertEqual(status['dirty_blocks'], 1)
+
+        # no features -> dm-cache default
+        status = lvm.parse_cache_status("0 2097152 cache 8 174/8192 128 "
+                "3/16384 10 20 30 40 0 3 1 0 2 "
+                "migration_threshold 2048 smq 0 rw -")
+        self.assertEqual(status['mode'], lvm.CACHE_MODE_WRITEBACK)
+
+        self.assertEqual(lvm.parse_cache_status("0 2097152 linear"), None)
+        self.assertEqual(lvm.parse_cache_status("0 2097152 cache Fail"), None)
+
+    def test_thin_args(self):
+        """ Test lvcreate arguments of thin pools and thin volumes."""
+        self.assertEqual(
+                lvm.get_thin_pool_args('vg', 'pool', 100 * MEGABYTE),
+                ['lvcreate', '--type', 'thin-pool', '--name', 'pool',
+                        '--size', '102400k', 'vg'])
+        self.assertEqual(
+                lvm.get_thin_pool_args('vg', None, 100 * MEGABYTE),
+                ['lvcreate', '--type', 'thin-pool', '--size', '102400k',
+                        'vg'])
+        self.assertEqual(
+                lvm.get_thin_lv_args('vg', 'lv', 'pool', 1024 * MEGABYTE),
+                ['lvcreate', '--type', 'thin', '--name', 'lv',
+                        '--virtualsize', '1048576k', '--thinpool', 'vg/pool'])
+        self.assertEqual(
+                lvm.get_thin_snapshot_args('vg', 'snap', 'lv'),
+                ['lvcreate', '--snapshot', '--setactivationskip', 'n',
+                        '--name', 'snap', 'vg/lv'])
+        self.assertEqual(
+                lvm.get_thin_snapshot_args('vg', None, 'lv'),
+                ['lvcreate', '--snapshot', '--setactivationskip', 'n',
+                        'vg/lv'])
+
+    def test_thin_pool_status(self):
+        """ Test parsing of dm-thin-pool status."""
+        status = lvm.parse_thin_pool_status("0 204800 thin-pool 1 "
+                "20/1024 40/1600 - rw discard_passdown queue_if_no_space -\n")
+        self.assertEqual(status['data_size'], 100 * MEGABYTE)
+        # 64 KiB data blocks
+        self.assertEqual(status['data_used'], 40 * 64 * KILOBYTE)
+        self.assertEqual(status['metadata_size'], 4 * MEGABYTE)
+        self.assertEqual(status['metadata_used'], 20 * 4 * KILOBYTE)
+
+        self.assertEqual(lvm.parse_thin_pool_status("0 204800 linear"), None)
+        self.assertEqual(
+                lvm.parse_thin_pool_status("0 204800 thin-pool Fail"), None)
+
+    def test_lvextend_args(self):
+        """ Test arguments of lvm commands without explicit names."""
+        self.assertEqual(
+                lvm.get_lvextend_args('vg', 'lv', 80 * MEGABYTE),
+                ['lvextend', '--size', '81920k', 'vg/lv'])
+        self.assertEqual(
+                lvm.get_lvcreate_args('vg', None, 40 * MEGABYTE),
+                ['lvcreate', '--size', '40960k', 'vg'])
+        self.assertEqual(
+                lvm.get_cache_pool_args('vg', None, 40 * MEGABYTE),
+                ['lvcreate', '--type', 'cache-pool', '--size', '40960k',
+                        'vg'])
+
+    def test_map_name(self):
+        """ Test escaping of device-mapper names of logical volumes."""
+        self.assertEqual(lvm.get_map_name('vg', 'lv'), 'vg-lv')
+        self.assertEqual(lvm.get_map_name('my-vg', 'my-lv'), 'my--vg-my--lv')
+
+    def test_free_extents(self):
+        """ Test free extents of volume group without thin pool."""
+        lv = FakeLV(mapName='nonexistent-vg-lv')
+        vg = FakeLV(name='vg', lvs=[lv], freeExtents=10)
+        self.assertFalse(lvm.has_thin_pool(vg))
+        self.assertEqual(lvm.get_free_extents(vg), 10)
+        vg.freeExtents = -5
+        self.assertEqual(lvm.get_free_extents(vg), 0)
+
+    def test_thin_lv_pool_map(self):
+        """ Test detection of thin volumes without sysfs path."""
+        self.assertEqual(lvm.get_thin_lv_pool_map(None), None)
+        self.assertEqual(
+                lvm.get_thin_lv_pool_map('/nonexistent/block/dm-0'), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util.partitioning import FreeSpaceIndex
+import unittest
+
+class TestFreeSpaceIndex(unittest.TestCase):
+    """
+        Test index of free regions on a disk.
+    """
+
+    def setUp(self):
+        self.index = FreeSpaceIndex(2048)
+        self.index.add(34, 4095)
+        self.index.add(100000, 199999)
+        self.index.add(300000, 1000000)
+
+    def test_aligned(self):
+        """ Test that returned regions are aligned."""
+        self.assertEqual(self.index.first_fit(1), (2048, 4095))
+        self.assertEqual(self.index.largest(), (301056, 999423))
+
+        logical = FreeSpaceIndex(2048, reserved=1)
+        logical.add(2048, 10239)
+        self.assertEqual(logical.largest(), (4096, 10239))
+
+    def test_fit(self):
+        """ Test first fit and best fit queries."""
+        self.assertEqual(self.index.first_fit(4096), (100352, 198655))
+        self.assertEqual(self.index.best_fit(4096), (100352, 198655))
+        self.assertEqual(self.index.best_fit(100000), (301056, 999423))
+        self.assertEqual(self.index.first_fit(1000000), None)
+        self.assertEqual(self.index.best_fit(1000000), None)
+
+    def test_update(self):
+        """ Test incremental updates of the index."""
+        self.index.remove(301056, 999423)
+        self.assertEqual(self.index.regions, [(34, 4095), (100000, 199999),
+                (300000, 301055), (999424, 1000000)])
+        self.assertEqual(self.index.largest(), (100352, 198655))
+
+        self.index.add(301056, 999423)
+        self.assertEqual(self.index.regions, [(34, 4095), (100000, 199999),
+                (300000, 1000000)])
+
+        # merge with both neighbours
+        self.index.add(4096, 99999)
+        self.assertEqual(self.index.regions, [(34, 199999),
+                (300000, 1000000)])
+
+        # remove a range covering several regions
+        self.index.remove(0, 500000)
+        self.assertEqual(self.index.regions, [(500001, 1000000)])
+        self.assertEqual(self.index.lengths, [(497664, 501760, 999423)])
+
+        self.index.clear()
+        self.assertEqual(self.index.largest(), None)
+
+    def test_equal_lengths(self):
+        """ Test that the first of equally long regions is returned."""
+        index = FreeSpaceIndex(2048)
+        index.add(8192, 10239)
+        index.add(2048, 4095)
+        index.add(20480, 40959)
+        self.assertEqual(index.largest(), (20480, 40959))
+        self.assertEqual(index.best_fit(1), (2048, 4095))
+        self.assertEqual(index.first_fit(1), (2048, 4095))
+        self.assertEqual(index.first_fit(4096), (20480, 40959))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.ProviderManager import ProviderManager
+import openlmi.common.cmpi_logging as cmpi_logging
+import gc
+import unittest
+from mocks import CMPILoggerMock
+
+class DeviceMock(object):
+    """ Mockup of blivet StorageDevice."""
+    def __init__(self, path, disk=True):
+        self.path = path
+        self.disk = disk
+
+class DeviceProviderMock(object):
+    """ Mockup of DeviceProvider, which counts created names."""
+    def __init__(self, disks):
+        self.disks = disks
+        self.names = 0
+
+    def provides_device(self, device):
+        return device.disk == self.disks
+
+    def get_name_for_device(self, device):
+        self.names += 1
+        return (self, device.path)
+
+class TestProviderManager(unittest.TestCase):
+    """
+        Test cache of device names in ProviderManager.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.manager = ProviderManager()
+        self.disks = DeviceProviderMock(True)
+        self.others = DeviceProviderMock(False)
+        self.manager.add_device_provider(self.disks)
+        self.manager.add_device_provider(self.others)
+
+    def test_cache(self):
+        """ Test that names are created only once per device."""
+        sda = DeviceMock("/dev/sda")
+        md0 = DeviceMock("/dev/md0", disk=False)
+        name = self.manager.get_name_for_device(sda)
+        self.assertEqual(name, (self.disks, "/dev/sda"))
+        self.assertIs(self.manager.get_name_for_device(sda), name)
+        self.assertIs(self.manager.get_provider_for_device(sda), self.disks)
+        self.assertIs(self.manager.get_provider_for_device(md0), self.others)
+        self.manager.get_name_for_device(md0)
+        self.assertEqual(self.disks.names, 1)
+        self.assertEqual(self.others.names, 1)
+
+        # renamed device gets new name
+        md0.path = "/dev/md/test"
+        self.assertEqual(self.manager.get_name_for_device(md0),
+                (self.others, "/dev/md/test"))
+
+        # the cache does not keep devices alive
+        del sda
+        del md0
+        gc.collect()
+        self.assertEqual(len(self.manager._device_cache), 0)
+
+    def tearDown(self):
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
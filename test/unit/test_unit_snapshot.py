@@ -0,0 +1,245 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage import StorageSnapshot
+import openlmi.common.cmpi_logging as cmpi_logging
+import pywbem
+import shutil
+import tempfile
+import unittest
+from mocks import CMPILoggerMock, ExtentProviderMock
+
+class ConfigMock(object):
+    """ Mockup of StorageConfiguration with temporary persistent path."""
+    def __init__(self, path):
+        self.PERSISTENT_PATH = path + '/'
+        self.SNAPSHOT_FILE = 'snapshot'
+
+class InstanceNameMock(object):
+    """ Mockup of pywbem.CIMInstanceName."""
+    def __init__(self, classname, name):
+        self.classname = classname
+        self.keybindings = {'Name': name}
+
+class InstanceMock(object):
+    """ Mockup of pywbem.CIMInstance."""
+    def __init__(self, classname, name):
+        self.path = InstanceNameMock(classname, name)
+
+    def __eq__(self, other):
+        return self.path.keybindings == other.path.keybindings
+
+class DeviceMock(object):
+    """ Mockup of blivet StorageDevice."""
+    def __init__(self, path, parents=None):
+        self.name = path
+        self.path = path
+        self.type = "disk"
+        self.parents = parents or []
+        self.format = None
+        self.size = 100
+
+class DeviceTreeMock(object):
+    """ Mockup of blivet DeviceTree."""
+    pass
+
+class StorageMock(object):
+    """ Mockup of blivet.Blivet."""
+    def __init__(self):
+        self.devices = []
+        self.reset()
+
+    def reset(self):
+        self.devicetree = DeviceTreeMock()
+
+class TestStorageSnapshot(unittest.TestCase):
+    """
+        Test persistent snapshot of storage topology.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.directory = tempfile.mkdtemp()
+        self.config = ConfigMock(self.directory)
+        self.block_devices = [(8, 0, 1024, 'sda'), (8, 1, 512, 'sda1')]
+        self.orig_get_block_devices = StorageSnapshot.get_block_devices
+        StorageSnapshot.get_block_devices = lambda: self.block_devices
+
+        self.storage = StorageMock()
+        sda = DeviceMock('/dev/sda')
+        self.storage.devices = [sda, DeviceMock('/dev/sda1', [sda])]
+
+    def _store(self, snapshot):
+        """ Store instances of two classes."""
+        snapshot.store_instances(self.storage, "LMI_StorageExtent",
+                [InstanceMock("LMI_StorageExtent", "/dev/sda")])
+        snapshot.store_instances(self.storage, "LMI_DiskPartition",
+                [InstanceMock("LMI_DiskPartition", "/dev/sda1")])
+        snapshot.flush()
+
+    def test_load(self):
+        """ Test that stored snapshot is loaded after restart."""
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        self.assertFalse(snapshot.load())
+        snapshot.set_ready(self.storage)
+        self._store(snapshot)
+
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        self.assertTrue(snapshot.load())
+        self.assertFalse(snapshot.is_ready())
+        self.assertEqual(snapshot.generation, 1)
+        self.assertEqual(snapshot.devices['/dev/sda1']['parents'],
+                ['/dev/sda'])
+        self.assertEqual(len(snapshot.get_instances("lmi_storageextent")), 1)
+        instance = snapshot.get_instance(
+                InstanceNameMock("LMI_DiskPartition", "/dev/sda1"))
+        self.assertEqual(instance.path.keybindings['Name'], '/dev/sda1')
+        self.assertIsNone(snapshot.get_instance(
+                InstanceNameMock("LMI_DiskPartition", "/dev/sda2")))
+        self.assertIsNone(snapshot.get_instances("LMI_VGStoragePool"))
+
+    def test_invalidation(self):
+        """ Test that snapshot is ignored when block devices change."""
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        snapshot.set_ready(self.storage)
+        self._store(snapshot)
+
+        self.block_devices = [(8, 0, 1024, 'sda')]
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        self.assertFalse(snapshot.load())
+        self.assertIsNone(snapshot.get_instances("LMI_StorageExtent"))
+
+    def test_generation(self):
+        """ Test that reset of device tree drops cached instances."""
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        snapshot.set_ready(self.storage)
+        self.assertTrue(snapshot.is_ready())
+        self._store(snapshot)
+        self.assertEqual(snapshot.generation, 1)
+
+        self.storage.reset()
+        snapshot.store_instances(self.storage, "LMI_StorageExtent",
+                [InstanceMock("LMI_StorageExtent", "/dev/sda")])
+        self.assertEqual(snapshot.generation, 2)
+        self.assertIsNone(snapshot.get_instances("LMI_DiskPartition"))
+        self.assertEqual(len(snapshot.get_instances("LMI_StorageExtent")), 1)
+        snapshot.flush()
+
+    def test_save_once(self):
+        """ Test that the snapshot is saved once per generation."""
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        saves = []
+        orig_save = snapshot.save
+        snapshot.save = lambda: saves.append(orig_save())
+        snapshot.set_ready(self.storage)
+        self._store(snapshot)
+        snapshot.store_instances(self.storage, "LMI_VGStoragePool", [])
+        snapshot.flush()
+        self.assertEqual(len(saves), 1)
+
+        # new generation removes the old one from disk
+        self.storage.reset()
+        snapshot.update(self.storage)
+        self.assertFalse(StorageSnapshot.StorageSnapshot(self.config).load())
+        self._store(snapshot)
+        self.assertEqual(len(saves), 2)
+
+    def _enumerate(self, provider, property_list=None):
+        """
+            Enumerate StorageExtents of given provider. Each instance is
+            copied, as CIMOM consumes it before the next one is yielded.
+        """
+        return [instance.copy() for instance in provider.MI_enumInstances(
+                CMPILoggerMock(), pywbem.CIMInstanceName('LMI_StorageExtent'),
+                property_list)]
+
+    def test_provider_store(self):
+        """ Test that enumeration of a provider is stored in snapshot."""
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        snapshot.set_ready(self.storage)
+        provider = ExtentProviderMock(self.storage, snapshot)
+        self._enumerate(provider)
+        snapshot.flush()
+        instances = snapshot.get_instances('LMI_StorageExtent')
+        self.assertEqual([instance['DeviceID'] for instance in instances],
+                ['/dev/sda', '/dev/sda1'])
+        self.assertEqual([instance.path['DeviceID'] for instance in instances],
+                ['/dev/sda', '/dev/sda1'])
+
+    def test_provider_property_list(self):
+        """
+            Test that enumeration with PropertyList computes only requested
+            properties and it is not stored in the snapshot.
+        """
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        snapshot.set_ready(self.storage)
+        provider = ExtentProviderMock(self.storage, snapshot)
+        instances = self._enumerate(provider, ['Name'])
+        self.assertEqual([instance['Name'] for instance in instances],
+                ['/dev/sda', '/dev/sda1'])
+        self.assertEqual(provider.computed, [])
+        self.assertIsNone(snapshot.get_instances('LMI_StorageExtent'))
+
+        instances = self._enumerate(provider, ['NumberOfBlocks'])
+        self.assertEqual(provider.computed, ['/dev/sda', '/dev/sda1'])
+        self.assertNotIn('Name', instances[0])
+
+    def test_provider_load(self):
+        """
+            Test that a provider serves instances from loaded snapshot and
+            filters them by PropertyList.
+        """
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        snapshot.set_ready(self.storage)
+        self._enumerate(ExtentProviderMock(self.storage, snapshot))
+        snapshot.flush()
+
+        snapshot = StorageSnapshot.StorageSnapshot(self.config)
+        self.assertTrue(snapshot.load())
+        provider = ExtentProviderMock(self.storage, snapshot)
+        instances = self._enumerate(provider)
+        self.assertEqual([instance['Name'] for instance in instances],
+                ['/dev/sda', '/dev/sda1'])
+        self.assertEqual(instances[0]['NumberOfBlocks'], 100)
+
+        instances = self._enumerate(provider, ['Name'])
+        self.assertEqual([instance['Name'] for instance in instances],
+                ['/dev/sda', '/dev/sda1'])
+        self.assertEqual(sorted(instances[1].keys()), ['DeviceID', 'Name'])
+
+        name = pywbem.CIMInstanceName('LMI_StorageExtent',
+                keybindings={'DeviceID': '/dev/sda1'})
+        instance = provider.MI_getInstance(CMPILoggerMock(), name, ['name'])
+        self.assertEqual(sorted(instance.keys()), ['DeviceID', 'Name'])
+        self.assertEqual(instance['Name'], '/dev/sda1')
+        instance = provider.MI_getInstance(CMPILoggerMock(), name, None)
+        self.assertEqual(instance['NumberOfBlocks'], 100)
+
+        # the snapshot is not modified by the filtering
+        self.assertEqual(len(snapshot.get_instance(name).keys()), 3)
+        # nothing was computed, the storage was not needed
+        self.assertEqual(provider.computed, [])
+        self.assertFalse(snapshot.is_ready())
+
+    def tearDown(self):
+        StorageSnapshot.get_block_devices = self.orig_get_block_devices
+        shutil.rmtree(self.directory)
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
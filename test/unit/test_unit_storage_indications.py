@@ -0,0 +1,112 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+import pywbem
+from openlmi.storage.StorageIndications import StorageIndications
+import openlmi.common.cmpi_logging as cmpi_logging
+import unittest
+from mocks import CMPILoggerMock
+
+class IndicationManagerMock(object):
+    """ Mockup of IndicationManager, which records sent indications."""
+    def __init__(self):
+        self.filters = {}
+        self.subscribed = set()
+        self.sent = []
+
+    def add_filters(self, filters):
+        self.filters.update(filters)
+
+    def is_subscribed(self, filter_id):
+        return filter_id in self.subscribed
+
+    def send_instcreation(self, instance, filter_id):
+        self.sent.append(('created', instance['DeviceID'], filter_id))
+
+    def send_instdeletion(self, instance, filter_id):
+        self.sent.append(('deleted', instance['DeviceID'], filter_id))
+
+    def send_instmodification(self, old_instance, new_instance, filter_id):
+        self.sent.append(('changed', new_instance['DeviceID'], filter_id))
+
+class ExtentProviderMock(object):
+    """ Mockup of ExtentProvider, enumerates devices with their sizes."""
+    def __init__(self):
+        self.devices = {}
+        self.enumerations = 0
+
+    def enum_instances(self, env, model, keys_only):
+        self.enumerations += 1
+        for (path, size) in sorted(self.devices.items()):
+            model.path['DeviceID'] = path
+            model['DeviceID'] = path
+            model['NumberOfBlocks'] = pywbem.Uint64(size)
+            yield model
+
+class TestStorageIndications(unittest.TestCase):
+    """
+        Test indications generated by diffing device tree generations.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.manager = IndicationManagerMock()
+        self.provider = ExtentProviderMock()
+        self.indications = StorageIndications(self.manager, 'root/cimv2')
+        self.indications.add_provider('extent', 'LMI_StorageExtent',
+                self.provider)
+
+    def test_filters(self):
+        """ Test that all filters are registered."""
+        self.assertEqual(len(self.manager.filters), 9)
+        query = self.manager.filters[StorageIndications.IND_POOL_DELETED]
+        self.assertEqual(query['Query'], "SELECT * FROM CIM_InstDeletion "
+                "WHERE SourceInstance ISA LMI_VGStoragePool")
+
+    def test_not_subscribed(self):
+        """ Test that nothing is enumerated without subscription."""
+        self.indications.storage_changing(None)
+        self.provider.devices['/dev/sda'] = 10
+        self.indications.storage_changed(None)
+        self.assertEqual(self.provider.enumerations, 0)
+        self.assertEqual(self.manager.sent, [])
+
+    def test_diff(self):
+        """ Test creation, deletion and modification indications."""
+        self.manager.subscribed.add(StorageIndications.IND_EXTENT_CREATED)
+        self.provider.devices = {'/dev/sda': 10, '/dev/sdb': 20}
+        self.indications.storage_changing(None)
+        self.provider.devices = {'/dev/sda': 15, '/dev/sdc': 30}
+        self.indications.storage_changed(None)
+        self.assertEqual(sorted(self.manager.sent), [
+                ('changed', '/dev/sda', StorageIndications.IND_EXTENT_CHANGED),
+                ('created', '/dev/sdc', StorageIndications.IND_EXTENT_CREATED),
+                ('deleted', '/dev/sdb', StorageIndications.IND_EXTENT_DELETED),
+        ])
+        self.assertEqual(self.provider.enumerations, 2)
+
+        # reset without previous enumeration sends nothing
+        self.manager.sent = []
+        self.indications.storage_changed(None)
+        self.assertEqual(self.manager.sent, [])
+
+    def tearDown(self):
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
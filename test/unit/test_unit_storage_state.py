@@ -0,0 +1,231 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.StorageState import StorageState, StorageStateServer, \
+        StorageStateConnection, StorageStateClient
+import openlmi.common.cmpi_logging as cmpi_logging
+import os
+import pywbem
+import shutil
+import tempfile
+import threading
+import unittest
+from mocks import CMPILoggerMock, ExtentProviderMock
+
+class InstanceNameMock(object):
+    """ Mockup of pywbem.CIMInstanceName."""
+    def __init__(self, classname, name):
+        self.classname = classname
+        self.keybindings = {'Name': name}
+
+class InstanceMock(object):
+    """ Mockup of pywbem.CIMInstance."""
+    def __init__(self, classname, name):
+        self.path = InstanceNameMock(classname, name)
+
+class DeviceMock(object):
+    """ Mockup of blivet StorageDevice."""
+    def __init__(self, path):
+        self.path = path
+
+class StorageMock(object):
+    """ Mockup of blivet.Blivet, which counts resets."""
+    def __init__(self):
+        self.resets = 0
+        self.devices = [DeviceMock('/dev/sda'), DeviceMock('/dev/sdb')]
+        self.devicetree = object()
+
+    def reset(self):
+        self.resets += 1
+        self.devicetree = object()
+
+class StorageUtilMock(object):
+    """
+        Mockup of openlmi.storage.util.storage, which calls reset listeners
+        and counts watchers.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset_listeners = []
+        self.watchers = 0
+
+    def lock_storage(self):
+        return self.lock
+
+    def reset_storage(self, storage, reason):
+        with self.lock:
+            storage.reset()
+            for callback in self.reset_listeners:
+                callback(storage)
+
+    def watch_external_changes(self, storage):
+        self.watchers += 1
+        return True
+
+class TestStorageState(unittest.TestCase):
+    """
+        Test storage state shared by several provider processes.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "state.socket")
+
+    def _start_server(self, state=None):
+        """ Start the daemon in a thread."""
+        server = StorageStateServer(self.path, state)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+    def test_clients(self):
+        """ Test that instances are shared and invalidated."""
+        state = StorageState()
+        first = StorageStateClient(StorageMock(), state)
+        second = StorageStateClient(StorageMock(), state)
+        # ask the daemon on each check
+        first.READY_CHECK_INTERVAL = 0
+        second.READY_CHECK_INTERVAL = 0
+
+        self.assertFalse(first.is_ready())
+        self.assertIsNone(first.get_instances("LMI_StorageExtent"))
+        first.wait_for_ready()
+        self.assertTrue(first.is_ready())
+        first.store_instances(first.storage, "LMI_StorageExtent",
+                [InstanceMock("LMI_StorageExtent", "/dev/sda")])
+
+        # the second process does not need to reset its storage
+        self.assertEqual(len(second.get_instances("lmi_storageextent")), 1)
+        self.assertIsNotNone(second.get_instance(
+                InstanceNameMock("LMI_StorageExtent", "/dev/sda")))
+        self.assertEqual(second.storage.resets, 0)
+
+        # the second process modifies the storage
+        second.wait_for_ready()
+        second.storage_changed(second.storage)
+        self.assertTrue(second.is_ready())
+        self.assertFalse(first.is_ready())
+        self.assertIsNone(first.get_instances("LMI_StorageExtent"))
+
+        # outdated instances are not stored
+        first.store_instances(first.storage, "LMI_StorageExtent",
+                [InstanceMock("LMI_StorageExtent", "/dev/sda")])
+        self.assertIsNone(second.get_instances("LMI_StorageExtent"))
+
+        first.wait_for_ready()
+        self.assertEqual(first.storage.resets, 2)
+        self.assertTrue(first.is_ready())
+
+    def test_storage_util(self):
+        """ Test reset through storage_util and cached readiness."""
+        state = StorageState()
+        storage_util = StorageUtilMock()
+        client = StorageStateClient(StorageMock(), state, storage_util)
+        storage_util.reset_listeners.append(client.storage_changed)
+
+        client.wait_for_ready()
+        self.assertEqual(client.storage.resets, 1)
+        self.assertEqual(storage_util.watchers, 1)
+        # catching up with the daemon does not invalidate other processes
+        self.assertEqual(state.generation, 1)
+
+        # readiness is not checked with the daemon immediately
+        state.call('invalidate')
+        self.assertTrue(client.is_ready())
+        client.READY_CHECK_INTERVAL = 0
+        self.assertFalse(client.is_ready())
+        client.wait_for_ready()
+        self.assertEqual(client.storage.resets, 2)
+        self.assertEqual(storage_util.watchers, 1)
+        self.assertEqual(state.generation, 2)
+        self.assertTrue(client.is_ready())
+
+    def test_server(self):
+        """ Test requests over the socket and reconnection."""
+        state = StorageState()
+        server = self._start_server(state)
+        connection = StorageStateConnection(self.path)
+        self.assertEqual(connection.call('get_generation'), 1)
+        self.assertTrue(connection.call('store_instances', 1,
+                "LMI_StorageExtent", ["instance"]))
+        self.assertEqual(connection.call('get_instances',
+                "LMI_StorageExtent"), ["instance"])
+        self.assertRaises(ValueError, connection.call, 'unknown')
+
+        # restart the daemon, the state is kept
+        server.shutdown()
+        server.server_close()
+        server = self._start_server(state)
+        self.assertEqual(connection.call('invalidate'), 2)
+        server.shutdown()
+        server.server_close()
+
+    def test_providers(self):
+        """ Test instances shared by providers of two processes."""
+        state = StorageState()
+        server = self._start_server(state)
+        first = StorageStateClient(StorageMock(),
+                StorageStateConnection(self.path))
+        second = StorageStateClient(StorageMock(),
+                StorageStateConnection(self.path))
+        first_provider = ExtentProviderMock(first.storage, first)
+        second_provider = ExtentProviderMock(second.storage, second)
+        env = CMPILoggerMock()
+        path = pywbem.CIMInstanceName('LMI_StorageExtent')
+
+        first.wait_for_ready()
+        list(first_provider.MI_enumInstances(env, path, None))
+        self.assertEqual(first_provider.computed, ['/dev/sda', '/dev/sdb'])
+
+        instances = list(second_provider.MI_enumInstances(env, path, None))
+        self.assertEqual([instance['Name'] for instance in instances],
+                ['/dev/sda', '/dev/sdb'])
+        self.assertEqual(instances[1]['NumberOfBlocks'], 100)
+
+        name = pywbem.CIMInstanceName('LMI_StorageExtent',
+                keybindings={'DeviceID': '/dev/sdb'})
+        instance = second_provider.MI_getInstance(env, name, ['Name'])
+        self.assertEqual(sorted(instance.keys()), ['DeviceID', 'Name'])
+        self.assertEqual(instance['Name'], '/dev/sdb')
+
+        # the second process did not need its blivet
+        self.assertEqual(second_provider.computed, [])
+        self.assertEqual(second.storage.resets, 0)
+        server.shutdown()
+        server.server_close()
+
+    def test_no_daemon(self):
+        """ Test that blivet is used when the daemon is not running."""
+        connection = StorageStateConnection(self.path)
+        self.assertRaises(EnvironmentError, connection.call, 'get_generation')
+
+        client = StorageStateClient(StorageMock(), connection)
+        self.assertFalse(client.is_ready())
+        self.assertIsNone(client.get_instances("LMI_StorageExtent"))
+        client.wait_for_ready()
+        self.assertTrue(client.is_ready())
+        self.assertEqual(client.storage.resets, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util import sysfs
+import openlmi.common.cmpi_logging as cmpi_logging
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from mocks import CMPILoggerMock
+
+class TestSysfs(unittest.TestCase):
+    """
+        Test reading of block devices from sysfs and udev database.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.directory = tempfile.mkdtemp()
+        self.orig_paths = (sysfs.SYS_BLOCK, sysfs.UDEV_DATA, sysfs.MOUNTINFO,
+                sysfs.DEV_DIR)
+        sysfs.SYS_BLOCK = os.path.join(self.directory, "block")
+        sysfs.UDEV_DATA = os.path.join(self.directory, "udev")
+        sysfs.MOUNTINFO = os.path.join(self.directory, "mountinfo")
+        sysfs.DEV_DIR = os.path.join(self.directory, "dev")
+        os.makedirs(sysfs.UDEV_DATA)
+        os.makedirs(sysfs.DEV_DIR)
+
+    def _write(self, path, content):
+        """ Write file in the fake tree, creating its directory."""
+        path = os.path.join(self.directory, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(content)
+
+    def _add_device(self, path, dev, size, **files):
+        """ Add block device with given major:minor and size in sectors."""
+        self._write(os.path.join(path, "dev"), dev + "\n")
+        self._write(os.path.join(path, "size"), "%d\n" % size)
+        for (name, content) in files.iteritems():
+            self._write(os.path.join(path, name), content + "\n")
+
+    def test_devices(self):
+        """ Test disk with partitions, LV and mounted filesystem."""
+        self._add_device("block/sda", "8:0", 2048000,
+                **{"queue/logical_block_size": "4096"})
+        self._add_device("block/sda/sda2", "8:2", 2000, partition="2")
+        self._add_device("block/sda/sda1", "8:1", 1000, partition="1")
+        self._add_device("block/dm-0", "253:0", 1000,
+                **{"dm/name": "vg-lv", "dm/uuid": "LVM-abcd"})
+        os.makedirs(os.path.join(sysfs.SYS_BLOCK, "dm-0", "slaves", "sda2"))
+        self._write("udev/b8:0", "S:disk/by-id/foo\nE:ID_PART_TABLE_TYPE=dos\n")
+        self._write("udev/b8:2", "E:ID_FS_TYPE=LVM2_member\n"
+                "E:ID_FS_USAGE=raid\n")
+        self._write("udev/b253:0", "E:DM_VG_NAME=vg\nE:DM_LV_NAME=lv\n")
+        self._write("mountinfo",
+                "20 1 8:1 / /boot rw,relatime shared:1 - xfs /dev/sda1 rw\n")
+
+        devices = sysfs.get_devices()
+        self.assertEqual(devices.keys(), ["dm-0", "sda", "sda1", "sda2"])
+
+        sda = devices["sda"]
+        self.assertEqual(sda.type, sysfs.BlockDevice.TYPE_DISK)
+        self.assertEqual(sda.path, "/dev/sda")
+        self.assertEqual(sda.size, 2048000 * 512)
+        self.assertEqual(sda.sector_size, 4096)
+        self.assertEqual(sda.partition_table, "dos")
+
+        sda1 = devices["sda1"]
+        self.assertEqual(sda1.type, sysfs.BlockDevice.TYPE_PARTITION)
+        self.assertEqual(sda1.parents, ["sda"])
+        self.assertEqual(sda1.partition_number, 1)
+        self.assertEqual(sda1.sector_size, 4096)
+        # no udev data, the filesystem is found in mountinfo
+        self.assertEqual(sda1.fs_type, "xfs")
+        self.assertEqual(sda1.fs_usage, "filesystem")
+        self.assertEqual(sda1.mounts, [("/boot", "xfs")])
+
+        self.assertEqual(devices["sda2"].fs_type, "LVM2_member")
+        self.assertEqual(devices["sda2"].fs_usage, "raid")
+
+        lv = devices["dm-0"]
+        self.assertEqual(lv.type, sysfs.BlockDevice.TYPE_LV)
+        self.assertEqual(lv.path, "/dev/mapper/vg-lv")
+        self.assertEqual(lv.display_name, "vg-lv")
+        self.assertEqual(lv.vg_name, "vg")
+        self.assertEqual(lv.parents, ["sda2"])
+        self.assertEqual(lv.sector_size, 512)
+        self.assertIsNone(lv.fs_type)
+
+    def _write_pv(self, name, metadata, label_sector=1):
+        """
+            Write fake LVM physical volume with given metadata text
+            to the fake /dev.
+        """
+        mda_offset = 4096
+        mda_size = 1024 * 1024
+        label = struct.pack('<8sQII8s', 'LABELONE', label_sector, 0, 32,
+                'LVM2 001')
+        label += struct.pack('<32sQ', 'x' * 32, 8 * 1024 * 1024)
+        # one data area, one metadata area
+        label += struct.pack('<QQQQ', mda_offset + mda_size, 0, 0, 0)
+        label += struct.pack('<QQQQ', mda_offset, mda_size, 0, 0)
+        image = '\0' * (label_sector * 512) + label
+        image += '\0' * (mda_offset - len(image))
+        text_offset = 512
+        header = struct.pack('<I16sIQQ', 0, ' LVM2 x[5A%r0N*>', 1,
+                mda_offset, mda_size)
+        if metadata:
+            header += struct.pack('<QQII', text_offset, len(metadata), 0, 0)
+        image += header + '\0' * (text_offset - len(header)) + metadata
+        self._write(os.path.join("dev", name), image)
+
+    def test_volume_groups(self):
+        """ Test that VGs are found in metadata of PVs, not from LVs."""
+        self._add_device("block/sda", "8:0", 2048000)
+        self._add_device("block/sdb", "8:16", 2048000)
+        self._add_device("block/sdc", "8:32", 2048000)
+        self._add_device("block/sdd", "8:48", 2048000)
+        for dev in ("8:0", "8:16", "8:32"):
+            self._write("udev/b" + dev, "E:ID_FS_TYPE=LVM2_member\n")
+        # inactive VG without any dm device
+        self._write_pv("sda", 'vg1 {\nid = "abcd"\nseqno = 3\n}\n')
+        self._write_pv("sdb", 'vg1 {\nid = "abcd"\nseqno = 3\n}\n', 0)
+        # orphan PV
+        self._write_pv("sdc", '')
+        # not a PV at all
+        self._write("dev/sdd", '\0' * 4096)
+
+        vgs = sysfs.get_volume_groups(sysfs.get_devices())
+        self.assertEqual(vgs, {"vg1": ["sda", "sdb"]})
+        self.assertIsNone(sysfs.read_pv_vg_name(
+                os.path.join(sysfs.DEV_DIR, "sdd")))
+        self.assertIsNone(sysfs.read_pv_vg_name(
+                os.path.join(sysfs.DEV_DIR, "missing")))
+
+    def tearDown(self):
+        (sysfs.SYS_BLOCK, sysfs.UDEV_DATA, sysfs.MOUNTINFO,
+                sysfs.DEV_DIR) = self.orig_paths
+        shutil.rmtree(self.directory)
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
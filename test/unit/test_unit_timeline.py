@@ -0,0 +1,123 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util import timeline
+import openlmi.common.cmpi_logging as cmpi_logging
+import json
+import os
+import tempfile
+import unittest
+from mocks import CMPILoggerMock
+
+def make_timer(action, phases):
+    """
+        Return finished ActionTimer with given phases, each measured once.
+    """
+    timer = timeline.ActionTimer(action, '/dev/sda')
+    for phase in phases:
+        with timer.phase(phase):
+            pass
+    timer.finish()
+    return timer
+
+class TestTimeline(unittest.TestCase):
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+
+    def test_phases(self):
+        """ Test that phases are recorded in order and repeated ones summed."""
+        timer = make_timer('Create', ['lock_wait', 'process_actions',
+                'lock_wait'])
+        record = timer.get_record()
+        self.assertEqual(record['action'], 'Create')
+        self.assertEqual(record['device'], '/dev/sda')
+        self.assertEqual(record['phases'].keys(),
+                ['lock_wait', 'process_actions'])
+        self.assertTrue(record['duration'] >= 0)
+        self.assertEqual(record['error'], None)
+
+    def test_error(self):
+        """ Test that failed phase is recorded together with the error."""
+        timer = timeline.ActionTimer('Destroy', '/dev/sda')
+        try:
+            with timer.phase('process_actions'):
+                raise ValueError('failed')
+        except ValueError, err:
+            timer.finish(str(err))
+        record = timer.get_record()
+        self.assertEqual(record['phases'].keys(), ['process_actions'])
+        self.assertEqual(record['error'], 'failed')
+
+    def test_bound(self):
+        """ Test that only given nr. of records is kept."""
+        actions = timeline.ActionTimeline(size=3)
+        for i in xrange(5):
+            actions.add(make_timer('action%d' % i, ['reset']))
+        (sequence, records) = actions.get_records()
+        self.assertEqual(sequence, 5)
+        self.assertEqual([r['action'] for r in records],
+                ['action2', 'action3', 'action4'])
+        self.assertEqual([r['sequence'] for r in records], [3, 4, 5])
+
+        actions.configure(1, None)
+        (sequence, records) = actions.get_records()
+        self.assertEqual([r['action'] for r in records], ['action4'])
+
+        actions.configure(0, None)
+        actions.add(make_timer('action5', ['reset']))
+        (sequence, records) = actions.get_records()
+        self.assertEqual(sequence, 6)
+        self.assertEqual(records, [])
+
+    def test_since(self):
+        """ Test that only records after given sequence are returned."""
+        actions = timeline.ActionTimeline()
+        actions.add(make_timer('action1', ['reset']))
+        (sequence, records) = actions.get_records()
+        self.assertEqual(len(records), 1)
+
+        (sequence, records) = actions.get_records(sequence)
+        self.assertEqual(sequence, 1)
+        self.assertEqual(records, [])
+
+        actions.add(make_timer('action2', ['reset']))
+        (sequence, records) = actions.get_records(sequence)
+        self.assertEqual(sequence, 2)
+        self.assertEqual([r['action'] for r in records], ['action2'])
+
+    def test_log(self):
+        """ Test that records are appended to the log file as JSON lines."""
+        (handle, path) = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            actions = timeline.ActionTimeline(log_path=path)
+            actions.add(make_timer('action1', ['reset']))
+            actions.add(make_timer('action2', ['udev_settle', 'reset']))
+            with open(path) as log_file:
+                lines = [json.loads(line) for line in log_file]
+        finally:
+            os.unlink(path)
+        self.assertEqual([line['action'] for line in lines],
+                ['action1', 'action2'])
+        self.assertEqual(sorted(lines[1]['phases'].keys()),
+                ['reset', 'udev_settle'])
+        self.assertEqual(lines[1]['sequence'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
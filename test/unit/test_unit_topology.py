@@ -0,0 +1,152 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.StorageTopology import StorageTopology
+import json
+import pywbem
+import openlmi.common.cmpi_logging as cmpi_logging
+import unittest
+from mocks import CMPILoggerMock
+
+class DeviceMock(object):
+    """ Mockup of blivet StorageDevice."""
+    def __init__(self, path, size, parents=()):
+        self.path = path
+        self.size = size
+        self.parents = list(parents)
+        self.format = None
+
+class DeviceTreeMock(object):
+    """ Mockup of blivet DeviceTree."""
+    pass
+
+class StorageMock(object):
+    """ Mockup of blivet.Blivet."""
+    def __init__(self):
+        self.devices = []
+        self.devicetree = DeviceTreeMock()
+
+    def reset(self):
+        self.devicetree = DeviceTreeMock()
+
+class DeviceProviderMock(object):
+    """ Mockup of DeviceProvider."""
+    def get_instance(self, env, model, device):
+        model['NumberOfBlocks'] = pywbem.Uint64(device.size)
+        return model
+
+class ProviderManagerMock(object):
+    """ Mockup of ProviderManager."""
+    def __init__(self):
+        self.provider = DeviceProviderMock()
+        self.setting_providers = []
+
+    def get_provider_for_device(self, device):
+        return self.provider
+
+    def get_name_for_device(self, device):
+        return pywbem.CIMInstanceName('LMI_StorageExtent',
+                namespace='root/cimv2',
+                keybindings={'DeviceID': device.path})
+
+class TestStorageTopology(unittest.TestCase):
+    """
+        Test topology export and its deltas.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.storage = StorageMock()
+        self.sda = DeviceMock('/dev/sda', 100)
+        self.sda1 = DeviceMock('/dev/sda1', 50, [self.sda])
+        self.storage.devices = [self.sda, self.sda1]
+        self.topology = StorageTopology(self.storage, ProviderManagerMock(),
+                'root/cimv2')
+
+    def _get(self, since=None, epoch=None):
+        """ Return parsed document."""
+        (generation, document) = self.topology.get_document(since, epoch)
+        document = json.loads(document)
+        self.assertEqual(document['generation'], generation)
+        return document
+
+    def test_full(self):
+        """ Test full topology."""
+        document = self._get()
+        self.assertEqual(document['version'], 1)
+        self.assertEqual(document['generation'], 1)
+        self.assertIsNone(document['since'])
+        sda1 = document['objects']['LMI_StorageExtent.DeviceID="/dev/sda1"']
+        self.assertEqual(sda1['parents'],
+                ['LMI_StorageExtent.DeviceID="/dev/sda"'])
+        self.assertEqual(sda1['properties']['NumberOfBlocks'], 50)
+
+        # nothing changed, the same generation
+        self.storage.reset()
+        self.assertEqual(self._get()['generation'], 1)
+
+    def test_delta(self):
+        """ Test changes since previous generation."""
+        epoch = self._get()['epoch']
+        self.sda1.size = 60
+        sda2 = DeviceMock('/dev/sda2', 40, [self.sda])
+        self.storage.devices = [self.sda, self.sda1, sda2]
+        self.storage.reset()
+        document = self._get(1, epoch)
+        self.assertEqual(document['generation'], 2)
+        self.assertEqual(document['since'], 1)
+        self.assertEqual(sorted(document['objects'].keys()), [
+                'LMI_StorageExtent.DeviceID="/dev/sda1"',
+                'LMI_StorageExtent.DeviceID="/dev/sda2"'])
+        self.assertEqual(document['removed'], [])
+
+        self.storage.devices = [self.sda, sda2]
+        self.storage.reset()
+        document = self._get(2, epoch)
+        self.assertEqual(document['objects'], {})
+        self.assertEqual(document['removed'],
+                ['LMI_StorageExtent.DeviceID="/dev/sda1"'])
+        # delta over two generations
+        document = self._get(1, epoch)
+        self.assertEqual(document['objects'].keys(),
+                ['LMI_StorageExtent.DeviceID="/dev/sda2"'])
+        self.assertEqual(document['removed'],
+                ['LMI_StorageExtent.DeviceID="/dev/sda1"'])
+
+        # unknown epoch gets full topology
+        document = self._get(2, 'foo')
+        self.assertIsNone(document['since'])
+        self.assertEqual(len(document['objects']), 2)
+
+    def test_forget_removed(self):
+        """ Test that old deltas are not available after many removals."""
+        self.topology.MAX_REMOVED = 1
+        epoch = self._get()['epoch']
+        self.storage.devices = [self.sda]
+        self.storage.reset()
+        self._get()
+        self.storage.devices = []
+        self.storage.reset()
+        self.assertEqual(self._get(2, epoch)['since'], 2)
+        self.assertIsNone(self._get(1, epoch)['since'])
+
+    def tearDown(self):
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util import udev
+import openlmi.common.cmpi_logging as cmpi_logging
+import os
+import shutil
+import tempfile
+import unittest
+from mocks import CMPILoggerMock
+
+class DeviceMock(object):
+    """ Mockup of pyudev.Device."""
+    def __init__(self, sys_path, action=None, device_node=None,
+            device_links=(), **properties):
+        self.sys_path = sys_path
+        self.sys_name = os.path.basename(sys_path)
+        self.action = action
+        self.device_node = device_node
+        self.device_links = list(device_links)
+        self.properties = properties
+
+    def get(self, name, default=None):
+        return self.properties.get(name, default)
+
+class MonitorMock(object):
+    """
+        Mockup of pyudev.Monitor, which returns queued events and then
+        None, as if the timeout expired.
+    """
+    def __init__(self):
+        self.events = []
+        self.timeouts = []
+
+    def poll(self, timeout=None):
+        self.timeouts.append(timeout)
+        if self.events:
+            return self.events.pop(0)
+        return None
+
+class TestDeviceSettler(unittest.TestCase):
+    """
+        Test waiting for udev events of modified block devices.
+    """
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.directory = tempfile.mkdtemp()
+        # path -> DeviceMock of devices, which currently exist
+        self.devices = {}
+        self.orig_read_seqnum = udev._read_seqnum
+        udev._read_seqnum = lambda: 10
+
+    def tearDown(self):
+        udev._read_seqnum = self.orig_read_seqnum
+        shutil.rmtree(self.directory)
+        self.logmgr.destroy()
+
+    def _add_device(self, path, sys_path, **properties):
+        """ Add existing device with fake uevent file in sysfs."""
+        sys_path = os.path.join(self.directory, sys_path)
+        os.makedirs(sys_path)
+        device = DeviceMock(sys_path, device_node=path, **properties)
+        self.devices[path] = device
+        return device
+
+    def _create_settler(self, paths):
+        """
+            Return DeviceSettler of given paths, which uses MonitorMock
+            and self.devices instead of pyudev.
+        """
+        settler = udev.DeviceSettler.__new__(udev.DeviceSettler)
+        settler.paths = set(paths)
+        settler._monitor = MonitorMock()
+        settler._get_device = self.devices.get
+        settler._existing = set()
+        settler._parent_sys_paths = []
+        for path in settler.paths:
+            device = settler._get_device(path)
+            if device is not None:
+                settler._existing.add(path)
+                settler._parent_sys_paths.append(device.sys_path)
+        return settler
+
+    def _read_uevent(self, device):
+        """ Return what was written to uevent file of the device."""
+        with open(os.path.join(device.sys_path, 'uevent')) as uevent:
+            return uevent.read()
+
+    def test_change(self):
+        """ Test waiting for triggered 'change' event."""
+        sda = self._add_device('/dev/sda', 'block/sda')
+        settler = self._create_settler(['/dev/sda'])
+        monitor = settler._monitor
+        monitor.events = [
+                # old event, emitted before the trigger
+                DeviceMock(sda.sys_path, 'change', SEQNUM='9'),
+                DeviceMock(sda.sys_path, 'change', SEQNUM='11'),
+                DeviceMock(sda.sys_path, 'change', SEQNUM='12')]
+        settler._wait(udev.SETTLE_TIMEOUT)
+        self.assertEqual(self._read_uevent(sda), 'change')
+        self.assertEqual(len(monitor.events), 1)
+
+    def test_add_partition(self):
+        """ Test waiting for 'add' event of a new partition."""
+        sda = self._add_device('/dev/sda', 'block/sda')
+        settler = self._create_settler(['/dev/sda', '/dev/sda1'])
+        monitor = settler._monitor
+        sda1 = os.path.join(sda.sys_path, 'sda1')
+        monitor.events = [
+                DeviceMock(sda1, 'add'),
+                DeviceMock(sda.sys_path, 'change', SEQNUM='11'),
+                DeviceMock(sda.sys_path, 'change', SEQNUM='12')]
+        settler._wait(udev.SETTLE_TIMEOUT)
+        self.assertEqual(len(monitor.events), 1)
+
+    def test_add_dm(self):
+        """
+            Test that 'add' event of device-mapper device is not enough,
+            its 'change' event with DM_NAME is waited for.
+        """
+        sda = self._add_device('/dev/sda', 'block/sda')
+        settler = self._create_settler(['/dev/sda', '/dev/mapper/vg-lv'])
+        monitor = settler._monitor
+        dm = os.path.join(self.directory, 'block/dm-0')
+        monitor.events = [
+                DeviceMock(sda.sys_path, 'change', SEQNUM='11'),
+                DeviceMock(dm, 'add', device_node='/dev/dm-0'),
+                DeviceMock(dm, 'change', device_node='/dev/dm-0',
+                        DM_NAME='vg-lv'),
+                DeviceMock(dm, 'change', device_node='/dev/dm-0',
+                        DM_NAME='vg-lv')]
+        settler._wait(udev.SETTLE_TIMEOUT)
+        self.assertEqual(len(monitor.events), 1)
+        # the 'change' event was received before the quiet period expired
+        self.assertEqual(None in monitor.timeouts, False)
+
+    def test_add_missing(self):
+        """ Test that missing 'add' event is waited for only QUIET_TIME."""
+        settler = self._create_settler(['/dev/mapper/vg-lv'])
+        monitor = settler._monitor
+        dm = os.path.join(self.directory, 'block/dm-0')
+        monitor.events = [DeviceMock(dm, 'add', device_node='/dev/dm-0')]
+        settler._wait(udev.SETTLE_TIMEOUT)
+        self.assertEqual(monitor.events, [])
+        self.assertEqual(monitor.timeouts[-1] <= udev.QUIET_TIME, True)
+        self.assertEqual(len(monitor.timeouts), 2)
+
+    def test_remove(self):
+        """ Test waiting for 'remove' event of a destroyed device."""
+        sda = self._add_device('/dev/sda', 'block/sda')
+        sda1 = self._add_device('/dev/sda1', 'block/sda/sda1',
+                device_links=['/dev/disk/by-id/foo-part1'])
+        settler = self._create_settler(['/dev/sda', '/dev/sda1'])
+        monitor = settler._monitor
+        monitor.events = [
+                DeviceMock(sda.sys_path, 'change', SEQNUM='11'),
+                DeviceMock(sda1.sys_path, 'remove', device_node='/dev/sda1'),
+                DeviceMock(sda.sys_path, 'change', SEQNUM='12')]
+        # the partition is destroyed by the modification
+        del self.devices['/dev/sda1']
+        settler._wait(udev.SETTLE_TIMEOUT)
+        self.assertEqual(len(monitor.events), 1)
+
+if __name__ == '__main__':
+    unittest.main()
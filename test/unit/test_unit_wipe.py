@@ -0,0 +1,104 @@
+# Copyright (C) 2013 Red Hat, Inc.  All rights reserved.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+#
+# Authors: Jan Safranek <jsafrane@redhat.com>
+# -*- coding: utf-8 -*-
+
+from openlmi.storage.util import wipe
+import openlmi.common.cmpi_logging as cmpi_logging
+import os
+import shutil
+import tempfile
+import unittest
+from mocks import CMPILoggerMock
+
+MB = 1024 * 1024
+
+class TestWipe(unittest.TestCase):
+    """
+        Test removal of metadata signatures.
+    """
+    # Device size, not aligned to 4096 bytes.
+    SIZE = 100 * MB + 512
+
+    def setUp(self):
+        self.logmgr = cmpi_logging.LogManager(CMPILoggerMock())
+        self.directory = tempfile.mkdtemp()
+
+    def _create_device(self, name, markers):
+        """ Create sparse file with 'X' markers at given offsets."""
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.truncate(self.SIZE)
+            for offset in markers:
+                f.seek(offset)
+                f.write("X")
+        return path
+
+    def _read(self, path, offset):
+        """ Read one byte at given offset."""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(1)
+
+    def test_ranges(self):
+        """ Test that the ranges are aligned, merged and cover the end."""
+        ranges = wipe.get_wipe_ranges(self.SIZE)
+        self.assertEqual(ranges[0], (0, MB))
+        self.assertEqual(ranges[1], (64 * MB, 4096))
+        # MD 0.90, MD 1.0 and GPT backup are merged
+        (offset, length) = ranges[2]
+        self.assertEqual(offset + length, self.SIZE)
+        self.assertEqual(offset, 100 * MB - 132 * 1024)
+        self.assertEqual(len(ranges), 3)
+        for (offset, length) in ranges:
+            self.assertEqual(offset % wipe.BLOCK_SIZE, 0)
+
+    def test_wipe(self):
+        """ Test that signatures on all devices are wiped and data kept."""
+        wiped = [0, 4096, 64 * MB + 1, self.SIZE - 1, self.SIZE - 8192,
+                100 * MB - 64 * 1024]
+        kept = [MB, 50 * MB, 64 * MB + 4096, 100 * MB - 256 * 1024]
+        paths = [self._create_device("dev%d" % i, wiped + kept)
+                for i in range(4)]
+        wipe.wipe_devices(paths)
+        for path in paths:
+            for offset in wiped:
+                self.assertEqual(self._read(path, offset), "\0")
+            for offset in kept:
+                self.assertEqual(self._read(path, offset), "X")
+            self.assertEqual(os.path.getsize(path), self.SIZE)
+
+    def test_errors(self):
+        """ Test that all devices are wiped and the error is raised."""
+        wiped = [0, self.SIZE - 1]
+        paths = [self._create_device("dev%d" % i, wiped)
+                for i in range(wipe.MAX_THREADS + 2)]
+        missing = os.path.join(self.directory, "missing")
+        paths.insert(1, missing)
+        self.assertRaises(OSError, wipe.wipe_devices, paths)
+        for path in paths:
+            if path == missing:
+                continue
+            for offset in wiped:
+                self.assertEqual(self._read(path, offset), "\0")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.logmgr.destroy()
+
+if __name__ == '__main__':
+    unittest.main()